@@ -0,0 +1,669 @@
+"""
+Асинхронный парсер хронологии: несколько вкладок одного браузера.
+
+Большую часть времени разбор карточки дела ждёт сеть, поэтому вместо
+отдельного Chrome на каждый обработчик один браузер ведёт K вкладок
+одновременно через asyncio и CDP (Playwright). Каждая вкладка проходит
+тот же путь, что и get_case_events: карточка → вкладка «Судебные акты» →
+раскрытие хронологии → извлечение последнего события. Результаты
+сохраняются через apply_case_events, как в sync_chronology. Дела
+захватываются пакетами через case_leases, поэтому асинхронный парсер можно
+запускать параллельно с другими обработчиками.
+
+Playwright — необязательная зависимость:
+    pip install playwright && playwright install chromium
+"""
+
+import asyncio
+import fnmatch
+import logging
+import os
+import random
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from functools import partial
+from parser import (  # type: ignore
+    apply_case_events,
+    parse_hearing_text,
+    save_error_page,
+)
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from calendar_reconcile import reconcile_after_scrape
+from case_leases import (
+    claim_cases,
+    count_due,
+    ensure_leases,
+    heartbeat,
+    reclaim_expired,
+    release_case,
+    release_unfinished,
+    reset_due,
+)
+from db import Session
+from document_state import default_worker_id
+from hearings import write_hearings_ics
+from kad_selectors import CARD_URL, SELECTORS
+from lean_profile import BLOCKED_URLS, BROWSER_LEAN
+from logging_setup import bind_log_context, setup_logging
+from metrics import METRICS, job_finished, job_started
+from notify_outbox import flush_after_scrape
+from retry_policy import (
+    BLOCKED,
+    DEFAULT_POLICY,
+    LAYOUT,
+    MAX_CONSECUTIVE_BLOCKS,
+    PERMANENT,
+    CaseFailure,
+    RetryPolicy,
+    classify_exception,
+    classify_page,
+    record_case_failure,
+)
+from selector_health import HEALTH, LayoutDriftError
+from timing import TIMINGS
+from utils import USER_AGENTS, human_pause
+
+logger = logging.getLogger(__name__)
+
+# Количество одновременно открытых вкладок
+ASYNC_TABS = int(os.getenv("ASYNC_TABS", "4"))
+# Сколько дел на вкладку захватывается за раз: больший пакет реже
+# обращается к БД, меньший быстрее возвращает дела при падении обработчика
+ASYNC_CLAIM_PER_TAB = int(os.getenv("ASYNC_CLAIM_PER_TAB", "5"))
+# Адрес уже запущенного Chrome (--remote-debugging-port); если не задан,
+# Playwright запускает собственный Chromium
+PLAYWRIGHT_CDP_URL = os.getenv("PLAYWRIGHT_CDP_URL", "")
+PLAYWRIGHT_HEADLESS = (
+    os.getenv("PLAYWRIGHT_HEADLESS", "false").lower() == "true"
+)
+
+# Типы ресурсов, которые не нужны для разбора карточки
+BLOCKED_RESOURCE_TYPES = {"image", "font", "media"}
+
+# Тексты блоков с информацией о следующем заседании: сначала по структуре
+# (блок с иконкой календаря), затем резервный поиск по фразе
+HEARING_SCRIPT = """
+(s) => {
+    const blocks = [];
+    for (const block of document.querySelectorAll(s.hearing_block)) {
+        if (block.querySelector(s.hearing_icon)) {
+            blocks.push(block.innerText.trim());
+        }
+    }
+    let fallback = '';
+    const xpath = document.evaluate(
+        s.hearing_text, document, null,
+        XPathResult.FIRST_ORDERED_NODE_TYPE, null);
+    if (xpath.singleNodeValue) {
+        fallback = xpath.singleNodeValue.innerText.trim();
+    }
+    return {blocks: blocks, fallback: fallback};
+}
+"""
+
+# Поля последнего события хронологии и количество событий
+EVENT_SCRIPT = """
+(s) => {
+    const items = document.querySelectorAll(s.chrono_item);
+    if (!items.length) { return null; }
+    const last = items[0];
+    const text = (sel) => {
+        const el = last.querySelector(sel);
+        return el ? el.innerText.trim() : '';
+    };
+    const link = last.querySelector(s.doc_link);
+    return {
+        event_date: text(s.event_date),
+        event_title: text(s.event_title),
+        event_author: text(s.event_author),
+        event_publish: text(s.event_publish),
+        doc_link: link ? link.href : '',
+        events_count: items.length,
+    };
+}
+"""
+
+
+async def _route_lean(route) -> None:
+    """Отклоняет запросы к изображениям, шрифтам и счётчикам."""
+    request = route.request
+    if request.resource_type in BLOCKED_RESOURCE_TYPES or any(
+        fnmatch.fnmatch(request.url, pattern) for pattern in BLOCKED_URLS
+    ):
+        await route.abort()
+    else:
+        await route.continue_()
+
+
+async def fetch_case_events(
+    page, case_number: str, policy: Optional[RetryPolicy] = None
+) -> Tuple[Dict[str, Any], int]:
+    """
+    Получает последнее событие дела во вкладке браузера.
+
+    Асинхронный аналог get_case_events с той же политикой повторов.
+
+    Args:
+        page: Вкладка Playwright
+        case_number: Номер дела
+        policy: Политика повторов (по умолчанию DEFAULT_POLICY)
+
+    Returns:
+        Tuple: (данные события, количество событий)
+
+    Raises:
+        CaseFailure: Если дело получить не удалось (с классом ошибки)
+        LayoutDriftError: Если обязательные селекторы перестали находиться
+    """
+    from playwright.async_api import (
+        TimeoutError as PlaywrightTimeoutError,  # type: ignore
+    )
+
+    # Контекст задачи asyncio: у каждой вкладки свой
+    bind_log_context(case_number=case_number, stage="scrape")
+    budget = (policy or DEFAULT_POLICY).start()
+    laps = TIMINGS.laps(case_number)
+    failure: Optional[CaseFailure] = None
+    while True:
+        delay = budget.delay_before_next(failure)
+        if delay is None:
+            break
+        await asyncio.sleep(delay)
+        budget.attempt += 1
+        if failure:
+            laps.lap("retry")
+            METRICS.inc("kadbot_retries_total", job="parser_async")
+        try:
+            await page.goto(
+                CARD_URL.format(case_number), wait_until="domcontentloaded"
+            )
+            await asyncio.sleep(human_pause(2.0, 5.0))
+            logger.info("Загружена страница для дела %s", case_number)
+            laps.lap("navigate")
+
+            html = await page.content()
+            page_failure = classify_page(html)
+            if page_failure:
+                logger.warning(
+                    "Дело %s недоступно: %s", case_number, page_failure.reason
+                )
+                save_error_page(case_number, html)
+                raise page_failure
+            laps.lap("block_check")
+
+            hearing_date = hearing_time = hearing_room = ""
+            try:
+                texts = await page.evaluate(HEARING_SCRIPT, SELECTORS)
+                for text in texts["blocks"]:
+                    hearing_date, hearing_time, hearing_room = (
+                        parse_hearing_text(text)
+                    )
+                    if hearing_date:
+                        break
+                if not hearing_date and texts["fallback"]:
+                    hearing_date, hearing_time, hearing_room = (
+                        parse_hearing_text(texts["fallback"], fallback=True)
+                    )
+            except Exception as e:
+                logger.info(
+                    "Не удалось извлечь 'Следующее заседание' для %s: %s",
+                    case_number,
+                    e,
+                )
+            laps.lap("hearing")
+
+            # Переключение на вкладку "Судебные акты"
+            try:
+                await page.wait_for_selector(
+                    SELECTORS["tab"], timeout=budget.timeout(8) * 1000
+                )
+                HEALTH.record("tab", True, case_number)
+                tab = page.locator(SELECTORS["tab"], has_text="Судебные акты")
+                if await tab.count():
+                    await tab.first.click()
+                    await asyncio.sleep(human_pause(1.0, 2.0))
+            except PlaywrightTimeoutError:
+                HEALTH.record("tab", False, case_number)
+            except Exception as e:
+                logger.info(
+                    "Не удалось переключиться на вкладку 'Судебные акты' "
+                    "для дела %s: %s",
+                    case_number,
+                    e,
+                )
+            laps.lap("tab_switch")
+
+            # Раскрытие хронологии
+            try:
+                button = await page.wait_for_selector(
+                    SELECTORS["collapse"],
+                    state="visible",
+                    timeout=budget.timeout(10) * 1000,
+                )
+                HEALTH.record("collapse", True, case_number)
+                await button.scroll_into_view_if_needed()
+                await button.click()
+                await asyncio.sleep(human_pause(1.0, 2.0))
+            except PlaywrightTimeoutError:
+                logger.warning(
+                    "Кнопка раскрытия хронологии (%s) не найдена для дела %s "
+                    "после 10 секунд",
+                    SELECTORS["collapse"],
+                    case_number,
+                )
+                HEALTH.record("collapse", False, case_number)
+                save_error_page(case_number, await page.content())
+                raise CaseFailure(LAYOUT, "нет кнопки раскрытия хронологии")
+            laps.lap("expand")
+
+            try:
+                await page.wait_for_selector(
+                    SELECTORS["chrono_item"],
+                    timeout=budget.timeout(20) * 1000,
+                )
+                HEALTH.record("chrono_item", True, case_number)
+            except PlaywrightTimeoutError:
+                logger.warning(
+                    "Элементы хронологии (%s) не найдены для дела %s "
+                    "после 20 секунд",
+                    SELECTORS["chrono_item"],
+                    case_number,
+                )
+                HEALTH.record("chrono_item", False, case_number)
+                save_error_page(case_number, await page.content())
+                raise CaseFailure(LAYOUT, "нет элементов хронологии")
+            laps.lap("wait_items")
+
+            data = await page.evaluate(EVENT_SCRIPT, SELECTORS)
+            if not data:
+                raise CaseFailure(LAYOUT, "нет элементов хронологии")
+            HEALTH.record("event_date", bool(data["event_date"]), case_number)
+            HEALTH.record(
+                "event_title", bool(data["event_title"]), case_number
+            )
+            events_count = data.pop("events_count")
+            data["event_publish"] = (
+                data["event_publish"].replace("Дата публикации:", "").strip()
+            )
+            data.update(
+                events_count=events_count,
+                hearing_date=hearing_date,
+                hearing_time=hearing_time,
+                hearing_room=hearing_room,
+            )
+            logger.info(
+                "Спарсено событие для дела %s: %s — %s",
+                case_number,
+                data["event_title"],
+                data["event_date"],
+            )
+            laps.lap("extract")
+            return data, events_count
+
+        except LayoutDriftError:
+            raise
+        except Exception as e:
+            failure = classify_exception(e)
+            logger.error(
+                "Ошибка при парсинге дела %s (попытка %s, %s): %s",
+                case_number,
+                budget.attempt,
+                failure.kind,
+                failure.reason,
+            )
+
+    failure = budget.give_up(failure)
+    logger.error("Не удалось спарсить дело %s: %s", case_number, failure)
+    raise failure
+
+
+def _record_failure(case_number: str, failure: CaseFailure) -> None:
+    """Записывает постоянную ошибку в отдельной сессии БД (в потоке)."""
+    session = Session()
+    try:
+        record_case_failure(session, case_number, failure)
+    finally:
+        session.close()
+
+
+def _persist(
+    case_number: str, web_event: Dict[str, Any], events_count: int
+) -> str:
+    """Сохраняет событие в отдельной сессии БД (вызывается в потоке)."""
+    session = Session()
+    try:
+        return apply_case_events(
+            session, case_number, web_event, events_count
+        )
+    finally:
+        session.close()
+
+
+def _claim(worker_id: str, limit: int, run_started: datetime) -> List[str]:
+    """Захватывает следующий пакет дел (вызывается в потоке)."""
+    session = Session()
+    try:
+        return claim_cases(session, worker_id, limit, run_started)
+    finally:
+        session.close()
+
+
+def _release(worker_id: str, case_number: str) -> None:
+    """
+    Освобождает обработанное дело и продлевает аренду остальных дел
+    обработчика (вызывается в потоке).
+    """
+    session = Session()
+    try:
+        release_case(session, worker_id, case_number)
+        heartbeat(session, worker_id)
+    finally:
+        session.close()
+
+
+async def _process_case(
+    page,
+    case_number: str,
+    executor: ThreadPoolExecutor,
+    stats: Dict[str, int],
+) -> bool:
+    """
+    Разбирает одно дело во вкладке и сохраняет результат.
+
+    Returns:
+        bool: False, если получено MAX_CONSECUTIVE_BLOCKS блокировок подряд
+            и обход нужно остановить
+    """
+    loop = asyncio.get_running_loop()
+    try:
+        web_event, events_count = await fetch_case_events(page, case_number)
+        stats["consecutive_blocks"] = 0
+    except CaseFailure as failure:
+        stats["failed"] += 1
+        METRICS.inc(
+            "kadbot_case_failures_total",
+            job="parser_async",
+            kind=failure.kind,
+        )
+        if failure.kind == PERMANENT:
+            await loop.run_in_executor(
+                executor, _record_failure, case_number, failure
+            )
+        if failure.kind == BLOCKED:
+            METRICS.inc("kadbot_blocks_total", job="parser_async")
+            stats["consecutive_blocks"] += 1
+        else:
+            # Серию прерывает любой ответ, кроме страницы блокировки
+            stats["consecutive_blocks"] = 0
+        if stats["consecutive_blocks"] >= MAX_CONSECUTIVE_BLOCKS:
+            logger.error(
+                "Получено %s страниц блокировки подряд, парсинг остановлен",
+                stats["consecutive_blocks"],
+            )
+            return False
+        return True
+    METRICS.inc("kadbot_cases_processed_total", job="parser_async")
+    METRICS.progress("parser_async")
+    try:
+        # Сохранение и запросы в CRM — синхронный код; выполняются в одном
+        # потоке, чтобы не нагружать SQLite параллельной записью и не
+        # блокировать цикл событий
+        outcome = await loop.run_in_executor(
+            executor, _persist, case_number, web_event, events_count
+        )
+        stats[outcome] += 1
+        if outcome != "unchanged":
+            METRICS.inc(
+                "kadbot_case_changes_total",
+                job="parser_async",
+                outcome=outcome,
+            )
+    except Exception as e:
+        stats["failed"] += 1
+        logger.error("Ошибка обработки дела %s: %s", case_number, e)
+    return True
+
+
+async def _tab_worker(
+    context,
+    cases: "asyncio.Queue[str]",
+    executor: ThreadPoolExecutor,
+    stats: Dict[str, int],
+    refill: Optional[Callable[[], List[str]]] = None,
+    on_done: Optional[Callable[[str], None]] = None,
+    refill_lock: Optional[asyncio.Lock] = None,
+) -> None:
+    """
+    Обрабатывает дела из очереди в собственной вкладке.
+
+    Args:
+        context: Контекст браузера Playwright
+        cases: Общая очередь номеров дел
+        executor: Поток для синхронной работы с БД
+        stats: Общие счётчики обработки
+        refill: Возвращает следующий пакет дел, когда очередь пуста
+        on_done: Вызывается после обработки каждого дела
+        refill_lock: Общая для вкладок блокировка пополнения очереди
+    """
+    loop = asyncio.get_running_loop()
+    refill_lock = refill_lock or asyncio.Lock()
+    page = await context.new_page()
+    try:
+        while not stats["stopped"]:
+            if cases.empty() and refill is not None:
+                async with refill_lock:
+                    # Пока вкладка ждала блокировку, очередь могла пополнить
+                    # другая вкладка: второй пакет захватывать не нужно
+                    if cases.empty():
+                        for case_number in await loop.run_in_executor(
+                            executor, refill
+                        ):
+                            cases.put_nowait(case_number)
+            try:
+                case_number = cases.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            proceed = await _process_case(page, case_number, executor, stats)
+            if on_done is not None:
+                await loop.run_in_executor(executor, on_done, case_number)
+            if not proceed:
+                # Остальные вкладки завершатся после текущего дела;
+                # захваченные, но не обработанные дела освобождает вызывающий
+                stats["stopped"] = 1
+                return
+            # Пауза между делами в пределах вкладки
+            await asyncio.sleep(human_pause(1.0, 3.0))
+    finally:
+        await page.close()
+
+
+async def run_tabs(
+    case_numbers: List[str],
+    tabs: int = ASYNC_TABS,
+    refill: Optional[Callable[[], List[str]]] = None,
+    on_done: Optional[Callable[[str], None]] = None,
+) -> Dict[str, int]:
+    """
+    Обрабатывает дела в нескольких вкладках одного браузера.
+
+    Args:
+        case_numbers: Номера дел
+        tabs: Количество одновременно открытых вкладок
+        refill: Возвращает следующий пакет дел, когда очередь пуста
+            (вызывается в потоке сохранения)
+        on_done: Вызывается в потоке сохранения после каждого дела
+
+    Returns:
+        Dict[str, int]: Количество добавленных, обновлённых, неизменных и
+            необработанных дел
+
+    Raises:
+        LayoutDriftError: Если разметка изменилась; остальные вкладки к
+            этому моменту остановлены
+    """
+    from playwright.async_api import async_playwright  # type: ignore
+
+    stats = {
+        "added": 0,
+        "updated": 0,
+        "unchanged": 0,
+        "failed": 0,
+        "consecutive_blocks": 0,
+        "stopped": 0,
+    }
+    cases: "asyncio.Queue[str]" = asyncio.Queue()
+    for case_number in case_numbers:
+        cases.put_nowait(case_number)
+
+    executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="persist")
+    async with async_playwright() as playwright:
+        if PLAYWRIGHT_CDP_URL:
+            browser = await playwright.chromium.connect_over_cdp(
+                PLAYWRIGHT_CDP_URL
+            )
+            context = (
+                browser.contexts[0]
+                if browser.contexts
+                else await browser.new_context()
+            )
+        else:
+            browser = await playwright.chromium.launch(
+                headless=PLAYWRIGHT_HEADLESS
+            )
+            context = await browser.new_context(
+                user_agent=random.choice(USER_AGENTS), locale="ru-RU"
+            )
+        if BROWSER_LEAN:
+            await context.route("**/*", _route_lean)
+        refill_lock = asyncio.Lock()
+        workers = [
+            asyncio.ensure_future(
+                _tab_worker(
+                    context,
+                    cases,
+                    executor,
+                    stats,
+                    refill,
+                    on_done,
+                    refill_lock,
+                )
+            )
+            for _ in range(tabs if refill else min(tabs, len(case_numbers)))
+        ]
+        try:
+            await asyncio.gather(*workers)
+        except BaseException:
+            # Ошибка одной вкладки (например, LayoutDriftError) прерывает
+            # обход: остальные вкладки отменяются и дожидаются, чтобы
+            # вызывающий освободил аренду их дел уже после остановки
+            for worker in workers:
+                worker.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+            raise
+        finally:
+            executor.shutdown(wait=True)
+            await browser.close()
+    stats.pop("consecutive_blocks")
+    stats.pop("stopped")
+    return stats
+
+
+def sync_chronology_async(
+    tabs: int = ASYNC_TABS,
+    resume: bool = True,
+    worker_id: Optional[str] = None,
+) -> Dict[str, int]:
+    """
+    Синхронизирует хронологию дел через несколько вкладок.
+
+    Дела захватываются пакетами по tabs * ASYNC_CLAIM_PER_TAB через
+    case_leases, как в sync_chronology.
+
+    Args:
+        tabs: Количество одновременно открытых вкладок
+        resume: Если False, все дела считаются подлежащими обходу
+            независимо от времени последней обработки
+        worker_id: Идентификатор обработчика (по умолчанию host:pid)
+
+    Returns:
+        Dict[str, int]: Итоги обработки (см. run_tabs)
+    """
+    try:
+        import playwright  # type: ignore  # noqa: F401
+    except ImportError:
+        logger.error(
+            "Playwright не установлен: pip install playwright && "
+            "playwright install chromium"
+        )
+        return {}
+
+    setup_logging()
+    worker_id = worker_id or default_worker_id()
+    run_started = datetime.now()
+    session = Session()
+    try:
+        ensure_leases(session)
+        reclaim_expired(session)
+        if not resume:
+            reset_due(session)
+        total = count_due(session, run_started)
+    finally:
+        session.close()
+    if not total:
+        logger.warning(
+            "Нет дел для обработки: все дела обработаны недавно или заняты "
+            "другими обработчиками"
+        )
+        return {}
+
+    logger.info(
+        "Асинхронная обработка %s дел в %s вкладках, обработчик %s",
+        total,
+        tabs,
+        worker_id,
+    )
+    HEALTH.reset()
+    TIMINGS.reset()
+    job_started("parser_async")
+    try:
+        stats = asyncio.run(
+            run_tabs(
+                [],
+                tabs,
+                refill=partial(
+                    _claim, worker_id, tabs * ASYNC_CLAIM_PER_TAB, run_started
+                ),
+                on_done=partial(_release, worker_id),
+            )
+        )
+    except LayoutDriftError as e:
+        logger.critical("Парсинг остановлен: %s", e)
+        raise
+    finally:
+        session = Session()
+        try:
+            release_unfinished(session, worker_id)
+        except Exception as e:
+            logger.error("Не удалось освободить аренду дел: %s", e)
+        try:
+            write_hearings_ics(session)
+        except Exception as e:
+            logger.error("Не удалось записать календарь заседаний: %s", e)
+        try:
+            reconcile_after_scrape(session)
+            flush_after_scrape(session)
+        finally:
+            session.close()
+        TIMINGS.write_summary()
+        job_finished("parser_async")
+    logger.info(
+        "Асинхронная обработка завершена: добавлено %(added)s, обновлено "
+        "%(updated)s, без изменений %(unchanged)s, ошибок %(failed)s",
+        stats,
+    )
+    return stats
+
+
+if __name__ == "__main__":
+    sync_chronology_async()
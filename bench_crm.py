@@ -0,0 +1,265 @@
+"""
+Бенчмарк работы с CRM на локальной замене Aspro.Cloud (mock_crm.py).
+
+Измеряет время синхронизации проектов (первая синхронизация и повторная без
+изменений), скорость отправки уведомлений (комментариев в секунду) в
+нескольких потоках и число запросов к CRM при отправке через очередь
+уведомлений. База данных — временный файл SQLite, рабочая база не
+затрагивается.
+
+Пример запуска:
+    python bench_crm.py --projects 10000 --notifications 500 --threads 1 8
+    python bench_crm.py --projects 100000 --latency 0.02 --rate-limit 0.01
+"""
+
+import argparse
+import json
+import logging
+import os
+import shutil
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List
+
+from mock_crm import MockCrm, generate_projects, start_mock_crm
+
+logger = logging.getLogger(__name__)
+
+
+def _configure_environment(url: str, database_url: str) -> None:
+    """
+    Направляет модули CRM и БД на замену CRM и временную базу.
+
+    Модули читают настройки при импорте, поэтому функция вызывается до их
+    импорта.
+    """
+    os.environ["ASPRO_API_URL"] = url
+    os.environ["DATABASE_URL"] = database_url
+    for name, value in (
+        ("ASPRO_API_KEY", "bench"),
+        ("ASPRO_COMPANY", "bench"),
+        ("USERID", "1"),
+        ("USER_NAME", "Бенчмарк"),
+    ):
+        os.environ[name] = value
+
+
+def bench_sync() -> Dict[str, Any]:
+    """
+    Синхронизирует проекты дважды: первый раз — запись всех дел, второй —
+    без изменений.
+
+    Returns:
+        Dict[str, Any]: Время синхронизаций и количество дел в БД
+    """
+    from crm_sync import sync_crm_projects_to_db
+    from db import Session
+    from models import Cases
+
+    timings = []
+    for _ in range(2):
+        started = time.perf_counter()
+        sync_crm_projects_to_db()
+        timings.append(time.perf_counter() - started)
+    session = Session()
+    try:
+        cases = session.query(Cases).count()
+    finally:
+        session.close()
+    return {
+        "first_sync_seconds": round(timings[0], 3),
+        "repeat_sync_seconds": round(timings[1], 3),
+        "cases": cases,
+    }
+
+
+def bench_notifications(
+    project_ids: List[int], count: int, threads: int
+) -> Dict[str, Any]:
+    """
+    Отправляет count комментариев напрямую в threads потоков.
+
+    Args:
+        project_ids: Проекты, в которые отправляются комментарии
+        count: Количество комментариев
+        threads: Количество потоков
+
+    Returns:
+        Dict[str, Any]: Скорость отправки и количество ошибок
+    """
+    from crm_notify import send_case_update_comment
+
+    def send(index: int) -> bool:
+        return bool(
+            send_case_update_comment(
+                project_ids[index % len(project_ids)],
+                f"Событие {index}",
+                "01.01.2025",
+                f"https://kad.arbitr.ru/Document/{index}",
+            )
+        )
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        results = list(executor.map(send, range(count)))
+    elapsed = time.perf_counter() - started
+    return {
+        "threads": threads,
+        "notifications": count,
+        "failed": results.count(False),
+        "seconds": round(elapsed, 3),
+        "notifications_per_second": round(count / elapsed, 1)
+        if elapsed
+        else 0.0,
+    }
+
+
+def bench_outbox(
+    crm: MockCrm, project_ids: List[int], count: int
+) -> Dict[str, Any]:
+    """
+    Ставит count обновлений в очередь уведомлений и отправляет её.
+
+    Args:
+        crm: Замена CRM (для подсчёта запросов)
+        project_ids: Проекты обновлений
+        count: Количество обновлений
+
+    Returns:
+        Dict[str, Any]: Количество комментариев и запросов к CRM
+    """
+    from db import Session
+    from notify_outbox import enqueue_notification, flush_notifications
+
+    session = Session()
+    try:
+        for index in range(count):
+            enqueue_notification(
+                session,
+                project_ids[index % len(project_ids)],
+                f"А40-{index}/2025",
+                {
+                    "event_title": f"Событие {index}",
+                    "event_date": "01.01.2025",
+                    "doc_link": f"https://kad.arbitr.ru/Document/{index}",
+                },
+            )
+        requests_before = sum(crm.requests.values())
+        started = time.perf_counter()
+        comments = flush_notifications(session, force=True)
+        elapsed = time.perf_counter() - started
+    finally:
+        session.close()
+    return {
+        "updates": count,
+        "projects": len(project_ids),
+        "comments": comments,
+        "crm_requests": sum(crm.requests.values()) - requests_before,
+        "seconds": round(elapsed, 3),
+    }
+
+
+def main() -> int:
+    """
+    Точка входа бенчмарка.
+
+    Returns:
+        int: Код возврата процесса
+    """
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--projects", type=int, default=10000)
+    parser.add_argument("--notifications", type=int, default=500)
+    parser.add_argument(
+        "--threads",
+        type=int,
+        nargs="+",
+        default=[1, 8],
+        help="Варианты количества потоков отправки уведомлений",
+    )
+    parser.add_argument(
+        "--outbox-projects",
+        type=int,
+        default=20,
+        help="Проектов, между которыми распределены обновления очереди",
+    )
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--rate-limit", type=float, default=0.0)
+    parser.add_argument("--page-size", type=int, default=50)
+    parser.add_argument("--json", help="Сохранить результаты в JSON файл")
+    args = parser.parse_args()
+
+    crm = MockCrm(
+        generate_projects(args.projects),
+        latency=args.latency,
+        error_rate=args.error_rate,
+        rate_limit=args.rate_limit,
+        page_size=args.page_size,
+    )
+    server, url = start_mock_crm(crm)
+    workdir = tempfile.mkdtemp(prefix="bench_crm_")
+    _configure_environment(
+        url, "sqlite:///" + os.path.join(workdir, "bench.db")
+    )
+    from db import engine
+    from logging_setup import setup_logging
+    from models import Base
+
+    setup_logging()
+    Base.metadata.create_all(engine)
+    try:
+        active = [
+            project["id"]
+            for project in crm.projects
+            if not project["is_archive"]
+        ]
+        results: Dict[str, Any] = {
+            "projects": args.projects,
+            "latency": args.latency,
+            "error_rate": args.error_rate,
+            "rate_limit": args.rate_limit,
+        }
+        results["sync"] = bench_sync()
+        print(
+            f"Синхронизация {args.projects} проектов: "
+            f"{results['sync']['first_sync_seconds']:.2f} с, повторная "
+            f"{results['sync']['repeat_sync_seconds']:.2f} с, дел в БД "
+            f"{results['sync']['cases']}"
+        )
+
+        results["notifications"] = []
+        print(f"{'потоков':<9}{'уведомл/с':>10}{'ошибок':>8}{'время, с':>10}")
+        for threads in args.threads:
+            summary = bench_notifications(
+                active, args.notifications, threads
+            )
+            results["notifications"].append(summary)
+            print(
+                f"{threads:<9}{summary['notifications_per_second']:>10.1f}"
+                f"{summary['failed']:>8}{summary['seconds']:>10.2f}"
+            )
+
+        results["outbox"] = bench_outbox(
+            crm, active[: args.outbox_projects], args.notifications
+        )
+        print(
+            f"Очередь уведомлений: {results['outbox']['updates']} "
+            f"обновлений -> {results['outbox']['comments']} комментариев, "
+            f"{results['outbox']['crm_requests']} запросов к CRM за "
+            f"{results['outbox']['seconds']:.2f} с"
+        )
+        results["crm_requests"] = dict(crm.requests)
+    finally:
+        server.shutdown()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,192 @@
+"""
+Бенчмарк OCR: скорость (страниц в секунду) и точность распознавания по
+символам на эталонном корпусе.
+
+Корпус в репозиторий не входит (судебные акты содержат персональные
+данные) — это папка с PDF файлами и эталонными текстами рядом:
+    corpus/решение.pdf
+    corpus/решение.gt.txt
+
+Пример запуска:
+    python bench_ocr.py --corpus corpus --steps 400 200,300,400 200,300
+"""
+
+import argparse
+import difflib
+import json
+import logging
+import os
+import sys
+import time
+from typing import Any, Dict, List
+
+from logging_setup import setup_logging
+from ocr import OCR_CONFIG, OCR_LANG, OCR_MIN_CONFIDENCE, ocr_pages
+
+logger = logging.getLogger(__name__)
+
+
+def char_accuracy(reference: str, hypothesis: str) -> float:
+    """
+    Оценивает точность распознавания по символам.
+
+    Пробельные символы нормализуются, так как разбиение на строки зависит от
+    настроек Tesseract и не влияет на пригодность текста.
+
+    Args:
+        reference: Эталонный текст
+        hypothesis: Распознанный текст
+
+    Returns:
+        float: Доля совпадающих символов 0-1
+    """
+    ref = " ".join(reference.split())
+    hyp = " ".join(hypothesis.split())
+    if not ref:
+        return 1.0 if not hyp else 0.0
+    matcher = difflib.SequenceMatcher(None, ref, hyp, autojunk=False)
+    matched = sum(block.size for block in matcher.get_matching_blocks())
+    return matched / max(len(ref), len(hyp))
+
+
+def load_corpus(corpus_dir: str) -> List[Dict[str, str]]:
+    """
+    Загружает список документов корпуса с эталонными текстами.
+
+    Args:
+        corpus_dir: Папка корпуса
+
+    Returns:
+        List[Dict[str, str]]: Пути к PDF и эталонные тексты
+    """
+    documents = []
+    for name in sorted(os.listdir(corpus_dir)):
+        if not name.lower().endswith(".pdf"):
+            continue
+        pdf_path = os.path.join(corpus_dir, name)
+        gt_path = os.path.splitext(pdf_path)[0] + ".gt.txt"
+        if not os.path.exists(gt_path):
+            print(f"Пропущен {name}: нет эталона {gt_path}")
+            continue
+        with open(gt_path, "r", encoding="utf-8") as f:
+            documents.append({"pdf": pdf_path, "reference": f.read()})
+    return documents
+
+
+def run_benchmark(
+    documents: List[Dict[str, str]],
+    dpi_steps: List[int],
+    preprocess: bool,
+    min_confidence: float,
+) -> Dict[str, Any]:
+    """
+    Прогоняет корпус с заданными настройками без использования кеша.
+
+    Args:
+        documents: Документы корпуса
+        dpi_steps: Ступени разрешения
+        preprocess: Выполнять ли предобработку
+        min_confidence: Порог уверенности для перехода на следующую ступень
+
+    Returns:
+        Dict[str, Any]: Сводка по настройкам
+    """
+    pages = 0
+    accuracy_sum = 0.0
+    dpi_counts: Dict[int, int] = {}
+    started = time.monotonic()
+    for document in documents:
+        results = ocr_pages(
+            document["pdf"],
+            dpi_steps=dpi_steps,
+            lang=OCR_LANG,
+            config=OCR_CONFIG,
+            preprocess=preprocess,
+            min_confidence=min_confidence,
+            use_cache=False,
+        )
+        text = "\n".join(result.text for result in results)
+        accuracy_sum += char_accuracy(document["reference"], text)
+        pages += len(results)
+        for result in results:
+            dpi_counts[result.dpi] = dpi_counts.get(result.dpi, 0) + 1
+    elapsed = time.monotonic() - started
+    return {
+        "dpi_steps": dpi_steps,
+        "preprocess": preprocess,
+        "min_confidence": min_confidence,
+        "documents": len(documents),
+        "pages": pages,
+        "seconds": round(elapsed, 2),
+        "pages_per_second": round(pages / elapsed, 3) if elapsed else 0.0,
+        "char_accuracy": round(accuracy_sum / len(documents), 4),
+        "final_dpi_pages": dpi_counts,
+    }
+
+
+def main() -> int:
+    """
+    Точка входа бенчмарка.
+
+    Returns:
+        int: Код возврата процесса
+    """
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument(
+        "--corpus",
+        required=True,
+        help="Папка с PDF файлами и эталонными текстами *.gt.txt",
+    )
+    parser.add_argument(
+        "--steps",
+        nargs="+",
+        default=["400", "200,300,400"],
+        help="Наборы ступеней dpi через запятую",
+    )
+    parser.add_argument(
+        "--min-confidence", type=float, default=OCR_MIN_CONFIDENCE
+    )
+    parser.add_argument(
+        "--compare-preprocess",
+        action="store_true",
+        help="Дополнительно прогнать каждый набор без предобработки",
+    )
+    parser.add_argument("--json", help="Сохранить результаты в JSON файл")
+    args = parser.parse_args()
+    setup_logging()
+
+    if not os.path.isdir(args.corpus):
+        print(f"Папка корпуса не найдена: {args.corpus}")
+        return 1
+    documents = load_corpus(args.corpus)
+    if not documents:
+        print(f"В корпусе {args.corpus} нет PDF с эталонными текстами")
+        return 1
+
+    variants = [True, False] if args.compare_preprocess else [True]
+    summaries = []
+    print(
+        f"{'dpi':<14}{'prep':<6}{'стр/с':>8}{'точность':>10}{'страниц':>9}"
+    )
+    for steps in args.steps:
+        dpi_steps = [int(dpi) for dpi in steps.split(",")]
+        for preprocess in variants:
+            summary = run_benchmark(
+                documents, dpi_steps, preprocess, args.min_confidence
+            )
+            summaries.append(summary)
+            print(
+                f"{steps:<14}{'да' if preprocess else 'нет':<6}"
+                f"{summary['pages_per_second']:>8.2f}"
+                f"{summary['char_accuracy']:>10.2%}"
+                f"{summary['pages']:>9}"
+            )
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(summaries, f, ensure_ascii=False, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,451 @@
+"""
+Бенчмарк парсера карточек дел на локальном сервере kad.arbitr.ru
+(mock_kad.py).
+
+Запускает заданное число процессов-обработчиков (у каждого свой браузер)
+и сообщает дел в минуту, задержки по стадиям (p50/p95 по замерам TIMINGS
+всех обработчиков), пиковую память процесса Python и браузера каждого
+обработчика и число отказов по классам. Карточки, отказы и задержки
+сервера одинаковы при каждом запуске, поэтому результаты разных версий
+парсера можно сравнивать.
+
+Режимы:
+    events — get_case_events для каждого дела: только браузер и разбор;
+    sync   — sync_chronology: аренда дел, запись в БД, очередь уведомлений
+             и сверка календаря (CRM — mock_crm.py);
+    async  — sync_chronology_async: Playwright, ASYNC_TABS вкладок в
+             каждом обработчике.
+
+Паузы, имитирующие человека, по умолчанию отключены (--pause-scale 0),
+иначе они составляют большую часть времени на дело. База данных и
+рабочие файлы — во временной папке, рабочая база не затрагивается.
+
+Пример запуска:
+    python bench_scraper.py --cases 100 --workers 1 2 4
+    python bench_scraper.py --corpus fixtures/kad --mode sync \\
+        --block-rate 0.02 --missing-rate 0.05 --json bench.json
+"""
+
+import argparse
+import json
+import logging
+import multiprocessing
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+from mock_crm import MockCrm, generate_projects, start_mock_crm
+from mock_kad import add_fault_arguments, mock_kad_from_args, start_mock_kad
+
+try:
+    import psutil  # type: ignore
+except ImportError:  # pragma: no cover - psutil необязателен
+    psutil = None
+
+try:
+    import resource
+except ImportError:  # pragma: no cover - нет на Windows
+    resource = None  # type: ignore
+
+logger = logging.getLogger(__name__)
+
+
+def _peak_rss_mb() -> Optional[float]:
+    """Пиковая резидентная память текущего процесса в мегабайтах."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux сообщает килобайты, macOS — байты
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+class _BrowserMemory:
+    """
+    Пиковая память дочерних процессов (chromedriver и браузер), замеряемая
+    в фоновом потоке.
+    """
+
+    def __init__(self, interval: float = 0.5) -> None:
+        self.interval = interval
+        self.peak_mb: Optional[float] = None
+        self._stop = threading.Event()
+        self._thread = threading.Thread(
+            target=self._run, name="browser-memory", daemon=True
+        )
+
+    def _run(self) -> None:
+        process = psutil.Process()
+        while not self._stop.wait(self.interval):
+            total = 0
+            for child in process.children(recursive=True):
+                try:
+                    total += child.memory_info().rss
+                except psutil.Error:
+                    continue
+            mb = total / (1024 * 1024)
+            if total and (self.peak_mb is None or mb > self.peak_mb):
+                self.peak_mb = mb
+
+    def start(self) -> None:
+        """Начинает замер (без psutil замер не ведётся)."""
+        if psutil is not None:
+            self._thread.start()
+
+    def stop(self) -> Optional[float]:
+        """
+        Останавливает замер.
+
+        Returns:
+            Optional[float]: Пиковая память в мегабайтах или None
+        """
+        self._stop.set()
+        if self._thread.is_alive():
+            self._thread.join()
+        return self.peak_mb
+
+
+def _scrape_events(case_numbers: List[str]) -> Dict[str, int]:
+    """
+    Получает события дел через get_case_events в одном браузере.
+
+    Returns:
+        Dict[str, int]: Количество дел по исходам ("ok" или класс отказа)
+    """
+    from parser import get_case_events  # type: ignore
+
+    from browser import BrowserSession
+    from retry_policy import CaseFailure
+    from selector_health import LayoutDriftError
+
+    outcomes: Dict[str, int] = {}
+    with BrowserSession() as browser:
+        for case_number in case_numbers:
+            try:
+                get_case_events(browser.driver, case_number)
+                outcome = "ok"
+            except CaseFailure as failure:
+                outcome = failure.kind
+            except LayoutDriftError as e:
+                logger.error("Обработчик остановлен: %s", e)
+                outcomes["layout_drift"] = 1
+                break
+            outcomes[outcome] = outcomes.get(outcome, 0) + 1
+            browser.page_done()
+    return outcomes
+
+
+def _run_worker(task: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Выполняет задачу обработчика в отдельном процессе.
+
+    Общие настройки процесс наследует из окружения родителя: модули
+    парсера читают их при импорте, а модуль бенчмарка (и с ним
+    kad_selectors) импортируется при запуске процесса, до вызова функции.
+    Настройки обработчика (папка профиля браузера) задаются здесь, до
+    импорта модуля browser.
+
+    Args:
+        task: Режим, номер обработчика, рабочая папка, окружение и дела
+
+    Returns:
+        Dict[str, Any]: Исходы, замеры стадий и память обработчика
+    """
+    os.environ.update(task["env"])
+    os.chdir(task["workdir"])
+    from logging_setup import setup_logging
+    from timing import TIMINGS
+
+    setup_logging()
+    worker_id = f"bench-{task['index']}"
+    memory = _BrowserMemory()
+    memory.start()
+    started = time.perf_counter()
+    outcomes: Dict[str, int] = {}
+    try:
+        if task["mode"] == "events":
+            outcomes = _scrape_events(task["cases"])
+        elif task["mode"] == "sync":
+            from parser import sync_chronology
+
+            sync_chronology(
+                batch_size=task["batch_size"],
+                pause_between_batches=0,
+                worker_id=worker_id,
+            )
+        else:
+            from async_parser import sync_chronology_async
+
+            outcomes = sync_chronology_async(
+                tabs=task["tabs"], worker_id=worker_id
+            )
+    except Exception as e:
+        logger.error("Обработчик %s остановлен: %s", worker_id, e)
+        outcomes["worker_error"] = 1
+        error = f"{type(e).__name__}: {e}"
+    else:
+        error = None
+    seconds = time.perf_counter() - started
+    return {
+        "worker": worker_id,
+        "error": error,
+        "cases": TIMINGS.summary()["cases"],
+        "outcomes": outcomes,
+        "seconds": round(seconds, 3),
+        "python_rss_mb": _round(_peak_rss_mb()),
+        "browser_rss_mb": _round(memory.stop()),
+        "samples": TIMINGS.samples(),
+    }
+
+
+def _round(value: Optional[float]) -> Optional[float]:
+    """Округляет значение памяти для отчёта."""
+    return None if value is None else round(value, 1)
+
+
+def _prepare_database(database_url: str, case_numbers: List[str]) -> None:
+    """Создаёт таблицы и записывает дела для режимов sync и async."""
+    from sqlalchemy import create_engine  # type: ignore
+    from sqlalchemy.orm import Session  # type: ignore
+
+    from models import Base, Cases
+
+    engine = create_engine(database_url)
+    Base.metadata.create_all(engine)
+    with Session(engine) as session:
+        session.add_all(
+            Cases(case_number=case_number, project_id=index)
+            for index, case_number in enumerate(case_numbers, start=1)
+        )
+        session.commit()
+    engine.dispose()
+
+
+def _database_outcomes(database_url: str) -> Dict[str, int]:
+    """Исходы обработки дел по таблицам cases и chronology."""
+    from sqlalchemy import create_engine  # type: ignore
+    from sqlalchemy.orm import Session  # type: ignore
+
+    from models import Cases, Chronology
+
+    engine = create_engine(database_url)
+    with Session(engine) as session:
+        outcomes = {
+            "ok": session.query(Chronology).count(),
+            "permanent": session.query(Cases)
+            .filter(Cases.scrape_status == "permanent")
+            .count(),
+        }
+    engine.dispose()
+    return outcomes
+
+
+def bench_workers(
+    args: argparse.Namespace,
+    case_numbers: List[str],
+    workers: int,
+    kad_url: str,
+    crm_url: str,
+) -> Dict[str, Any]:
+    """
+    Обрабатывает все дела заданным числом обработчиков.
+
+    Args:
+        args: Параметры запуска
+        case_numbers: Номера дел
+        workers: Количество процессов-обработчиков
+        kad_url: Адрес сервера карточек дел
+        crm_url: Адрес замены CRM
+
+    Returns:
+        Dict[str, Any]: Скорость, исходы, задержки по стадиям и память
+    """
+    from timing import Timings
+
+    workdir = tempfile.mkdtemp(prefix="bench_scraper_")
+    database_url = "sqlite:///" + os.path.join(workdir, "bench.db")
+    env = {
+        "KAD_BASE_URL": kad_url,
+        "HUMAN_PAUSE_SCALE": str(args.pause_scale),
+        "DATABASE_URL": database_url,
+        "ASPRO_API_URL": crm_url,
+        "ASPRO_API_KEY": "bench",
+        "ASPRO_COMPANY": "bench",
+        "USERID": "1",
+        "USER_NAME": "Бенчмарк",
+        "METRICS_PORT": "0",
+        "METRICS_TEXTFILE": "",
+        "PLAYWRIGHT_HEADLESS": "true",
+    }
+    os.environ.update(env)
+    tasks = []
+    for index in range(workers):
+        tasks.append(
+            {
+                "mode": args.mode,
+                "index": index,
+                "workdir": workdir,
+                "env": {
+                    "BROWSER_PROFILE_DIR": os.path.join(
+                        workdir, f"profile-{index}"
+                    )
+                },
+                # В режиме events дела делятся заранее, в остальных их
+                # распределяет аренда case_leases
+                "cases": case_numbers[index::workers],
+                "batch_size": args.batch_size,
+                "tabs": args.tabs,
+            }
+        )
+    try:
+        if args.mode != "events":
+            _prepare_database(database_url, case_numbers)
+        context = multiprocessing.get_context("spawn")
+        started = time.perf_counter()
+        with context.Pool(workers) as pool:
+            results = pool.map(_run_worker, tasks)
+        seconds = time.perf_counter() - started
+        outcomes: Dict[str, int] = {}
+        for result in results:
+            for kind, count in result["outcomes"].items():
+                outcomes[kind] = outcomes.get(kind, 0) + count
+        if args.mode != "events":
+            outcomes.update(_database_outcomes(database_url))
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    timings = Timings()
+    for result in results:
+        for stage, samples in result.pop("samples").items():
+            for value in samples:
+                timings.record(stage, value)
+    stages = {
+        stage: {key: stats[key] for key in ("count", "p50", "p95", "max")}
+        for stage, stats in timings.summary()["stages"].items()
+    }
+    processed = sum(result["cases"] for result in results)
+    return {
+        "workers": workers,
+        "cases": processed,
+        "seconds": round(seconds, 3),
+        "cases_per_minute": round(processed / seconds * 60, 1)
+        if seconds
+        else 0.0,
+        "outcomes": outcomes,
+        "stages": stages,
+        "per_worker": results,
+    }
+
+
+def _print_summary(summary: Dict[str, Any]) -> None:
+    """Печатает результаты одного прогона."""
+    outcomes = ", ".join(
+        f"{kind} {count}"
+        for kind, count in sorted(summary["outcomes"].items())
+    )
+    print(
+        f"\nОбработчиков: {summary['workers']}, дел: {summary['cases']} за "
+        f"{summary['seconds']:.1f} с — {summary['cases_per_minute']:.1f} "
+        f"дел/мин ({outcomes or 'нет исходов'})"
+    )
+    print(f"{'стадия':<12}{'раз':>6}{'p50, с':>9}{'p95, с':>9}{'макс, с':>9}")
+    for stage, stats in summary["stages"].items():
+        print(
+            f"{stage:<12}{stats['count']:>6}{stats['p50']:>9.3f}"
+            f"{stats['p95']:>9.3f}{stats['max']:>9.3f}"
+        )
+    print(f"{'обработчик':<12}{'дел':>6}{'Python, МБ':>12}{'браузер, МБ':>13}")
+    for worker in summary["per_worker"]:
+        python_mb = worker["python_rss_mb"]
+        browser_mb = worker["browser_rss_mb"]
+        print(
+            f"{worker['worker']:<12}{worker['cases']:>6}"
+            f"{python_mb if python_mb is not None else '—':>12}"
+            f"{browser_mb if browser_mb is not None else '—':>13}"
+        )
+        if worker["error"]:
+            print(f"  {worker['worker']}: {worker['error']}")
+
+
+def main() -> int:
+    """
+    Точка входа бенчмарка.
+
+    Returns:
+        int: Код возврата процесса
+    """
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument(
+        "--mode", choices=("events", "sync", "async"), default="events"
+    )
+    parser.add_argument(
+        "--cases",
+        type=int,
+        default=50,
+        help="Количество синтетических дел (без --corpus)",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        nargs="+",
+        default=[1],
+        help="Варианты количества процессов-обработчиков",
+    )
+    parser.add_argument(
+        "--pause-scale",
+        type=float,
+        default=0.0,
+        help="Множитель пауз, имитирующих человека (HUMAN_PAUSE_SCALE)",
+    )
+    parser.add_argument("--batch-size", type=int, default=10)
+    parser.add_argument(
+        "--tabs", type=int, default=4, help="Вкладок в режиме async"
+    )
+    add_fault_arguments(parser)
+    parser.add_argument("--json", help="Сохранить результаты в JSON файл")
+    args = parser.parse_args()
+
+    kad = mock_kad_from_args(args, synthetic=not args.corpus)
+    case_numbers = (
+        sorted(kad.corpus)
+        if args.corpus
+        else [f"А40-{index}/2025" for index in range(1, args.cases + 1)]
+    )
+    kad_server, kad_url = start_mock_kad(kad)
+    crm_server, crm_url = start_mock_crm(
+        MockCrm(generate_projects(len(case_numbers), archive_share=0))
+    )
+    results: Dict[str, Any] = {
+        "mode": args.mode,
+        "cases": len(case_numbers),
+        "pause_scale": args.pause_scale,
+        "latency": args.latency,
+        "slow_rate": args.slow_rate,
+        "block_rate": args.block_rate,
+        "subscription_rate": args.subscription_rate,
+        "missing_rate": args.missing_rate,
+        "runs": [],
+    }
+    try:
+        for workers in args.workers:
+            summary = bench_workers(
+                args, case_numbers, workers, kad_url, crm_url
+            )
+            results["runs"].append(summary)
+            _print_summary(summary)
+        results["kad_requests"] = dict(kad.requests)
+    finally:
+        kad_server.shutdown()
+        crm_server.shutdown()
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
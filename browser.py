@@ -0,0 +1,284 @@
+"""
+Модуль для управления долгоживущей сессией браузера.
+Переиспользует профиль Chrome между запусками, перезапускает драйвер после
+заданного числа страниц или при превышении потребления памяти и заранее
+готовит запасной драйвер, чтобы замена не стоила времени.
+"""
+
+import logging
+import os
+import re
+import threading
+from typing import Optional
+
+from utils import get_driver
+
+try:
+    import psutil  # type: ignore
+except ImportError:  # pragma: no cover - psutil необязателен
+    psutil = None
+
+logger = logging.getLogger(__name__)
+
+BROWSER_PROFILE_DIR = os.getenv("BROWSER_PROFILE_DIR", ".browser_profiles")
+BROWSER_MAX_PAGES = int(os.getenv("BROWSER_MAX_PAGES", "200"))
+BROWSER_MAX_RSS_MB = int(os.getenv("BROWSER_MAX_RSS_MB", "1500"))
+# Доля лимита, после которой начинается подготовка запасного драйвера
+SPARE_THRESHOLD = 0.8
+
+
+def driver_rss_mb(driver) -> Optional[float]:
+    """
+    Возвращает суммарную резидентную память процессов браузера.
+
+    Args:
+        driver: Chrome драйвер
+
+    Returns:
+        float: Память в мегабайтах или None, если psutil недоступен
+    """
+    pid = getattr(driver, "browser_pid", None)
+    if psutil is None or not pid:
+        return None
+    try:
+        process = psutil.Process(pid)
+        total = process.memory_info().rss
+        for child in process.children(recursive=True):
+            try:
+                total += child.memory_info().rss
+            except psutil.Error:
+                continue
+        return total / (1024 * 1024)
+    except psutil.Error:
+        return None
+
+
+def driver_cpu_seconds(driver) -> Optional[float]:
+    """
+    Возвращает суммарное процессорное время процессов браузера.
+
+    Args:
+        driver: Chrome драйвер
+
+    Returns:
+        float: Время user+system в секундах или None, если psutil недоступен
+    """
+    pid = getattr(driver, "browser_pid", None)
+    if psutil is None or not pid:
+        return None
+    try:
+        process = psutil.Process(pid)
+        total = 0.0
+        for proc in [process] + process.children(recursive=True):
+            try:
+                times = proc.cpu_times()
+                total += times.user + times.system
+            except psutil.Error:
+                continue
+        return total
+    except psutil.Error:
+        return None
+
+
+class BrowserSession:
+    """
+    Долгоживущая сессия браузера с перезапуском и запасным драйвером.
+
+    Профили Chrome хранятся в двух папках-слотах внутри profile_dir: пока
+    текущий драйвер работает в одном слоте, запасной запускается в другом,
+    так как Chrome не позволяет двум процессам использовать один профиль.
+    Слоты лежат в подпапке обработчика (worker_id, по умолчанию PID), чтобы
+    несколько процессов с общим profile_dir не делили один профиль.
+
+    Пример:
+        with BrowserSession() as browser:
+            for case_number in cases:
+                get_case_events(browser.driver, case_number)
+                browser.page_done()
+    """
+
+    def __init__(
+        self,
+        max_pages: int = BROWSER_MAX_PAGES,
+        max_rss_mb: int = BROWSER_MAX_RSS_MB,
+        profile_dir: Optional[str] = BROWSER_PROFILE_DIR,
+        warm_spare: bool = True,
+        worker_id: Optional[str] = None,
+    ) -> None:
+        """
+        Args:
+            max_pages: Число страниц, после которого драйвер перезапускается
+            max_rss_mb: Порог памяти браузера в мегабайтах
+            profile_dir: Папка для постоянных профилей Chrome (None —
+                временный профиль на каждый запуск)
+            warm_spare: Готовить запасной драйвер заранее
+            worker_id: Идентификатор обработчика: профили хранятся в его
+                подпапке и переиспользуются следующими запусками с тем же
+                идентификатором (по умолчанию — подпапка PID процесса)
+        """
+        self.max_pages = max_pages
+        self.max_rss_mb = max_rss_mb
+        self.profile_dir = profile_dir
+        self.worker_id = worker_id
+        self.warm_spare = warm_spare
+        self.pages = 0
+        self.recycles = 0
+        self._driver = None
+        self._slot = 0
+        self._spare = None
+        self._spare_thread: Optional[threading.Thread] = None
+        self._spare_error: Optional[Exception] = None
+        self._quit_thread: Optional[threading.Thread] = None
+        if psutil is None:
+            logger.info(
+                "psutil не установлен: перезапуск браузера по памяти отключён"
+            )
+
+    def __enter__(self) -> "BrowserSession":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    @property
+    def driver(self):
+        """Текущий драйвер; запускается при первом обращении."""
+        if self._driver is None:
+            self._driver = self._start(self._slot)
+            self.pages = 0
+        return self._driver
+
+    def page_done(self) -> None:
+        """
+        Учитывает обработанную страницу и при необходимости перезапускает
+        драйвер или начинает подготовку запасного.
+        """
+        self.pages += 1
+        rss = driver_rss_mb(self._driver) if self._driver else None
+        if self.pages >= self.max_pages or (
+            rss is not None and rss >= self.max_rss_mb
+        ):
+            logger.info(
+                "Перезапуск браузера: страниц %s, память %s МБ",
+                self.pages,
+                rss if rss is not None else "?",
+            )
+            self.recycle()
+        elif self.warm_spare and (
+            self.pages >= self.max_pages * SPARE_THRESHOLD
+            or (rss is not None and rss >= self.max_rss_mb * SPARE_THRESHOLD)
+        ):
+            self._prepare_spare()
+
+    def recycle(self) -> None:
+        """
+        Заменяет текущий драйвер запасным (или новым, если запасного нет).
+
+        Также используется, когда драйвер перестал отвечать.
+        """
+        old = self._driver
+        self._driver = None
+        if old is not None:
+            # Старый драйвер закрывается в фоне, чтобы не ждать его выхода
+            self._quit_thread = threading.Thread(
+                target=self._quit, args=(old,), name="browser-quit"
+            )
+            self._quit_thread.start()
+
+        spare = self._take_spare()
+        self._slot = 1 - self._slot
+        if spare is not None:
+            self._driver = spare
+            self.pages = 0
+            logger.info("Браузер заменён запасным драйвером")
+        self.recycles += 1
+
+    def recycle_if_dead(self) -> bool:
+        """
+        Перезапускает драйвер, если его сессия перестала отвечать.
+
+        Returns:
+            bool: True, если драйвер был перезапущен
+        """
+        if self._driver is None:
+            return False
+        try:
+            self._driver.current_url
+            return False
+        except Exception as e:
+            logger.warning("Сессия браузера не отвечает: %s", e)
+        self.recycle()
+        return True
+
+    def close(self) -> None:
+        """Закрывает текущий и запасной драйверы."""
+        spare = self._take_spare()
+        for driver in (self._driver, spare):
+            if driver is not None:
+                self._quit(driver)
+        self._driver = None
+        logger.info("Сессия браузера закрыта")
+
+    def _profile(self, slot: int) -> Optional[str]:
+        """Путь к папке профиля для слота или None."""
+        if not self.profile_dir:
+            return None
+        owner = (
+            re.sub(r"[^\w.-]", "_", self.worker_id)
+            if self.worker_id
+            else f"pid-{os.getpid()}"
+        )
+        path = os.path.abspath(
+            os.path.join(self.profile_dir, owner, f"slot-{slot}")
+        )
+        os.makedirs(path, exist_ok=True)
+        return path
+
+    def _start(self, slot: int):
+        """Запускает драйвер в слоте профиля."""
+        return get_driver(user_data_dir=self._profile(slot))
+
+    def _prepare_spare(self) -> None:
+        """Запускает подготовку запасного драйвера в фоне."""
+        if (
+            self._spare is not None
+            or self._spare_thread is not None
+            or self._spare_error is not None
+        ):
+            return
+        slot = 1 - self._slot
+
+        quit_thread = self._quit_thread
+
+        def start_spare() -> None:
+            # Слот освобождается только после выхода предыдущего драйвера
+            if quit_thread is not None:
+                quit_thread.join()
+            try:
+                self._spare = self._start(slot)
+                logger.info("Запасной драйвер готов")
+            except Exception as e:
+                self._spare_error = e
+                logger.error("Не удалось запустить запасной драйвер: %s", e)
+
+        self._spare_thread = threading.Thread(
+            target=start_spare, name="browser-spare", daemon=True
+        )
+        self._spare_thread.start()
+
+    def _take_spare(self):
+        """Дожидается запасного драйвера, если он готовится, и забирает его."""
+        if self._spare_thread is not None:
+            self._spare_thread.join()
+            self._spare_thread = None
+        spare, self._spare, self._spare_error = self._spare, None, None
+        return spare
+
+    @staticmethod
+    def _quit(driver) -> None:
+        """Закрывает драйвер, не прерывая работу при ошибке."""
+        try:
+            driver.quit()
+            logger.info("Chrome драйвер закрыт")
+        except Exception as e:
+            logger.warning("Ошибка при закрытии Chrome драйвера: %s", e)
@@ -0,0 +1,322 @@
+"""
+Модуль сверки календаря заседаний с CRM.
+
+Вместо создания события на каждое обнаруженное заседание сверка читает
+события календаря "Судебные заседания" за период несколькими постраничными
+запросами, сравнивает их с таблицей hearings и выполняет только нужные
+изменения: создаёт события новых заседаний, изменяет события с другим
+временем или кабинетом и удаляет события перенесённых заседаний. ID
+события CRM хранится в hearings.remote_event_id, поэтому повторный запуск
+без изменений не создаёт и не меняет ни одного события.
+
+Удаляются только события, созданные KadBot (описание начинается с
+KADBOT_EVENT_MARKER); события, добавленные вручную, не затрагиваются.
+Создание события проходит через журнал crm_writes, поэтому две
+одновременные сверки не создадут одно событие дважды.
+
+Пример:
+    python main.py calendar-sync --dry-run
+"""
+
+import logging
+import os
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+from crm_calendar import (
+    ASPRO_API_KEY,
+    COMPANY,
+    create_project_calendar_event,
+    delete_calendar_event,
+    get_hearings_calendar_id,
+    hearing_event_data,
+    list_calendar_events,
+    update_calendar_event,
+)
+from crm_writes import (
+    abandon_write,
+    begin_write,
+    complete_write,
+    completed_writes,
+    forget_write,
+    hearing_event_key,
+)
+from hearings import hearings_between
+from models import Cases, Hearing
+
+logger = logging.getLogger(__name__)
+
+# Включить сверку после обхода дел
+CALENDAR_SYNC = os.getenv("CALENDAR_SYNC", "true").lower() == "true"
+# Период сверки: столько дней назад и вперёд от текущего момента
+CALENDAR_SYNC_DAYS_BACK = int(os.getenv("CALENDAR_SYNC_DAYS_BACK", "1"))
+CALENDAR_SYNC_DAYS_AHEAD = int(os.getenv("CALENDAR_SYNC_DAYS_AHEAD", "180"))
+
+# Поля события, по которым решается, нужно ли его изменить
+_COMPARED_FIELDS = ("name", "description", "plan_start_date", "model_id")
+
+
+def _normalize(value: Any) -> str:
+    """Приводит значение поля к строке для сравнения с ответом API."""
+    return str(value if value is not None else "").replace("\r\n", "\n")
+
+
+def _differs(remote: Dict[str, Any], data: Dict[str, Any]) -> bool:
+    """Проверяет, отличается ли событие CRM от ожидаемых полей."""
+    return any(
+        _normalize(remote.get(field)) != _normalize(data[field])
+        for field in _COMPARED_FIELDS
+    )
+
+
+def plan_calendar_changes(
+    hearings: List[Hearing],
+    remote_events: List[Dict[str, Any]],
+    project_ids: Dict[str, int],
+    calendar_id: int,
+) -> Dict[str, list]:
+    """
+    Сравнивает заседания с событиями CRM и составляет список изменений.
+
+    Заседание без remote_event_id сопоставляется с событием того же дела на
+    то же время (например, созданным до появления сверки), чтобы не
+    создавать дубль.
+
+    Args:
+        hearings: Заседания периода
+        remote_events: События KadBot в календаре CRM за тот же период
+        project_ids: Номер дела -> ID проекта в CRM
+        calendar_id: ID календаря
+
+    Returns:
+        Dict[str, list]: "create" и "update" — пары (заседание, поля
+            события), "adopt" — пары (заседание, ID события), "delete" —
+            ID событий
+    """
+    remote_by_id = {int(item["id"]): item for item in remote_events}
+    plan: Dict[str, list] = {
+        "create": [],
+        "update": [],
+        "adopt": [],
+        "delete": [],
+    }
+    unmatched: List[Tuple[Hearing, Dict[str, Any]]] = []
+    for hearing in hearings:
+        project_id = project_ids.get(hearing.case_number)
+        if not project_id:
+            logger.debug(
+                "Нет проекта CRM для дела %s, заседание пропущено",
+                hearing.case_number,
+            )
+            continue
+        data = hearing_event_data(
+            project_id,
+            hearing.case_number,
+            hearing.starts_at,
+            hearing.room,
+            calendar_id,
+        )
+        remote = remote_by_id.pop(hearing.remote_event_id or 0, None)
+        if remote is None:
+            unmatched.append((hearing, data))
+        elif _differs(remote, data):
+            plan["update"].append((hearing, data))
+
+    by_slot = {}
+    for event_id, item in remote_by_id.items():
+        slot = (
+            _normalize(item.get("name")),
+            _normalize(item.get("plan_start_date")),
+        )
+        by_slot[slot] = event_id
+    for hearing, data in unmatched:
+        event_id = by_slot.pop(
+            (data["name"], data["plan_start_date"]), None
+        )
+        if event_id is None:
+            plan["create"].append((hearing, data))
+            continue
+        remote = remote_by_id.pop(event_id)
+        plan["adopt"].append((hearing, event_id))
+        if _differs(remote, data):
+            plan["update"].append((hearing, data))
+
+    # Оставшиеся события KadBot не соответствуют ни одному заседанию:
+    # заседание перенесено или дело удалено
+    plan["delete"] = list(remote_by_id)
+    return plan
+
+
+def _created_event_id(result: Optional[Dict[str, Any]]) -> Optional[int]:
+    """Извлекает ID созданного события из ответа API."""
+    if not result:
+        return None
+    event_id = result.get("response", {}).get("id")
+    return int(event_id) if event_id else None
+
+
+def _create_event(
+    session,
+    hearing: Hearing,
+    data: Dict[str, Any],
+    calendar_id: int,
+    listed_at: datetime,
+) -> str:
+    """
+    Создаёт событие заседания через журнал crm_writes.
+
+    Args:
+        session: Сессия базы данных
+        hearing: Заседание
+        data: Поля события
+        calendar_id: ID календаря
+        listed_at: Время чтения списка событий CRM
+
+    Returns:
+        str: "created"; "skipped", если запрос не отправлялся (событие
+            создал или создаёт другой обработчик); "failed" при ошибке API
+    """
+    project_id = data["model_id"]
+    key = hearing_event_key(project_id, hearing.case_number, hearing.starts_at)
+    done = completed_writes(session, [key]).get(key)
+    if done is not None:
+        if done.remote_id and done.completed_at >= listed_at:
+            # Событие создала параллельная сверка после чтения списка
+            hearing.remote_event_id = done.remote_id
+            session.commit()
+            return "skipped"
+        # Созданного события нет в списке CRM: его удалили вручную
+        forget_write(session, key)
+    if not begin_write(session, key, "hearing_event", project_id):
+        logger.info(
+            "Событие заседания по делу %s уже создаёт другой обработчик",
+            hearing.case_number,
+        )
+        return "skipped"
+
+    event_id = _created_event_id(
+        create_project_calendar_event(
+            project_id=project_id,
+            case_number=hearing.case_number,
+            start_dt=hearing.starts_at,
+            room=hearing.room,
+            event_calendar_id=calendar_id,
+        )
+    )
+    if event_id is None:
+        abandon_write(session, key)
+        return "failed"
+    complete_write(session, key, event_id)
+    # ID сохраняется сразу: при сбое посреди сверки созданные события
+    # не будут созданы повторно
+    hearing.remote_event_id = event_id
+    session.commit()
+    return "created"
+
+
+def reconcile_calendar(
+    session,
+    days_back: int = CALENDAR_SYNC_DAYS_BACK,
+    days_ahead: int = CALENDAR_SYNC_DAYS_AHEAD,
+    dry_run: bool = False,
+) -> Dict[str, int]:
+    """
+    Приводит календарь CRM в соответствие с таблицей hearings.
+
+    Args:
+        session: Сессия базы данных
+        days_back: Сколько дней прошедших заседаний сверять
+        days_ahead: Сколько дней будущих заседаний сверять
+        dry_run: Только посчитать изменения, не меняя календарь
+
+    Returns:
+        Dict[str, int]: Количество созданных, изменённых, сопоставленных и
+            удалённых событий, событий, пропущенных по журналу crm_writes,
+            и ошибок; пустой словарь, если сверка не выполнялась
+    """
+    if not ASPRO_API_KEY or not COMPANY:
+        logger.error(
+            "ASPRO_API_KEY/ASPRO_COMPANY не заданы, сверка календаря "
+            "пропущена"
+        )
+        return {}
+    calendar_id = get_hearings_calendar_id()
+    if not calendar_id:
+        logger.error("Не удалось получить ID календаря, сверка пропущена")
+        return {}
+
+    now = datetime.now()
+    start = now - timedelta(days=days_back)
+    end = now + timedelta(days=days_ahead)
+    listed_at = datetime.now()
+    remote_events = list_calendar_events(calendar_id, start, end)
+    if remote_events is None:
+        # По неполному списку нельзя решать, какие события удалять
+        logger.error("Список событий CRM не получен, сверка пропущена")
+        return {}
+
+    hearings = hearings_between(session, start, end)
+    case_numbers = {hearing.case_number for hearing in hearings}
+    project_ids = {
+        case_number: project_id
+        for case_number, project_id in session.query(
+            Cases.case_number, Cases.project_id
+        ).filter(Cases.case_number.in_(case_numbers))
+        if project_id
+    }
+    plan = plan_calendar_changes(
+        hearings, remote_events, project_ids, calendar_id
+    )
+    stats = {action: len(items) for action, items in plan.items()}
+    stats["skipped"] = 0
+    stats["failed"] = 0
+    logger.info(
+        "Сверка календаря: заседаний %s, событий в CRM %s, создать %s, "
+        "изменить %s, сопоставить %s, удалить %s",
+        len(hearings),
+        len(remote_events),
+        stats["create"],
+        stats["update"],
+        stats["adopt"],
+        stats["delete"],
+    )
+    if dry_run:
+        return stats
+
+    for hearing, event_id in plan["adopt"]:
+        hearing.remote_event_id = event_id
+    session.commit()
+
+    for hearing, data in plan["create"]:
+        outcome = _create_event(session, hearing, data, calendar_id, listed_at)
+        if outcome != "created":
+            stats[outcome] += 1
+
+    for hearing, data in plan["update"]:
+        if not update_calendar_event(hearing.remote_event_id, data):
+            stats["failed"] += 1
+
+    for event_id in plan["delete"]:
+        if delete_calendar_event(event_id):
+            logger.info("Удалено событие календаря %s", event_id)
+        else:
+            stats["failed"] += 1
+    return stats
+
+
+def reconcile_after_scrape(session) -> None:
+    """
+    Выполняет сверку после обхода дел, если она включена (CALENDAR_SYNC).
+
+    Ошибки сверки записываются в лог и не прерывают парсинг.
+
+    Args:
+        session: Сессия базы данных
+    """
+    if not CALENDAR_SYNC:
+        return
+    try:
+        reconcile_calendar(session)
+    except Exception as e:
+        session.rollback()
+        logger.error("Ошибка сверки календаря: %s", e)
@@ -0,0 +1,337 @@
+"""
+Модуль аренды дел для распределённого парсинга.
+
+Несколько обработчиков (процессов или машин с разными IP) делят общий
+список дел через таблицу case_leases: обработчик атомарно захватывает
+пакет дел, которым пора обновиться, с арендой на CASE_LEASE_SECONDS,
+продлевает аренду, пока работает, и освобождает дело после обработки.
+Аренда упавшего обработчика истекает, и дело забирает другой обработчик.
+
+Захват выполняется условным UPDATE (compare-and-set) по каждой записи,
+поэтому схема работает и на SQLite, и на серверной БД (DATABASE_URL).
+"""
+
+import logging
+import os
+from datetime import datetime, timedelta
+from typing import Iterable, List, Optional, Set
+
+from sqlalchemy import and_, or_, update  # type: ignore
+from sqlalchemy.exc import IntegrityError  # type: ignore
+
+from models import CaseLease, Cases
+from retry_policy import PERMANENT
+
+logger = logging.getLogger(__name__)
+
+# Срок аренды; продлевается после каждого обработанного дела
+CASE_LEASE_SECONDS = int(os.getenv("CASE_LEASE_SECONDS", "600"))
+# Дело снова становится доступным для захвата через столько секунд после
+# обработки; должно быть не меньше периода запуска парсера, иначе
+# обработчики, запущенные в разное время, обойдут одно дело дважды
+CASE_RESCRAPE_INTERVAL = int(os.getenv("CASE_RESCRAPE_INTERVAL", "1800"))
+
+
+def ensure_leases(session) -> int:
+    """
+    Создаёт записи аренды для дел, у которых их ещё нет.
+
+    Args:
+        session: Сессия базы данных
+
+    Returns:
+        int: Количество добавленных записей
+    """
+    missing = (
+        session.query(Cases.case_number)
+        .outerjoin(CaseLease, CaseLease.case_number == Cases.case_number)
+        .filter(CaseLease.case_number.is_(None))
+        .all()
+    )
+    for (case_number,) in missing:
+        session.add(CaseLease(case_number=case_number))
+    try:
+        session.commit()
+    except IntegrityError:
+        # Те же записи одновременно добавил другой обработчик
+        session.rollback()
+        return 0
+    if missing:
+        logger.info("Добавлено записей аренды дел: %s", len(missing))
+    return len(missing)
+
+
+def _claimable_filter(now: datetime, run_started: datetime):
+    """
+    Условие выборки дел, доступных для захвата: аренда свободна или
+    истекла, дело пора обновить и в этом запуске его ещё не обрабатывали.
+    """
+    return and_(
+        or_(
+            CaseLease.worker_id.is_(None),
+            CaseLease.lease_expires_at.is_(None),
+            CaseLease.lease_expires_at < now,
+        ),
+        or_(CaseLease.next_due_at.is_(None), CaseLease.next_due_at <= now),
+        or_(
+            CaseLease.released_at.is_(None),
+            CaseLease.released_at < run_started,
+        ),
+        or_(Cases.scrape_status.is_(None), Cases.scrape_status != PERMANENT),
+    )
+
+
+def count_due(session, run_started: datetime) -> int:
+    """
+    Считает дела, доступные для захвата.
+
+    Args:
+        session: Сессия базы данных
+        run_started: Время начала запуска
+
+    Returns:
+        int: Количество дел
+    """
+    return (
+        session.query(CaseLease)
+        .join(Cases, Cases.case_number == CaseLease.case_number)
+        .filter(_claimable_filter(datetime.now(), run_started))
+        .count()
+    )
+
+
+def claim_cases(
+    session,
+    worker_id: str,
+    limit: int,
+    run_started: datetime,
+    lease_seconds: int = CASE_LEASE_SECONDS,
+) -> List[str]:
+    """
+    Атомарно захватывает пакет дел.
+
+    Запись переходит к обработчику, только если с момента выборки её
+    аренда не изменилась (условие по прежнему worker_id и сроку аренды),
+    поэтому два обработчика не получат одно дело.
+
+    Args:
+        session: Сессия базы данных
+        worker_id: Идентификатор обработчика
+        limit: Максимальный размер пакета
+        run_started: Время начала запуска: дела, освобождённые позже, в
+            этом запуске повторно не захватываются
+        lease_seconds: Срок аренды в секундах
+
+    Returns:
+        List[str]: Номера захваченных дел
+    """
+    now = datetime.now()
+    candidates = (
+        session.query(
+            CaseLease.case_number,
+            CaseLease.worker_id,
+            CaseLease.lease_expires_at,
+        )
+        .join(Cases, Cases.case_number == CaseLease.case_number)
+        .filter(_claimable_filter(now, run_started))
+        .order_by(CaseLease.next_due_at, Cases.id)
+        .limit(limit * 2)
+        .all()
+    )
+    claimed = []
+    for case_number, owner, expires_at in candidates:
+        if len(claimed) >= limit:
+            break
+        now = datetime.now()
+        result = session.execute(
+            update(CaseLease)
+            .where(
+                CaseLease.case_number == case_number,
+                (
+                    CaseLease.worker_id.is_(None)
+                    if owner is None
+                    else CaseLease.worker_id == owner
+                ),
+                (
+                    CaseLease.lease_expires_at.is_(None)
+                    if expires_at is None
+                    else CaseLease.lease_expires_at == expires_at
+                ),
+            )
+            .values(
+                worker_id=worker_id,
+                claimed_at=now,
+                lease_expires_at=now + timedelta(seconds=lease_seconds),
+            )
+        )
+        session.commit()
+        if result.rowcount == 1:
+            claimed.append(case_number)
+            if owner is not None:
+                logger.info(
+                    "Дело %s забрано у обработчика %s: аренда истекла",
+                    case_number,
+                    owner,
+                )
+    return claimed
+
+
+def heartbeat(
+    session,
+    worker_id: str,
+    case_numbers: Optional[Iterable[str]] = None,
+    lease_seconds: int = CASE_LEASE_SECONDS,
+) -> Set[str]:
+    """
+    Продлевает аренду дел обработчика.
+
+    Args:
+        session: Сессия базы данных
+        worker_id: Идентификатор обработчика
+        case_numbers: Дела для продления (по умолчанию все дела обработчика)
+        lease_seconds: Новый срок аренды от текущего момента
+
+    Returns:
+        Set[str]: Дела, аренда которых всё ещё принадлежит обработчику;
+            остальные уже забрал другой обработчик, их обрабатывать нельзя
+    """
+    # Аренда продлевается, пока worker_id не сменился: даже истёкшую
+    # аренду можно продлить, если дело никто не забрал
+    conditions = [CaseLease.worker_id == worker_id]
+    if case_numbers is not None:
+        case_numbers = list(case_numbers)
+        if not case_numbers:
+            return set()
+        conditions.append(CaseLease.case_number.in_(case_numbers))
+    session.execute(
+        update(CaseLease)
+        .where(*conditions)
+        .values(
+            lease_expires_at=datetime.now()
+            + timedelta(seconds=lease_seconds)
+        )
+    )
+    session.commit()
+    held = {
+        case_number
+        for (case_number,) in session.query(CaseLease.case_number).filter(
+            *conditions
+        )
+    }
+    if case_numbers is not None and len(held) < len(case_numbers):
+        logger.warning(
+            "Обработчик %s потерял аренду дел: %s",
+            worker_id,
+            ", ".join(sorted(set(case_numbers) - held)),
+        )
+    return held
+
+
+def release_case(
+    session,
+    worker_id: str,
+    case_number: str,
+    rescrape_after: int = CASE_RESCRAPE_INTERVAL,
+) -> bool:
+    """
+    Освобождает обработанное дело и назначает время следующего обхода.
+
+    Args:
+        session: Сессия базы данных
+        worker_id: Идентификатор обработчика
+        case_number: Номер дела
+        rescrape_after: Через сколько секунд дело снова станет доступным
+
+    Returns:
+        bool: False, если аренда уже принадлежит другому обработчику
+    """
+    now = datetime.now()
+    result = session.execute(
+        update(CaseLease)
+        .where(
+            CaseLease.case_number == case_number,
+            CaseLease.worker_id == worker_id,
+        )
+        .values(
+            worker_id=None,
+            lease_expires_at=None,
+            released_at=now,
+            next_due_at=now + timedelta(seconds=rescrape_after),
+        )
+    )
+    session.commit()
+    return result.rowcount == 1
+
+
+def release_unfinished(session, worker_id: str) -> int:
+    """
+    Возвращает необработанные дела обработчика в общий список (при
+    остановке), не дожидаясь истечения аренды.
+
+    Args:
+        session: Сессия базы данных
+        worker_id: Идентификатор обработчика
+
+    Returns:
+        int: Количество освобождённых дел
+    """
+    result = session.execute(
+        update(CaseLease)
+        .where(CaseLease.worker_id == worker_id)
+        .values(worker_id=None, lease_expires_at=None)
+    )
+    session.commit()
+    if result.rowcount:
+        logger.info(
+            "Обработчик %s вернул необработанных дел: %s",
+            worker_id,
+            result.rowcount,
+        )
+    return result.rowcount
+
+
+def reclaim_expired(session) -> int:
+    """
+    Снимает истёкшие аренды упавших обработчиков.
+
+    Захват и без этого учитывает истёкшие аренды; функция нужна, чтобы
+    видеть в логе, что обработчик пропал.
+
+    Args:
+        session: Сессия базы данных
+
+    Returns:
+        int: Количество снятых аренд
+    """
+    result = session.execute(
+        update(CaseLease)
+        .where(
+            CaseLease.worker_id.isnot(None),
+            CaseLease.lease_expires_at < datetime.now(),
+        )
+        .values(worker_id=None, lease_expires_at=None)
+    )
+    session.commit()
+    if result.rowcount:
+        logger.warning("Сняты истёкшие аренды дел: %s", result.rowcount)
+    return result.rowcount
+
+
+def reset_due(session) -> int:
+    """
+    Делает все свободные дела доступными для обхода немедленно
+    (принудительный полный обход).
+
+    Args:
+        session: Сессия базы данных
+
+    Returns:
+        int: Количество дел
+    """
+    result = session.execute(
+        update(CaseLease)
+        .where(CaseLease.worker_id.is_(None))
+        .values(next_due_at=None, released_at=None)
+    )
+    session.commit()
+    return result.rowcount
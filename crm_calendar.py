@@ -5,20 +5,30 @@
 import logging
 import os
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import Any, Dict, List, Optional, Tuple
 
 import requests  # type: ignore
 from dotenv import load_dotenv  # type: ignore
+from sqlalchemy.exc import SQLAlchemyError  # type: ignore
 
-logging.basicConfig(
-    filename="kad_parser.log",
-    level=logging.INFO,
-    format="%(asctime)s - %(levelname)s - %(message)s",
+from crm_metadata import (
+    CRM_CACHE_CALENDAR_TTL,
+    HEARINGS_CALENDAR_KEY,
+    cached_value,
 )
+from db import Session
+from logging_setup import setup_logging
+from metrics import crm_request_failed, crm_response_hook
+
+logger = logging.getLogger(__name__)
 
 load_dotenv()
 ASPRO_API_KEY = os.getenv("ASPRO_API_KEY")
 COMPANY = os.getenv("ASPRO_COMPANY")
+# Адрес API Aspro.Cloud; для нагрузочных тестов — адрес mock_crm.py
+ASPRO_API_URL = (
+    os.getenv("ASPRO_API_URL") or f"https://{COMPANY}.aspro.cloud"
+).rstrip("/")
 
 # ID календаря, куда создаём событие (получить в CRM). Опционально
 ASPRO_EVENT_CALENDAR_ID = os.getenv("ASPRO_EVENT_CALENDAR_ID")
@@ -29,110 +39,257 @@ def _format_dt(dt: datetime) -> str:
     return dt.strftime("%Y-%m-%d %H:%M:%S")
 
 
-# Кеш для ID календаря "Судебные заседания"
+# ID календаря "Судебные заседания" в текущем процессе; между процессами
+# ID хранится в таблице crm_metadata
 hearings_cal_id_cache: Optional[int] = None
 
+HEARINGS_CALENDAR_NAMES = {"Судебные заседания", "Зудебные заседания"}
+
+
+def _calendar_url(action: str) -> str:
+    """Возвращает адрес метода API календарей."""
+    return (
+        f"{ASPRO_API_URL}/api/v1/module/calendar/calendar/"
+        f"{action}"
+    )
+
 
-def _get_or_create_hearings_calendar() -> Optional[int]:
+def _find_hearings_calendar() -> Tuple[bool, Optional[int]]:
     """
-    Возвращает ID календаря "Судебные заседания". Если календарь удалён,
-    пытается найти его в списке, а при отсутствии — создаёт заново.
+    Ищет календарь "Судебные заседания" по имени во всех страницах списка.
+
+    Returns:
+        Tuple[bool, Optional[int]]: (список получен, ID календаря или None,
+            если календаря нет)
+    """
+    params: Dict[str, Any] = {"api_key": ASPRO_API_KEY}
+    fetched = 0
+    page = 1
+    while True:
+        params["page"] = str(page)
+        try:
+            resp = requests.get(
+                _calendar_url("list"),
+                params=params,
+                timeout=15,
+                hooks={"response": crm_response_hook("calendar_list")},
+            )
+        except requests.RequestException as e:
+            crm_request_failed("calendar_list")
+            logger.error("Исключение при получении списка календарей: %s", e)
+            return False, None
+        if not resp.ok:
+            logger.error(
+                "Ошибка запроса списка календарей: HTTP %d - %s",
+                resp.status_code,
+                resp.text,
+            )
+            return False, None
+        data = resp.json().get("response", {})
+        items = data.get("items", [])
+        fetched += len(items)
+        for item in items:
+            name = str(item.get("name", "")).strip()
+            if name in HEARINGS_CALENDAR_NAMES:
+                logger.info(
+                    "Найден календарь '%s' с ID %s", name, item.get("id")
+                )
+                return True, int(item.get("id"))
+        if not items or fetched >= int(data.get("total", 0)):
+            return True, None
+        page += 1
+
+
+def _create_hearings_calendar() -> Optional[int]:
+    """
+    Создаёт календарь "Судебные заседания".
+
+    Returns:
+        int | None: ID календаря или None при ошибке
+    """
+    params = {"api_key": ASPRO_API_KEY}
+    data = {
+        "name": "Судебные заседания",
+        "description": "Календарь для судебных заседаний (создан KadBot)",
+        "type": 20,  # Публичный
+        "color": "#FF0000",
+        "timezone": "Europe/Moscow",
+    }
+    try:
+        resp = requests.post(
+            _calendar_url("create"),
+            params=params,
+            data=data,
+            timeout=15,
+            hooks={"response": crm_response_hook("calendar_create")},
+        )
+        if resp.ok:
+            cal_id = int(resp.json().get("response", {}).get("id"))
+            logger.info(
+                "Создан календарь 'Судебные заседания' с ID %s",
+                cal_id,
+            )
+            return cal_id
+        else:
+            logger.error(
+                "Ошибка создания календаря: HTTP %d - %s",
+                resp.status_code,
+                resp.text,
+            )
+            return None
+    except Exception as e:
+        if isinstance(e, requests.RequestException):
+            crm_request_failed("calendar_create")
+        logger.error("Исключение при создании календаря: %s", str(e))
+        return None
+
+
+def _lookup_hearings_calendar() -> Optional[int]:
+    """
+    Находит календарь по имени, а если его нет — создаёт.
+
+    Календарь создаётся, только если список календарей получен полностью:
+    при ошибке запроса списка новый календарь-дубль не создаётся.
+
+    Returns:
+        int | None: ID календаря или None при ошибке
+    """
+    listed, cal_id = _find_hearings_calendar()
+    if cal_id is not None:
+        return cal_id
+    if not listed:
+        return None
+    return _create_hearings_calendar()
+
+
+def _get_or_create_hearings_calendar(refresh: bool = False) -> Optional[int]:
+    """
+    Возвращает ID календаря "Судебные заседания": из
+    ASPRO_EVENT_CALENDAR_ID, из кеша crm_metadata или поиском по имени с
+    созданием календаря при его отсутствии.
+
+    Args:
+        refresh: Заново найти календарь в CRM, не используя кеш
 
     Returns:
         int | None: ID календаря или None при ошибке
     """
     global hearings_cal_id_cache
 
-    if hearings_cal_id_cache is not None:
+    if hearings_cal_id_cache is not None and not refresh:
         return hearings_cal_id_cache
 
     if not ASPRO_API_KEY or not COMPANY:
-        logging.error(
+        logger.error(
             "ASPRO_API_KEY/ASPRO_COMPANY не заданы. Не могу получить "
             "календарь."
         )
         return None
 
-    # 1) Если указан ID через переменную окружения — используем его как приоритетный
+    # 1) Если указан ID через переменную окружения — используем его как
+    # приоритетный
     if ASPRO_EVENT_CALENDAR_ID:
         try:
             cal_id = int(ASPRO_EVENT_CALENDAR_ID)
             hearings_cal_id_cache = cal_id
-            logging.info(
+            logger.info(
                 "Использую ID календаря из переменной "
                 "ASPRO_EVENT_CALENDAR_ID: %s",
                 cal_id,
             )
             return cal_id
         except ValueError:
-            logging.warning(
+            logger.warning(
                 "ASPRO_EVENT_CALENDAR_ID имеет неверный формат: %s",
                 ASPRO_EVENT_CALENDAR_ID,
             )
 
-    # 2) Пытаемся найти нужный календарь по имени через список
-    try:
-        list_url = (
-            "https://" + COMPANY + ".aspro.cloud/api/v1/module/calendar/" +
-            "calendar/list"
-        )
-        params = {"api_key": ASPRO_API_KEY}
-        resp = requests.get(list_url, params=params, timeout=15)
-        if resp.ok:
-            items = resp.json().get("response", {}).get("items", [])
-            target_names = {"Судебные заседания", "Зудебные заседания"}
-            for item in items:
-                name = str(item.get("name", "")).strip()
-                if name in target_names:
-                    hearings_cal_id_cache = int(item.get("id"))
-                    logging.info(
-                        "Найден календарь '%s' с ID %s",
-                        name,
-                        hearings_cal_id_cache,
-                    )
-                    return hearings_cal_id_cache
-        else:
-            logging.error(
-                "Ошибка запроса списка календарей: HTTP %d - %s",
-                resp.status_code,
-                resp.text,
-            )
-    except Exception as e:
-        logging.error("Исключение при получении списка календарей: %s", str(e))
-
-    # 3) Если не нашли — создаем заново с корректным именем
+    # 2) Общий кеш в БД; при его отсутствии или истечении — поиск в CRM
+    session = Session()
     try:
-        create_url = (
-            "https://" + COMPANY + ".aspro.cloud/api/v1/module/calendar/" +
-            "calendar/create"
+        cal_id = cached_value(
+            session,
+            HEARINGS_CALENDAR_KEY,
+            CRM_CACHE_CALENDAR_TTL,
+            _lookup_hearings_calendar,
+            refresh=refresh,
         )
-        params = {"api_key": ASPRO_API_KEY}
-        data = {
-            "name": "Судебные заседания",
-            "description": "Календарь для судебных заседаний (создан KadBot)",
-            "type": 20,  # Публичный
-            "color": "#FF0000",
-            "timezone": "Europe/Moscow",
-        }
-        resp = requests.post(create_url, params=params, data=data, timeout=15)
-        if resp.ok:
-            cal_id = int(resp.json().get("response", {}).get("id"))
-            hearings_cal_id_cache = cal_id
-            logging.info(
-                "Создан календарь 'Судебные заседания' с ID %s",
-                cal_id,
-            )
-            return cal_id
-        else:
-            logging.error(
-                "Ошибка создания календаря: HTTP %d - %s",
-                resp.status_code,
-                resp.text,
-            )
-            return None
-    except Exception as e:
-        logging.error("Исключение при создании календаря: %s", str(e))
+        session.commit()
+    except SQLAlchemyError as e:
+        session.rollback()
+        logger.warning("Кеш справочников CRM недоступен: %s", e)
+        cal_id = _lookup_hearings_calendar()
+    finally:
+        session.close()
+    if cal_id is None:
         return None
+    hearings_cal_id_cache = int(cal_id)
+    return hearings_cal_id_cache
+
+
+def get_hearings_calendar_id(refresh: bool = False) -> Optional[int]:
+    """
+    Возвращает ID календаря "Судебные заседания" (ASPRO_EVENT_CALENDAR_ID,
+    кеш crm_metadata, поиск по имени или создание календаря).
+
+    Args:
+        refresh: Заново найти календарь в CRM (например, после его
+            удаления), обновив кеш
+
+    Returns:
+        int | None: ID календаря или None при ошибке
+    """
+    return _get_or_create_hearings_calendar(refresh=refresh)
+
+
+# Первая строка описания событий, созданных KadBot: по ней сверка
+# календаря отличает свои события от добавленных вручную
+KADBOT_EVENT_MARKER = "Автоматически добавлено из KadBot"
+
+
+def _tasks_url(action: str) -> str:
+    """Возвращает адрес метода API задач (события календаря — задачи)."""
+    return f"{ASPRO_API_URL}/api/v1/module/task/tasks/{action}"
+
+
+def hearing_event_data(
+    project_id: int,
+    case_number: str,
+    start_dt: datetime,
+    room: Optional[str],
+    calendar_id: int,
+) -> Dict[str, Any]:
+    """
+    Формирует поля события календаря для судебного заседания.
+
+    Args:
+        project_id: ID проекта в CRM
+        case_number: Номер дела
+        start_dt: Дата и время начала заседания
+        room: Номер кабинета/зала
+        calendar_id: ID календаря
+
+    Returns:
+        Dict[str, Any]: Поля запроса создания или изменения события
+    """
+    description = f"{KADBOT_EVENT_MARKER}\nДело: {case_number}"
+    if room:
+        description = description + f"\nКабинет: {room}"
+    return {
+        "name": f"Судебное заседание по делу {case_number}",
+        "description": description,
+        "type": 20,  # Событие (не задача)
+        "event_calendar_id": calendar_id,
+        "plan_start_date": _format_dt(start_dt),
+        "plan_end_date": _format_dt(start_dt),
+        "event_color": "#FF0000",  # Красный цвет для судебных заседаний
+        "event_busy_status": 20,  # Занят
+        "event_access_type": 30,  # Публичное событие
+        "all_day": 0,  # Не на весь день
+        "module": "st",  # Модуль "Проекты"
+        "model": "project",  # Модель "Проект"
+        "model_id": project_id,  # ID проекта для привязки
+    }
 
 
 def create_project_calendar_event(
@@ -152,17 +309,19 @@ def create_project_calendar_event(
         start_dt: Дата и время начала заседания
         duration_minutes: Продолжительность в минутах (по умолчанию 60)
         room: Номер кабинета/зала (опционально)
+        event_calendar_id: ID календаря (по умолчанию календарь
+            "Судебные заседания")
 
     Returns:
         Ответ API или None при ошибке
     """
     if not ASPRO_API_KEY or not COMPANY:
-        logging.error(
+        logger.error(
             "ASPRO_API_KEY/ASPRO_COMPANY не заданы. Не могу создать событие."
         )
         return None
 
-    logging.info(
+    logger.info(
         "Создаю событие календаря для дела %s (проект %d) на %s",
         case_number,
         project_id,
@@ -170,60 +329,43 @@ def create_project_calendar_event(
     )
 
     try:
-        # Вычисляем время окончания (пока не используется,
-        # но может понадобиться)
-        # end_dt = start_dt + timedelta(minutes=duration_minutes)
-
-        # Получаем/создаём ID календаря для судебных заседаний, если не передан явно
-        calendar_id = event_calendar_id if event_calendar_id is not None else _get_or_create_hearings_calendar()
+        # Получаем/создаём ID календаря для судебных заседаний, если не
+        # передан явно
+        calendar_id = (
+            event_calendar_id
+            if event_calendar_id is not None
+            else _get_or_create_hearings_calendar()
+        )
         if not calendar_id:
-            logging.error("Не удалось получить ID календаря для события")
+            logger.error("Не удалось получить ID календаря для события")
             return None
 
         # Создаем событие в календаре через модуль "Задачи"
-        url = (
-            "https://" + COMPANY + ".aspro.cloud/api/v1/module/task/tasks/create"
+        url = _tasks_url("create")
+        data = hearing_event_data(
+            project_id, case_number, start_dt, room, calendar_id
         )
 
-        # Данные для создания события в календаре
-        description = (
-            "Автоматически добавлено из KadBot\n" +
-            f"Дело: {case_number}"
-        )
-        if room:
-            description = description + f"\nКабинет: {room}"
-
-        data = {
-            "name": f"Судебное заседание по делу {case_number}",
-            "description": description,
-            "type": 20,  # Событие (не задача)
-            "event_calendar_id": calendar_id,
-            "plan_start_date": start_dt.strftime("%Y-%m-%d %H:%M:%S"),
-            "plan_end_date": start_dt.strftime("%Y-%m-%d %H:%M:%S"),
-            "event_color": "#FF0000",  # Красный цвет для судебных заседаний
-            "event_busy_status": 20,  # Занят
-            "event_access_type": 30,  # Публичное событие
-            "all_day": 0,  # Не на весь день
-            "module": "st",  # Модуль "Проекты"
-            "model": "project",  # Модель "Проект"
-            "model_id": project_id,  # ID проекта для привязки
-        }
-
         params = {"api_key": ASPRO_API_KEY}
         headers = {"Content-Type": "application/x-www-form-urlencoded"}
 
-        logging.info(
+        logger.info(
             "Отправляю запрос на создание события: %s", url
         )
-        logging.debug("Данные события: %s", data)
+        logger.debug("Данные события: %s", data)
 
         resp = requests.post(
-            url, params=params, data=data, headers=headers, timeout=15
+            url,
+            params=params,
+            data=data,
+            headers=headers,
+            timeout=15,
+            hooks={"response": crm_response_hook("event_create")},
         )
 
         if resp.ok:
             result = resp.json()
-            logging.info(
+            logger.info(
                 "Событие календаря успешно создано в CRM для дела %s. "
                 "ID события: %s",
                 case_number,
@@ -231,7 +373,7 @@ def create_project_calendar_event(
             )
             return result
         else:
-            logging.error(
+            logger.error(
                 "Ошибка создания события календаря для дела %s: "
                 "HTTP %d - %s",
                 case_number,
@@ -241,7 +383,9 @@ def create_project_calendar_event(
             return None
 
     except Exception as e:
-        logging.error(
+        if isinstance(e, requests.RequestException):
+            crm_request_failed("event_create")
+        logger.error(
             "Исключение при создании события календаря для дела %s: %s",
             case_number,
             str(e),
@@ -250,14 +394,151 @@ def create_project_calendar_event(
         return None
 
 
+def list_calendar_events(
+    calendar_id: int, start: datetime, end: datetime
+) -> Optional[List[Dict[str, Any]]]:
+    """
+    Возвращает события календаря, созданные KadBot, в интервале дат.
+
+    Список читается постранично; фильтр по календарю и датам передаётся
+    API и повторяется на стороне клиента.
+
+    Args:
+        calendar_id: ID календаря
+        start: Начало интервала
+        end: Конец интервала (не включается)
+
+    Returns:
+        List[Dict[str, Any]]: События или None при ошибке запроса (сверку
+            по неполному списку выполнять нельзя)
+    """
+    params: Dict[str, Any] = {
+        "api_key": ASPRO_API_KEY,
+        "filter[event_calendar_id]": calendar_id,
+        "filter[plan_start_date][from]": _format_dt(start),
+        "filter[plan_start_date][to]": _format_dt(end),
+    }
+    events: List[Dict[str, Any]] = []
+    fetched = 0
+    page = 1
+    while True:
+        params["page"] = str(page)
+        try:
+            resp = requests.get(
+                _tasks_url("list"),
+                params=params,
+                timeout=15,
+                hooks={"response": crm_response_hook("event_list")},
+            )
+        except requests.RequestException as e:
+            crm_request_failed("event_list")
+            logger.error("Исключение при получении событий календаря: %s", e)
+            return None
+        if not resp.ok:
+            logger.error(
+                "Ошибка запроса событий календаря: HTTP %d - %s",
+                resp.status_code,
+                resp.text,
+            )
+            return None
+        data = resp.json().get("response", {})
+        items = data.get("items", [])
+        fetched += len(items)
+        for item in items:
+            try:
+                starts_at = datetime.strptime(
+                    str(item.get("plan_start_date")), "%Y-%m-%d %H:%M:%S"
+                )
+            except ValueError:
+                continue
+            if (
+                str(item.get("event_calendar_id")) == str(calendar_id)
+                and start <= starts_at < end
+                and str(item.get("description", "")).startswith(
+                    KADBOT_EVENT_MARKER
+                )
+            ):
+                events.append(item)
+        if not items or fetched >= int(data.get("total", 0)):
+            break
+        page += 1
+    return events
+
+
+def update_calendar_event(event_id: int, data: Dict[str, Any]) -> bool:
+    """
+    Изменяет событие календаря.
+
+    Args:
+        event_id: ID события (задачи) в CRM
+        data: Новые поля события
+
+    Returns:
+        bool: True при успехе
+    """
+    try:
+        resp = requests.post(
+            _tasks_url(f"update/{event_id}"),
+            params={"api_key": ASPRO_API_KEY},
+            data=data,
+            timeout=15,
+            hooks={"response": crm_response_hook("event_update")},
+        )
+    except requests.RequestException as e:
+        crm_request_failed("event_update")
+        logger.error("Исключение при изменении события %s: %s", event_id, e)
+        return False
+    if not resp.ok:
+        logger.error(
+            "Ошибка изменения события %s: HTTP %d - %s",
+            event_id,
+            resp.status_code,
+            resp.text,
+        )
+    return resp.ok
+
+
+def delete_calendar_event(event_id: int) -> bool:
+    """
+    Удаляет событие календаря.
+
+    Args:
+        event_id: ID события (задачи) в CRM
+
+    Returns:
+        bool: True при успехе или если событие уже удалено
+    """
+    try:
+        resp = requests.post(
+            _tasks_url(f"delete/{event_id}"),
+            params={"api_key": ASPRO_API_KEY},
+            timeout=15,
+            hooks={"response": crm_response_hook("event_delete")},
+        )
+    except requests.RequestException as e:
+        crm_request_failed("event_delete")
+        logger.error("Исключение при удалении события %s: %s", event_id, e)
+        return False
+    if resp.status_code == 404:
+        return True
+    if not resp.ok:
+        logger.error(
+            "Ошибка удаления события %s: HTTP %d - %s",
+            event_id,
+            resp.status_code,
+            resp.text,
+        )
+    return resp.ok
+
+
 def test_calendar_api() -> None:
     """
     Тестовая функция для проверки API календаря.
     """
-    logging.info("Запуск теста API календаря")
+    logger.info("Запуск теста API календаря")
 
     if not ASPRO_API_KEY or not COMPANY:
-        logging.error("Тест пропущен: не заданы ASPRO_API_KEY/ASPRO_COMPANY")
+        logger.error("Тест пропущен: не заданы ASPRO_API_KEY/ASPRO_COMPANY")
         return
 
     try:
@@ -272,15 +553,17 @@ def test_calendar_api() -> None:
         )
 
         if result:
-            logging.info("Тест API календаря пройден успешно")
+            logger.info("Тест API календаря пройден успешно")
         else:
-            logging.error("Тест API календаря не пройден")
+            logger.error("Тест API календаря не пройден")
 
     except Exception as e:
-        logging.error("Ошибка в тесте API календаря: %s",
-                      str(e), exc_info=True)
+        logger.error(
+            "Ошибка в тесте API календаря: %s", str(e), exc_info=True
+        )
 
 
 if __name__ == "__main__":
     # Запуск теста при прямом вызове модуля
+    setup_logging()
     test_calendar_api()
@@ -0,0 +1,180 @@
+"""
+Модуль кеша справочных данных CRM в базе данных.
+
+Справочные значения, которые меняются редко (ID календаря «Судебные
+заседания»), хранятся в таблице crm_metadata со сроком годности. Новый
+процесс или обработчик на другой машине берёт их из общей БД и не
+запрашивает список календарей CRM при каждом запуске. Если обновить
+значение не удалось (CRM недоступна), используется устаревшее значение.
+
+Пример:
+    python main.py crm-cache
+    python main.py crm-cache --refresh
+"""
+
+import json
+import logging
+import os
+from datetime import datetime, timedelta
+from typing import Any, Callable, List, Optional
+
+from sqlalchemy.exc import IntegrityError  # type: ignore
+
+from models import CrmMetadata
+from persistence import dialect_insert
+
+logger = logging.getLogger(__name__)
+
+# Ключ ID календаря «Судебные заседания»
+HEARINGS_CALENDAR_KEY = "calendar:hearings"
+# Срок годности ID календаря в секундах
+CRM_CACHE_CALENDAR_TTL = int(os.getenv("CRM_CACHE_CALENDAR_TTL", "604800"))
+
+
+def get_cached(session, key: str, allow_stale: bool = False) -> Any:
+    """
+    Возвращает значение из кеша.
+
+    Args:
+        session: Сессия базы данных
+        key: Ключ значения
+        allow_stale: Вернуть значение и после истечения срока годности
+
+    Returns:
+        Any: Значение или None, если его нет или срок годности истёк
+    """
+    entry = session.get(CrmMetadata, key)
+    if entry is None:
+        return None
+    if not allow_stale and entry.expires_at <= datetime.now():
+        return None
+    return json.loads(entry.value)
+
+
+def put_cached(session, key: str, value: Any, ttl: int) -> None:
+    """
+    Сохраняет значение в кеш.
+
+    Значение записывается одним INSERT ... ON CONFLICT DO UPDATE, поэтому
+    одновременная запись другим процессом не приводит к ошибке. Транзакция
+    не фиксируется: commit выполняет вызывающий код. На БД без ON CONFLICT
+    запись выполняется в точке сохранения, и конфликт откатывает только её.
+
+    Args:
+        session: Сессия базы данных
+        key: Ключ значения
+        value: Значение, сериализуемое в JSON
+        ttl: Срок годности в секундах
+    """
+    now = datetime.now()
+    fields = {
+        "value": json.dumps(value, ensure_ascii=False),
+        "fetched_at": now,
+        "expires_at": now + timedelta(seconds=ttl),
+    }
+    # Прочитанная ранее запись в сессии устаревает
+    loaded = session.identity_map.get(
+        session.identity_key(CrmMetadata, key)
+    )
+    if loaded is not None:
+        session.expire(loaded)
+
+    insert = dialect_insert(session)
+    if insert is not None:
+        statement = insert(CrmMetadata.__table__).values(key=key, **fields)
+        session.execute(
+            statement.on_conflict_do_update(
+                index_elements=["key"], set_=fields
+            )
+        )
+        return
+
+    for _ in range(2):
+        try:
+            with session.begin_nested():
+                entry = session.get(CrmMetadata, key)
+                if entry is None:
+                    session.add(CrmMetadata(key=key, **fields))
+                else:
+                    for name, field_value in fields.items():
+                        setattr(entry, name, field_value)
+            return
+        except IntegrityError:
+            # Ту же запись одновременно добавил другой процесс: обновляем её
+            continue
+    logger.error(
+        "Не удалось сохранить %s в кеш справочников CRM: запись "
+        "одновременно изменяют другие процессы",
+        key,
+    )
+
+
+def invalidate(session, key: Optional[str] = None) -> int:
+    """
+    Удаляет значение из кеша (по умолчанию — все значения).
+
+    Args:
+        session: Сессия базы данных
+        key: Ключ значения
+
+    Returns:
+        int: Количество удалённых значений
+    """
+    query = session.query(CrmMetadata)
+    if key is not None:
+        query = query.filter(CrmMetadata.key == key)
+    removed = query.delete(synchronize_session="fetch")
+    session.commit()
+    return removed
+
+
+def cached_value(
+    session,
+    key: str,
+    ttl: int,
+    loader: Callable[[], Any],
+    refresh: bool = False,
+) -> Any:
+    """
+    Возвращает значение из кеша или загружает его из CRM.
+
+    Args:
+        session: Сессия базы данных
+        key: Ключ значения
+        ttl: Срок годности нового значения в секундах
+        loader: Функция загрузки значения из CRM; None — ошибка загрузки
+        refresh: Загрузить значение, даже если срок годности не истёк
+
+    Returns:
+        Any: Значение; при ошибке загрузки — устаревшее значение из кеша
+            или None. Загруженное значение сохраняется без commit
+            (см. put_cached)
+    """
+    if not refresh:
+        value = get_cached(session, key)
+        if value is not None:
+            return value
+    value = loader()
+    if value is not None:
+        put_cached(session, key, value, ttl)
+        return value
+    stale = get_cached(session, key, allow_stale=True)
+    if stale is not None:
+        logger.warning(
+            "Не удалось обновить %s из CRM, использую сохранённое значение",
+            key,
+        )
+    return stale
+
+
+def cache_entries(session) -> List[CrmMetadata]:
+    """
+    Возвращает все значения кеша.
+
+    Args:
+        session: Сессия базы данных
+
+    Returns:
+        List[CrmMetadata]: Записи кеша по ключу
+    """
+    return session.query(CrmMetadata).order_by(CrmMetadata.key).all()
@@ -1,82 +1,83 @@
 """
 Модуль для отправки уведомлений в Aspro CRM через API.
+
+Парсер не отправляет комментарии напрямую: обновления копятся в очереди
+notify_outbox и уходят одним комментарием на проект
+(send_case_digest_comment).
 """
 
 import logging
 import os
-from typing import Optional
+from typing import Any, Dict, List, Optional
 
 import requests  # type: ignore
 from dotenv import load_dotenv  # type: ignore
 
-logging.basicConfig(
-    filename="kad_parser.log",
-    level=logging.INFO,
-    format="%(asctime)s - %(levelname)s - %(message)s",
-)
+from metrics import crm_request_failed, crm_response_hook
+
+logger = logging.getLogger(__name__)
 
 load_dotenv()
 ASPRO_API_KEY = os.getenv("ASPRO_API_KEY")
 COMPANY = os.getenv("ASPRO_COMPANY")
+# Адрес API Aspro.Cloud; для нагрузочных тестов — адрес mock_crm.py
+ASPRO_API_URL = (
+    os.getenv("ASPRO_API_URL") or f"https://{COMPANY}.aspro.cloud"
+).rstrip("/")
 USERID = os.getenv("USERID")
 USER_NAME = os.getenv("USER_NAME")
 MODULE = "st"
 ENTITY = "projects"
 
 
-def send_case_update_comment(
-    project_id: int,
-    event_title: str,
-    event_date: str,
-    doc_link: Optional[str] = None,
-) -> Optional[dict]:
-    """
-    Отправляет комментарий-уведомление об обновлении события по делу в проект
-    Aspro CRM с упоминанием пользователя.
-
-    Args:
-        project_id: ID проекта в CRM
-        event_title: Название события
-        event_date: Дата события
-        doc_link: Ссылка на документ (опционально)
-
-    Returns:
-        dict: Ответ API при успешной отправке, None при ошибке
-    """
+def _check_settings(project_id: int) -> bool:
+    """Проверяет project_id и настройки отправки комментариев."""
     if not project_id:
-        logging.error("Не указан project_id!")
-        return None
+        logger.error("Не указан project_id!")
+        return False
 
     if not ASPRO_API_KEY or not COMPANY:
-        logging.error(
+        logger.error(
             "Переменные ASPRO_API_KEY или ASPRO_COMPANY не заданы в .env"
         )
-        return None
+        return False
 
     if not USERID:
-        logging.error("Переменная USERID не задана в .env")
-        return None
+        logger.error("Переменная USERID не задана в .env")
+        return False
 
     if not USER_NAME:
-        logging.error("Переменная USER_NAME не задана в .env")
-        return None
+        logger.error("Переменная USER_NAME не задана в .env")
+        return False
+    return True
 
-    comment_text = (
-        f"<p>Обновление по делу<br>"
-        f'Уведомление для: <span class="js-item-mention '
+
+def _mention() -> str:
+    """Возвращает HTML упоминания пользователя USERID в комментарии."""
+    return (
+        f'<span class="js-item-mention '
         f'mentioning__user flw--comment-mention" '
         f'data-id="{USERID}" data-user-detail="" '
         f'data-user-id="{USERID}" '
         f'data-href="/_module/company/view/member/{USERID}" '
         f'data-toggle="sidepanel" '
-        f'_target="blank" contenteditable="false">{USER_NAME}</span><br>'
-        f"Событие: <b>{event_title}</b><br>"
-        f"Дата: {event_date}<br>"
-        f"<a href='{doc_link if doc_link else '#'}'>Документ</a></p>"
+        f'_target="blank" contenteditable="false">{USER_NAME}</span>'
     )
 
+
+def _post_comment(project_id: int, comment_text: str) -> Optional[dict]:
+    """
+    Отправляет комментарий в проект CRM.
+
+    Args:
+        project_id: ID проекта в CRM
+        comment_text: HTML комментария
+
+    Returns:
+        dict: Ответ API при успешной отправке, None при ошибке
+    """
     url = (
-        f"https://{COMPANY}.aspro.cloud/api/v1/module/{MODULE}/"
+        f"{ASPRO_API_URL}/api/v1/module/{MODULE}/"
         f"{ENTITY}/{project_id}/comments/create"
     )
     params = {"api_key": ASPRO_API_KEY}
@@ -85,17 +86,104 @@ def send_case_update_comment(
 
     try:
         response = requests.post(
-            url, params=params, data=data, headers=headers, timeout=10
+            url,
+            params=params,
+            data=data,
+            headers=headers,
+            timeout=10,
+            hooks={"response": crm_response_hook("comment_create")},
         )
         if response.ok:
-            logging.info("Комментарий успешно отправлен в CRM")
+            logger.info("Комментарий успешно отправлен в CRM")
             return response.json()
         else:
-            logging.error(
-                f"Ошибка отправки комментария: {response.status_code} - "
-                f"{response.text}"
+            logger.error(
+                "Ошибка отправки комментария: %s - %s",
+                response.status_code,
+                response.text,
             )
             return None
     except Exception as e:
-        logging.error(f"Ошибка при попытке отправки комментария: {e}")
+        if isinstance(e, requests.RequestException):
+            crm_request_failed("comment_create")
+        logger.error("Ошибка при попытке отправки комментария: %s", e)
+        return None
+
+
+def send_case_update_comment(
+    project_id: int,
+    event_title: str,
+    event_date: str,
+    doc_link: Optional[str] = None,
+) -> Optional[dict]:
+    """
+    Отправляет комментарий-уведомление об обновлении события по делу в проект
+    Aspro CRM с упоминанием пользователя.
+
+    Args:
+        project_id: ID проекта в CRM
+        event_title: Название события
+        event_date: Дата события
+        doc_link: Ссылка на документ (опционально)
+
+    Returns:
+        dict: Ответ API при успешной отправке, None при ошибке
+    """
+    if not _check_settings(project_id):
         return None
+
+    comment_text = (
+        f"<p>Обновление по делу<br>"
+        f"Уведомление для: {_mention()}<br>"
+        f"Событие: <b>{event_title}</b><br>"
+        f"Дата: {event_date}<br>"
+        f"<a href='{doc_link if doc_link else '#'}'>Документ</a></p>"
+    )
+    return _post_comment(project_id, comment_text)
+
+
+def send_case_digest_comment(
+    project_id: int, updates: List[Dict[str, Any]]
+) -> Optional[dict]:
+    """
+    Отправляет один комментарий со всеми накопленными обновлениями по
+    проекту. Одно обновление отправляется в обычном формате
+    send_case_update_comment.
+
+    Args:
+        project_id: ID проекта в CRM
+        updates: Обновления в порядке обнаружения с ключами case_number,
+            event_title, event_date и doc_link
+
+    Returns:
+        dict: Ответ API при успешной отправке, None при ошибке
+    """
+    if len(updates) == 1:
+        update = updates[0]
+        return send_case_update_comment(
+            project_id=project_id,
+            event_title=update.get("event_title") or "Без названия",
+            event_date=update.get("event_date") or "Не указана",
+            doc_link=update.get("doc_link"),
+        )
+    if not updates or not _check_settings(project_id):
+        return None
+
+    lines = []
+    for update in updates:
+        line = (
+            f"{update.get('event_date') or 'Дата не указана'} — "
+            f"<b>{update.get('event_title') or 'Без названия'}</b>"
+        )
+        if update.get("doc_link"):
+            line += f" (<a href='{update['doc_link']}'>документ</a>)"
+        if update.get("case_number"):
+            line = f"{update['case_number']}: {line}"
+        lines.append(line)
+    comment_text = (
+        f"<p>Обновления по делу: {len(updates)}<br>"
+        f"Уведомление для: {_mention()}<br>"
+        + "<br>".join(lines)
+        + "</p>"
+    )
+    return _post_comment(project_id, comment_text)
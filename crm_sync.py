@@ -12,17 +12,20 @@ import requests  # type: ignore
 from dotenv import load_dotenv  # type: ignore
 
 from db import Session
+from logging_setup import setup_logging
+from metrics import METRICS, crm_response_hook, job_finished, job_started
 from models import Cases
+from persistence import upsert_cases
 
-logging.basicConfig(
-    filename="kad_parser.log",
-    level=logging.INFO,
-    format="%(asctime)s - %(levelname)s - %(message)s",
-)
+logger = logging.getLogger(__name__)
 
 load_dotenv()
 API_KEY = os.getenv("ASPRO_API_KEY")
 COMPANY = os.getenv("ASPRO_COMPANY")
+# Адрес API Aspro.Cloud; для нагрузочных тестов — адрес mock_crm.py
+ASPRO_API_URL = (
+    os.getenv("ASPRO_API_URL") or f"https://{COMPANY}.aspro.cloud"
+).rstrip("/")
 
 
 def get_projects() -> List[Dict[str, Any]]:
@@ -31,15 +34,26 @@ def get_projects() -> List[Dict[str, Any]]:
 
     Returns:
         List[Dict]: Список проектов с их данными
+
+    Raises:
+        requests.HTTPError: Если страница списка не получена
     """
-    url = f"https://{COMPANY}.aspro.cloud/api/v1/module/st/projects/list"
+    url = f"{ASPRO_API_URL}/api/v1/module/st/projects/list"
     params = {"api_key": API_KEY}
     projects = []
     page = 1
 
     while True:
         params["page"] = str(page)
-        resp = requests.get(url, params=params, timeout=15)
+        resp = requests.get(
+            url,
+            params=params,
+            timeout=15,
+            hooks={"response": crm_response_hook("projects_list")},
+        )
+        # Неполный список нельзя использовать: дела, не попавшие в него,
+        # были бы удалены как архивные
+        resp.raise_for_status()
         data = resp.json()
         items = data.get("response", {}).get("items", [])
 
@@ -72,21 +86,28 @@ def extract_case_number(name: str) -> Optional[str]:
     return None
 
 
-def sync_crm_projects_to_db() -> None:
+def sync_crm_projects_to_db() -> bool:
     """
     Синхронизирует проекты из CRM с базой данных.
 
     Получает все проекты из CRM, извлекает номера дел из названий,
     добавляет новые дела в базу данных и удаляет архивные.
+
+    Returns:
+        bool: False, если синхронизация прервана ошибкой
     """
+    setup_logging()
     session = Session()
+    job_started("crm_sync")
     try:
         all_projects = get_projects()
         active_projects = [
             p for p in all_projects if p.get("is_archive", 0) == 0
         ]
-        logging.info(f"Всего проектов в CRM: {len(all_projects)}")
-        logging.info(f"Новых, неархивных проектов: {len(active_projects)}")
+        logger.info("Всего проектов в CRM: %s", len(all_projects))
+        logger.info("Новых, неархивных проектов: %s", len(active_projects))
+        METRICS.set("kadbot_crm_projects", len(active_projects))
+        METRICS.progress("crm_sync")
 
         # Диагностика: проверяем дублирующиеся project_id в CRM
         project_id_counts = {}
@@ -102,28 +123,31 @@ def sync_crm_projects_to_db() -> None:
             if len(names) > 1
         }
         if duplicates:
-            logging.warning(
-                f"Найдены дублирующиеся project_id в CRM: {duplicates}"
+            logger.warning(
+                "Найдены дублирующиеся project_id в CRM: %s", duplicates
             )
             # Детальная диагностика для каждого дубликата
             for pid, names in duplicates.items():
-                logging.warning(
-                    f"Project_id {pid} используется в проектах: {names}"
+                logger.warning(
+                    "Project_id %s используется в проектах: %s", pid, names
                 )
 
         # Дополнительная диагностика для проблемных project_id
         problematic_ids = [1275, 1337]  # Добавляем другие проблемные ID
         for pid in problematic_ids:
             if pid in project_id_counts:
-                logging.info(
-                    f"Project_id {pid} найден в CRM в проектах: "
-                    f"{project_id_counts[pid]}"
+                logger.info(
+                    "Project_id %s найден в CRM в проектах: %s",
+                    pid,
+                    project_id_counts[pid],
                 )
 
         # Получаем существующие записи из БД
         db_cases = {c.case_number: c for c in session.query(Cases).all()}
         db_project_ids = {c.project_id for c in db_cases.values()}
         active_case_numbers = set()
+        # Новые дела и изменённые project_id записываются одним пакетом
+        upserts = []
         added = 0
         updated = 0
         conflicts = 0
@@ -143,57 +167,74 @@ def sync_crm_projects_to_db() -> None:
                 if existing_case.project_id != project_id:
                     # Проверяем, не занят ли новый project_id другим делом
                     if project_id in db_project_ids:
-                        logging.warning(
-                            f"Конфликт: дело {case_number} пытается "
-                            f"использовать project_id {project_id}, который "
-                            f"уже занят другим делом"
+                        logger.warning(
+                            "Конфликт: дело %s пытается использовать "
+                            "project_id %s, который уже занят другим делом",
+                            case_number,
+                            project_id,
                         )
                         conflicts += 1
                         continue
-                    existing_case.project_id = project_id
+                    upserts.append(
+                        {"case_number": case_number, "project_id": project_id}
+                    )
+                    db_project_ids.add(project_id)
                     updated += 1
-                    logging.info(
-                        f"Обновлен project_id для дела {case_number}: "
-                        f"{existing_case.project_id} -> {project_id}"
+                    logger.info(
+                        "Обновлен project_id для дела %s: %s -> %s",
+                        case_number,
+                        existing_case.project_id,
+                        project_id,
                     )
             else:
                 # Новое дело
                 if project_id in db_project_ids:
-                    logging.warning(
-                        f"Конфликт: новое дело {case_number} пытается "
-                        f"использовать project_id {project_id}, который "
-                        f"уже занят"
+                    logger.warning(
+                        "Конфликт: новое дело %s пытается использовать "
+                        "project_id %s, который уже занят",
+                        case_number,
+                        project_id,
                     )
                     conflicts += 1
                     continue
 
-                session.add(
-                    Cases(case_number=case_number, project_id=project_id)
+                upserts.append(
+                    {"case_number": case_number, "project_id": project_id}
                 )
                 db_project_ids.add(project_id)
-                logging.info(
-                    f"Добавлено дело: {case_number} с project_id: {project_id}"
+                logger.info(
+                    "Добавлено дело: %s с project_id: %s",
+                    case_number,
+                    project_id,
                 )
                 added += 1
 
+        upsert_cases(session, upserts)
+
         # Удаляем архивные дела
         removed = 0
         for case_number in db_cases:
             if case_number not in active_case_numbers:
                 obj = db_cases[case_number]
                 session.delete(obj)
-                logging.info(f"Удалено архивное дело: {case_number}")
+                logger.info("Удалено архивное дело: %s", case_number)
                 removed += 1
 
         session.commit()
-        logging.info(
-            f"Итого добавлено: {added}, обновлено: {updated}, "
-            f"удалено: {removed}, конфликтов: {conflicts}"
+        logger.info(
+            "Итого добавлено: %s, обновлено: %s, удалено: %s, конфликтов: %s",
+            added,
+            updated,
+            removed,
+            conflicts,
         )
+        return True
     except Exception as e:
-        logging.error(f"Ошибка синхронизации CRM: {e}")
+        logger.error("Ошибка синхронизации CRM: %s", e)
         session.rollback()
+        return False
     finally:
+        job_finished("crm_sync")
         session.close()
 
 
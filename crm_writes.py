@@ -0,0 +1,210 @@
+"""
+Модуль журнала записей в CRM (идемпотентность).
+
+Комментарий или событие календаря, созданные повторно, дублируются в CRM,
+поэтому каждая такая запись получает детерминированный ключ (проект,
+дело, дата и название события, ссылка на документ или время заседания) и
+проходит через таблицу crm_writes:
+
+1. begin_write — до запроса: ключ записывается со статусом «pending».
+   Если ключ уже выполнен или его прямо сейчас отправляет другой
+   обработчик, запрос не нужен.
+2. complete_write — сразу после успешного ответа, отдельным коммитом:
+   статус «done» и ID созданного объекта.
+3. abandon_write — после ошибки: ключ освобождается для повтора.
+
+Запись «pending» старше CRM_WRITE_PENDING_SECONDS осталась от упавшего
+процесса; результат её запроса неизвестен, и запись отправляется снова
+(с предупреждением в логе). Изменение и удаление событий идемпотентны сами
+по себе и через журнал не проходят.
+"""
+
+import hashlib
+import logging
+import os
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, Optional
+
+from sqlalchemy import update  # type: ignore
+from sqlalchemy.exc import IntegrityError  # type: ignore
+
+from models import CrmWrite
+
+logger = logging.getLogger(__name__)
+
+PENDING = "pending"
+DONE = "done"
+
+# Через сколько секунд незавершённая запись считается брошенной упавшим
+# процессом; должно быть больше таймаута запроса к CRM
+CRM_WRITE_PENDING_SECONDS = int(os.getenv("CRM_WRITE_PENDING_SECONDS", "300"))
+
+
+def idempotency_key(operation: str, *parts) -> str:
+    """
+    Строит ключ записи из операции и её определяющих полей.
+
+    Args:
+        operation: Операция ("comment", "hearing_event")
+        *parts: Поля, однозначно задающие запись
+
+    Returns:
+        str: SHA-256 в шестнадцатеричном виде
+    """
+    raw = "\x1f".join(
+        [operation] + ["" if part is None else str(part) for part in parts]
+    )
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def comment_key(
+    project_id: int,
+    case_number: str,
+    event_date: Optional[str],
+    event_title: Optional[str],
+    doc_link: Optional[str],
+) -> str:
+    """Ключ уведомления о событии дела в комментарии проекта."""
+    return idempotency_key(
+        "comment", project_id, case_number, event_date, event_title, doc_link
+    )
+
+
+def hearing_event_key(
+    project_id: int, case_number: str, starts_at: datetime
+) -> str:
+    """Ключ события календаря для заседания."""
+    return idempotency_key(
+        "hearing_event",
+        project_id,
+        case_number,
+        starts_at.strftime("%Y-%m-%dT%H:%M"),
+    )
+
+
+def completed_writes(session, keys: Iterable[str]) -> Dict[str, CrmWrite]:
+    """
+    Возвращает выполненные записи по ключам.
+
+    Args:
+        session: Сессия базы данных
+        keys: Ключи записей
+
+    Returns:
+        Dict[str, CrmWrite]: Ключ -> запись журнала со статусом «done»
+    """
+    keys = list(set(keys))
+    if not keys:
+        return {}
+    return {
+        write.idempotency_key: write
+        for write in session.query(CrmWrite).filter(
+            CrmWrite.idempotency_key.in_(keys), CrmWrite.status == DONE
+        )
+    }
+
+
+def begin_write(
+    session, key: str, operation: str, project_id: Optional[int] = None
+) -> bool:
+    """
+    Резервирует ключ перед запросом в CRM.
+
+    Args:
+        session: Сессия базы данных
+        key: Ключ записи
+        operation: Операция
+        project_id: ID проекта в CRM
+
+    Returns:
+        bool: True — запрос нужно выполнить; False — запись уже выполнена
+            или её выполняет другой обработчик
+    """
+    now = datetime.now()
+    session.add(
+        CrmWrite(
+            idempotency_key=key,
+            operation=operation,
+            project_id=project_id,
+            status=PENDING,
+            attempts=1,
+            started_at=now,
+        )
+    )
+    try:
+        session.commit()
+        return True
+    except IntegrityError:
+        session.rollback()
+
+    # Ключ уже есть: перехватываем только брошенную незавершённую запись
+    result = session.execute(
+        update(CrmWrite)
+        .where(
+            CrmWrite.idempotency_key == key,
+            CrmWrite.status == PENDING,
+            CrmWrite.started_at
+            < now - timedelta(seconds=CRM_WRITE_PENDING_SECONDS),
+        )
+        .values(started_at=now, attempts=CrmWrite.attempts + 1)
+    )
+    session.commit()
+    if result.rowcount == 1:
+        logger.warning(
+            "Запись %s в CRM (проект %s) не была завершена, результат "
+            "неизвестен; отправляю повторно",
+            operation,
+            project_id,
+        )
+        return True
+    return False
+
+
+def complete_write(
+    session, key: str, remote_id: Optional[int] = None
+) -> None:
+    """
+    Отмечает запись выполненной.
+
+    Args:
+        session: Сессия базы данных
+        key: Ключ записи
+        remote_id: ID созданного в CRM объекта
+    """
+    session.execute(
+        update(CrmWrite)
+        .where(CrmWrite.idempotency_key == key)
+        .values(status=DONE, remote_id=remote_id, completed_at=datetime.now())
+    )
+    session.commit()
+
+
+def abandon_write(session, key: str) -> None:
+    """
+    Освобождает ключ после неудачного запроса, чтобы его можно было
+    повторить.
+
+    Args:
+        session: Сессия базы данных
+        key: Ключ записи
+    """
+    session.query(CrmWrite).filter(
+        CrmWrite.idempotency_key == key, CrmWrite.status == PENDING
+    ).delete(synchronize_session="fetch")
+    session.commit()
+
+
+def forget_write(session, key: str) -> None:
+    """
+    Удаляет запись журнала, объект которой больше не существует в CRM
+    (например, событие удалили вручную), чтобы его можно было создать
+    заново.
+
+    Args:
+        session: Сессия базы данных
+        key: Ключ записи
+    """
+    session.query(CrmWrite).filter(
+        CrmWrite.idempotency_key == key
+    ).delete(synchronize_session="fetch")
+    session.commit()
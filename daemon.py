@@ -0,0 +1,264 @@
+"""
+Модуль фонового режима: синхронизация CRM, парсинг хронологии и скачивание
+документов работают по собственным расписаниям.
+
+Каждая стадия выполняется в своём потоке: запуск задачи, пауза interval
+секунд, следующий запуск. Задача, завершившаяся ошибкой (исключение или
+результат False), повторяется с удвоенной паузой. SIGINT/SIGTERM
+останавливают расписания; выполняющиеся задачи дорабатывают текущий
+запуск.
+
+Скачивание запускается в отдельном процессе со своим Chrome, поэтому сбой
+или зависание его драйвера не затрагивает парсер. Сохранение PDF нажимает
+клавиши через pyautogui, а они попадают в активное окно любого процесса,
+поэтому запуски парсинга и скачивания не пересекаются: стадии с окном
+браузера на экране выполняются по очереди (DESKTOP_LOCK). Параллельно с
+ними идёт только синхронизация CRM; одновременные парсинг и скачивание
+требуют разных машин или сеансов рабочего стола с общей БД.
+
+Пример:
+    python main.py daemon --stages crm,parse,download
+"""
+
+import logging
+import multiprocessing
+import os
+import signal
+import sys
+import threading
+import time
+from contextlib import nullcontext
+from typing import Callable, Dict, List, Optional
+
+from logging_setup import setup_logging
+from metrics import METRICS, start_metrics
+
+logger = logging.getLogger(__name__)
+
+DAEMON_STAGES = os.getenv("DAEMON_STAGES", "crm,parse,download")
+DAEMON_CRM_INTERVAL = float(os.getenv("DAEMON_CRM_INTERVAL", "3600"))
+DAEMON_PARSE_INTERVAL = float(os.getenv("DAEMON_PARSE_INTERVAL", "1800"))
+DAEMON_DOWNLOAD_INTERVAL = float(
+    os.getenv("DAEMON_DOWNLOAD_INTERVAL", "600")
+)
+# Пауза после ошибки задачи растёт вдвое до этого предела
+DAEMON_MAX_BACKOFF = float(os.getenv("DAEMON_MAX_BACKOFF", "3600"))
+
+# Общая блокировка стадий, управляющих окном браузера на экране
+DESKTOP_LOCK = threading.Lock()
+
+
+def _run_crm() -> bool:
+    from crm_sync import sync_crm_projects_to_db
+
+    return sync_crm_projects_to_db()
+
+
+def _run_parse() -> bool:
+    from parser import sync_chronology  # type: ignore
+
+    return sync_chronology()
+
+
+def _download_process() -> None:
+    """Точка входа процесса скачивания: код выхода 1 при ошибке."""
+    from download_documents import download_documents
+
+    if not download_documents():
+        sys.exit(1)
+
+
+def _run_download() -> bool:
+    process = multiprocessing.get_context("spawn").Process(
+        target=_download_process, name="daemon-download"
+    )
+    process.start()
+    process.join()
+    if process.exitcode != 0:
+        logger.error(
+            "Процесс скачивания завершился с кодом %s", process.exitcode
+        )
+    return process.exitcode == 0
+
+
+class Schedule:
+    """
+    Расписание одной стадии: задача повторяется с паузой interval секунд.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        job: Callable[[], Optional[bool]],
+        interval: float,
+        fatal: tuple = (),
+        lock: Optional[threading.Lock] = None,
+    ) -> None:
+        """
+        Args:
+            name: Имя стадии
+            job: Функция задачи без аргументов; результат False означает
+                неудачный запуск
+            interval: Пауза между окончанием запуска и следующим запуском
+            fatal: Исключения, после которых стадия останавливается
+                (повтор не поможет без вмешательства)
+            lock: Блокировка, которую задача держит на время запуска
+                (стадии с общей блокировкой выполняются по очереди)
+        """
+        self.name = name
+        self.job = job
+        self.interval = interval
+        self.fatal = fatal
+        self.lock = lock
+        self.runs = 0
+        self.failures = 0
+        self.last_error: Optional[str] = None
+
+    def run(self, stop: threading.Event) -> None:
+        """
+        Выполняет задачу по расписанию, пока не установлен stop.
+
+        Args:
+            stop: Событие остановки процесса
+        """
+        backoff = self.interval
+        while not stop.is_set():
+            started = time.monotonic()
+            logger.info("Стадия %s: запуск %s", self.name, self.runs + 1)
+            try:
+                with self.lock or nullcontext():
+                    if stop.is_set():
+                        break
+                    result = self.job()
+                if result is False:
+                    raise RuntimeError(
+                        f"задача стадии {self.name} завершилась ошибкой"
+                    )
+            except self.fatal as e:
+                self.last_error = str(e)
+                logger.critical(
+                    "Стадия %s остановлена до перезапуска процесса: %s",
+                    self.name,
+                    e,
+                )
+                METRICS.inc(
+                    "kadbot_daemon_runs_total", stage=self.name, result="fatal"
+                )
+                return
+            except Exception as e:
+                self.failures += 1
+                self.last_error = str(e)
+                backoff = min(backoff * 2, DAEMON_MAX_BACKOFF)
+                logger.exception("Стадия %s завершилась ошибкой", self.name)
+                METRICS.inc(
+                    "kadbot_daemon_runs_total", stage=self.name, result="error"
+                )
+            else:
+                backoff = self.interval
+                METRICS.inc(
+                    "kadbot_daemon_runs_total", stage=self.name, result="ok"
+                )
+            finally:
+                self.runs += 1
+            logger.info(
+                "Стадия %s: запуск занял %.0f с, следующий через %.0f с",
+                self.name,
+                time.monotonic() - started,
+                backoff,
+            )
+            stop.wait(backoff)
+
+
+def default_schedules(
+    crm_interval: float = DAEMON_CRM_INTERVAL,
+    parse_interval: float = DAEMON_PARSE_INTERVAL,
+    download_interval: float = DAEMON_DOWNLOAD_INTERVAL,
+) -> Dict[str, Schedule]:
+    """
+    Возвращает расписания всех стадий.
+
+    Args:
+        crm_interval: Пауза между синхронизациями CRM в секундах
+        parse_interval: Пауза между обходами хронологии в секундах
+        download_interval: Пауза между разборами очереди документов
+
+    Returns:
+        Dict[str, Schedule]: Имя стадии -> расписание
+    """
+    from selector_health import LayoutDriftError
+
+    return {
+        "crm": Schedule("crm", _run_crm, crm_interval),
+        "parse": Schedule(
+            "parse",
+            _run_parse,
+            parse_interval,
+            fatal=(LayoutDriftError,),
+            lock=DESKTOP_LOCK,
+        ),
+        "download": Schedule(
+            "download", _run_download, download_interval, lock=DESKTOP_LOCK
+        ),
+    }
+
+
+def run_daemon(
+    stages: Optional[List[str]] = None,
+    schedules: Optional[Dict[str, Schedule]] = None,
+    stop: Optional[threading.Event] = None,
+) -> None:
+    """
+    Запускает стадии по расписаниям и ждёт сигнала остановки.
+
+    Args:
+        stages: Имена стадий (по умолчанию DAEMON_STAGES)
+        schedules: Расписания (по умолчанию default_schedules())
+        stop: Событие остановки (по умолчанию устанавливается по
+            SIGINT/SIGTERM)
+
+    Raises:
+        ValueError: Если указана неизвестная стадия
+    """
+    setup_logging()
+    start_metrics()
+    stages = stages or [
+        name.strip() for name in DAEMON_STAGES.split(",") if name.strip()
+    ]
+    schedules = schedules or default_schedules()
+    unknown = [name for name in stages if name not in schedules]
+    if unknown:
+        raise ValueError(
+            f"Неизвестные стадии: {', '.join(unknown)}; "
+            f"доступны: {', '.join(schedules)}"
+        )
+
+    stop = stop or threading.Event()
+    if threading.current_thread() is threading.main_thread():
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            signal.signal(signum, lambda *_: stop.set())
+
+    threads = []
+    for name in stages:
+        thread = threading.Thread(
+            target=schedules[name].run,
+            args=(stop,),
+            name=f"daemon-{name}",
+            daemon=True,
+        )
+        thread.start()
+        threads.append(thread)
+    logger.info("Фоновый режим запущен, стадии: %s", ", ".join(stages))
+    print(f"Фоновый режим: {', '.join(stages)}. Остановка — Ctrl+C.")
+
+    while not stop.is_set() and any(t.is_alive() for t in threads):
+        stop.wait(1)
+    stop.set()
+    logger.info("Остановка фонового режима, ожидаю завершения задач")
+    print("Остановка: ожидаю завершения текущих задач...")
+    for thread in threads:
+        thread.join()
+    logger.info("Фоновый режим остановлен")
+
+
+if __name__ == "__main__":
+    run_daemon()
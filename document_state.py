@@ -0,0 +1,337 @@
+"""
+Модуль для работы с таблицей состояний документов.
+Ставит документы в очередь, выдаёт их обработчикам и фиксирует результат.
+"""
+
+import logging
+import os
+import socket
+from datetime import datetime, timedelta
+from typing import List, Optional
+
+from sqlalchemy import and_, or_, update  # type: ignore
+from sqlalchemy.exc import IntegrityError  # type: ignore
+
+from case_leases import CASE_LEASE_SECONDS
+from models import Chronology, DocumentState, DocumentWatermark
+
+logger = logging.getLogger(__name__)
+
+PENDING = "pending"
+DOWNLOADING = "downloading"
+DOWNLOADED = "downloaded"
+OCR_DONE = "ocr_done"
+FAILED = "failed"
+
+# Максимальная длина сообщения об ошибке, сохраняемого в БД
+MAX_ERROR_LENGTH = 1000
+
+# Имя отметки обнаружения документов в document_watermarks
+DOCUMENT_WATERMARK = "chronology"
+# Записи, обновлённые незадолго до отметки, просматриваются повторно:
+# транзакция парсера может зафиксироваться позже более новой. Парсер
+# берёт updated_at непосредственно перед записью события и фиксирует её
+# сразу, пока держит аренду дела. Если фиксация задержалась дольше срока
+# аренды, дело уже отдано другому обработчику, и тот запишет событие
+# заново со свежим updated_at. Поэтому перекрытие, равное сроку аренды,
+# не теряет опоздавшие записи. Повторно найденные ссылки отсекаются по
+# document_states
+WATERMARK_OVERLAP = timedelta(seconds=CASE_LEASE_SECONDS)
+
+
+def default_worker_id() -> str:
+    """
+    Возвращает идентификатор текущего процесса-обработчика.
+
+    Returns:
+        str: Строка вида "host:pid"
+    """
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def enqueue_documents(session) -> int:
+    """
+    Добавляет в очередь новые документы из хронологии.
+
+    Хранится отметка — наибольший updated_at уже просмотренных записей
+    хронологии. Выбираются только записи новее отметки за вычетом
+    WATERMARK_OVERLAP (диапазон по индексу chronology.updated_at), поэтому
+    ежедневный запуск по большому портфелю просматривает лишь новые
+    судебные акты. Первый запуск без отметки
+    просматривает всю хронологию. Ссылки, не являющиеся HTTP(S) адресами
+    (например, локальные пути уже сохранённых документов), пропускаются.
+
+    Args:
+        session: Сессия базы данных
+
+    Returns:
+        int: Количество новых документов в очереди
+    """
+    watermark = session.get(DocumentWatermark, DOCUMENT_WATERMARK)
+    query = session.query(Chronology, DocumentState.id).outerjoin(
+        DocumentState, DocumentState.doc_link == Chronology.doc_link
+    )
+    if watermark is not None:
+        # Записи без updated_at (до миграции) просматриваются каждый раз:
+        # migrate_db заполняет их, так что выборка обычно пуста
+        query = query.filter(
+            or_(
+                Chronology.updated_at
+                > watermark.last_updated_at - WATERMARK_OVERLAP,
+                Chronology.updated_at.is_(None),
+            )
+        )
+    rows = query.order_by(Chronology.updated_at, Chronology.id).all()
+    seen = set()
+    latest = watermark.last_updated_at if watermark is not None else None
+    now = datetime.now()
+    for row, state_id in rows:
+        if row.updated_at and (latest is None or row.updated_at > latest):
+            latest = row.updated_at
+        if (
+            state_id is not None
+            or not row.doc_link
+            or not row.doc_link.startswith("http")
+            or row.doc_link in seen
+        ):
+            continue
+        seen.add(row.doc_link)
+        session.add(
+            DocumentState(
+                chronology_id=row.id,
+                case_number=row.case_number,
+                doc_link=row.doc_link,
+                event_title=row.event_title,
+                event_date=row.event_date,
+                status=PENDING,
+                attempts=0,
+                updated_at=now,
+            )
+        )
+
+    # Отметка ставится и тогда, когда время просмотренных записей
+    # неизвестно
+    session.merge(
+        DocumentWatermark(
+            name=DOCUMENT_WATERMARK, last_updated_at=latest or now
+        )
+    )
+    try:
+        session.commit()
+    except IntegrityError:
+        # Те же записи одновременно поставил в очередь другой обработчик
+        session.rollback()
+        logger.info("Очередь документов уже обновлена другим обработчиком")
+        return 0
+    logger.info(
+        "Просмотрено новых записей хронологии: %s, в очередь добавлено "
+        "документов: %s",
+        len(rows),
+        len(seen),
+    )
+    return len(seen)
+
+
+def release_stale_claims(session, stale_after: int = 1800) -> int:
+    """
+    Возвращает в очередь документы, зависшие в статусе downloading.
+
+    Такое бывает, если обработчик упал посреди скачивания.
+
+    Args:
+        session: Сессия базы данных
+        stale_after: Через сколько секунд захват считается просроченным
+
+    Returns:
+        int: Количество возвращённых в очередь документов
+    """
+    deadline = datetime.now() - timedelta(seconds=stale_after)
+    result = session.execute(
+        update(DocumentState)
+        .where(
+            DocumentState.status == DOWNLOADING,
+            or_(
+                DocumentState.claimed_at.is_(None),
+                DocumentState.claimed_at < deadline,
+            ),
+        )
+        .values(status=PENDING, worker_id=None, updated_at=datetime.now())
+    )
+    session.commit()
+    if result.rowcount:
+        logger.info(
+            "Возвращено в очередь зависших документов: %s", result.rowcount
+        )
+    return result.rowcount
+
+
+def count_remaining(session, max_attempts: int = 3) -> int:
+    """
+    Считает документы, которые ещё предстоит скачать.
+
+    Args:
+        session: Сессия базы данных
+        max_attempts: Максимальное число попыток для одного документа
+
+    Returns:
+        int: Количество документов в очереди
+    """
+    return (
+        session.query(DocumentState)
+        .filter(_claimable_filter(max_attempts))
+        .count()
+    )
+
+
+def claim_documents(
+    session,
+    worker_id: str,
+    limit: int,
+    max_attempts: int = 3,
+) -> List[DocumentState]:
+    """
+    Атомарно захватывает пакет документов для скачивания.
+
+    Захват выполняется условным UPDATE по каждой записи: запись переходит в
+    статус downloading, только если её статус не изменился с момента
+    выборки. Поэтому несколько процессов могут разбирать одну очередь, не
+    скачивая документ дважды.
+
+    Args:
+        session: Сессия базы данных
+        worker_id: Идентификатор обработчика
+        limit: Максимальный размер пакета
+        max_attempts: Максимальное число попыток для одного документа
+
+    Returns:
+        List[DocumentState]: Захваченные документы
+    """
+    candidates = (
+        session.query(DocumentState.id, DocumentState.status)
+        .filter(_claimable_filter(max_attempts))
+        .order_by(DocumentState.id)
+        .limit(limit * 2)
+        .all()
+    )
+    claimed_ids = []
+    for state_id, status in candidates:
+        if len(claimed_ids) >= limit:
+            break
+        now = datetime.now()
+        result = session.execute(
+            update(DocumentState)
+            .where(
+                DocumentState.id == state_id,
+                DocumentState.status == status,
+            )
+            .values(
+                status=DOWNLOADING,
+                worker_id=worker_id,
+                claimed_at=now,
+                updated_at=now,
+                attempts=DocumentState.attempts + 1,
+            )
+        )
+        session.commit()
+        if result.rowcount == 1:
+            claimed_ids.append(state_id)
+
+    if not claimed_ids:
+        return []
+    return (
+        session.query(DocumentState)
+        .filter(DocumentState.id.in_(claimed_ids))
+        .order_by(DocumentState.id)
+        .all()
+    )
+
+
+def mark_downloaded(
+    session,
+    state: DocumentState,
+    file_path: str,
+    download_seconds: float,
+) -> None:
+    """
+    Отмечает документ как скачанный.
+
+    Args:
+        session: Сессия базы данных
+        state: Запись состояния документа
+        file_path: Путь к сохранённому файлу
+        download_seconds: Длительность скачивания в секундах
+    """
+    state.status = DOWNLOADED
+    state.file_path = file_path
+    state.bytes = (
+        os.path.getsize(file_path) if os.path.exists(file_path) else None
+    )
+    state.download_seconds = download_seconds
+    state.last_error = None
+    state.updated_at = datetime.now()
+    session.commit()
+
+
+def mark_ocr_done(
+    session, state: DocumentState, ocr_seconds: Optional[float]
+) -> None:
+    """
+    Отмечает документ как распознанный.
+
+    Args:
+        session: Сессия базы данных
+        state: Запись состояния документа
+        ocr_seconds: Длительность OCR в секундах
+    """
+    state.status = OCR_DONE
+    state.ocr_seconds = ocr_seconds
+    state.updated_at = datetime.now()
+    session.commit()
+
+
+def mark_failed(session, state: DocumentState, error: str) -> None:
+    """
+    Отмечает документ как необработанный и сохраняет текст ошибки.
+
+    Документ снова попадёт в очередь, пока не исчерпан лимит попыток.
+
+    Args:
+        session: Сессия базы данных
+        state: Запись состояния документа
+        error: Описание ошибки
+    """
+    state.status = FAILED
+    state.last_error = error[:MAX_ERROR_LENGTH]
+    state.worker_id = None
+    state.updated_at = datetime.now()
+    session.commit()
+
+
+def reset_failed(session) -> int:
+    """
+    Сбрасывает счётчик попыток у документов с ошибками.
+
+    Args:
+        session: Сессия базы данных
+
+    Returns:
+        int: Количество сброшенных документов
+    """
+    result = session.execute(
+        update(DocumentState)
+        .where(DocumentState.status == FAILED)
+        .values(status=PENDING, attempts=0, updated_at=datetime.now())
+    )
+    session.commit()
+    return result.rowcount
+
+
+def _claimable_filter(max_attempts: int):
+    """Условие выборки документов, доступных для захвата."""
+    return or_(
+        DocumentState.status == PENDING,
+        and_(
+            DocumentState.status == FAILED,
+            DocumentState.attempts < max_attempts,
+        ),
+    )
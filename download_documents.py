@@ -9,33 +9,42 @@ import random
 import re
 import shutil
 import time
-from typing import Optional
+from typing import Iterator, Optional
 
-import pyautogui  # type: ignore
-import pytesseract  # type: ignore
-from pdf2image import convert_from_path  # type: ignore
+from dotenv import load_dotenv  # type: ignore
 from selenium.webdriver.common.by import By  # type: ignore
 from selenium.webdriver.support import (
     expected_conditions as EC,  # type: ignore
 )
 from selenium.webdriver.support.ui import WebDriverWait  # type: ignore
-from sqlalchemy import create_engine  # type: ignore
-from sqlalchemy.orm import sessionmaker  # type: ignore
 from tqdm import tqdm  # type: ignore
 
-from models import Chronology
-from utils import (
-    clear_progress,
-    get_driver,
-    load_progress,
-    save_progress,
-    simulate_mouse_movement,
+from db import Session
+from document_state import (
+    DOWNLOADED,
+    claim_documents,
+    count_remaining,
+    default_worker_id,
+    enqueue_documents,
+    mark_downloaded,
+    mark_failed,
+    mark_ocr_done,
+    release_stale_claims,
+    reset_failed,
 )
-
-logging.basicConfig(
-    filename="kad_parser.log",
-    level=logging.INFO,
-    format="%(asctime)s - %(levelname)s - %(message)s",
+from logging_setup import setup_logging
+from metrics import METRICS, job_finished, job_started
+from models import DocumentState
+from ocr import ocr_pdf
+from pipeline import Pipeline, Stage
+from search_index import ensure_search_index, index_document
+from utils import get_driver, simulate_mouse_movement
+
+logger = logging.getLogger(__name__)
+
+load_dotenv()
+DOCUMENTS_DIR = os.getenv(
+    "DOCUMENTS_DIR", "/Users/nikita/Dev/KadBot/documents"
 )
 
 
@@ -68,34 +77,33 @@ def format_case_number(case_number: str) -> str:
     return case_number.replace("/", "_")
 
 
-def download_document(
+def fetch_document(
     driver,
     url: str,
     case_number: str,
-    event_title: str,
-    event_date: str,
-    case_participants=None,
-    output_dir: str = "/Users/nikita/Dev/KadBot/documents",
+    output_dir: str = DOCUMENTS_DIR,
 ) -> Optional[str]:
     """
-    Скачивает документ по ссылке и выполняет OCR.
+    Открывает документ в браузере и дожидается окончания загрузки.
 
     Args:
         driver: Chrome драйвер
         url: Ссылка на документ
         case_number: Номер дела
-        event_title: Название события
-        event_date: Дата события
-        case_participants: Участники дела
         output_dir: Папка для сохранения документов
 
     Returns:
-        str: Путь к сохраненному файлу или None при ошибке
+        str: Путь к загруженному файлу в папке загрузок браузера
+        или None при ошибке
     """
+    # pyautogui требует графический дисплей уже при импорте, поэтому
+    # загружается только при скачивании
+    import pyautogui  # type: ignore
+
     try:
         os.makedirs(output_dir, exist_ok=True)
-        logging.info(
-            f"Попытка загрузки документа для дела {case_number}: {url}"
+        logger.info(
+            "Попытка загрузки документа для дела %s: %s", case_number, url
         )
 
         # Устанавливаем папку загрузки
@@ -116,7 +124,7 @@ def download_document(
             driver.get("https://kad.arbitr.ru")
             for cookie in cookies:
                 driver.add_cookie(cookie)
-            logging.info("Cookies загружены из cookies.pkl")
+            logger.info("Cookies загружены из cookies.pkl")
 
         # Эмуляция человеческого поведения
         for _ in range(2):
@@ -131,25 +139,20 @@ def download_document(
         driver.get(url)
         time.sleep(random.uniform(3.0, 5.0))
 
-        # Формируем имя файла
-        event_title_clean = clean_event_title(event_title)
-        case_number_clean = format_case_number(case_number)
-        file_name = f"{event_title_clean}_{case_number_clean}.pdf"
-        file_path = os.path.join(output_dir, file_name)
-
         # Проверяем, является ли страница PDF
         content_type = driver.execute_script("return document.contentType;")
-        logging.info(f"Content-Type страницы: {content_type}")
+        logger.info("Content-Type страницы: %s", content_type)
         if content_type == "application/pdf":
-            logging.info(f"Страница является PDF, пытаемся сохранить: {url}")
+            logger.info("Страница является PDF, пытаемся сохранить: %s", url)
             pyautogui.hotkey("command", "s")
             time.sleep(2)
             pyautogui.hotkey("enter")
             time.sleep(5)
         else:
-            logging.info(
-                f"Страница не является PDF, Content-Type: {content_type}. "
-                f"Проверяем наличие кнопки скачивания."
+            logger.info(
+                "Страница не является PDF, Content-Type: %s. Проверяем "
+                "наличие кнопки скачивания.",
+                content_type,
             )
             try:
                 download_button = WebDriverWait(driver, 10).until(
@@ -157,7 +160,7 @@ def download_document(
                         (By.CSS_SELECTOR, "cr-icon-button#download")
                     )
                 )
-                logging.info(
+                logger.info(
                     "Найдена кнопка скачивания: cr-icon-button#download"
                 )
                 driver.execute_script("arguments[0].click();", download_button)
@@ -165,13 +168,12 @@ def download_document(
                 pyautogui.hotkey("enter")
                 time.sleep(5)
             except Exception as e:
-                logging.error(
-                    f"Не найдена кнопка скачивания для дела {case_number}: {e}"
-                )
-                print(
-                    f"Ошибка: Не найдена кнопка скачивания для дела "
-                    f"{case_number}. Проверьте "
-                    f"error_{case_number.replace('/', '_')}.html"
+                logger.error(
+                    "Не найдена кнопка скачивания для дела %s, страница "
+                    "сохранена в error_%s.html: %s",
+                    case_number,
+                    case_number.replace("/", "_"),
+                    e,
                 )
                 with open(
                     f"error_{case_number.replace('/', '_')}.html",
@@ -193,223 +195,427 @@ def download_document(
                     break
             time.sleep(1)
 
-        if temp_file and os.path.exists(temp_file):
-            logging.info(
-                f"Найден временный файл в {default_download_dir}: {temp_file}"
+        if not temp_file or not os.path.exists(temp_file):
+            logger.error(
+                "Файл не появился в %s для дела %s",
+                default_download_dir,
+                case_number,
             )
-            while (
-                temp_file.endswith(".crdownload")
-                and time.time() - start_time < timeout
-            ):
-                time.sleep(1)
-                for f in os.listdir(default_download_dir):
-                    if f.endswith(".pdf"):
-                        temp_file = os.path.join(default_download_dir, f)
-                        break
-            if temp_file.endswith(".pdf"):
-                shutil.move(temp_file, file_path)
-                logging.info(f"Файл перемещен в {file_path}")
-            else:
-                logging.error(f"Файл не завершил загрузку: {temp_file}")
-                print(
-                    f"Ошибка: Файл не завершил загрузку для дела {case_number}."
-                )
-                return None
+            return None
 
-            if not os.path.exists(file_path):
-                logging.error(
-                    f"Файл не был загружен для дела {case_number}: {file_path}"
-                )
-                print(f"Ошибка: Файл не был загружен для дела {case_number}.")
-                return None
+        logger.info(
+            "Найден временный файл в %s: %s", default_download_dir, temp_file
+        )
+        while (
+            temp_file.endswith(".crdownload")
+            and time.time() - start_time < timeout
+        ):
+            time.sleep(1)
+            for f in os.listdir(default_download_dir):
+                if f.endswith(".pdf"):
+                    temp_file = os.path.join(default_download_dir, f)
+                    break
+        if not temp_file.endswith(".pdf"):
+            logger.error("Файл не завершил загрузку: %s", temp_file)
+            return None
+        return temp_file
+    except Exception as e:
+        logger.error(
+            "Ошибка скачивания документа для дела %s: %s", case_number, e
+        )
+        return None
 
-        logging.info(f"Документ для дела {case_number} сохранен в {file_path}")
 
-        # OCR
-        try:
-            images = convert_from_path(file_path, dpi=400)
-            text = ""
-            for i, image in enumerate(images):
-                text += pytesseract.image_to_string(
-                    image, lang="rus", config="--psm 6 --oem 3"
-                )
-                logging.info(
-                    f"OCR для страницы {i+1} дела {case_number}: "
-                    f"{text[:100]}..."
-                )
-            with open(f"{file_path}.txt", "w", encoding="utf-8") as f:
-                f.write(text)
-            logging.info(f"OCR текст сохранен в {file_path}.txt")
-        except Exception as e:
-            logging.error(f"Ошибка OCR для дела {case_number}: {e}")
-            print(f"Ошибка OCR для дела {case_number}: {e}")
-
-        return file_path
+def store_document(
+    temp_file: str,
+    case_number: str,
+    event_title: str,
+    output_dir: str = DOCUMENTS_DIR,
+) -> Optional[str]:
+    """
+    Переносит загруженный файл в папку документов под постоянным именем.
+
+    Args:
+        temp_file: Путь к загруженному файлу
+        case_number: Номер дела
+        event_title: Название события
+        output_dir: Папка для сохранения документов
+
+    Returns:
+        str: Путь к сохраненному файлу или None при ошибке
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    event_title_clean = clean_event_title(event_title)
+    case_number_clean = format_case_number(case_number)
+    file_name = f"{event_title_clean}_{case_number_clean}.pdf"
+    file_path = os.path.join(output_dir, file_name)
+
+    shutil.move(temp_file, file_path)
+    if not os.path.exists(file_path):
+        logger.error(
+            "Файл не был загружен для дела %s: %s", case_number, file_path
+        )
+        return None
+    logger.info("Документ для дела %s сохранен в %s", case_number, file_path)
+    return file_path
+
+
+def download_document(
+    driver,
+    url: str,
+    case_number: str,
+    event_title: str,
+    event_date: str,
+    case_participants=None,
+    output_dir: str = DOCUMENTS_DIR,
+) -> Optional[str]:
+    """
+    Скачивает документ по ссылке и сохраняет его в папку документов.
+
+    Args:
+        driver: Chrome драйвер
+        url: Ссылка на документ
+        case_number: Номер дела
+        event_title: Название события
+        event_date: Дата события
+        case_participants: Участники дела
+        output_dir: Папка для сохранения документов
+
+    Returns:
+        str: Путь к сохраненному файлу или None при ошибке
+    """
+    temp_file = fetch_document(driver, url, case_number, output_dir)
+    if not temp_file:
+        return None
+    try:
+        return store_document(temp_file, case_number, event_title, output_dir)
+    except Exception as e:
+        logger.error(
+            "Ошибка сохранения документа для дела %s: %s", case_number, e
+        )
+        return None
+
+
+def ocr_document(file_path: str, case_number: str) -> Optional[str]:
+    """
+    Выполняет OCR скачанного документа и сохраняет текст рядом с файлом.
+
+    Страницы, уже распознанные с теми же настройками, берутся из кеша OCR.
+
+    Args:
+        file_path: Путь к PDF файлу
+        case_number: Номер дела (для логирования)
+
+    Returns:
+        str: Путь к текстовому файлу или None при ошибке
+    """
+    text = ocr_pdf(file_path)
+    if text is None:
+        logger.error("Ошибка OCR для дела %s", case_number)
+        return None
+    try:
+        with open(f"{file_path}.txt", "w", encoding="utf-8") as f:
+            f.write(text)
+        logger.info("OCR текст сохранен в %s.txt", file_path)
+        return f"{file_path}.txt"
     except Exception as e:
-        logging.error(
-            f"Ошибка скачивания документа для дела {case_number}: {e}"
+        logger.error(
+            "Ошибка записи OCR текста для дела %s: %s", case_number, e
+        )
+        return None
+
+
+class DocumentJob:
+    """
+    Документ, проходящий через стадии конвейера.
+
+    Содержит только простые значения, чтобы его можно было передавать
+    между потоками без привязки к сессии БД.
+    """
+
+    def __init__(self, state: DocumentState) -> None:
+        self.state_id = state.id
+        self.case_number = state.case_number
+        self.doc_link = state.doc_link
+        self.event_title = state.event_title
+        self.event_date = state.event_date
+        self.temp_file: Optional[str] = None
+        self.file_path: Optional[str] = state.file_path
+        self.text: Optional[str] = None
+        self.download_started = time.monotonic()
+        self.ocr_seconds: Optional[float] = None
+
+
+def _update_state(job: DocumentJob, action, *args) -> None:
+    """Применяет функцию изменения статуса к записи документа задания."""
+    session = Session()
+    try:
+        state = session.get(DocumentState, job.state_id)
+        if state:
+            action(session, state, *args)
+    finally:
+        session.close()
+
+
+def _fail(job: DocumentJob, error: str) -> None:
+    """Отмечает документ задания как необработанный."""
+    logger.error("Документ дела %s не обработан: %s", job.case_number, error)
+    _update_state(job, mark_failed, error)
+    METRICS.inc("kadbot_documents_total", status="failed")
+
+
+def _download_stage(job: DocumentJob, driver) -> Optional[DocumentJob]:
+    """Стадия скачивания: файл загружается браузером в папку загрузок."""
+    job.download_started = time.monotonic()
+    job.temp_file = fetch_document(driver, job.doc_link, job.case_number)
+    if not job.temp_file:
+        _fail(job, "Документ не скачан, см. kad_parser.log")
+        return None
+    return job
+
+
+def _store_stage(job: DocumentJob, _context) -> Optional[DocumentJob]:
+    """Стадия сохранения: файл переносится в папку документов."""
+    try:
+        job.file_path = store_document(
+            job.temp_file, job.case_number, job.event_title
         )
-        print(f"Ошибка скачивания документа для дела {case_number}: {e}")
+    except Exception as e:
+        _fail(job, f"Ошибка сохранения: {e}")
+        return None
+    if not job.file_path:
+        _fail(job, "Файл не сохранён в папку документов")
+        return None
+    _update_state(
+        job,
+        mark_downloaded,
+        job.file_path,
+        time.monotonic() - job.download_started,
+    )
+    METRICS.inc("kadbot_documents_total", status="downloaded")
+    logger.info(
+        "Сохранен документ для дела %s: %s", job.case_number, job.file_path
+    )
+    return job
+
+
+def _extract_stage(job: DocumentJob, _context) -> Optional[DocumentJob]:
+    """Стадия извлечения текста: OCR с кешем страниц."""
+    started = time.monotonic()
+    job.text = ocr_pdf(job.file_path)
+    job.ocr_seconds = time.monotonic() - started
+    if job.text is None:
+        # Документ остаётся в статусе downloaded и будет распознан позже
+        logger.error("Ошибка OCR для дела %s", job.case_number)
         return None
+    return job
+
+
+def _index_stage(job: DocumentJob, _context) -> Optional[DocumentJob]:
+    """
+    Стадия индексации: текст сохраняется рядом с документом и добавляется
+    в полнотекстовый индекс.
+    """
+    with open(f"{job.file_path}.txt", "w", encoding="utf-8") as f:
+        f.write(job.text or "")
+    try:
+        _update_state(job, index_document, job.text or "")
+    except Exception as e:
+        # Документ остаётся найденным по файлу; индекс можно перестроить
+        # командой python search_index.py --rebuild
+        logger.error(
+            "Ошибка индексации документа дела %s: %s", job.case_number, e
+        )
+    _update_state(job, mark_ocr_done, job.ocr_seconds)
+    METRICS.inc("kadbot_documents_total", status="ocr_done")
+    logger.info("OCR текст сохранен в %s.txt", job.file_path)
+    return job
+
+
+def _discover(
+    worker_id: str,
+    batch_size: int,
+    pause_between_batches: int,
+    max_attempts: int,
+) -> Iterator[DocumentJob]:
+    """
+    Стадия обнаружения: захватывает документы пакетами из очереди в БД.
+
+    Генератор читается конвейером по мере освобождения места в очереди
+    скачивания, поэтому документы не захватываются впрок.
+    """
+    session = Session()
+    try:
+        while True:
+            batch = claim_documents(
+                session, worker_id, batch_size, max_attempts
+            )
+            if not batch:
+                return
+            logger.info(
+                "Обработчик %s взял пакет из %s документов",
+                worker_id,
+                len(batch),
+            )
+            for state in batch:
+                yield DocumentJob(state)
+            if count_remaining(session, max_attempts):
+                logger.info(
+                    "Пауза %s секунд перед следующим пакетом",
+                    pause_between_batches,
+                )
+                time.sleep(pause_between_batches)
+    finally:
+        session.close()
+
+
+def finish_pending_ocr(session) -> None:
+    """
+    Распознаёт документы, которые были скачаны, но не прошли OCR.
+
+    Args:
+        session: Сессия базы данных
+    """
+    states = (
+        session.query(DocumentState)
+        .filter(DocumentState.status == DOWNLOADED)
+        .order_by(DocumentState.id)
+        .all()
+    )
+    for state in states:
+        if not state.file_path or not os.path.exists(state.file_path):
+            mark_failed(session, state, "Скачанный файл не найден")
+            continue
+        started = time.monotonic()
+        text_path = ocr_document(state.file_path, state.case_number)
+        if text_path:
+            with open(text_path, encoding="utf-8") as f:
+                index_document(session, state, f.read())
+            mark_ocr_done(session, state, time.monotonic() - started)
 
 
 def download_documents(
-    batch_size: int = 10, pause_between_batches: int = 30, resume: bool = False
-) -> None:
+    batch_size: int = 10,
+    pause_between_batches: int = 30,
+    retry_failed: bool = False,
+    max_attempts: int = 3,
+    worker_id: Optional[str] = None,
+    ocr_workers: int = 2,
+    queue_size: int = 5,
+) -> bool:
     """
     Скачивает документы по ссылкам из базы данных.
 
+    Документы проходят конвейер стадий: обнаружение -> скачивание ->
+    сохранение -> извлечение текста -> индексация. Стадии связаны
+    ограниченными очередями размера queue_size, поэтому медленный OCR
+    притормаживает скачивание, а не накапливает файлы.
+
+    Состояние каждого документа хранится в таблице document_states, поэтому
+    повторный запуск продолжает ровно с тех документов, которые не были
+    обработаны, а несколько процессов могут разбирать одну очередь.
+
     Args:
         batch_size: Размер пакета документов для обработки
         pause_between_batches: Пауза между пакетами в секундах
-        resume: Если True, возобновляет скачивание с последнего документа
+        retry_failed: Если True, сбрасывает счётчик попыток у документов
+            с ошибками
+        max_attempts: Максимальное число попыток для одного документа
+        worker_id: Идентификатор обработчика (по умолчанию host:pid)
+        ocr_workers: Количество потоков OCR
+        queue_size: Размер очереди перед каждой стадией
+
+    Returns:
+        bool: False, если запуск прерван ошибкой или пользователем
     """
-    engine = create_engine("sqlite:////Users/nikita/Dev/KadBot/kad_cases.db")
-    Session = sessionmaker(bind=engine)
+    setup_logging()
     session = Session()
-    processed_documents = 0
-    driver = None
-    start_index = 0
+    worker_id = worker_id or default_worker_id()
+    job_started("documents")
 
     try:
-        documents = (
-            session.query(Chronology)
-            .filter(Chronology.doc_link.isnot(None), Chronology.doc_link != "")
-            .all()
-        )
-        if not documents:
-            logging.warning("Нет документов для обработки в базе данных.")
+        ensure_search_index(session.get_bind())
+        enqueue_documents(session)
+        release_stale_claims(session)
+        if retry_failed:
+            reset = reset_failed(session)
+            logger.info("Сброшены попытки у %s документов с ошибками", reset)
+        finish_pending_ocr(session)
+
+        total = count_remaining(session, max_attempts)
+        if not total:
+            logger.warning("Нет документов для обработки в базе данных.")
             print(
                 "Предупреждение: Нет документов для обработки в базе данных. "
                 "Запустите parser.py для сбора данных."
             )
-            return
-
-        logging.info(
-            f"Найдено {len(documents)} дел с документами для обработки"
-        )
-        print(f"Найдено {len(documents)} дел для обработки.")
-
-        if resume:
-            progress = load_progress("download_progress.json")
-            if progress:
-                last_case_number = progress.get("last_case_number")
-                start_index = progress.get("last_index", 0)
-                logging.info(
-                    f"Возобновление скачивания с дела {last_case_number} "
-                    f"(индекс {start_index})"
-                )
-                documents = documents[start_index:]
-            else:
-                logging.info(
-                    "Файл прогресса скачивания не найден, начинаем с начала"
-                )
-                start_index = 0
-                documents = documents
-        else:
-            clear_progress("download_progress.json")
+            return True
 
-        driver = get_driver()
+        logger.info("Найдено %s документов для обработки", total)
+        print(f"Найдено {total} документов для обработки.")
 
+        completed = []
         with tqdm(
-            total=len(documents), desc="Обработка документов", unit="документ"
+            total=total, desc="Обработка документов", unit="документ"
         ) as pbar:
-            for i in range(0, len(documents), batch_size):
-                batch = documents[i : i + batch_size]
-                logging.info(
-                    f"Обработка пакета документов {i+1+start_index}-"
-                    f"{min(i+batch_size+start_index, len(documents)+start_index)} "
-                    f"из {len(documents)+start_index}"
-                )
-                print(
-                    "Обработка пакета "
-                    f"{i+1+start_index}-"
-                    f"{min(i+batch_size+start_index, len(documents)+start_index)} "
-                    f"из {len(documents)+start_index}"
-                )
 
-                for index, doc in enumerate(batch, start=i + start_index):
-                    case_number = doc.case_number
-                    doc_link = doc.doc_link
-                    event_title = doc.event_title
-                    event_date = doc.event_date
-                    case_participants = getattr(doc, "case_participants", None)
-                    try:
-                        if doc_link.startswith(
-                            "/Users/nikita/Dev/KadBot/documents"
-                        ):
-                            logging.info(
-                                "Документ для дела "
-                                f"{case_number} уже сохранен локально: {doc_link}"
-                            )
-                            print(
-                                f"Документ для дела {case_number} уже сохранен."
-                            )
-                            pbar.update(1)
-                            continue
-
-                        file_path = download_document(
-                            driver,
-                            doc_link,
-                            case_number,
-                            event_title,
-                            event_date,
-                            case_participants,
-                        )
-                        if file_path:
-                            logging.info(
-                                f"Сохранен документ для дела {case_number}: "
-                                f"{file_path}"
-                            )
-                            print(
-                                f"Сохранен документ для дела {case_number}: "
-                                f"{file_path}"
-                            )
-                            processed_documents += 1
-                        save_progress(
-                            case_number, index, "download_progress.json"
-                        )
-                        pbar.update(1)
-                    except Exception as e:
-                        logging.error(
-                            f"Ошибка обработки документа для дела "
-                            f"{case_number}: {e}"
-                        )
-                        print(
-                            f"Ошибка обработки документа для дела "
-                            f"{case_number}: {e}"
-                        )
-                        pbar.update(1)
-                        continue
-
-                if i + batch_size < len(documents):
-                    logging.info(
-                        f"Пауза {pause_between_batches} секунд перед "
-                        f"следующим пакетом"
-                    )
-                    time.sleep(pause_between_batches)
+            def on_finish(job: DocumentJob, ok: bool) -> None:
+                if ok:
+                    completed.append(job.state_id)
+                METRICS.progress("documents")
+                pbar.update(1)
+
+            # Скачивание идёт через папку загрузок браузера, поэтому на
+            # стадии скачивания работает один драйвер
+            pipeline = Pipeline(
+                [
+                    Stage(
+                        "download",
+                        _download_stage,
+                        workers=1,
+                        queue_size=queue_size,
+                        setup=get_driver,
+                        teardown=lambda driver: driver.quit(),
+                    ),
+                    Stage("store", _store_stage, queue_size=queue_size),
+                    Stage(
+                        "extract",
+                        _extract_stage,
+                        workers=ocr_workers,
+                        queue_size=queue_size,
+                    ),
+                    Stage("index", _index_stage, queue_size=queue_size),
+                ],
+                on_finish=on_finish,
+            )
+            pipeline.run(
+                _discover(
+                    worker_id, batch_size, pause_between_batches, max_attempts
+                )
+            )
 
-        logging.info(
-            f"Завершена обработка {processed_documents} из {len(documents)} "
-            f"документов"
+        logger.info(
+            "Завершена обработка: обработано %s из %s документов",
+            len(completed),
+            total,
         )
         print(
-            f"Завершена обработка {processed_documents} из {len(documents)} "
+            f"Завершена обработка: обработано {len(completed)} из {total} "
             f"документов"
         )
-        clear_progress("download_progress.json")
+        return True
     except KeyboardInterrupt:
-        logging.info("Процесс скачивания прерван пользователем")
+        logger.info("Процесс скачивания прерван пользователем")
         print("Процесс скачивания прерван пользователем")
+        return False
     except Exception as e:
-        logging.error(f"Критическая ошибка в download_documents: {e}")
+        logger.error("Критическая ошибка в download_documents: %s", e)
         print(f"Критическая ошибка: {e}. Проверьте kad_parser.log.")
+        return False
     finally:
-        if driver:
-            driver.quit()
-            logging.info("Chrome драйвер закрыт")
+        job_finished("documents")
         session.close()
-        logging.info("Сессия базы данных закрыта")
+        logger.info("Сессия базы данных закрыта")
 
 
 if __name__ == "__main__":
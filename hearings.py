@@ -0,0 +1,388 @@
+"""
+Модуль расписания судебных заседаний.
+
+Сведения о заседании приходят из хронологии строками DD.MM.YYYY и HH:MM.
+При сохранении события дела они переносятся в таблицу hearings с
+настоящим datetime и индексом, поэтому вопрос «какие заседания на
+следующей неделе» — один запрос по индексу. Из той же таблицы пишется
+файл .ics, на который можно подписаться в календаре (Google, Outlook,
+Apple), не обращаясь к API календаря CRM.
+
+Пример:
+    python main.py hearings --days 7 --ics
+"""
+
+import logging
+import os
+from datetime import datetime, timedelta, timezone
+from typing import List, Optional
+
+from models import Chronology, Hearing
+
+try:
+    from zoneinfo import ZoneInfo  # type: ignore
+except ImportError:  # pragma: no cover - zoneinfo есть с Python 3.9
+    ZoneInfo = None
+
+logger = logging.getLogger(__name__)
+
+# Файл календаря заседаний (пусто — не писать)
+HEARINGS_ICS_FILE = os.getenv("HEARINGS_ICS_FILE", "hearings.ics")
+# Заседания в файле календаря: столько дней назад и вперёд
+HEARINGS_ICS_DAYS_BACK = int(os.getenv("HEARINGS_ICS_DAYS_BACK", "30"))
+HEARINGS_ICS_DAYS_AHEAD = int(os.getenv("HEARINGS_ICS_DAYS_AHEAD", "180"))
+# Часовой пояс времени заседаний (например Europe/Moscow): время в .ics
+# пишется в UTC; пусто — «плавающее» время в поясе подписчика
+HEARINGS_TZ = os.getenv("HEARINGS_TZ", "")
+HEARING_DURATION_MINUTES = int(os.getenv("HEARING_DURATION_MINUTES", "60"))
+
+
+def parse_hearing_datetime(
+    hearing_date: Optional[str], hearing_time: Optional[str]
+) -> Optional[datetime]:
+    """
+    Собирает время заседания из строк хронологии.
+
+    Args:
+        hearing_date: Дата в формате DD.MM.YYYY
+        hearing_time: Время в формате HH:MM
+
+    Returns:
+        datetime: Время начала заседания или None, если строки не разобраны
+    """
+    if not hearing_date or not hearing_time:
+        return None
+    try:
+        return datetime.strptime(
+            f"{hearing_date.strip()} {hearing_time.strip()}", "%d.%m.%Y %H:%M"
+        )
+    except ValueError:
+        logger.warning(
+            "Не удалось разобрать время заседания: %s %s",
+            hearing_date,
+            hearing_time,
+        )
+        return None
+
+
+def record_hearing(
+    session,
+    case_number: str,
+    hearing_date: Optional[str],
+    hearing_time: Optional[str],
+    room: Optional[str] = None,
+    title: Optional[str] = None,
+    chronology_id: Optional[int] = None,
+) -> Optional[Hearing]:
+    """
+    Сохраняет заседание дела в таблицу hearings.
+
+    Будущие заседания того же дела на другое время считаются перенесёнными
+    и удаляются; прошедшие заседания остаются в истории.
+
+    Args:
+        session: Сессия базы данных
+        case_number: Номер дела
+        hearing_date: Дата в формате DD.MM.YYYY
+        hearing_time: Время в формате HH:MM
+        room: Кабинет или зал
+        title: Событие хронологии, в котором назначено заседание
+        chronology_id: ID записи хронологии
+
+    Returns:
+        Hearing: Запись заседания или None, если время не указано
+    """
+    starts_at = parse_hearing_datetime(hearing_date, hearing_time)
+    if starts_at is None:
+        return None
+    rescheduled = (
+        session.query(Hearing)
+        .filter(
+            Hearing.case_number == case_number,
+            Hearing.starts_at >= datetime.now(),
+            Hearing.starts_at != starts_at,
+        )
+        .delete(synchronize_session=False)
+    )
+    if rescheduled:
+        logger.info(
+            "Заседание по делу %s перенесено на %s", case_number, starts_at
+        )
+    hearing = (
+        session.query(Hearing)
+        .filter_by(case_number=case_number, starts_at=starts_at)
+        .first()
+    )
+    if hearing is None:
+        hearing = Hearing(case_number=case_number, starts_at=starts_at)
+        session.add(hearing)
+    hearing.room = room
+    hearing.title = title
+    hearing.chronology_id = chronology_id
+    hearing.updated_at = datetime.now()
+    session.commit()
+    return hearing
+
+
+def hearings_between(
+    session,
+    start: datetime,
+    end: datetime,
+    case_number: Optional[str] = None,
+) -> List[Hearing]:
+    """
+    Возвращает заседания в интервале [start, end) по возрастанию времени.
+
+    Будущие заседания, которых больше нет в хронологии дела (отменены или
+    перенесены), пропускаются, поэтому не попадают ни в файл .ics, ни в
+    календарь CRM; прошедшие остаются в истории.
+
+    Args:
+        session: Сессия базы данных
+        start: Начало интервала
+        end: Конец интервала (не включается)
+        case_number: Только заседания этого дела
+
+    Returns:
+        List[Hearing]: Заседания
+    """
+    query = session.query(Hearing).filter(
+        Hearing.starts_at >= start, Hearing.starts_at < end
+    )
+    if case_number:
+        query = query.filter(Hearing.case_number == case_number)
+    hearings = query.order_by(Hearing.starts_at, Hearing.case_number).all()
+    if not hearings:
+        return hearings
+
+    # Хронология хранит следующее заседание из карточки дела. Будущее
+    # заседание, которого там больше нет, отменено или перенесено;
+    # заседания дела без хронологии не показываются вовсе
+    scheduled = {
+        number: parse_hearing_datetime(hearing_date, hearing_time)
+        for number, hearing_date, hearing_time in session.query(
+            Chronology.case_number,
+            Chronology.hearing_date,
+            Chronology.hearing_time,
+        ).filter(
+            Chronology.case_number.in_(
+                {hearing.case_number for hearing in hearings}
+            )
+        )
+    }
+    now = datetime.now()
+    return [
+        hearing
+        for hearing in hearings
+        if hearing.case_number in scheduled
+        and (
+            hearing.starts_at < now
+            or scheduled[hearing.case_number] == hearing.starts_at
+        )
+    ]
+
+
+def upcoming_hearings(session, days: int = 7) -> List[Hearing]:
+    """
+    Возвращает заседания от текущего момента на days дней вперёд.
+
+    Args:
+        session: Сессия базы данных
+        days: Количество дней
+
+    Returns:
+        List[Hearing]: Заседания
+    """
+    now = datetime.now()
+    return hearings_between(session, now, now + timedelta(days=days))
+
+
+def backfill_hearings(session) -> int:
+    """
+    Заполняет таблицу hearings из сохранённой хронологии.
+
+    Args:
+        session: Сессия базы данных
+
+    Returns:
+        int: Количество сохранённых заседаний
+    """
+    recorded = 0
+    events = (
+        session.query(Chronology)
+        .filter(
+            Chronology.hearing_date.isnot(None),
+            Chronology.hearing_time.isnot(None),
+        )
+        .all()
+    )
+    for event in events:
+        if record_hearing(
+            session,
+            event.case_number,
+            event.hearing_date,
+            event.hearing_time,
+            event.hearing_room,
+            event.event_title,
+            event.id,
+        ):
+            recorded += 1
+    logger.info("Заседаний перенесено из хронологии: %s", recorded)
+    return recorded
+
+
+def _ics_escape(value: str) -> str:
+    """Экранирует текст значения iCalendar (RFC 5545, 3.3.11)."""
+    return (
+        value.replace("\\", "\\\\")
+        .replace(";", "\\;")
+        .replace(",", "\\,")
+        .replace("\n", "\\n")
+    )
+
+
+def _ics_fold(line: str) -> List[str]:
+    """Переносит строку длиннее 75 байт (RFC 5545, 3.1)."""
+    parts = []
+    current = ""
+    for char in line:
+        if len((current + char).encode("utf-8")) > 75:
+            parts.append(current)
+            current = " " + char
+        else:
+            current += char
+    parts.append(current)
+    return parts
+
+
+def _hearings_zone():
+    """
+    Возвращает часовой пояс HEARINGS_TZ или None, если он не задан или
+    недоступен (тогда время пишется «плавающим»).
+    """
+    if not HEARINGS_TZ:
+        return None
+    if ZoneInfo is None:
+        logger.warning(
+            "HEARINGS_TZ=%s требует Python 3.9+, время заседаний записано "
+            "без часового пояса",
+            HEARINGS_TZ,
+        )
+        return None
+    try:
+        return ZoneInfo(HEARINGS_TZ)
+    except (KeyError, ValueError):
+        logger.warning(
+            "Неизвестный часовой пояс HEARINGS_TZ=%s, время заседаний "
+            "записано без часового пояса",
+            HEARINGS_TZ,
+        )
+        return None
+
+
+def _ics_time(name: str, value: datetime, zone) -> str:
+    """
+    Форматирует свойство даты и времени: в UTC, если пояс известен (TZID
+    без компонента VTIMEZONE клиенты толкуют по-разному), иначе
+    «плавающим» временем.
+    """
+    if zone is None:
+        return f"{name}:{value:%Y%m%dT%H%M%S}"
+    utc = value.replace(tzinfo=zone).astimezone(timezone.utc)
+    return f"{name}:{utc:%Y%m%dT%H%M%SZ}"
+
+
+def render_ics(hearings: List[Hearing]) -> str:
+    """
+    Формирует календарь iCalendar из заседаний.
+
+    UID события зависит только от дела и времени заседания, поэтому
+    клиенты обновляют события при повторной загрузке, а не дублируют их.
+
+    Args:
+        hearings: Заседания
+
+    Returns:
+        str: Текст календаря с переводами строк CRLF
+    """
+    stamp = datetime.utcnow().strftime("%Y%m%dT%H%M%SZ")
+    zone = _hearings_zone()
+    lines = [
+        "BEGIN:VCALENDAR",
+        "VERSION:2.0",
+        "PRODID:-//KadBot//Hearings//RU",
+        "CALSCALE:GREGORIAN",
+        "X-WR-CALNAME:Судебные заседания",
+    ]
+    for hearing in hearings:
+        description = f"Дело: {hearing.case_number}"
+        if hearing.title:
+            description += f"\n{hearing.title}"
+        uid = (
+            f"{hearing.case_number}-{hearing.starts_at:%Y%m%dT%H%M}"
+            "@kadbot"
+        )
+        lines.extend(
+            [
+                "BEGIN:VEVENT",
+                f"UID:{_ics_escape(uid)}",
+                f"DTSTAMP:{stamp}",
+                _ics_time("DTSTART", hearing.starts_at, zone),
+                _ics_time(
+                    "DTEND",
+                    hearing.starts_at
+                    + timedelta(minutes=HEARING_DURATION_MINUTES),
+                    zone,
+                ),
+                "SUMMARY:"
+                + _ics_escape(
+                    f"Судебное заседание по делу {hearing.case_number}"
+                ),
+                f"DESCRIPTION:{_ics_escape(description)}",
+            ]
+        )
+        if hearing.room:
+            lines.append(
+                f"LOCATION:{_ics_escape(f'Кабинет {hearing.room}')}"
+            )
+        lines.append("END:VEVENT")
+    lines.append("END:VCALENDAR")
+    folded = [part for line in lines for part in _ics_fold(line)]
+    return "\r\n".join(folded) + "\r\n"
+
+
+def write_hearings_ics(
+    session,
+    path: str = HEARINGS_ICS_FILE,
+    days_back: int = HEARINGS_ICS_DAYS_BACK,
+    days_ahead: int = HEARINGS_ICS_DAYS_AHEAD,
+) -> int:
+    """
+    Записывает файл календаря заседаний.
+
+    Файл заменяется атомарно, поэтому клиент, читающий его по подписке, не
+    получит недописанный календарь.
+
+    Args:
+        session: Сессия базы данных
+        path: Путь к файлу .ics (пусто — не писать)
+        days_back: Сколько дней прошедших заседаний включить
+        days_ahead: Сколько дней будущих заседаний включить
+
+    Returns:
+        int: Количество заседаний в файле
+    """
+    if not path:
+        return 0
+    now = datetime.now()
+    hearings = hearings_between(
+        session,
+        now - timedelta(days=days_back),
+        now + timedelta(days=days_ahead),
+    )
+    temp_path = f"{path}.tmp"
+    with open(temp_path, "w", encoding="utf-8", newline="") as f:
+        f.write(render_ics(hearings))
+    os.replace(temp_path, path)
+    logger.info("Календарь заседаний записан в %s: %s", path, len(hearings))
+    return len(hearings)
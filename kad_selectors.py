@@ -0,0 +1,80 @@
+"""
+Селекторы разметки kad.arbitr.ru.
+
+Все CSS/XPath селекторы карточки дела собраны в одном месте и помечены
+версией. При изменении разметки сайта достаточно поправить этот файл (или
+подложить JSON с переопределениями через KAD_SELECTORS_FILE) и поднять
+версию — версия пишется в лог и в сообщение LayoutDriftError.
+
+Формат JSON файла:
+    {"version": "2025-01-15", "selectors": {"collapse": ".new-collapse"}}
+
+Адрес сайта задаётся KAD_BASE_URL: для бенчмарка парсера его направляют на
+локальный сервер записанных карточек (mock_kad.py).
+"""
+
+import json
+import logging
+import os
+from typing import Dict
+
+logger = logging.getLogger(__name__)
+
+SELECTORS_VERSION = "2024-06-01"
+
+# Адрес kad.arbitr.ru; для бенчмарка — адрес mock_kad.py
+KAD_BASE_URL = os.getenv("KAD_BASE_URL", "https://kad.arbitr.ru").rstrip("/")
+# Карточка дела по номеру
+CARD_URL = KAD_BASE_URL + "/Card?number={}"
+
+DEFAULT_SELECTORS: Dict[str, str] = {
+    # Блок "Следующее заседание" и иконка календаря внутри него
+    "hearing_block": "div.b-instanceAdditional",
+    "hearing_icon": "i.b-icons16.redCalendar",
+    "hearing_text": "//*[contains(text(),'Следующее заседание')]",
+    # Вкладки карточки и кнопка раскрытия хронологии
+    "tab": ".b-tab.js-tab",
+    "collapse": ".b-collapse.js-collapse",
+    # Элементы хронологии и их поля
+    "chrono_item": ".b-chrono-item.js-chrono-item",
+    "event_date": ".case-date",
+    "event_title": ".case-type",
+    "event_author": ".case-subject",
+    "event_publish": ".b-case-publish_info",
+    "doc_link": "a.js-case-result-text--doc_link",
+}
+
+KAD_SELECTORS_FILE = os.getenv("KAD_SELECTORS_FILE", "")
+
+
+def load_selectors(path: str = KAD_SELECTORS_FILE) -> Dict[str, str]:
+    """
+    Возвращает селекторы с учётом переопределений из JSON файла.
+
+    Args:
+        path: Путь к JSON файлу переопределений (пустая строка — без них)
+
+    Returns:
+        Dict[str, str]: Селекторы по именам
+    """
+    global SELECTORS_VERSION
+    selectors = dict(DEFAULT_SELECTORS)
+    if not path:
+        return selectors
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+    except (OSError, ValueError) as e:
+        logger.error("Не удалось загрузить селекторы из %s: %s", path, e)
+        return selectors
+
+    unknown = set(data.get("selectors", {})) - set(DEFAULT_SELECTORS)
+    if unknown:
+        logger.warning("Неизвестные селекторы в %s: %s", path, sorted(unknown))
+    selectors.update(data.get("selectors", {}))
+    SELECTORS_VERSION = data.get("version", SELECTORS_VERSION)
+    logger.info("Загружены селекторы версии %s из %s", SELECTORS_VERSION, path)
+    return selectors
+
+
+SELECTORS = load_selectors()
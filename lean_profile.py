@@ -0,0 +1,182 @@
+"""
+Модуль «облегчённого» профиля Chrome.
+Блокирует изображения, шрифты, аналитику и рекламу, которые не нужны для
+разбора карточки дела, и отключает лишние функции браузера. Также
+собирает статистику загрузки страницы (объём переданных данных и время
+загрузки), чтобы измерять эффект.
+"""
+
+import logging
+import os
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+BROWSER_LEAN = os.getenv("BROWSER_LEAN", "true").lower() == "true"
+
+# Шаблоны URL для Network.setBlockedURLs. Стили не блокируются: без них
+# элементы карточки считаются невидимыми и WebDriverWait не находит кнопки
+DEFAULT_BLOCKED_URLS = [
+    "*.png",
+    "*.jpg",
+    "*.jpeg",
+    "*.gif",
+    "*.webp",
+    "*.ico",
+    "*.svg",
+    "*.woff",
+    "*.woff2",
+    "*.ttf",
+    "*.otf",
+    "*.eot",
+    "*.mp4",
+    "*mc.yandex.ru*",
+    "*an.yandex.ru*",
+    "*google-analytics.com*",
+    "*googletagmanager.com*",
+    "*doubleclick.net*",
+    "*top-fwz1.mail.ru*",
+    "*counter.yadro.ru*",
+    "*vk.com/rtrg*",
+]
+
+# Дополнительные шаблоны через запятую из окружения
+BLOCKED_URLS = DEFAULT_BLOCKED_URLS + [
+    pattern.strip()
+    for pattern in os.getenv("BROWSER_BLOCKED_URLS", "").split(",")
+    if pattern.strip()
+]
+
+LEAN_ARGUMENTS = [
+    "--blink-settings=imagesEnabled=false",
+    "--disable-extensions",
+    "--disable-background-networking",
+    "--disable-component-update",
+    "--disable-default-apps",
+    "--disable-sync",
+    "--disable-notifications",
+    "--mute-audio",
+    "--no-first-run",
+    "--disable-features=Translate,MediaRouter,OptimizationHints",
+]
+
+LEAN_PREFS = {
+    "profile.managed_default_content_settings.images": 2,
+    "profile.managed_default_content_settings.notifications": 2,
+    "profile.managed_default_content_settings.geolocation": 2,
+    "profile.managed_default_content_settings.media_stream": 2,
+}
+
+# Скрипт сбора статистики загрузки текущей страницы через Resource Timing.
+# transferSize ресурсов сторонних доменов без Timing-Allow-Origin равен 0,
+# поэтому объём — нижняя оценка
+PAGE_STATS_SCRIPT = """
+const nav = performance.getEntriesByType('navigation')[0];
+const resources = performance.getEntriesByType('resource');
+let bytes = nav ? nav.transferSize : 0;
+for (const r of resources) { bytes += r.transferSize || 0; }
+return {
+    bytes: bytes,
+    requests: resources.length + (nav ? 1 : 0),
+    load_ms: nav ? Math.round(nav.loadEventEnd - nav.startTime) : null,
+};
+"""
+
+
+def apply_lean_options(options) -> None:
+    """
+    Добавляет в ChromeOptions аргументы и настройки облегчённого профиля.
+
+    Args:
+        options: Объект ChromeOptions
+    """
+    for argument in LEAN_ARGUMENTS:
+        options.add_argument(argument)
+    options.add_experimental_option("prefs", LEAN_PREFS)
+
+
+def enable_request_blocking(
+    driver, patterns: Optional[List[str]] = None
+) -> None:
+    """
+    Включает блокировку запросов по шаблонам URL через CDP.
+
+    Args:
+        driver: Chrome драйвер
+        patterns: Шаблоны URL (по умолчанию BLOCKED_URLS)
+    """
+    patterns = patterns if patterns is not None else BLOCKED_URLS
+    try:
+        driver.execute_cdp_cmd("Network.enable", {})
+        driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": patterns})
+        logger.info("Включена блокировка запросов: %s шаблонов", len(patterns))
+    except Exception as e:
+        logger.warning("Не удалось включить блокировку запросов: %s", e)
+
+
+def collect_page_stats(driver) -> Optional[Dict[str, Any]]:
+    """
+    Возвращает статистику загрузки текущей страницы.
+
+    Args:
+        driver: Chrome драйвер
+
+    Returns:
+        Dict: bytes, requests, load_ms или None при ошибке
+    """
+    try:
+        return driver.execute_script(PAGE_STATS_SCRIPT)
+    except Exception as e:
+        logger.info("Не удалось получить статистику страницы: %s", e)
+        return None
+
+
+class LoadStats:
+    """
+    Накопитель статистики загрузки страниц за запуск.
+    """
+
+    def __init__(self) -> None:
+        self.pages = 0
+        self.bytes = 0
+        self.requests = 0
+        self.load_ms = 0
+        self.cpu_seconds = 0.0
+
+    def add(
+        self,
+        stats: Optional[Dict[str, Any]],
+        cpu_seconds: Optional[float] = None,
+    ) -> None:
+        """
+        Учитывает статистику одной страницы.
+
+        Args:
+            stats: Результат collect_page_stats
+            cpu_seconds: Процессорное время браузера на страницу
+        """
+        if not stats:
+            return
+        self.pages += 1
+        self.bytes += stats.get("bytes") or 0
+        self.requests += stats.get("requests") or 0
+        self.load_ms += stats.get("load_ms") or 0
+        if cpu_seconds is not None and cpu_seconds > 0:
+            self.cpu_seconds += cpu_seconds
+
+    def summary(self) -> str:
+        """
+        Возвращает сводку в виде строки для лога.
+
+        Returns:
+            str: Средние значения на страницу
+        """
+        if not self.pages:
+            return "Статистика загрузки страниц недоступна"
+        return (
+            f"Статистика загрузки: страниц {self.pages}, в среднем "
+            f"{self.bytes / self.pages / 1024:.1f} КБ, "
+            f"{self.requests / self.pages:.1f} запросов, "
+            f"{self.load_ms / self.pages:.0f} мс, "
+            f"CPU браузера {self.cpu_seconds / self.pages:.2f} с"
+        )
@@ -0,0 +1,199 @@
+"""
+Модуль настройки логирования.
+
+Логирование настраивается один раз на процесс вызовом setup_logging():
+обработчики модулей пишут записи в очередь (QueueHandler), а запись на диск
+выполняет отдельный поток (QueueListener), поэтому медленный диск не
+задерживает парсинг и OCR. Файл лога ротируется по размеру.
+
+По умолчанию каждая запись — строка JSON с полями времени, уровня, модуля,
+сообщения и контекста (номер дела и стадия обработки), заданного через
+bind_log_context(). Уровни отдельных модулей задаются в LOG_LEVELS,
+например "parser=DEBUG,ocr=WARNING".
+
+Пример:
+    logger = logging.getLogger(__name__)
+    bind_log_context(case_number="А40-1/2024", stage="scrape")
+    logger.info("Загружена страница за %.1f с", seconds)
+"""
+
+import atexit
+import contextvars
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import threading
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+LOG_FILE = os.getenv("LOG_FILE", "kad_parser.log")
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
+# Уровни отдельных модулей: "parser=DEBUG,ocr=WARNING"
+LOG_LEVELS = os.getenv("LOG_LEVELS", "")
+# json — строки JSON, text — прежний текстовый формат
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json")
+LOG_MAX_BYTES = int(os.getenv("LOG_MAX_BYTES", str(10 * 1024 * 1024)))
+LOG_BACKUP_COUNT = int(os.getenv("LOG_BACKUP_COUNT", "5"))
+
+TEXT_FORMAT = "%(asctime)s - %(levelname)s - %(message)s"
+
+# Поля контекста, добавляемые к каждой записи
+CONTEXT_FIELDS = ("case_number", "stage")
+
+_context: "contextvars.ContextVar[Dict[str, Any]]" = contextvars.ContextVar(
+    "log_context", default={}
+)
+_setup_lock = threading.Lock()
+_listener: Optional[logging.handlers.QueueListener] = None
+_queue_handler: Optional[logging.Handler] = None
+
+
+def bind_log_context(**fields: Any) -> None:
+    """
+    Задаёт контекст записей лога для текущего потока или задачи asyncio.
+
+    Значение действует до следующего вызова; None удаляет поле.
+
+    Args:
+        **fields: Поля контекста (case_number, stage)
+    """
+    context = dict(_context.get())
+    for key, value in fields.items():
+        if value is None:
+            context.pop(key, None)
+        else:
+            context[key] = value
+    _context.set(context)
+
+
+def clear_log_context() -> None:
+    """Очищает контекст записей лога текущего потока или задачи."""
+    _context.set({})
+
+
+class _ContextFilter(logging.Filter):
+    """Добавляет к записи поля контекста в потоке, создавшем запись."""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        context = _context.get()
+        for field in CONTEXT_FIELDS:
+            if not hasattr(record, field):
+                setattr(record, field, context.get(field))
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    """Форматирует запись в одну строку JSON."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry: Dict[str, Any] = {
+            "ts": datetime.fromtimestamp(record.created).isoformat(
+                timespec="milliseconds"
+            ),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for field in CONTEXT_FIELDS:
+            value = getattr(record, field, None)
+            if value is not None:
+                entry[field] = value
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class _QueueHandler(logging.handlers.QueueHandler):
+    """
+    QueueHandler, сохраняющий исключение в записи: стандартный prepare()
+    вклеивает трассировку в текст сообщения, и JSON теряет поле exc.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record.message = record.getMessage()
+        if record.exc_info and not record.exc_text:
+            record.exc_text = logging.Formatter().formatException(
+                record.exc_info
+            )
+        prepared = logging.makeLogRecord(record.__dict__)
+        prepared.msg = prepared.message
+        prepared.args = None
+        prepared.exc_info = None
+        return prepared
+
+
+def _parse_levels(spec: str) -> Dict[str, str]:
+    """Разбирает строку вида "parser=DEBUG,ocr=WARNING"."""
+    levels = {}
+    for item in spec.split(","):
+        name, _, level = item.partition("=")
+        if name.strip() and level.strip():
+            levels[name.strip()] = level.strip().upper()
+    return levels
+
+
+def setup_logging(
+    log_file: str = LOG_FILE,
+    level: str = LOG_LEVEL,
+    levels: str = LOG_LEVELS,
+    log_format: str = LOG_FORMAT,
+) -> None:
+    """
+    Настраивает логирование процесса. Повторные вызовы ничего не делают.
+
+    Args:
+        log_file: Путь к файлу лога
+        level: Уровень корневого логгера
+        levels: Уровни отдельных модулей ("parser=DEBUG,ocr=WARNING")
+        log_format: "json" или "text"
+    """
+    global _listener, _queue_handler
+    with _setup_lock:
+        if _listener is not None:
+            return
+
+        file_handler = logging.handlers.RotatingFileHandler(
+            log_file,
+            maxBytes=LOG_MAX_BYTES,
+            backupCount=LOG_BACKUP_COUNT,
+            encoding="utf-8",
+        )
+        file_handler.setFormatter(
+            JsonFormatter()
+            if log_format == "json"
+            else logging.Formatter(TEXT_FORMAT)
+        )
+
+        log_queue: "queue.Queue[logging.LogRecord]" = queue.Queue(-1)
+        _queue_handler = _QueueHandler(log_queue)
+        _queue_handler.addFilter(_ContextFilter())
+
+        root = logging.getLogger()
+        root.addHandler(_queue_handler)
+        root.setLevel(level.upper())
+        for name, module_level in _parse_levels(levels).items():
+            logging.getLogger(name).setLevel(module_level)
+
+        _listener = logging.handlers.QueueListener(
+            log_queue, file_handler, respect_handler_level=True
+        )
+        _listener.start()
+        atexit.register(stop_logging)
+
+
+def stop_logging() -> None:
+    """Дописывает очередь записей на диск и останавливает поток записи."""
+    global _listener, _queue_handler
+    with _setup_lock:
+        if _listener is None:
+            return
+        logging.getLogger().removeHandler(_queue_handler)
+        _queue_handler = None
+        _listener.stop()
+        for handler in _listener.handlers:
+            handler.close()
+        _listener = None
@@ -14,11 +14,7 @@ from crm_notify import send_case_update_comment
 from db import Session, get_project_id_for_case
 from models import Cases, Chronology
 
-logging.basicConfig(
-    filename="kad_parser.log",
-    level=logging.INFO,
-    format="%(asctime)s - %(levelname)s - %(message)s",
-)
+logger = logging.getLogger(__name__)
 
 
 def parse_date(date_str: str) -> Optional[datetime]:
@@ -76,12 +72,15 @@ def save_event_to_db(
         event_publish=event_data.get("event_publish", ""),
         doc_link=event_data.get("doc_link", ""),
         events_count=events_count,
+        updated_at=datetime.now(),
     )
     session.add(chronology)
     session.commit()
-    logging.info(
-        f"Добавлено новое событие для дела {case_number}: "
-        f"{event_data['event_title']} — {event_data['event_date']}"
+    logger.info(
+        "Добавлено новое событие для дела %s: %s — %s",
+        case_number,
+        event_data["event_title"],
+        event_data["event_date"],
     )
 
 
@@ -106,10 +105,13 @@ def update_event_in_db(
     chronology.event_publish = event_data.get("event_publish", "")
     chronology.doc_link = event_data.get("doc_link", "")
     chronology.events_count = events_count
+    chronology.updated_at = datetime.now()
     session.commit()
-    logging.info(
-        f"Обновлено событие для дела {chronology.case_number}: "
-        f"{event_data['event_title']} — {event_data['event_date']}"
+    logger.info(
+        "Обновлено событие для дела %s: %s — %s",
+        chronology.case_number,
+        event_data["event_title"],
+        event_data["event_date"],
     )
 
 
@@ -125,7 +127,7 @@ def parse_and_save_case(session, driver, case_number: str) -> None:
     try:
         event_data, events_count = get_case_events(driver, case_number)
         if not event_data:
-            logging.warning(f"Дело {case_number}: событий не найдено")
+            logger.warning("Дело %s: событий не найдено", case_number)
             return
 
         db_event = get_last_event_from_db(session, case_number)
@@ -140,9 +142,9 @@ def parse_and_save_case(session, driver, case_number: str) -> None:
                 update_event_in_db(session, db_event, event_data, events_count)
                 notify_case_update(case_number, event_data)
             else:
-                logging.info(f"Без изменений для дела {case_number}")
+                logger.info("Без изменений для дела %s", case_number)
     except Exception as e:
-        logging.error(f"Ошибка обработки дела {case_number}: {e}")
+        logger.error("Ошибка обработки дела %s: %s", case_number, e)
 
 
 def parse_all_cases() -> None:
@@ -157,17 +159,17 @@ def parse_all_cases() -> None:
     try:
         all_cases = session.query(Cases).all()
         total = len(all_cases)
-        logging.info(f"Начата обработка {total} дел")
+        logger.info("Начата обработка %s дел", total)
         for idx, case in enumerate(all_cases, 1):
-            logging.info(f"[{idx}/{total}] Проверка {case.case_number}")
+            logger.info("[%s/%s] Проверка %s", idx, total, case.case_number)
             parse_and_save_case(session, driver, case.case_number)
             time.sleep(random.uniform(0.7, 1.3))
     finally:
         if driver:
             driver.quit()
-            logging.info("Chrome драйвер закрыт")
+            logger.info("Chrome драйвер закрыт")
         session.close()
-        logging.info("Сессия базы данных закрыта")
+        logger.info("Сессия базы данных закрыта")
 
 
 def notify_case_update(case_number: str, event_data: Dict[str, Any]) -> None:
@@ -180,7 +182,7 @@ def notify_case_update(case_number: str, event_data: Dict[str, Any]) -> None:
     """
     project_id = get_project_id_for_case(case_number)
     if not project_id:
-        logging.warning(f"Не найден project_id для дела {case_number}")
+        logger.warning("Не найден project_id для дела %s", case_number)
         return
     send_case_update_comment(
         project_id=project_id,
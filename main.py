@@ -1,78 +1,435 @@
 """
 Главный модуль приложения для парсинга дел и скачивания документов.
-Предоставляет интерфейс для выбора действий: синхронизация CRM, парсинг или
-скачивание документов.
+
+Без аргументов показывает интерактивное меню. С подкомандой выполняет
+действие без вопросов (для cron, systemd и контейнеров):
+
+    python main.py sync-crm
+    python main.py parse --batch-size 20 --restart
+    python main.py parse-async --tabs 4
+    python main.py download --ocr-workers 4 --retry-failed
+    python main.py daemon --stages crm,parse,download
+    python main.py search "неустойка" --case А40-1/2024
+    python main.py hearings --days 7 --ics
+    python main.py calendar-sync --dry-run
+    python main.py notify-flush --all
+    python main.py crm-cache --refresh
+
+Модули действий импортируются только при выборе действия: парсер и
+скачивание тянут за собой Chrome, selenium, pyautogui (нужен дисплей) и
+OCR, а синхронизация CRM должна запускаться на сервере без них.
 """
 
-import json
-import os
-from parser import sync_chronology  # type: ignore
+import argparse
+import sys
+from typing import List, Optional
 
-from crm_sync import sync_crm_projects_to_db
-from download_documents import download_documents
+from logging_setup import setup_logging
+from selector_health import LayoutDriftError
 
 
-def check_resume_option(filename: str) -> bool:
-    """
-    Проверяет, был ли предыдущий запуск процесса прерван, и предлагает
-    пользователю выбор.
+def run_crm_sync(args: Optional[argparse.Namespace] = None) -> bool:
+    """Синхронизирует проекты из CRM (только requests и БД)."""
+    from crm_sync import sync_crm_projects_to_db
 
-    Args:
-        filename: Имя файла прогресса ('parser_progress.json' или
-        'download_progress.json')
+    return sync_crm_projects_to_db()
 
-    Returns:
-        bool: True, если пользователь выбрал продолжить, False, если начать
-        заново
-    """
-    if os.path.exists(filename):
-        with open(filename, "r", encoding="utf-8") as f:
-            progress = json.load(f)
-        last_case_number = progress.get("last_case_number", "неизвестно")
-        process_name = (
-            "парсинга"
-            if filename == "parser_progress.json"
-            else "скачивания документов"
+
+def run_parser(args: Optional[argparse.Namespace] = None) -> bool:
+    """Парсит события по делам в Chrome."""
+    from parser import sync_chronology  # type: ignore
+
+    if args is None:
+        # Прогресс хранится в таблице case_leases: повтор пропускает дела,
+        # обработанные менее CASE_RESCRAPE_INTERVAL секунд назад
+        print("Запуск парсинга с автоматическим восстановлением прогресса...")
+        return sync_chronology()
+    return sync_chronology(
+        batch_size=args.batch_size,
+        pause_between_batches=args.pause,
+        resume=not args.restart,
+        worker_id=args.worker_id,
+    )
+
+
+def run_download(args: Optional[argparse.Namespace] = None) -> bool:
+    """Скачивает документы и распознаёт их текст."""
+    from download_documents import download_documents
+
+    # Состояние документов хранится в БД: повтор продолжает с места
+    # остановки без отдельного файла прогресса
+    if args is None:
+        return download_documents()
+    return download_documents(
+        batch_size=args.batch_size,
+        pause_between_batches=args.pause,
+        retry_failed=args.retry_failed,
+        max_attempts=args.max_attempts,
+        worker_id=args.worker_id,
+        ocr_workers=args.ocr_workers,
+        queue_size=args.queue_size,
+    )
+
+
+def run_parser_async(args: Optional[argparse.Namespace] = None) -> None:
+    """Парсит события в нескольких вкладках Playwright."""
+    from async_parser import ASYNC_TABS, sync_chronology_async
+
+    if args is None:
+        sync_chronology_async(ASYNC_TABS)
+        return
+    sync_chronology_async(
+        args.tabs or ASYNC_TABS,
+        resume=not args.restart,
+        worker_id=args.worker_id,
+    )
+
+
+def run_search(args: argparse.Namespace) -> None:
+    """Ищет документы в полнотекстовом индексе."""
+    from search_index import main as search
+
+    argv = list(args.query) + ["--limit", str(args.limit)]
+    if args.case:
+        argv += ["--case", args.case]
+    if args.rebuild:
+        argv.append("--rebuild")
+    search(argv)
+
+
+def run_hearings(args: argparse.Namespace) -> None:
+    """Показывает ближайшие заседания и записывает календарь .ics."""
+    from db import Session
+    from hearings import (
+        HEARINGS_ICS_FILE,
+        backfill_hearings,
+        upcoming_hearings,
+        write_hearings_ics,
+    )
+
+    session = Session()
+    try:
+        if args.backfill:
+            print(f"Перенесено заседаний: {backfill_hearings(session)}")
+        for hearing in upcoming_hearings(session, args.days):
+            room = f", кабинет {hearing.room}" if hearing.room else ""
+            print(
+                f"{hearing.starts_at:%d.%m.%Y %H:%M}  "
+                f"{hearing.case_number}{room}"
+            )
+        if args.ics:
+            path = args.ics_file or HEARINGS_ICS_FILE
+            count = write_hearings_ics(session, path)
+            print(f"Календарь записан в {path}: {count} заседаний")
+    finally:
+        session.close()
+
+
+def run_calendar_sync(args: argparse.Namespace) -> None:
+    """Сверяет календарь заседаний CRM с таблицей hearings."""
+    from calendar_reconcile import reconcile_calendar
+    from db import Session
+
+    session = Session()
+    try:
+        stats = reconcile_calendar(
+            session,
+            days_back=args.days_back,
+            days_ahead=args.days_ahead,
+            dry_run=args.dry_run,
         )
+    finally:
+        session.close()
+    if not stats:
+        print("Сверка не выполнена, см. kad_parser.log")
+        return
+    print(
+        "Создать/создано: {create}, изменить: {update}, сопоставить: "
+        "{adopt}, удалить: {delete}, пропущено: {skipped}, ошибок: "
+        "{failed}".format(**stats)
+    )
+
+
+def run_notify_flush(args: argparse.Namespace) -> None:
+    """Отправляет накопленные уведомления CRM."""
+    from db import Session
+    from notify_outbox import flush_notifications, pending_count
+
+    session = Session()
+    try:
+        sent = flush_notifications(session, force=args.all)
         print(
-            f"\nОбнаружен прерванный процесс {process_name}. "
-            f"Последнее обработанное дело: {last_case_number}"
+            f"Отправлено уведомлений: {sent}, "
+            f"в очереди: {pending_count(session)}"
         )
-        print("1. Продолжить с последнего обработанного дела")
-        print("2. Начать заново")
-        choice = input("Выберите действие (1 или 2): ").strip()
-        return choice == "1"
-    return False
+    finally:
+        session.close()
+
+
+def run_crm_cache(args: argparse.Namespace) -> None:
+    """Показывает и обновляет кеш справочников CRM."""
+    from crm_calendar import get_hearings_calendar_id
+    from crm_metadata import cache_entries, invalidate
+    from db import Session
+
+    session = Session()
+    try:
+        if args.clear:
+            print(f"Удалено значений: {invalidate(session)}")
+        if args.refresh:
+            calendar_id = get_hearings_calendar_id(refresh=True)
+            print(f"ID календаря заседаний: {calendar_id}")
+        for entry in cache_entries(session):
+            print(
+                f"{entry.key} = {entry.value}  (получено "
+                f"{entry.fetched_at:%d.%m.%Y %H:%M}, действует до "
+                f"{entry.expires_at:%d.%m.%Y %H:%M})"
+            )
+    finally:
+        session.close()
+
+
+def run_daemon(args: argparse.Namespace) -> None:
+    """Запускает стадии по расписаниям."""
+    from daemon import default_schedules
+    from daemon import run_daemon as run
+
+    run(
+        stages=args.stages.split(",") if args.stages else None,
+        schedules=default_schedules(
+            crm_interval=args.crm_interval,
+            parse_interval=args.parse_interval,
+            download_interval=args.download_interval,
+        ),
+    )
 
 
-def main() -> None:
+# Действия меню: номер -> (название, функция)
+ACTIONS = {
+    "1": ("Синхронизировать CRM проекты", run_crm_sync),
+    "2": ("Парсить события по делам", run_parser),
+    "3": ("Скачать документы по ссылкам из базы данных", run_download),
+    "4": (
+        "Парсить события в нескольких вкладках (Playwright)",
+        run_parser_async,
+    ),
+}
+
+
+def build_parser() -> argparse.ArgumentParser:
     """
-    Главная функция приложения.
+    Создаёт разбор аргументов командной строки.
+
+    Returns:
+        argparse.ArgumentParser: Парсер с подкомандами
+    """
+    from calendar_reconcile import (
+        CALENDAR_SYNC_DAYS_AHEAD,
+        CALENDAR_SYNC_DAYS_BACK,
+    )
+    from daemon import (
+        DAEMON_CRM_INTERVAL,
+        DAEMON_DOWNLOAD_INTERVAL,
+        DAEMON_PARSE_INTERVAL,
+    )
+
+    cli = argparse.ArgumentParser(
+        description="KadBot: парсинг kad.arbitr.ru, документы и Aspro CRM"
+    )
+    commands = cli.add_subparsers(dest="command")
+
+    sync_crm = commands.add_parser(
+        "sync-crm", help="Синхронизировать проекты из CRM"
+    )
+    sync_crm.set_defaults(handler=run_crm_sync)
+
+    parse = commands.add_parser("parse", help="Парсить события по делам")
+    parse.add_argument("--batch-size", type=int, default=10)
+    parse.add_argument(
+        "--pause", type=int, default=5, help="Пауза между пакетами, с"
+    )
+    parse.add_argument(
+        "--restart",
+        action="store_true",
+        help="Обойти все дела, не дожидаясь CASE_RESCRAPE_INTERVAL",
+    )
+    parse.add_argument("--worker-id", default=None)
+    parse.set_defaults(handler=run_parser)
+
+    parse_async = commands.add_parser(
+        "parse-async", help="Парсить события в нескольких вкладках"
+    )
+    parse_async.add_argument(
+        "--tabs", type=int, default=None, help="Количество вкладок"
+    )
+    parse_async.add_argument(
+        "--restart",
+        action="store_true",
+        help="Обойти все дела, не дожидаясь CASE_RESCRAPE_INTERVAL",
+    )
+    parse_async.add_argument("--worker-id", default=None)
+    parse_async.set_defaults(handler=run_parser_async)
+
+    download = commands.add_parser(
+        "download", help="Скачать документы и распознать текст"
+    )
+    download.add_argument("--batch-size", type=int, default=10)
+    download.add_argument(
+        "--pause", type=int, default=30, help="Пауза между пакетами, с"
+    )
+    download.add_argument(
+        "--retry-failed",
+        action="store_true",
+        help="Сбросить счётчик попыток у документов с ошибками",
+    )
+    download.add_argument("--max-attempts", type=int, default=3)
+    download.add_argument("--ocr-workers", type=int, default=2)
+    download.add_argument("--queue-size", type=int, default=5)
+    download.add_argument("--worker-id", default=None)
+    download.set_defaults(handler=run_download)
+
+    search = commands.add_parser(
+        "search", help="Поиск по тексту документов и событиям"
+    )
+    search.add_argument("query", nargs="*", help="Слова для поиска")
+    search.add_argument("--limit", type=int, default=20)
+    search.add_argument("--case", default=None, help="Номер дела")
+    search.add_argument(
+        "--rebuild",
+        action="store_true",
+        help="Заново построить индекс по текстовым файлам документов",
+    )
+    search.set_defaults(handler=run_search)
+
+    hearings = commands.add_parser(
+        "hearings", help="Ближайшие заседания и календарь .ics"
+    )
+    hearings.add_argument(
+        "--days", type=int, default=7, help="Заседания на N дней вперёд"
+    )
+    hearings.add_argument(
+        "--ics", action="store_true", help="Записать файл календаря"
+    )
+    hearings.add_argument(
+        "--ics-file", default=None, help="Путь к файлу (HEARINGS_ICS_FILE)"
+    )
+    hearings.add_argument(
+        "--backfill",
+        action="store_true",
+        help="Перенести заседания из хронологии",
+    )
+    hearings.set_defaults(handler=run_hearings)
+
+    calendar_sync = commands.add_parser(
+        "calendar-sync", help="Сверить календарь заседаний CRM"
+    )
+    calendar_sync.add_argument(
+        "--days-back", type=int, default=CALENDAR_SYNC_DAYS_BACK
+    )
+    calendar_sync.add_argument(
+        "--days-ahead", type=int, default=CALENDAR_SYNC_DAYS_AHEAD
+    )
+    calendar_sync.add_argument(
+        "--dry-run",
+        action="store_true",
+        help="Только показать количество изменений",
+    )
+    calendar_sync.set_defaults(handler=run_calendar_sync)
+
+    notify_flush = commands.add_parser(
+        "notify-flush", help="Отправить накопленные уведомления CRM"
+    )
+    notify_flush.add_argument(
+        "--all",
+        action="store_true",
+        help="Отправить все уведомления, не дожидаясь окна накопления",
+    )
+    notify_flush.set_defaults(handler=run_notify_flush)
+
+    crm_cache = commands.add_parser(
+        "crm-cache", help="Кеш справочников CRM (ID календаря)"
+    )
+    crm_cache.add_argument(
+        "--refresh",
+        action="store_true",
+        help="Заново получить значения из CRM",
+    )
+    crm_cache.add_argument(
+        "--clear", action="store_true", help="Удалить все значения"
+    )
+    crm_cache.set_defaults(handler=run_crm_cache)
+
+    daemon = commands.add_parser(
+        "daemon", help="Фоновый режим: все стадии по расписаниям"
+    )
+    daemon.add_argument(
+        "--stages",
+        default=None,
+        help="Стадии через запятую: crm,parse,download",
+    )
+    daemon.add_argument(
+        "--crm-interval", type=float, default=DAEMON_CRM_INTERVAL
+    )
+    daemon.add_argument(
+        "--parse-interval", type=float, default=DAEMON_PARSE_INTERVAL
+    )
+    daemon.add_argument(
+        "--download-interval", type=float, default=DAEMON_DOWNLOAD_INTERVAL
+    )
+    daemon.set_defaults(handler=run_daemon)
+    return cli
+
+
+def menu() -> bool:
+    """
+    Интерактивное меню.
 
     Предоставляет пользователю выбор между синхронизацией проектов из CRM,
-    парсингом событий по делам или скачиванием документов. Поддерживает
-    возобновление.
+    парсингом событий по делам или скачиванием документов. Оба процесса
+    автоматически продолжают работу с места остановки.
+
+    Returns:
+        bool: False, если выбор неверный или действие завершилось ошибкой
     """
-    print("1. Синхронизировать CRM проекты")
-    print("2. Парсить события по делам")
-    print("3. Скачать документы по ссылкам из базы данных")
-    action = input("Выбери действие (1, 2 или 3): ").strip()
-
-    if action == "1":
-        sync_crm_projects_to_db()
-    elif action == "2":
-        # Новая версия parser.py автоматически восстанавливает прогресс
-        print("Запуск парсинга с автоматическим восстановлением прогресса...")
-        sync_chronology()
-    elif action == "3":
-        resume = check_resume_option("download_progress.json")
-        download_documents(resume=resume)
-    else:
+    for key, (title, _) in ACTIONS.items():
+        print(f"{key}. {title}")
+    action = input("Выбери действие (1, 2, 3 или 4): ").strip()
+
+    if action not in ACTIONS:
         print("Неверный выбор!")
+        return False
+    return ACTIONS[action][1]() is not False
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """
+    Главная функция приложения.
+
+    Args:
+        argv: Аргументы командной строки (по умолчанию sys.argv[1:])
+
+    Returns:
+        int: Код возврата процесса: 0 — успех, 1 — задача завершилась
+        ошибкой (вернула False), 2 — неверные параметры, 3 — изменилась
+        разметка сайта (LayoutDriftError), нужно обновить селекторы
+    """
+    args = build_parser().parse_args(argv)
+    setup_logging()
+    try:
+        if not args.command:
+            return 0 if menu() else 1
+        result = args.handler(args)
+    except ValueError as e:
+        print(f"Ошибка: {e}")
+        return 2
+    except LayoutDriftError as e:
+        print(f"Парсинг остановлен, обновите селекторы: {e}")
+        return 3
+    return 1 if result is False else 0
 
 
 if __name__ == "__main__":
     """
     Точка входа в приложение.
     """
-    main()
+    sys.exit(main())
@@ -0,0 +1,357 @@
+"""
+Модуль метрик в текстовом формате Prometheus.
+
+Общий для парсинга, скачивания документов и синхронизации с CRM реестр
+счётчиков, показателей и сводок длительностей. Метрики доступны по HTTP
+(METRICS_PORT, адрес /metrics) и/или периодически записываются в файл
+для textfile collector node_exporter (METRICS_TEXTFILE). Если ни то, ни
+другое не задано, метрики только накапливаются в памяти.
+"""
+
+import logging
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from typing import Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+METRICS_PORT = int(os.getenv("METRICS_PORT", "0"))
+METRICS_HOST = os.getenv("METRICS_HOST", "127.0.0.1")
+METRICS_TEXTFILE = os.getenv("METRICS_TEXTFILE", "")
+METRICS_INTERVAL = float(os.getenv("METRICS_INTERVAL", "15"))
+
+# Описание и тип метрик: имя -> (тип, описание)
+METRIC_HELP: Dict[str, Tuple[str, str]] = {
+    "kadbot_job_running": ("gauge", "Задача выполняется (1) или нет (0)"),
+    "kadbot_job_last_progress_timestamp_seconds": (
+        "gauge",
+        "Время последнего продвижения задачи (unix time)",
+    ),
+    "kadbot_cases_processed_total": ("counter", "Обработано дел"),
+    "kadbot_case_changes_total": ("counter", "Найдено изменений по делам"),
+    "kadbot_case_failures_total": ("counter", "Ошибки парсинга дел"),
+    "kadbot_blocks_total": ("counter", "Страницы блокировки IP"),
+    "kadbot_retries_total": ("counter", "Повторные попытки парсинга"),
+    "kadbot_crm_requests_total": ("counter", "Запросы к API CRM"),
+    "kadbot_crm_request_seconds": ("summary", "Длительность запросов к CRM"),
+    "kadbot_crm_projects": ("gauge", "Активных проектов в CRM"),
+    "kadbot_documents_total": ("counter", "Документы по итогу обработки"),
+    "kadbot_ocr_pages_total": ("counter", "Распознано страниц OCR"),
+    "kadbot_ocr_seconds_total": ("counter", "Время OCR в секундах"),
+    "kadbot_queue_depth": ("gauge", "Глубина очередей стадий конвейера"),
+    "kadbot_daemon_runs_total": ("counter", "Запуски стадий фонового режима"),
+}
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+
+def _labels_key(labels: Dict[str, object]) -> LabelKey:
+    """Приводит метки к ключу словаря."""
+    return tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+
+def _format_labels(key: LabelKey) -> str:
+    """Форматирует метки в синтаксисе Prometheus."""
+    parts = [
+        '{}="{}"'.format(
+            name, value.replace("\\", "\\\\").replace('"', '\\"')
+        )
+        for name, value in key
+    ]
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _format_value(value: float) -> str:
+    """Форматирует значение без потери точности (в т.ч. unix time)."""
+    return str(int(value)) if float(value).is_integer() else repr(value)
+
+
+class Metrics:
+    """
+    Реестр метрик процесса. Потокобезопасен.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._values: Dict[str, Dict[LabelKey, float]] = {}
+        self._summaries: Dict[str, Dict[LabelKey, List[float]]] = {}
+        self._collectors: List[Callable[[], None]] = []
+
+    def inc(self, name: str, value: float = 1, **labels: object) -> None:
+        """
+        Увеличивает счётчик.
+
+        Args:
+            name: Имя метрики
+            value: Приращение
+            **labels: Метки
+        """
+        key = _labels_key(labels)
+        with self._lock:
+            series = self._values.setdefault(name, {})
+            series[key] = series.get(key, 0.0) + value
+
+    def set(self, name: str, value: float, **labels: object) -> None:
+        """
+        Устанавливает значение показателя.
+
+        Args:
+            name: Имя метрики
+            value: Значение
+            **labels: Метки
+        """
+        with self._lock:
+            self._values.setdefault(name, {})[_labels_key(labels)] = value
+
+    def observe(self, name: str, seconds: float, **labels: object) -> None:
+        """
+        Добавляет наблюдение в сводку (количество и сумма).
+
+        Args:
+            name: Имя метрики
+            seconds: Наблюдаемая длительность
+            **labels: Метки
+        """
+        key = _labels_key(labels)
+        with self._lock:
+            series = self._summaries.setdefault(name, {})
+            count_sum = series.setdefault(key, [0.0, 0.0])
+            count_sum[0] += 1
+            count_sum[1] += seconds
+
+    def progress(self, job: str) -> None:
+        """
+        Отмечает продвижение задачи (для оповещений о зависании).
+
+        Args:
+            job: Имя задачи
+        """
+        self.set(
+            "kadbot_job_last_progress_timestamp_seconds", time.time(), job=job
+        )
+
+    def add_collector(self, collector: Callable[[], None]) -> None:
+        """
+        Регистрирует функцию, обновляющую показатели перед выдачей метрик
+        (например, глубину очередей).
+
+        Args:
+            collector: Функция без аргументов
+        """
+        with self._lock:
+            self._collectors.append(collector)
+
+    def remove_collector(self, collector: Callable[[], None]) -> None:
+        """Удаляет ранее зарегистрированную функцию сбора."""
+        with self._lock:
+            if collector in self._collectors:
+                self._collectors.remove(collector)
+
+    def render(self) -> str:
+        """
+        Возвращает метрики в текстовом формате Prometheus.
+
+        Returns:
+            str: Текст для /metrics или textfile collector
+        """
+        with self._lock:
+            collectors = list(self._collectors)
+        for collector in collectors:
+            try:
+                collector()
+            except Exception as e:
+                logger.warning("Ошибка сбора метрик: %s", e)
+
+        lines = []
+        with self._lock:
+            names = sorted(set(self._values) | set(self._summaries))
+            for name in names:
+                metric_type, description = METRIC_HELP.get(
+                    name, ("untyped", name)
+                )
+                lines.append(f"# HELP {name} {description}")
+                lines.append(f"# TYPE {name} {metric_type}")
+                for key, value in sorted(self._values.get(name, {}).items()):
+                    lines.append(
+                        f"{name}{_format_labels(key)} {_format_value(value)}"
+                    )
+                for key, (count, total) in sorted(
+                    self._summaries.get(name, {}).items()
+                ):
+                    labels = _format_labels(key)
+                    lines.append(
+                        f"{name}_count{labels} {_format_value(count)}"
+                    )
+                    lines.append(f"{name}_sum{labels} {total:.6f}")
+        return "\n".join(lines) + "\n"
+
+    def write_textfile(self, path: str) -> None:
+        """
+        Атомарно записывает метрики в файл.
+
+        Args:
+            path: Путь к .prom файлу
+        """
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(self.render())
+        os.replace(tmp_path, path)
+
+
+# Общий реестр процесса
+METRICS = Metrics()
+
+_exporter_lock = threading.Lock()
+_exporter_started = False
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    """Отдаёт метрики по адресу /metrics."""
+
+    def do_GET(self) -> None:  # noqa: N802 - имя задано http.server
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = METRICS.render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format: str, *args) -> None:
+        """Не пишет запросы к /metrics в stderr."""
+
+
+def _textfile_loop(path: str, interval: float) -> None:
+    """Периодически записывает метрики в файл."""
+    while True:
+        try:
+            METRICS.write_textfile(path)
+        except OSError as e:
+            logger.warning("Не удалось записать метрики в %s: %s", path, e)
+        time.sleep(interval)
+
+
+def start_metrics(
+    port: int = METRICS_PORT,
+    textfile: Optional[str] = METRICS_TEXTFILE,
+    interval: float = METRICS_INTERVAL,
+) -> None:
+    """
+    Запускает экспорт метрик, если он настроен. Повторные вызовы ничего не
+    делают.
+
+    Args:
+        port: Порт HTTP сервера (0 — не запускать)
+        textfile: Путь к файлу для textfile collector (пусто — не писать)
+        interval: Период записи файла в секундах
+    """
+    global _exporter_started
+    with _exporter_lock:
+        if _exporter_started:
+            return
+        _exporter_started = True
+
+    if port:
+        try:
+            server = HTTPServer((METRICS_HOST, port), _MetricsHandler)
+        except OSError as e:
+            logger.error("Не удалось запустить сервер метрик: %s", e)
+        else:
+            threading.Thread(
+                target=server.serve_forever, name="metrics-http", daemon=True
+            ).start()
+            logger.info(
+                "Метрики доступны на http://%s:%s/metrics", METRICS_HOST, port
+            )
+    if textfile:
+        threading.Thread(
+            target=_textfile_loop,
+            args=(textfile, interval),
+            name="metrics-textfile",
+            daemon=True,
+        ).start()
+        logger.info("Метрики записываются в %s", textfile)
+
+
+def flush_metrics(textfile: Optional[str] = METRICS_TEXTFILE) -> None:
+    """
+    Записывает метрики в файл немедленно (в конце задачи).
+
+    Args:
+        textfile: Путь к файлу для textfile collector (пусто — ничего)
+    """
+    if not textfile:
+        return
+    try:
+        METRICS.write_textfile(textfile)
+    except OSError as e:
+        logger.warning("Не удалось записать метрики в %s: %s", textfile, e)
+
+
+def crm_response_hook(operation: str) -> Callable:
+    """
+    Возвращает hook для requests, учитывающий запрос к CRM.
+
+    Пример:
+        requests.post(url, hooks={"response": crm_response_hook("comment")})
+
+    Args:
+        operation: Название операции (метка operation)
+
+    Returns:
+        Callable: Функция hook(response, *args, **kwargs)
+    """
+
+    def hook(response, *args, **kwargs):
+        METRICS.inc(
+            "kadbot_crm_requests_total",
+            operation=operation,
+            status=response.status_code,
+        )
+        METRICS.observe(
+            "kadbot_crm_request_seconds",
+            response.elapsed.total_seconds(),
+            operation=operation,
+        )
+        return response
+
+    return hook
+
+
+def crm_request_failed(operation: str) -> None:
+    """
+    Учитывает запрос к CRM, завершившийся исключением (таймаут, сеть).
+
+    Args:
+        operation: Название операции
+    """
+    METRICS.inc(
+        "kadbot_crm_requests_total", operation=operation, status="error"
+    )
+
+
+def job_started(job: str) -> None:
+    """
+    Отмечает запуск задачи и включает экспорт метрик, если он настроен.
+
+    Args:
+        job: Имя задачи (parser, documents, crm_sync)
+    """
+    start_metrics()
+    METRICS.set("kadbot_job_running", 1, job=job)
+    METRICS.progress(job)
+
+
+def job_finished(job: str) -> None:
+    """
+    Отмечает завершение задачи и сбрасывает метрики в файл.
+
+    Args:
+        job: Имя задачи
+    """
+    METRICS.set("kadbot_job_running", 0, job=job)
+    flush_metrics()
@@ -4,45 +4,210 @@
 """
 
 import logging
+from datetime import datetime
 
-from sqlalchemy import MetaData, Table, create_engine  # type: ignore
+from sqlalchemy import MetaData, Table, inspect  # type: ignore
 from sqlalchemy.sql import text  # type: ignore
 
-logging.basicConfig(
-    filename="kad_parser.log",
-    level=logging.INFO,
-    format="%(asctime)s - %(levelname)s - %(message)s",
+from db import Session, engine
+from hearings import backfill_hearings
+from logging_setup import setup_logging
+from models import Base
+from search_index import ensure_search_index
+
+logger = logging.getLogger(__name__)
+
+# Столбцы, которые ссылаются на записи хронологии: при удалении дублей они
+# переводятся на сохраняемую запись дела
+CHRONOLOGY_REFERENCES = [
+    ("document_states", "chronology_id"),
+    ("hearings", "chronology_id"),
+    ("notification_outbox", "chronology_id"),
+]
+
+# Записи хронологии, кроме последней (наибольший id) по каждому делу
+_DUPLICATE_CHRONOLOGY = (
+    "SELECT id FROM chronology WHERE id NOT IN ("
+    "SELECT MAX(id) FROM chronology GROUP BY case_number)"
 )
 
-DB_PATH = "sqlite:///kad_cases.db"
+
+def _add_column(table_name: str, column_name: str) -> None:
+    """
+    Добавляет в существующую таблицу столбец из модели.
+
+    Тип столбца компилируется диалектом текущей БД (DateTime — DATETIME в
+    SQLite и TIMESTAMP в PostgreSQL).
+
+    Args:
+        table_name: Имя таблицы
+        column_name: Имя столбца модели
+    """
+    column = Base.metadata.tables[table_name].c[column_name]
+    column_type = column.type.compile(dialect=engine.dialect)
+    logger.info("Добавление столбца %s в таблицу %s", column_name, table_name)
+    with engine.begin() as conn:
+        conn.execute(
+            text(
+                f"ALTER TABLE {table_name} ADD COLUMN {column_name} "
+                f"{column_type}"
+            )
+        )
+
+
+def _dedupe_chronology(conn, tables) -> int:
+    """
+    Удаляет дубли хронологии, сохраняя последнюю запись дела.
+
+    Ссылки на удаляемые записи из существующих таблиц
+    CHRONOLOGY_REFERENCES переводятся на сохраняемую запись того же дела.
+
+    Args:
+        conn: Соединение в открытой транзакции
+        tables: Имена существующих таблиц
+
+    Returns:
+        int: Количество удалённых записей
+    """
+    duplicates = conn.execute(
+        text(f"SELECT COUNT(*) FROM ({_DUPLICATE_CHRONOLOGY}) AS duplicates")
+    ).scalar()
+    if not duplicates:
+        return 0
+    logger.warning(
+        "Найдено дублей хронологии: %s; сохраняется последняя запись "
+        "каждого дела",
+        duplicates,
+    )
+    for table, column in CHRONOLOGY_REFERENCES:
+        if table not in tables:
+            continue
+        moved = conn.execute(
+            text(
+                f"UPDATE {table} SET {column} = ("
+                "SELECT MAX(kept.id) FROM chronology kept "
+                "JOIN chronology old ON old.case_number = kept.case_number "
+                f"WHERE old.id = {table}.{column}) "
+                f"WHERE {column} IN ({_DUPLICATE_CHRONOLOGY})"
+            )
+        ).rowcount
+        if moved:
+            logger.info(
+                "Ссылок %s.%s переведено на сохраняемые записи: %s",
+                table,
+                column,
+                moved,
+            )
+    return conn.execute(
+        text(f"DELETE FROM chronology WHERE id IN ({_DUPLICATE_CHRONOLOGY})")
+    ).rowcount
 
 
 def migrate_db() -> None:
     """
     Выполняет миграцию базы данных.
 
-    Добавляет столбец project_id в таблицу cases, если он отсутствует.
+    Добавляет столбцы cases.project_id, cases.scrape_* и
+    chronology.updated_at (с индексами), если они отсутствуют, заполняет
+    пустой chronology.updated_at временем миграции, удаляет
+    дубли хронологии (ссылки на них переводятся на сохраняемую запись) в
+    одной транзакции с созданием уникального индекса по
+    chronology.case_number и создаёт новые таблицы (например,
+    document_states, case_leases и notification_outbox) и полнотекстовый
+    индекс document_search. Новая таблица hearings заполняется из
+    хронологии.
     """
-    engine = create_engine(DB_PATH, connect_args={"check_same_thread": False})
     metadata = MetaData()
     metadata.reflect(bind=engine)
 
     cases_table = Table("cases", metadata, autoload_with=engine)
 
-    if "project_id" not in cases_table.c:
-        logging.info("Добавление столбца project_id в таблицу cases")
-        with engine.connect() as conn:
+    for column in (
+        "project_id",
+        "scrape_status",
+        "scrape_error",
+        "scrape_failed_at",
+    ):
+        if column not in cases_table.c:
+            _add_column("cases", column)
+
+    chronology_table = Table("chronology", metadata, autoload_with=engine)
+
+    if "updated_at" not in chronology_table.c:
+        _add_column("chronology", "updated_at")
+    with engine.begin() as conn:
+        # Записи старых версий без updated_at не попадают в диапазон
+        # отметки постановки документов в очередь (document_state): время
+        # миграции делает их новыми, и следующий запуск их просмотрит
+        backfilled = conn.execute(
+            text(
+                "UPDATE chronology SET updated_at = :now "
+                "WHERE updated_at IS NULL"
+            ),
+            {"now": datetime.now()},
+        ).rowcount
+        if backfilled:
+            logger.info(
+                "Заполнен updated_at у записей хронологии: %s", backfilled
+            )
+        conn.execute(
+            text(
+                "CREATE INDEX IF NOT EXISTS ix_chronology_case_updated "
+                "ON chronology (case_number, updated_at)"
+            )
+        )
+        conn.execute(
+            text(
+                "CREATE INDEX IF NOT EXISTS ix_chronology_updated_at "
+                "ON chronology (updated_at)"
+            )
+        )
+
+    if "hearings" in metadata.tables:
+        hearings_table = Table("hearings", metadata, autoload_with=engine)
+        if "remote_event_id" not in hearings_table.c:
+            _add_column("hearings", "remote_event_id")
+
+    chronology_indexes = {
+        index["name"]
+        for index in inspect(engine).get_indexes("chronology")
+    }
+    if "ux_chronology_case_number" not in chronology_indexes:
+        # Парсер хранит одно (последнее) событие на дело; старые версии
+        # могли оставить дубли. Удаление и индекс — одна транзакция: при
+        # ошибке база остаётся прежней
+        with engine.begin() as conn:
+            removed = _dedupe_chronology(conn, set(metadata.tables))
             conn.execute(
-                text("ALTER TABLE cases ADD COLUMN project_id INTEGER")
+                text(
+                    "CREATE UNIQUE INDEX ux_chronology_case_number "
+                    "ON chronology (case_number)"
+                )
             )
-            conn.commit()
-        logging.info("Столбец project_id успешно добавлен")
-    else:
-        logging.info("Столбец project_id уже существует")
+        logger.info(
+            "Создан уникальный индекс chronology.case_number, удалено "
+            "дублей: %s",
+            removed,
+        )
+
+    # Новые таблицы создаются без изменения существующих
+    Base.metadata.create_all(engine)
+    ensure_search_index(engine)
+    logger.info("Недостающие таблицы созданы")
+
+    if "hearings" not in metadata.tables:
+        # Заседания, найденные до появления таблицы, переносятся из
+        # хронологии
+        session = Session()
+        try:
+            backfill_hearings(session)
+        finally:
+            session.close()
 
 
 if __name__ == "__main__":
     """
     Точка входа для выполнения миграции базы данных.
     """
+    setup_logging()
     migrate_db()
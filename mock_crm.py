@@ -0,0 +1,372 @@
+"""
+Локальная замена API Aspro.Cloud для нагрузочных и регрессионных тестов.
+
+Реализует методы, которые использует бот: список проектов с постраничной
+выдачей и total, создание комментария, список и создание календарей,
+список, создание, изменение и удаление событий (задач). Данные хранятся в
+памяти; проекты генерируются синтетически (десятки тысяч за секунды).
+
+Задержка ответа, доля ошибок 500 и ответов 429 (с Retry-After) задаются
+параметрами, чтобы проверять поведение бота при медленной или
+перегруженной CRM. Бот направляется на сервер переменной ASPRO_API_URL.
+
+Пример:
+    python mock_crm.py --projects 10000 --latency 0.05 --rate-limit 0.02
+    ASPRO_API_URL=http://127.0.0.1:8099 python main.py crm
+"""
+
+import argparse
+import json
+import logging
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+logger = logging.getLogger(__name__)
+
+MOCK_CRM_HOST = "127.0.0.1"
+MOCK_CRM_PORT = 8099
+# Проектов на странице списка
+MOCK_CRM_PAGE_SIZE = 50
+
+
+def _route(path: str) -> str:
+    """Возвращает путь метода API без префикса /api/v1/module/."""
+    prefix = "/api/v1/module/"
+    return path[len(prefix):] if path.startswith(prefix) else path
+
+
+def generate_projects(
+    count: int,
+    archive_share: float = 0.1,
+    without_case_share: float = 0.05,
+    seed: int = 0,
+) -> List[Dict[str, Any]]:
+    """
+    Генерирует синтетические проекты CRM.
+
+    Args:
+        count: Количество проектов
+        archive_share: Доля архивных проектов
+        without_case_share: Доля проектов без номера дела в названии
+        seed: Начальное значение генератора (одинаковые данные между
+            запусками)
+
+    Returns:
+        List[Dict[str, Any]]: Проекты с полями id, name и is_archive
+    """
+    rng = random.Random(seed)
+    projects = []
+    for project_id in range(1, count + 1):
+        if rng.random() < without_case_share:
+            name = f"Консультация {project_id}"
+        else:
+            court = rng.choice(("А40", "А41", "А56", "А60"))
+            year = rng.choice((2023, 2024, 2025))
+            name = f"ООО «Клиент {project_id}» — {court}-{project_id}/{year}"
+        projects.append(
+            {
+                "id": project_id,
+                "name": name,
+                "is_archive": 1 if rng.random() < archive_share else 0,
+            }
+        )
+    return projects
+
+
+class MockCrm:
+    """
+    Состояние замены CRM и параметры имитации отказов.
+    """
+
+    def __init__(
+        self,
+        projects: List[Dict[str, Any]],
+        latency: float = 0.0,
+        error_rate: float = 0.0,
+        rate_limit: float = 0.0,
+        page_size: int = MOCK_CRM_PAGE_SIZE,
+        api_key: Optional[str] = None,
+        seed: int = 0,
+    ) -> None:
+        """
+        Args:
+            projects: Проекты (см. generate_projects)
+            latency: Средняя задержка ответа в секундах (±50%)
+            error_rate: Доля ответов 500
+            rate_limit: Доля ответов 429
+            page_size: Записей на странице списков
+            api_key: Требуемый api_key (None — любой)
+            seed: Начальное значение генератора отказов
+        """
+        self.projects = projects
+        self.project_ids = {project["id"] for project in projects}
+        self.latency = latency
+        self.error_rate = error_rate
+        self.rate_limit = rate_limit
+        self.page_size = page_size
+        self.api_key = api_key
+        self.calendars: List[Dict[str, Any]] = []
+        self.tasks: Dict[int, Dict[str, Any]] = {}
+        self.comments: Dict[int, int] = {}
+        self.requests: Dict[str, int] = {}
+        self._next_id = 1
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def _new_id(self) -> int:
+        """Выдаёт ID нового объекта."""
+        object_id = self._next_id
+        self._next_id += 1
+        return object_id
+
+    def _page(
+        self, items: List[Dict[str, Any]], query: Dict[str, str]
+    ) -> Dict[str, Any]:
+        """Возвращает страницу списка в формате API."""
+        page = max(int(query.get("page", "1") or 1), 1)
+        start = (page - 1) * self.page_size
+        return {
+            "response": {
+                "items": items[start: start + self.page_size],
+                "total": len(items),
+                "page": page,
+            }
+        }
+
+    def fault(self) -> Optional[int]:
+        """
+        Выбирает имитируемый отказ для очередного запроса.
+
+        Returns:
+            Optional[int]: 429, 500 или None
+        """
+        with self._lock:
+            roll = self._rng.random()
+        if roll < self.rate_limit:
+            return 429
+        if roll < self.rate_limit + self.error_rate:
+            return 500
+        return None
+
+    def delay(self) -> float:
+        """Возвращает задержку очередного ответа в секундах."""
+        if self.latency <= 0:
+            return 0.0
+        with self._lock:
+            return self.latency * self._rng.uniform(0.5, 1.5)
+
+    def handle(
+        self,
+        method: str,
+        path: str,
+        query: Dict[str, str],
+        form: Dict[str, str],
+    ) -> Tuple[int, Dict[str, Any]]:
+        """
+        Обрабатывает запрос к API.
+
+        Args:
+            method: GET или POST
+            path: Путь запроса
+            query: Параметры строки запроса
+            form: Поля тела запроса (application/x-www-form-urlencoded)
+
+        Returns:
+            Tuple[int, Dict[str, Any]]: HTTP статус и тело ответа
+        """
+        if self.api_key is not None and query.get("api_key") != self.api_key:
+            return 401, {"error": "invalid api_key"}
+        route = _route(path)
+        with self._lock:
+            if method == "GET" and route == "st/projects/list":
+                return 200, self._page(self.projects, query)
+
+            match = re.fullmatch(r"st/projects/(\d+)/comments/create", route)
+            if method == "POST" and match:
+                project_id = int(match.group(1))
+                if project_id not in self.project_ids:
+                    return 404, {"error": "project not found"}
+                self.comments[project_id] = (
+                    self.comments.get(project_id, 0) + 1
+                )
+                return 200, {"response": {"id": self._new_id()}}
+
+            if method == "GET" and route == "calendar/calendar/list":
+                return 200, self._page(self.calendars, query)
+            if method == "POST" and route == "calendar/calendar/create":
+                calendar = dict(form, id=self._new_id())
+                self.calendars.append(calendar)
+                return 200, {"response": {"id": calendar["id"]}}
+
+            if method == "GET" and route == "task/tasks/list":
+                calendar_id = query.get("filter[event_calendar_id]")
+                tasks = [
+                    task
+                    for task in self.tasks.values()
+                    if calendar_id is None
+                    or str(task.get("event_calendar_id")) == calendar_id
+                ]
+                return 200, self._page(tasks, query)
+            if method == "POST" and route == "task/tasks/create":
+                task = dict(form, id=self._new_id())
+                self.tasks[task["id"]] = task
+                return 200, {"response": {"id": task["id"]}}
+
+            match = re.fullmatch(r"task/tasks/(update|delete)/(\d+)", route)
+            if method == "POST" and match:
+                task_id = int(match.group(2))
+                if task_id not in self.tasks:
+                    return 404, {"error": "task not found"}
+                if match.group(1) == "delete":
+                    del self.tasks[task_id]
+                else:
+                    self.tasks[task_id].update(form)
+                return 200, {"response": {"id": task_id}}
+        return 404, {"error": f"unknown method {method} {path}"}
+
+    def count(self, path: str) -> None:
+        """Учитывает запрос в статистике по методам API."""
+        route = re.sub(r"/\d+", "/{id}", _route(path))
+        with self._lock:
+            self.requests[route] = self.requests.get(route, 0) + 1
+
+
+class _MockCrmHandler(BaseHTTPRequestHandler):
+    """Передаёт запросы HTTP в MockCrm сервера."""
+
+    def _dispatch(self, method: str) -> None:
+        crm: MockCrm = self.server.crm  # type: ignore[attr-defined]
+        parts = urlsplit(self.path)
+        query = {
+            key: values[-1] for key, values in parse_qs(parts.query).items()
+        }
+        form: Dict[str, str] = {}
+        length = int(self.headers.get("Content-Length") or 0)
+        if length:
+            body = self.rfile.read(length).decode("utf-8")
+            form = {
+                key: values[-1] for key, values in parse_qs(body).items()
+            }
+        crm.count(parts.path)
+        time.sleep(crm.delay())
+        fault = crm.fault()
+        if fault == 429:
+            self._reply(429, {"error": "rate limit"}, {"Retry-After": "1"})
+            return
+        if fault == 500:
+            self._reply(500, {"error": "internal error"})
+            return
+        status, payload = crm.handle(method, parts.path, query, form)
+        self._reply(status, payload)
+
+    def _reply(
+        self,
+        status: int,
+        payload: Dict[str, Any],
+        headers: Optional[Dict[str, str]] = None,
+    ) -> None:
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self) -> None:  # noqa: N802 - имя задано http.server
+        self._dispatch("GET")
+
+    def do_POST(self) -> None:  # noqa: N802 - имя задано http.server
+        self._dispatch("POST")
+
+    def log_message(self, format: str, *args: Any) -> None:
+        logger.debug("mock_crm: " + format, *args)
+
+
+def start_mock_crm(
+    crm: MockCrm, host: str = MOCK_CRM_HOST, port: int = 0
+) -> Tuple[ThreadingHTTPServer, str]:
+    """
+    Запускает сервер в фоновом потоке.
+
+    Args:
+        crm: Состояние замены CRM
+        host: Адрес
+        port: Порт (0 — любой свободный)
+
+    Returns:
+        Tuple[ThreadingHTTPServer, str]: Сервер (остановка —
+            server.shutdown()) и его адрес для ASPRO_API_URL
+    """
+    server = ThreadingHTTPServer((host, port), _MockCrmHandler)
+    server.daemon_threads = True
+    server.crm = crm  # type: ignore[attr-defined]
+    threading.Thread(
+        target=server.serve_forever, name="mock-crm", daemon=True
+    ).start()
+    url = f"http://{host}:{server.server_address[1]}"
+    logger.info("Замена CRM запущена: %s", url)
+    return server, url
+
+
+def main() -> int:
+    """
+    Запускает замену CRM до нажатия Ctrl+C.
+
+    Returns:
+        int: Код возврата процесса
+    """
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--host", default=MOCK_CRM_HOST)
+    parser.add_argument("--port", type=int, default=MOCK_CRM_PORT)
+    parser.add_argument("--projects", type=int, default=10000)
+    parser.add_argument(
+        "--archive-share", type=float, default=0.1, help="Доля архивных"
+    )
+    parser.add_argument(
+        "--latency", type=float, default=0.0, help="Задержка ответа, с"
+    )
+    parser.add_argument(
+        "--error-rate", type=float, default=0.0, help="Доля ответов 500"
+    )
+    parser.add_argument(
+        "--rate-limit", type=float, default=0.0, help="Доля ответов 429"
+    )
+    parser.add_argument("--page-size", type=int, default=MOCK_CRM_PAGE_SIZE)
+    parser.add_argument(
+        "--api-key",
+        default=None,
+        help="Требуемый api_key (по умолчанию любой)",
+    )
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    crm = MockCrm(
+        generate_projects(args.projects, args.archive_share),
+        latency=args.latency,
+        error_rate=args.error_rate,
+        rate_limit=args.rate_limit,
+        page_size=args.page_size,
+        api_key=args.api_key,
+    )
+    server, url = start_mock_crm(crm, args.host, args.port)
+    print(f"Замена CRM: {url} (проектов: {args.projects}). Остановка — Ctrl+C")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.shutdown()
+    print(json.dumps(crm.requests, ensure_ascii=False, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
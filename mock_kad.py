@@ -0,0 +1,525 @@
+"""
+Локальный сервер записанных карточек дел kad.arbitr.ru для бенчмарка и
+регрессионных тестов парсера.
+
+Отдаёт карточки дел (/Card?number=...) и разметку вкладки «Судебные акты»
+(/CardActs?number=...), которая подгружается по клику на вкладку, как на
+сайте. Карточки берутся из корпуса записанных страниц или генерируются
+синтетически (одинаково при каждом запуске). Парсер направляется на
+сервер переменной KAD_BASE_URL.
+
+Корпус — папка с HTML файлами; имя файла — номер дела, в котором «/»
+заменён на «_» (как у error_*.html, которые сохраняет парсер):
+    fixtures/kad/А40-12345_2024.html       — карточка дела
+    fixtures/kad/А40-12345_2024.acts.html  — вкладка «Судебные акты»
+                                             (необязательно)
+Скрипты записанных страниц удаляются, чтобы страница не обращалась к
+настоящему сайту. Если файла вкладки нет, хронология должна быть в самой
+карточке (страница сохранена после раскрытия хронологии).
+
+Имитируются страница блокировки, ограничение подписки, медленные ответы и
+отсутствующие элементы разметки. Отказ выбирается по номеру дела и seed,
+поэтому при повторном запуске те же дела получают те же отказы.
+
+Пример:
+    python mock_kad.py --synthetic --block-rate 0.02 --missing-rate 0.05
+    KAD_BASE_URL=http://127.0.0.1:8098 python main.py parse
+"""
+
+import argparse
+import hashlib
+import html
+import json
+import logging
+import os
+import random
+import re
+import threading
+import time
+from datetime import date, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+from kad_selectors import DEFAULT_SELECTORS
+
+logger = logging.getLogger(__name__)
+
+MOCK_KAD_HOST = "127.0.0.1"
+MOCK_KAD_PORT = 8098
+
+# Элементы, которые можно убрать из разметки (имена из kad_selectors;
+# hearing_text — XPath и убирается вместе с блоком заседания)
+MISSABLE_ELEMENTS = [
+    name for name in DEFAULT_SELECTORS if name != "hearing_text"
+]
+
+BLOCK_PAGE = (
+    "<!DOCTYPE html><html lang=\"ru\"><head><meta charset=\"utf-8\">"
+    "<title>Картотека арбитражных дел</title></head><body>"
+    "<h1>Доступ к сервису ограничен</h1>"
+    "<p>С вашего IP-адреса поступает слишком много запросов.</p>"
+    "</body></html>"
+)
+SUBSCRIPTION_PAGE = (
+    "<!DOCTYPE html><html lang=\"ru\"><head><meta charset=\"utf-8\">"
+    "<title>Картотека арбитражных дел</title></head><body>"
+    "<div class=\"b-subscription\">Вы можете оформить подписку на 40 дел"
+    "</div></body></html>"
+)
+NOT_FOUND_PAGE = (
+    "<!DOCTYPE html><html lang=\"ru\"><head><meta charset=\"utf-8\">"
+    "<title>Картотека арбитражных дел</title></head><body>"
+    "<h1>Дело не найдено</h1></body></html>"
+)
+MAIN_PAGE = (
+    "<!DOCTYPE html><html lang=\"ru\"><head><meta charset=\"utf-8\">"
+    "<title>Картотека арбитражных дел</title></head><body>"
+    "<h1>Картотека арбитражных дел (локальный сервер)</h1></body></html>"
+)
+
+# Подгрузка вкладки «Судебные акты» по клику и удаление «отсутствующих»
+# элементов (в том числе в подгруженной вкладке)
+LOADER_SCRIPT = """
+<script>
+(function () {
+    var number = %(number)s, missing = %(missing)s, loaded = false;
+    function strip() {
+        missing.forEach(function (sel) {
+            document.querySelectorAll(sel).forEach(function (el) {
+                el.remove();
+            });
+        });
+    }
+    document.addEventListener('click', function (event) {
+        var tab = event.target.closest('.js-tab');
+        if (!%(lazy)s || loaded || !tab ||
+                tab.textContent.indexOf('Судебные акты') < 0) {
+            return;
+        }
+        loaded = true;
+        fetch('/CardActs?number=' + encodeURIComponent(number))
+            .then(function (response) { return response.text(); })
+            .then(function (markup) {
+                var box = document.getElementById('kad-acts');
+                if (!box) {
+                    box = document.createElement('div');
+                    box.id = 'kad-acts';
+                    document.body.appendChild(box);
+                }
+                box.innerHTML = markup;
+                strip();
+            });
+    });
+    document.addEventListener('DOMContentLoaded', strip);
+})();
+</script>
+"""
+
+_SCRIPT_RE = re.compile(r"<script\b.*?</script\s*>", re.I | re.S)
+
+# Названия событий и судьи синтетических карточек
+_EVENT_TITLES = (
+    "Определение о принятии искового заявления к производству",
+    "Определение об отложении судебного разбирательства",
+    "Определение о назначении дела к судебному разбирательству",
+    "Решение",
+    "Постановление апелляционной инстанции",
+)
+_JUDGES = ("Иванов И. И.", "Петрова А. С.", "Сидоров П. В.")
+
+
+def load_corpus(corpus_dir: str) -> Dict[str, Dict[str, Optional[str]]]:
+    """
+    Загружает записанные карточки дел.
+
+    Args:
+        corpus_dir: Папка корпуса
+
+    Returns:
+        Dict[str, Dict[str, Optional[str]]]: Номер дела -> разметка
+            карточки (card) и вкладки «Судебные акты» (acts или None)
+    """
+    corpus: Dict[str, Dict[str, Optional[str]]] = {}
+    for name in sorted(os.listdir(corpus_dir)):
+        if not name.endswith(".html") or name.endswith(".acts.html"):
+            continue
+        stem = name[: -len(".html")]
+        with open(
+            os.path.join(corpus_dir, name), "r", encoding="utf-8"
+        ) as f:
+            card = _SCRIPT_RE.sub("", f.read())
+        acts_path = os.path.join(corpus_dir, stem + ".acts.html")
+        if stem.startswith("error_"):
+            stem = stem[len("error_"):]
+        acts = None
+        if os.path.exists(acts_path):
+            with open(acts_path, "r", encoding="utf-8") as f:
+                acts = _SCRIPT_RE.sub("", f.read())
+        corpus[stem.replace("_", "/")] = {"card": card, "acts": acts}
+    logger.info("Загружено карточек дел: %s из %s", len(corpus), corpus_dir)
+    return corpus
+
+
+def synthetic_case(
+    case_number: str, base_url: str = "", seed: int = 0
+) -> Dict[str, Optional[str]]:
+    """
+    Генерирует карточку дела в разметке kad.arbitr.ru.
+
+    Содержимое определяется номером дела и seed: одно дело всегда выглядит
+    одинаково.
+
+    Args:
+        case_number: Номер дела
+        base_url: Адрес сервера для ссылок на документы
+        seed: Начальное значение генератора
+
+    Returns:
+        Dict[str, Optional[str]]: Разметка карточки (card) и вкладки
+            «Судебные акты» (acts)
+    """
+    rng = random.Random(f"{seed}:{case_number}")
+    number = html.escape(case_number)
+    hearing = ""
+    if rng.random() < 0.6:
+        day = date.today() + timedelta(days=rng.randint(1, 90))
+        hearing = (
+            "<div class=\"b-instanceAdditional\">"
+            "<i class=\"b-icons16 redCalendar\"></i>"
+            f"Следующее заседание: {day:%d.%m.%Y}, "
+            f"{rng.randint(9, 17):02d}:{rng.choice((0, 15, 30, 45)):02d}, "
+            f"к.{rng.randint(1000, 9999)}</div>"
+        )
+    card = (
+        "<!DOCTYPE html><html lang=\"ru\"><head><meta charset=\"utf-8\">"
+        f"<title>Дело {number}</title></head><body>"
+        f"<h1 class=\"b-case-header\">{number}</h1>"
+        f"{hearing}"
+        "<ul class=\"b-tabs\">"
+        "<li class=\"b-tab js-tab\">Карточка дела</li>"
+        "<li class=\"b-tab js-tab\">Электронное дело</li>"
+        "<li class=\"b-tab js-tab\">Судебные акты</li>"
+        "</ul><div id=\"kad-acts\"></div></body></html>"
+    )
+
+    items = []
+    day = date.today() - timedelta(days=rng.randint(0, 30))
+    for index in range(rng.randint(1, 40)):
+        document_id = hashlib.md5(
+            f"{case_number}:{index}".encode("utf-8")
+        ).hexdigest()
+        items.append(
+            "<div class=\"b-chrono-item js-chrono-item\">"
+            f"<p class=\"case-date\">{day:%d.%m.%Y}</p>"
+            f"<p class=\"case-type\">{rng.choice(_EVENT_TITLES)}</p>"
+            f"<p class=\"case-subject\">{rng.choice(_JUDGES)}</p>"
+            "<span class=\"b-case-publish_info\">Дата публикации: "
+            f"{day + timedelta(days=1):%d.%m.%Y}</span>"
+            "<a class=\"js-case-result-text--doc_link\" "
+            f"href=\"{base_url}/Document/Pdf/{document_id}\">Документ</a>"
+            "</div>"
+        )
+        day -= timedelta(days=rng.randint(1, 20))
+    acts = (
+        "<div class=\"b-collapse js-collapse\">Развернуть хронологию</div>"
+        f"<div class=\"b-chrono-items\">{''.join(items)}</div>"
+    )
+    return {"card": card, "acts": acts}
+
+
+class MockKad:
+    """
+    Карточки дел и параметры имитации отказов.
+    """
+
+    def __init__(
+        self,
+        corpus: Optional[Dict[str, Dict[str, Optional[str]]]] = None,
+        synthetic: bool = False,
+        latency: float = 0.0,
+        slow_rate: float = 0.0,
+        slow_seconds: float = 10.0,
+        block_rate: float = 0.0,
+        subscription_rate: float = 0.0,
+        missing_rate: float = 0.0,
+        missing: Optional[List[str]] = None,
+        seed: int = 0,
+    ) -> None:
+        """
+        Args:
+            corpus: Записанные карточки (см. load_corpus)
+            synthetic: Генерировать карточки дел, которых нет в корпусе
+            latency: Средняя задержка ответа в секундах (±50%)
+            slow_rate: Доля дел с медленным ответом
+            slow_seconds: Дополнительная задержка медленного ответа
+            block_rate: Доля дел, на которых отдаётся страница блокировки
+            subscription_rate: Доля дел с ограничением подписки
+            missing_rate: Доля дел без части элементов разметки
+            missing: Какие элементы убирать (имена из MISSABLE_ELEMENTS;
+                по умолчанию кнопка раскрытия хронологии)
+            seed: Начальное значение выбора отказов и синтетических карточек
+        """
+        self.corpus = corpus or {}
+        self.synthetic = synthetic
+        self.latency = latency
+        self.slow_rate = slow_rate
+        self.slow_seconds = slow_seconds
+        self.block_rate = block_rate
+        self.subscription_rate = subscription_rate
+        self.missing_rate = missing_rate
+        self.missing = missing or ["collapse"]
+        unknown = set(self.missing) - set(MISSABLE_ELEMENTS)
+        if unknown:
+            raise ValueError(f"Неизвестные элементы: {sorted(unknown)}")
+        self.seed = seed
+        self.base_url = ""
+        self.requests: Dict[str, int] = {}
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def _roll(self, case_number: str, kind: str) -> float:
+        """Детерминированное число 0-1 для дела и вида отказа."""
+        digest = hashlib.sha256(
+            f"{self.seed}:{kind}:{case_number}".encode("utf-8")
+        ).digest()
+        return int.from_bytes(digest[:8], "big") / 2 ** 64
+
+    def fault(self, case_number: str) -> Optional[str]:
+        """
+        Возвращает отказ, который имитируется для дела.
+
+        Returns:
+            Optional[str]: "blocked", "subscription", "missing" или None
+        """
+        roll = self._roll(case_number, "fault")
+        for kind, share in (
+            ("blocked", self.block_rate),
+            ("subscription", self.subscription_rate),
+            ("missing", self.missing_rate),
+        ):
+            if roll < share:
+                return kind
+            roll -= share
+        return None
+
+    def delay(self, case_number: Optional[str] = None) -> float:
+        """Возвращает задержку ответа в секундах."""
+        seconds = 0.0
+        if self.latency > 0:
+            with self._lock:
+                seconds = self.latency * self._rng.uniform(0.5, 1.5)
+        if case_number and self._roll(case_number, "slow") < self.slow_rate:
+            seconds += self.slow_seconds
+        return seconds
+
+    def case(self, case_number: str) -> Optional[Dict[str, Optional[str]]]:
+        """Возвращает разметку дела из корпуса или синтетическую."""
+        if case_number in self.corpus:
+            return self.corpus[case_number]
+        if self.synthetic:
+            return synthetic_case(case_number, self.base_url, self.seed)
+        return None
+
+    def card(self, case_number: str) -> str:
+        """
+        Возвращает страницу карточки дела с учётом имитируемого отказа.
+
+        Args:
+            case_number: Номер дела
+
+        Returns:
+            str: HTML страницы
+        """
+        fault = self.fault(case_number)
+        if fault == "blocked":
+            return BLOCK_PAGE
+        if fault == "subscription":
+            return SUBSCRIPTION_PAGE
+        case = self.case(case_number)
+        if case is None:
+            return NOT_FOUND_PAGE
+        missing = []
+        if fault == "missing":
+            missing = [DEFAULT_SELECTORS[name] for name in self.missing]
+        script = LOADER_SCRIPT % {
+            "number": json.dumps(case_number),
+            "missing": json.dumps(missing),
+            "lazy": "true" if case["acts"] is not None else "false",
+        }
+        card = case["card"] or ""
+        position = card.lower().rfind("</body>")
+        if position < 0:
+            return card + script
+        return card[:position] + script + card[position:]
+
+    def acts(self, case_number: str) -> Optional[str]:
+        """Возвращает разметку вкладки «Судебные акты» или None."""
+        case = self.case(case_number)
+        return case["acts"] if case else None
+
+    def count(self, route: str) -> None:
+        """Учитывает запрос в статистике по страницам."""
+        with self._lock:
+            self.requests[route] = self.requests.get(route, 0) + 1
+
+
+class _MockKadHandler(BaseHTTPRequestHandler):
+    """Отдаёт страницы MockKad сервера."""
+
+    def do_GET(self) -> None:  # noqa: N802 - имя задано http.server
+        kad: MockKad = self.server.kad  # type: ignore[attr-defined]
+        parts = urlsplit(self.path)
+        number = (parse_qs(parts.query).get("number") or [""])[-1]
+        kad.count(parts.path)
+        if parts.path == "/":
+            time.sleep(kad.delay())
+            self._reply(200, MAIN_PAGE)
+        elif parts.path == "/Card":
+            time.sleep(kad.delay(number))
+            self._reply(200, kad.card(number))
+        elif parts.path == "/CardActs":
+            time.sleep(kad.delay())
+            acts = kad.acts(number)
+            if acts is None:
+                self._reply(404, "")
+            else:
+                self._reply(200, acts)
+        else:
+            self._reply(404, "")
+
+    def _reply(self, status: int, body: str) -> None:
+        data = body.encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format: str, *args: Any) -> None:
+        logger.debug("mock_kad: " + format, *args)
+
+
+def start_mock_kad(
+    kad: MockKad, host: str = MOCK_KAD_HOST, port: int = 0
+) -> Tuple[ThreadingHTTPServer, str]:
+    """
+    Запускает сервер в фоновом потоке.
+
+    Args:
+        kad: Карточки дел и параметры отказов
+        host: Адрес
+        port: Порт (0 — любой свободный)
+
+    Returns:
+        Tuple[ThreadingHTTPServer, str]: Сервер (остановка —
+            server.shutdown()) и его адрес для KAD_BASE_URL
+    """
+    server = ThreadingHTTPServer((host, port), _MockKadHandler)
+    server.daemon_threads = True
+    server.kad = kad  # type: ignore[attr-defined]
+    url = f"http://{host}:{server.server_address[1]}"
+    kad.base_url = url
+    threading.Thread(
+        target=server.serve_forever, name="mock-kad", daemon=True
+    ).start()
+    logger.info("Сервер карточек дел запущен: %s", url)
+    return server, url
+
+
+def add_fault_arguments(parser: argparse.ArgumentParser) -> None:
+    """Добавляет параметры корпуса и имитации отказов в CLI."""
+    parser.add_argument("--corpus", help="Папка записанных карточек дел")
+    parser.add_argument(
+        "--latency", type=float, default=0.0, help="Задержка ответа, с"
+    )
+    parser.add_argument(
+        "--slow-rate", type=float, default=0.0, help="Доля медленных дел"
+    )
+    parser.add_argument(
+        "--slow-seconds",
+        type=float,
+        default=10.0,
+        help="Задержка медленного ответа, с",
+    )
+    parser.add_argument(
+        "--block-rate", type=float, default=0.0, help="Доля страниц блокировки"
+    )
+    parser.add_argument(
+        "--subscription-rate",
+        type=float,
+        default=0.0,
+        help="Доля дел с ограничением подписки",
+    )
+    parser.add_argument(
+        "--missing-rate",
+        type=float,
+        default=0.0,
+        help="Доля дел без части элементов разметки",
+    )
+    parser.add_argument(
+        "--missing",
+        nargs="+",
+        choices=MISSABLE_ELEMENTS,
+        default=["collapse"],
+        help="Какие элементы убирать",
+    )
+    parser.add_argument("--seed", type=int, default=0)
+
+
+def mock_kad_from_args(args: argparse.Namespace, synthetic: bool) -> MockKad:
+    """Создаёт MockKad по параметрам add_fault_arguments."""
+    return MockKad(
+        load_corpus(args.corpus) if args.corpus else None,
+        synthetic=synthetic,
+        latency=args.latency,
+        slow_rate=args.slow_rate,
+        slow_seconds=args.slow_seconds,
+        block_rate=args.block_rate,
+        subscription_rate=args.subscription_rate,
+        missing_rate=args.missing_rate,
+        missing=args.missing,
+        seed=args.seed,
+    )
+
+
+def main() -> int:
+    """
+    Запускает сервер карточек дел до нажатия Ctrl+C.
+
+    Returns:
+        int: Код возврата процесса
+    """
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--host", default=MOCK_KAD_HOST)
+    parser.add_argument("--port", type=int, default=MOCK_KAD_PORT)
+    parser.add_argument(
+        "--synthetic",
+        action="store_true",
+        help="Генерировать карточки дел, которых нет в корпусе",
+    )
+    add_fault_arguments(parser)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    if not args.corpus and not args.synthetic:
+        parser.error("укажите --corpus и/или --synthetic")
+
+    kad = mock_kad_from_args(args, args.synthetic)
+    server, url = start_mock_kad(kad, args.host, args.port)
+    print(
+        f"Сервер карточек дел: {url} (записанных дел: {len(kad.corpus)}). "
+        "Остановка — Ctrl+C"
+    )
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.shutdown()
+    print(json.dumps(kad.requests, ensure_ascii=False, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
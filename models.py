@@ -3,7 +3,16 @@
 Определяет структуру таблиц для дел и хронологии событий.
 """
 
-from sqlalchemy import Column, Integer, String  # type: ignore
+from sqlalchemy import (  # type: ignore
+    Column,
+    DateTime,
+    Float,
+    Index,
+    Integer,
+    String,
+    Text,
+    UniqueConstraint,
+)
 from sqlalchemy.ext.declarative import declarative_base  # type: ignore
 
 Base = declarative_base()
@@ -13,13 +22,18 @@ class Cases(Base):
     """
     Модель для хранения информации о делах.
 
-    Связывает номера дел с ID проектов в CRM системе.
+    Связывает номера дел с ID проектов в CRM системе. scrape_status
+    "permanent" означает, что карточка дела недоступна (например, из-за
+    ограничения подписки) и парсер её пропускает.
     """
 
     __tablename__ = "cases"
     id = Column(Integer, primary_key=True)
     case_number = Column(String, unique=True, nullable=False)
     project_id = Column(Integer, unique=True, index=True)
+    scrape_status = Column(String)
+    scrape_error = Column(Text)
+    scrape_failed_at = Column(DateTime)
 
 
 class Chronology(Base):
@@ -27,6 +41,8 @@ class Chronology(Base):
     Модель для хранения хронологии событий по делам.
 
     Содержит информацию о событиях, датах, авторах и ссылках на документы.
+    Одна запись на дело — последнее событие; уникальный индекс по
+    case_number позволяет записывать события через INSERT ... ON CONFLICT.
     """
 
     __tablename__ = "chronology"
@@ -44,3 +60,206 @@ class Chronology(Base):
     hearing_room = Column(String)  # Номер кабинета/зала
     # Когда было создано событие в календаре
     hearing_created_at = Column(String)
+    # Когда запись последний раз добавлена или обновлена парсером
+    updated_at = Column(DateTime)
+
+    __table_args__ = (
+        Index("ix_chronology_case_updated", "case_number", "updated_at"),
+        Index("ix_chronology_updated_at", "updated_at"),
+        Index("ux_chronology_case_number", "case_number", unique=True),
+    )
+
+
+class DocumentState(Base):
+    """
+    Модель для хранения состояния скачивания документов.
+
+    Одна запись на ссылку документа: статус обработки (pending, downloading,
+    downloaded, ocr_done, failed), число попыток, последняя ошибка, размер
+    файла и длительности этапов. Заменяет файл download_progress.json.
+    """
+
+    __tablename__ = "document_states"
+    id = Column(Integer, primary_key=True)
+    chronology_id = Column(Integer, index=True)
+    case_number = Column(String, nullable=False)
+    doc_link = Column(String, unique=True, nullable=False)
+    event_title = Column(String)
+    event_date = Column(String)
+    status = Column(String, nullable=False, default="pending")
+    attempts = Column(Integer, nullable=False, default=0)
+    last_error = Column(String)
+    file_path = Column(String)
+    bytes = Column(Integer)
+    download_seconds = Column(Float)
+    ocr_seconds = Column(Float)
+    # Кто и когда взял документ в работу
+    worker_id = Column(String)
+    claimed_at = Column(DateTime)
+    updated_at = Column(DateTime)
+
+    __table_args__ = (
+        Index("ix_document_states_status_id", "status", "id"),
+    )
+
+
+class Hearing(Base):
+    """
+    Модель судебного заседания.
+
+    Нормализованная копия сведений о заседании из хронологии: время
+    хранится как datetime с индексом, поэтому расписание на период читается
+    одним запросом по индексу без разбора строк DD.MM.YYYY.
+    """
+
+    __tablename__ = "hearings"
+    id = Column(Integer, primary_key=True)
+    case_number = Column(String, nullable=False)
+    chronology_id = Column(Integer)
+    starts_at = Column(DateTime, nullable=False)
+    room = Column(String)
+    # Событие хронологии, в котором назначено заседание
+    title = Column(String)
+    updated_at = Column(DateTime)
+    # ID события в календаре CRM (заполняется сверкой календаря)
+    remote_event_id = Column(Integer)
+
+    __table_args__ = (
+        UniqueConstraint(
+            "case_number", "starts_at", name="uq_hearings_case_start"
+        ),
+        Index("ix_hearings_starts_at", "starts_at"),
+    )
+
+
+class CaseLease(Base):
+    """
+    Модель аренды дела обработчиком парсинга.
+
+    worker_id и lease_expires_at задают текущего владельца дела; после
+    обработки дело освобождается, а next_due_at назначает следующий обход.
+    Позволяет нескольким процессам и машинам делить список дел.
+    """
+
+    __tablename__ = "case_leases"
+    case_number = Column(String, primary_key=True)
+    worker_id = Column(String)
+    claimed_at = Column(DateTime)
+    lease_expires_at = Column(DateTime)
+    released_at = Column(DateTime)
+    next_due_at = Column(DateTime)
+
+    __table_args__ = (Index("ix_case_leases_next_due", "next_due_at"),)
+
+
+class NotificationOutbox(Base):
+    """
+    Модель очереди уведомлений CRM.
+
+    Обновление дела записывается в очередь вместо немедленной отправки;
+    записи одного проекта уходят одним комментарием после окна
+    накопления. claim_token и claimed_at — захват записей отправителем,
+    sent_at — время успешной отправки.
+    """
+
+    __tablename__ = "notification_outbox"
+    id = Column(Integer, primary_key=True)
+    project_id = Column(Integer, nullable=False)
+    case_number = Column(String, nullable=False)
+    chronology_id = Column(Integer)
+    event_title = Column(String)
+    event_date = Column(String)
+    doc_link = Column(String)
+    created_at = Column(DateTime, nullable=False)
+    claim_token = Column(String)
+    claimed_at = Column(DateTime)
+    attempts = Column(Integer, default=0, nullable=False)
+    sent_at = Column(DateTime)
+
+    __table_args__ = (
+        Index("ix_notification_outbox_pending", "sent_at", "project_id"),
+    )
+
+
+class CrmWrite(Base):
+    """
+    Модель журнала записей в CRM.
+
+    Каждая неидемпотентная запись в CRM (комментарий, создание события)
+    получает детерминированный ключ. Запись «pending» делается до запроса,
+    «done» с ID созданного объекта — сразу после успешного ответа, поэтому
+    повтор и возобновление не отправляют ту же запись второй раз.
+    """
+
+    __tablename__ = "crm_writes"
+    id = Column(Integer, primary_key=True)
+    idempotency_key = Column(String, nullable=False, unique=True)
+    operation = Column(String, nullable=False)
+    project_id = Column(Integer)
+    status = Column(String, nullable=False)
+    remote_id = Column(Integer)
+    attempts = Column(Integer, default=1, nullable=False)
+    started_at = Column(DateTime, nullable=False)
+    completed_at = Column(DateTime)
+
+
+class CrmMetadata(Base):
+    """
+    Модель кеша справочных данных CRM.
+
+    Значения (например, ID календаря заседаний) хранятся в JSON со сроком
+    годности, поэтому новые процессы и обработчики читают их из БД, а не
+    запрашивают списки CRM при каждом запуске.
+    """
+
+    __tablename__ = "crm_metadata"
+    key = Column(String, primary_key=True)
+    value = Column(Text, nullable=False)
+    fetched_at = Column(DateTime, nullable=False)
+    expires_at = Column(DateTime, nullable=False)
+
+
+class DocumentWatermark(Base):
+    """
+    Модель для хранения отметки обнаружения документов.
+
+    Хранит наибольший updated_at записей хронологии, документы которых уже
+    поставлены в очередь, чтобы следующий запуск выбирал по индексу
+    chronology.updated_at только новые записи.
+    """
+
+    __tablename__ = "document_watermarks"
+    name = Column(String, primary_key=True)
+    last_updated_at = Column(DateTime, nullable=False)
+
+
+class OcrPageCache(Base):
+    """
+    Модель для кеша результатов OCR.
+
+    Ключ — хеш содержимого файла, номер страницы и параметры распознавания
+    (dpi, язык, конфигурация Tesseract). Хранит текст и уверенность.
+    """
+
+    __tablename__ = "ocr_page_cache"
+    id = Column(Integer, primary_key=True)
+    content_hash = Column(String, nullable=False)
+    page_number = Column(Integer, nullable=False)
+    dpi = Column(Integer, nullable=False)
+    lang = Column(String, nullable=False)
+    config = Column(String, nullable=False)
+    text = Column(Text)
+    confidence = Column(Float)
+    seconds = Column(Float)
+    created_at = Column(DateTime)
+
+    __table_args__ = (
+        UniqueConstraint(
+            "content_hash",
+            "page_number",
+            "dpi",
+            "lang",
+            "config",
+            name="ux_ocr_page_cache_key",
+        ),
+    )
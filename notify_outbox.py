@@ -0,0 +1,306 @@
+"""
+Модуль очереди уведомлений CRM с окном накопления.
+
+Обновление дела не отправляется комментарием сразу, а записывается в
+таблицу notification_outbox. Когда самой старой записи проекта исполняется
+NOTIFY_COALESCE_SECONDS, все записи проекта уходят одним комментарием.
+Если по делу за день пришло несколько актов или обход после перерыва нашёл
+много изменений, пользователь получает одно уведомление на проект, а CRM —
+один запрос вместо десятков. В конце обхода очередь отправляется целиком,
+не дожидаясь окна.
+
+Записи захватываются условным UPDATE с токеном отправителя, поэтому
+несколько обработчиков парсинга не отправят одно уведомление дважды.
+Захват упавшего отправителя истекает через NOTIFY_CLAIM_SECONDS. Каждое
+обновление отмечается в журнале crm_writes сразу после отправки, поэтому
+после сбоя между отправкой и отметкой sent_at оно не уйдёт повторно.
+
+Пример:
+    python main.py notify-flush
+"""
+
+import logging
+import os
+import uuid
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import func, or_, update  # type: ignore
+
+from crm_notify import send_case_digest_comment
+from crm_writes import (
+    abandon_write,
+    begin_write,
+    comment_key,
+    complete_write,
+    completed_writes,
+)
+from models import NotificationOutbox
+
+logger = logging.getLogger(__name__)
+
+# Окно накопления уведомлений проекта в секундах (0 — отправлять сразу)
+NOTIFY_COALESCE_SECONDS = int(os.getenv("NOTIFY_COALESCE_SECONDS", "600"))
+# Через сколько секунд захват записей упавшим отправителем истекает; после
+# ошибки отправки повтор также откладывается на этот срок
+NOTIFY_CLAIM_SECONDS = int(os.getenv("NOTIFY_CLAIM_SECONDS", "300"))
+# После стольких неудачных отправок запись больше не отправляется
+NOTIFY_MAX_ATTEMPTS = int(os.getenv("NOTIFY_MAX_ATTEMPTS", "5"))
+
+
+def enqueue_notification(
+    session,
+    project_id: int,
+    case_number: str,
+    event_data: Dict[str, Any],
+    chronology_id: Optional[int] = None,
+) -> NotificationOutbox:
+    """
+    Записывает обновление дела в очередь уведомлений.
+
+    Args:
+        session: Сессия базы данных
+        project_id: ID проекта в CRM
+        case_number: Номер дела
+        event_data: Данные события (event_title, event_date, doc_link)
+        chronology_id: ID записи хронологии
+
+    Returns:
+        NotificationOutbox: Запись очереди
+    """
+    item = NotificationOutbox(
+        project_id=project_id,
+        case_number=case_number,
+        chronology_id=chronology_id,
+        event_title=event_data.get("event_title"),
+        event_date=event_data.get("event_date"),
+        doc_link=event_data.get("doc_link"),
+        created_at=datetime.now(),
+        attempts=0,
+    )
+    session.add(item)
+    session.commit()
+    return item
+
+
+def _pending_filter(now: datetime):
+    """Условие записей, которые можно захватить для отправки."""
+    return (
+        NotificationOutbox.sent_at.is_(None),
+        NotificationOutbox.attempts < NOTIFY_MAX_ATTEMPTS,
+        or_(
+            NotificationOutbox.claimed_at.is_(None),
+            NotificationOutbox.claimed_at
+            < now - timedelta(seconds=NOTIFY_CLAIM_SECONDS),
+        ),
+    )
+
+
+def _due_projects(session, now: datetime, force: bool) -> List[int]:
+    """Возвращает проекты, окно накопления которых истекло."""
+    query = session.query(NotificationOutbox.project_id).filter(
+        *_pending_filter(now)
+    )
+    query = query.group_by(NotificationOutbox.project_id)
+    if not force:
+        cutoff = now - timedelta(seconds=NOTIFY_COALESCE_SECONDS)
+        query = query.having(func.min(NotificationOutbox.created_at) <= cutoff)
+    return [project_id for (project_id,) in query]
+
+
+def _claim_project(
+    session, project_id: int, now: datetime
+) -> List[NotificationOutbox]:
+    """
+    Захватывает ожидающие записи проекта.
+
+    Returns:
+        List[NotificationOutbox]: Захваченные записи в порядке добавления;
+            пусто, если их уже захватил другой отправитель
+    """
+    token = uuid.uuid4().hex
+    session.execute(
+        update(NotificationOutbox)
+        .where(
+            NotificationOutbox.project_id == project_id,
+            *_pending_filter(now),
+        )
+        .values(claim_token=token, claimed_at=now)
+        .execution_options(synchronize_session=False)
+    )
+    session.commit()
+    return (
+        session.query(NotificationOutbox)
+        .filter_by(claim_token=token)
+        .order_by(NotificationOutbox.id)
+        .all()
+    )
+
+
+def _item_key(item: NotificationOutbox) -> str:
+    """Ключ журнала crm_writes для обновления из очереди."""
+    return comment_key(
+        item.project_id,
+        item.case_number,
+        item.event_date,
+        item.event_title,
+        item.doc_link,
+    )
+
+
+def _send_project(
+    session, project_id: int, items: List[NotificationOutbox]
+) -> Optional[bool]:
+    """
+    Отправляет захваченные обновления проекта одним комментарием.
+
+    Обновления, уже отправленные по журналу crm_writes (например, до сбоя
+    процесса), в комментарий не попадают; повторы одного события в очереди
+    объединяются. Записи очереди отмечаются отправленными, только когда их
+    ключ выполнен; записи, ключ которых сейчас отправляет другой
+    обработчик, остаются захваченными и проверяются снова после истечения
+    захвата.
+
+    Returns:
+        Optional[bool]: True — комментарий отправлен, False — ошибка
+            отправки, None — отправлять было нечего
+    """
+    keys = {item.id: _item_key(item) for item in items}
+    done = set(completed_writes(session, keys.values()))
+    updates: Dict[str, Dict[str, Any]] = {}
+    for item in items:
+        key = keys[item.id]
+        if key in done or key in updates:
+            continue
+        updates[key] = {
+            "case_number": item.case_number,
+            "event_title": item.event_title,
+            "event_date": item.event_date,
+            "doc_link": item.doc_link,
+        }
+    reserved = [
+        key
+        for key in updates
+        if begin_write(session, key, "comment", project_id)
+    ]
+    sent = None
+    if reserved:
+        sent = bool(
+            send_case_digest_comment(
+                project_id, [updates[key] for key in reserved]
+            )
+        )
+        for key in reserved:
+            if sent:
+                complete_write(session, key)
+            else:
+                abandon_write(session, key)
+        if sent:
+            done.update(reserved)
+
+    delivered = [item.id for item in items if keys[item.id] in done]
+    if delivered:
+        session.execute(
+            update(NotificationOutbox)
+            .where(NotificationOutbox.id.in_(delivered))
+            .values(sent_at=datetime.now())
+            .execution_options(synchronize_session=False)
+        )
+    if sent is False:
+        # Захват не снимается: повтор — после истечения NOTIFY_CLAIM_SECONDS
+        session.execute(
+            update(NotificationOutbox)
+            .where(
+                NotificationOutbox.id.in_(
+                    [item.id for item in items if item.id not in delivered]
+                )
+            )
+            .values(attempts=NotificationOutbox.attempts + 1)
+            .execution_options(synchronize_session=False)
+        )
+    session.commit()
+    if sent:
+        logger.info(
+            "Отправлено уведомление по проекту %s: обновлений %s "
+            "(записей в очереди %s)",
+            project_id,
+            len(reserved),
+            len(items),
+        )
+    elif sent is None and delivered:
+        logger.info(
+            "Уведомления по проекту %s уже были отправлены, записей "
+            "очереди закрыто: %s",
+            project_id,
+            len(delivered),
+        )
+    return sent
+
+
+def flush_notifications(session, force: bool = False) -> int:
+    """
+    Отправляет накопленные уведомления проектов, окно которых истекло.
+
+    Args:
+        session: Сессия базы данных
+        force: Отправить все ожидающие уведомления, не дожидаясь окна
+
+    Returns:
+        int: Количество отправленных комментариев
+    """
+    now = datetime.now()
+    sent = 0
+    for project_id in _due_projects(session, now, force):
+        items = _claim_project(session, project_id, now)
+        if not items:
+            continue
+        result = _send_project(session, project_id, items)
+        if result:
+            sent += 1
+        elif result is False:
+            logger.error(
+                "Не удалось отправить уведомление по проекту %s, повтор "
+                "через %s с",
+                project_id,
+                NOTIFY_CLAIM_SECONDS,
+            )
+    return sent
+
+
+def pending_count(session) -> int:
+    """
+    Считает уведомления, ожидающие отправки.
+
+    Args:
+        session: Сессия базы данных
+
+    Returns:
+        int: Количество записей очереди
+    """
+    return (
+        session.query(NotificationOutbox)
+        .filter(
+            NotificationOutbox.sent_at.is_(None),
+            NotificationOutbox.attempts < NOTIFY_MAX_ATTEMPTS,
+        )
+        .count()
+    )
+
+
+def flush_after_scrape(session) -> None:
+    """
+    Отправляет всю очередь уведомлений в конце обхода дел.
+
+    Ошибки записываются в лог и не прерывают парсинг.
+
+    Args:
+        session: Сессия базы данных
+    """
+    try:
+        sent = flush_notifications(session, force=True)
+    except Exception as e:
+        session.rollback()
+        logger.error("Ошибка отправки очереди уведомлений: %s", e)
+        return
+    if sent:
+        logger.info("Отправлено уведомлений по итогам обхода: %s", sent)
@@ -0,0 +1,331 @@
+"""
+Модуль для распознавания текста PDF документов с кешированием по страницам.
+Результат OCR хранится в БД с ключом (хеш файла, страница, dpi, язык,
+конфигурация Tesseract), поэтому неизменённые страницы не распознаются
+повторно. Разрешение подбирается адаптивно: страница распознаётся с низким
+dpi и перераспознаётся с более высоким, только если уверенность Tesseract
+ниже порога.
+"""
+
+import hashlib
+import logging
+import os
+import time
+from datetime import datetime
+from typing import Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+import pytesseract  # type: ignore
+from pdf2image import convert_from_path, pdfinfo_from_path  # type: ignore
+from sqlalchemy.exc import IntegrityError  # type: ignore
+
+from db import Session
+from metrics import METRICS
+from models import OcrPageCache
+from ocr_preprocess import preprocess as preprocess_image
+
+logger = logging.getLogger(__name__)
+
+# Ступени разрешения: следующая используется, если уверенность ниже порога
+OCR_DPI_STEPS = [
+    int(dpi) for dpi in os.getenv("OCR_DPI_STEPS", "200,300,400").split(",")
+]
+OCR_MIN_CONFIDENCE = float(os.getenv("OCR_MIN_CONFIDENCE", "80"))
+OCR_PREPROCESS = os.getenv("OCR_PREPROCESS", "true").lower() == "true"
+OCR_LANG = os.getenv("TESSERACT_LANG", "rus")
+OCR_CONFIG = os.getenv("OCR_CONFIG", "--psm 6 --oem 3")
+# Версия предобработки входит в ключ кеша, чтобы её изменение
+# инвалидировало результаты
+PREPROCESS_VERSION = "prep1"
+
+
+class PageResult(NamedTuple):
+    """Результат распознавания одной страницы."""
+
+    page_number: int
+    dpi: int
+    text: str
+    confidence: float
+    seconds: float
+    cached: bool
+
+
+def file_sha256(file_path: str, chunk_size: int = 1024 * 1024) -> str:
+    """
+    Считает SHA-256 содержимого файла.
+
+    Args:
+        file_path: Путь к файлу
+        chunk_size: Размер блока чтения в байтах
+
+    Returns:
+        str: Хеш в шестнадцатеричном виде
+    """
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def recognize_image(image, lang: str, config: str) -> Tuple[str, float]:
+    """
+    Распознаёт изображение страницы за один проход Tesseract.
+
+    Текст собирается из пословного результата image_to_data с сохранением
+    разбиения на строки, уверенность — среднее по распознанным словам.
+
+    Args:
+        image: Изображение страницы (PIL.Image)
+        lang: Язык распознавания
+        config: Конфигурация Tesseract
+
+    Returns:
+        Tuple: (текст страницы, средняя уверенность 0-100)
+    """
+    data = pytesseract.image_to_data(
+        image,
+        lang=lang,
+        config=config,
+        output_type=pytesseract.Output.DICT,
+    )
+    lines: Dict[Tuple[int, int, int], List[str]] = {}
+    confidences = []
+    for i, word in enumerate(data["text"]):
+        conf = float(data["conf"][i])
+        if conf < 0 or not word.strip():
+            continue
+        key = (data["block_num"][i], data["par_num"][i], data["line_num"][i])
+        lines.setdefault(key, []).append(word)
+        confidences.append(conf)
+    text = "\n".join(" ".join(words) for words in lines.values())
+    confidence = sum(confidences) / len(confidences) if confidences else 0.0
+    return text, confidence
+
+
+def _cache_config(config: str, preprocess: bool) -> str:
+    """Строка конфигурации для ключа кеша с учётом предобработки."""
+    return f"{config} #{PREPROCESS_VERSION}" if preprocess else config
+
+
+def _load_cached_pages(
+    session,
+    content_hash: str,
+    pages: Sequence[int],
+    dpi: int,
+    lang: str,
+    config: str,
+) -> Dict[int, OcrPageCache]:
+    """Загружает закешированные страницы для заданных настроек."""
+    rows = (
+        session.query(OcrPageCache)
+        .filter(
+            OcrPageCache.content_hash == content_hash,
+            OcrPageCache.page_number.in_(list(pages)),
+            OcrPageCache.dpi == dpi,
+            OcrPageCache.lang == lang,
+            OcrPageCache.config == config,
+        )
+        .all()
+    )
+    return {row.page_number: row for row in rows}
+
+
+def _page_ranges(pages: Sequence[int]) -> List[Tuple[int, int]]:
+    """Группирует номера страниц в непрерывные диапазоны."""
+    ranges: List[Tuple[int, int]] = []
+    for page in sorted(pages):
+        if ranges and ranges[-1][1] == page - 1:
+            ranges[-1] = (ranges[-1][0], page)
+        else:
+            ranges.append((page, page))
+    return ranges
+
+
+def _recognize_pages(
+    file_path: str,
+    pages: Sequence[int],
+    dpi: int,
+    lang: str,
+    config: str,
+    preprocess: bool,
+) -> List[PageResult]:
+    """Рендерит и распознаёт страницы с заданным разрешением."""
+    results = []
+    for first, last in _page_ranges(pages):
+        images = convert_from_path(
+            file_path, dpi=dpi, first_page=first, last_page=last
+        )
+        for page_number, image in enumerate(images, start=first):
+            started = time.monotonic()
+            if preprocess:
+                image = preprocess_image(image)
+            text, confidence = recognize_image(image, lang, config)
+            results.append(
+                PageResult(
+                    page_number=page_number,
+                    dpi=dpi,
+                    text=text,
+                    confidence=confidence,
+                    seconds=time.monotonic() - started,
+                    cached=False,
+                )
+            )
+    return results
+
+
+def ocr_pages(
+    file_path: str,
+    dpi_steps: Optional[Sequence[int]] = None,
+    lang: str = OCR_LANG,
+    config: str = OCR_CONFIG,
+    preprocess: bool = OCR_PREPROCESS,
+    min_confidence: float = OCR_MIN_CONFIDENCE,
+    use_cache: bool = True,
+) -> List[PageResult]:
+    """
+    Распознаёт страницы PDF с адаптивным выбором разрешения.
+
+    Все страницы сначала распознаются с первой ступенью dpi. Страницы с
+    уверенностью ниже min_confidence переходят на следующую ступень; для
+    каждой страницы остаётся результат с наибольшей уверенностью. Каждая
+    попытка кешируется под своим dpi, поэтому повторный запуск с теми же
+    настройками не вызывает Tesseract.
+
+    Args:
+        file_path: Путь к PDF файлу
+        dpi_steps: Ступени разрешения по возрастанию (по умолчанию
+            OCR_DPI_STEPS)
+        lang: Язык распознавания
+        config: Конфигурация Tesseract
+        preprocess: Выполнять ли предобработку изображения
+        min_confidence: Порог уверенности для перехода на следующую ступень
+        use_cache: Использовать ли кеш OCR
+
+    Returns:
+        List[PageResult]: Результаты по страницам в порядке номеров
+    """
+    dpi_steps = list(dpi_steps or OCR_DPI_STEPS)
+    cache_config = _cache_config(config, preprocess)
+    page_count = int(pdfinfo_from_path(file_path)["Pages"])
+    content_hash = file_sha256(file_path) if use_cache else ""
+    best: Dict[int, PageResult] = {}
+    pending = list(range(1, page_count + 1))
+
+    session = Session() if use_cache else None
+    try:
+        for dpi in dpi_steps:
+            cached = (
+                _load_cached_pages(
+                    session, content_hash, pending, dpi, lang, cache_config
+                )
+                if session is not None
+                else {}
+            )
+            results = [
+                PageResult(
+                    page_number=row.page_number,
+                    dpi=dpi,
+                    text=row.text or "",
+                    confidence=row.confidence or 0.0,
+                    seconds=row.seconds or 0.0,
+                    cached=True,
+                )
+                for row in cached.values()
+            ]
+            fresh = _recognize_pages(
+                file_path,
+                [page for page in pending if page not in cached],
+                dpi,
+                lang,
+                config,
+                preprocess,
+            )
+            if session is not None:
+                _store_pages(session, content_hash, fresh, lang, cache_config)
+            results.extend(fresh)
+            if fresh:
+                METRICS.inc("kadbot_ocr_pages_total", len(fresh), dpi=dpi)
+                METRICS.inc(
+                    "kadbot_ocr_seconds_total",
+                    sum(result.seconds for result in fresh),
+                )
+
+            for result in results:
+                previous = best.get(result.page_number)
+                if not previous or result.confidence > previous.confidence:
+                    best[result.page_number] = result
+            pending = sorted(
+                page
+                for page in pending
+                if best[page].confidence < min_confidence
+            )
+            logger.info(
+                "OCR %s при %s dpi: страниц %s, из кеша %s, ниже порога %s",
+                file_path,
+                dpi,
+                len(results),
+                len(cached),
+                len(pending),
+            )
+            if not pending:
+                break
+    finally:
+        if session is not None:
+            session.close()
+
+    return [best[page] for page in range(1, page_count + 1)]
+
+
+def _store_pages(
+    session,
+    content_hash: str,
+    results: Sequence[PageResult],
+    lang: str,
+    config: str,
+) -> None:
+    """Сохраняет результаты распознавания в кеш."""
+    for result in results:
+        session.add(
+            OcrPageCache(
+                content_hash=content_hash,
+                page_number=result.page_number,
+                dpi=result.dpi,
+                lang=lang,
+                config=config,
+                text=result.text,
+                confidence=result.confidence,
+                seconds=result.seconds,
+                created_at=datetime.now(),
+            )
+        )
+        try:
+            session.commit()
+        except IntegrityError:
+            # Страницу уже распознал параллельный обработчик
+            session.rollback()
+
+
+def ocr_pdf(
+    file_path: str,
+    dpi_steps: Optional[Sequence[int]] = None,
+    lang: str = OCR_LANG,
+    config: str = OCR_CONFIG,
+) -> Optional[str]:
+    """
+    Распознаёт PDF документ, используя кеш страниц и адаптивный dpi.
+
+    Args:
+        file_path: Путь к PDF файлу
+        dpi_steps: Ступени разрешения (по умолчанию OCR_DPI_STEPS)
+        lang: Язык распознавания
+        config: Конфигурация Tesseract
+
+    Returns:
+        str: Текст документа или None при ошибке
+    """
+    try:
+        pages = ocr_pages(file_path, dpi_steps, lang, config)
+        return "\n".join(page.text for page in pages)
+    except Exception as e:
+        logger.error("Ошибка OCR для файла %s: %s", file_path, e)
+        return None
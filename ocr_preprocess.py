@@ -0,0 +1,166 @@
+"""
+Модуль предобработки изображений страниц перед OCR.
+Все операции векторизованы на NumPy: перевод в оттенки серого,
+бинаризация по Оцу, обрезка полей и выравнивание наклона.
+"""
+
+from typing import Tuple
+
+import numpy as np  # type: ignore
+from PIL import Image  # type: ignore
+
+# Диапазон и шаг поиска угла наклона в градусах
+MAX_SKEW_ANGLE = 5.0
+SKEW_ANGLE_STEP = 0.25
+# Ширина уменьшенной копии для оценки наклона
+SKEW_SAMPLE_WIDTH = 1000
+# Доля тёмных пикселей, при которой строка/столбец считается рамкой скана
+BORDER_INK_RATIO = 0.6
+# Отступ вокруг текста после обрезки полей в пикселях
+CROP_MARGIN = 20
+
+
+def to_grayscale(image: Image.Image) -> np.ndarray:
+    """
+    Переводит изображение в массив оттенков серого.
+
+    Args:
+        image: Исходное изображение страницы
+
+    Returns:
+        np.ndarray: Массив uint8 размером (высота, ширина)
+    """
+    return np.asarray(image.convert("L"), dtype=np.uint8)
+
+
+def otsu_threshold(gray: np.ndarray) -> int:
+    """
+    Вычисляет порог бинаризации методом Оцу по гистограмме.
+
+    Args:
+        gray: Массив оттенков серого
+
+    Returns:
+        int: Порог яркости 0-255
+    """
+    hist = np.bincount(gray.ravel(), minlength=256).astype(np.float64)
+    prob = hist / hist.sum()
+    omega = np.cumsum(prob)
+    mu = np.cumsum(prob * np.arange(256))
+    mu_total = mu[-1]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        sigma_b = (mu_total * omega - mu) ** 2 / (omega * (1.0 - omega))
+    if not np.isfinite(sigma_b).any():
+        # Однотонная страница: порог не определён, текста нет
+        return 0
+    return int(np.nanargmax(np.where(np.isfinite(sigma_b), sigma_b, np.nan)))
+
+
+def binarize(gray: np.ndarray) -> np.ndarray:
+    """
+    Бинаризует страницу.
+
+    Args:
+        gray: Массив оттенков серого
+
+    Returns:
+        np.ndarray: Булев массив, True — тёмный пиксель (текст)
+    """
+    return gray <= otsu_threshold(gray)
+
+
+def _trim_dark_edges(profile: np.ndarray) -> Tuple[int, int]:
+    """Возвращает границы без сплошных тёмных полос по краям профиля."""
+    light = np.flatnonzero(profile < BORDER_INK_RATIO)
+    if light.size == 0:
+        return 0, profile.size
+    return int(light[0]), int(light[-1]) + 1
+
+
+def crop_borders(ink: np.ndarray) -> Tuple[slice, slice]:
+    """
+    Определяет область страницы без тёмной рамки скана и пустых полей.
+
+    Args:
+        ink: Булев массив тёмных пикселей
+
+    Returns:
+        Tuple[slice, slice]: Срезы по строкам и столбцам
+    """
+    top, bottom = _trim_dark_edges(ink.mean(axis=1))
+    left, right = _trim_dark_edges(ink.mean(axis=0))
+    inner = ink[top:bottom, left:right]
+
+    rows = np.flatnonzero(inner.any(axis=1))
+    cols = np.flatnonzero(inner.any(axis=0))
+    if rows.size == 0 or cols.size == 0:
+        return slice(top, bottom), slice(left, right)
+
+    height, width = ink.shape
+    return (
+        slice(
+            max(top + int(rows[0]) - CROP_MARGIN, 0),
+            min(top + int(rows[-1]) + 1 + CROP_MARGIN, height),
+        ),
+        slice(
+            max(left + int(cols[0]) - CROP_MARGIN, 0),
+            min(left + int(cols[-1]) + 1 + CROP_MARGIN, width),
+        ),
+    )
+
+
+def estimate_skew(ink: np.ndarray) -> float:
+    """
+    Оценивает угол наклона строк методом проекционного профиля.
+
+    Для каждого угла-кандидата координаты тёмных пикселей сдвигаются
+    сдвигом по вертикали, и считается «резкость» гистограммы строк. Угол с
+    максимальной резкостью соответствует горизонтальным строкам.
+
+    Args:
+        ink: Булев массив тёмных пикселей
+
+    Returns:
+        float: Угол в градусах, на который нужно повернуть страницу
+        (против часовой стрелки) для выравнивания
+    """
+    step = max(1, ink.shape[1] // SKEW_SAMPLE_WIDTH)
+    sample = ink[::step, ::step]
+    ys, xs = np.nonzero(sample)
+    if ys.size < 100:
+        return 0.0
+
+    angles = np.arange(
+        -MAX_SKEW_ANGLE, MAX_SKEW_ANGLE + SKEW_ANGLE_STEP, SKEW_ANGLE_STEP
+    )
+    best_angle, best_score = 0.0, -1.0
+    for angle in angles:
+        shifted = np.rint(ys - xs * np.tan(np.radians(angle))).astype(np.int64)
+        hist = np.bincount(shifted - shifted.min())
+        score = float(np.dot(hist, hist))
+        if score > best_score:
+            best_angle, best_score = float(angle), score
+    return best_angle
+
+
+def preprocess(image: Image.Image) -> Image.Image:
+    """
+    Готовит страницу к распознаванию.
+
+    Args:
+        image: Изображение страницы после рендеринга PDF
+
+    Returns:
+        Image.Image: Бинаризованное, обрезанное и выровненное изображение
+    """
+    ink = binarize(to_grayscale(image))
+    rows, cols = crop_borders(ink)
+    ink = ink[rows, cols]
+
+    page = Image.fromarray(np.where(ink, 0, 255).astype(np.uint8))
+    angle = estimate_skew(ink)
+    if abs(angle) >= SKEW_ANGLE_STEP:
+        page = page.rotate(
+            angle, resample=Image.NEAREST, expand=True, fillcolor=255
+        )
+    return page
@@ -5,7 +5,6 @@
 """
 
 import logging
-import random
 import re
 import time
 import traceback
@@ -27,23 +26,49 @@ try:
 except ImportError as e:
     raise ImportError(f"Required modules are missing: {e}")
 
-from crm_calendar import create_project_calendar_event
-from crm_notify import send_case_update_comment
+from browser import BrowserSession, driver_cpu_seconds
+from calendar_reconcile import reconcile_after_scrape
+from case_leases import (
+    claim_cases,
+    count_due,
+    ensure_leases,
+    heartbeat,
+    reclaim_expired,
+    release_case,
+    release_unfinished,
+    reset_due,
+)
 from db import Session, get_project_id_for_case
-from models import Cases, Chronology
-from utils import (
-    clear_progress,
-    get_driver,
-    load_progress,
-    save_progress,
-    simulate_mouse_movement,
+from document_state import default_worker_id
+from hearings import record_hearing, write_hearings_ics
+from kad_selectors import CARD_URL, SELECTORS
+from lean_profile import LoadStats, collect_page_stats
+from logging_setup import bind_log_context, setup_logging
+from metrics import METRICS, job_finished, job_started
+from models import Chronology
+from notify_outbox import (
+    enqueue_notification,
+    flush_after_scrape,
+    flush_notifications,
 )
-
-logging.basicConfig(
-    filename="kad_parser.log",
-    level=logging.INFO,
-    format="%(asctime)s - %(levelname)s - %(message)s",
+from persistence import upsert_chronology
+from retry_policy import (
+    BLOCKED,
+    DEFAULT_POLICY,
+    LAYOUT,
+    MAX_CONSECUTIVE_BLOCKS,
+    TRANSIENT,
+    CaseFailure,
+    RetryPolicy,
+    classify_exception,
+    classify_page,
+    record_case_failure,
 )
+from selector_health import HEALTH, LayoutDriftError, SelectorHealth
+from timing import TIMINGS
+from utils import human_pause, simulate_mouse_movement
+
+logger = logging.getLogger(__name__)
 
 
 def parse_date(date_str: str) -> Optional[datetime]:
@@ -62,54 +87,119 @@ def parse_date(date_str: str) -> Optional[datetime]:
         return None
 
 
+def parse_hearing_text(
+    text: str, fallback: bool = False
+) -> Tuple[str, str, str]:
+    """
+    Извлекает дату, время и зал следующего заседания из текста блока.
+
+    Args:
+        text: Текст блока карточки дела
+        fallback: Текст найден резервным поиском по фразе
+            "Следующее заседание"
+
+    Returns:
+        Tuple[str, str, str]: (дата DD.MM.YYYY, время HH:MM, зал) или
+            пустые строки, если заседание не найдено
+    """
+    if fallback:
+        m = re.search(
+            (
+                r"Следующее заседание:\s*(\d{2}\.\d{2}\.\d{4}),"
+                r"\s*(\d{2}:\d{2})(?:\s*,\s*к\.(\d+))?"
+            ),
+            text,
+        )
+        if not m:
+            return "", "", ""
+        return m.group(1), m.group(2), m.group(3) or ""
+
+    # Ищем дату и время в формате DD.MM.YYYY, HH:MM
+    date_time_match = re.search(
+        r"(\d{2}\.\d{2}\.\d{4}),\s*(\d{2}:\d{2})", text
+    )
+    if not date_time_match:
+        return "", "", ""
+
+    # Ищем номер кабинета/зала, затем другие варианты обозначения зала
+    room_match = re.search(r"к\.(\d+)", text) or re.search(
+        r"Зал[^№]*№\s*(\d+)", text
+    )
+    return (
+        date_time_match.group(1),
+        date_time_match.group(2),
+        room_match.group(1) if room_match else "",
+    )
+
+
+def save_error_page(case_number: str, html: str) -> None:
+    """
+    Сохраняет HTML страницы дела для разбора ошибки.
+
+    Args:
+        case_number: Номер дела
+        html: Содержимое страницы
+    """
+    with open(
+        f"error_{case_number.replace('/', '_')}.html", "w", encoding="utf-8"
+    ) as f:
+        f.write(html)
+
+
 def get_case_events(
-    driver: uc.Chrome, case_number: str
-) -> Tuple[Optional[Dict[str, Any]], int]:
+    driver: uc.Chrome,
+    case_number: str,
+    health: Optional[SelectorHealth] = None,
+    policy: Optional[RetryPolicy] = None,
+) -> Tuple[Dict[str, Any], int]:
     """
     Получает события для конкретного дела с сайта kad.arbitr.ru.
 
+    Повторяются только временные ошибки (таймауты, сбои драйвера), и только
+    пока не истекло время, отведённое на дело политикой повторов.
+
     Args:
         driver: Chrome драйвер для парсинга
         case_number: Номер дела для парсинга
+        health: Монитор селекторов (по умолчанию общий HEALTH)
+        policy: Политика повторов (по умолчанию DEFAULT_POLICY)
 
     Returns:
-        Tuple: (данные события, количество событий) или (None, 0) при ошибке
+        Tuple: (данные события, количество событий)
+
+    Raises:
+        CaseFailure: Если дело получить не удалось (с классом ошибки)
+        LayoutDriftError: Если обязательные селекторы перестали находиться
     """
-    for attempt in range(3):
+    health = health or HEALTH
+    bind_log_context(case_number=case_number, stage="scrape")
+    budget = (policy or DEFAULT_POLICY).start()
+    laps = TIMINGS.laps(case_number)
+    failure: Optional[CaseFailure] = None
+    while budget.next_attempt(failure):
+        # Время неудачной попытки и паузы перед повтором
+        if failure:
+            laps.lap("retry")
+            METRICS.inc("kadbot_retries_total", job="parser")
         try:
-            url = f"https://kad.arbitr.ru/Card?number={case_number}"
-            driver.get(url)
-            time.sleep(random.uniform(2.0, 5.0))
-            logging.info(f"Загружена страница для дела {case_number}")
-
-            # Проверка на блокировку
-            if "Доступ к сервису ограничен" in driver.page_source:
-                logging.error(f"IP заблокирован для дела {case_number}")
-                with open(
-                    f"error_{case_number.replace('/', '_')}.html",
-                    "w",
-                    encoding="utf-8",
-                ) as f:
-                    f.write(driver.page_source)
-                return None, 0
-
-            # Проверка на ограничение подписки
-            if "Вы можете оформить подписку на 40 дел" in driver.page_source:
-                logging.warning(
-                    f"Доступ к хронологии ограничен из-за подписки для дела "
-                    f"{case_number}"
+            driver.get(CARD_URL.format(case_number))
+            time.sleep(human_pause(2.0, 5.0))
+            logger.info("Загружена страница для дела %s", case_number)
+            laps.lap("navigate")
+
+            # Проверка на блокировку, ограничение подписки и отсутствие дела
+            page_failure = classify_page(driver.page_source)
+            if page_failure:
+                logger.warning(
+                    "Дело %s недоступно: %s", case_number, page_failure.reason
                 )
-                with open(
-                    f"error_{case_number.replace('/', '_')}.html",
-                    "w",
-                    encoding="utf-8",
-                ) as f:
-                    f.write(driver.page_source)
-                return None, 0
+                save_error_page(case_number, driver.page_source)
+                raise page_failure
+            laps.lap("block_check")
 
             # Эмуляция человеческого поведения (уменьшено до 3 прокруток)
             driver.execute_script("window.scrollTo(0, 0);")
-            time.sleep(random.uniform(0.5, 1.0))
+            time.sleep(human_pause(0.5, 1.0))
 
             # Извлекаем блок "Следующее заседание" по HTML-структуре
             hearing_date = ""
@@ -119,49 +209,30 @@ def get_case_events(
                 # Ищем div с классом b-instanceAdditional, который содержит
                 # информацию о заседании
                 hearing_blocks = driver.find_elements(
-                    By.CSS_SELECTOR, "div.b-instanceAdditional"
+                    By.CSS_SELECTOR, SELECTORS["hearing_block"]
                 )
 
                 for block in hearing_blocks:
                     # Проверяем, содержит ли блок иконку календаря
                     calendar_icons = block.find_elements(
-                        By.CSS_SELECTOR, "i.b-icons16.redCalendar"
+                        By.CSS_SELECTOR, SELECTORS["hearing_icon"]
                     )
 
                     if calendar_icons:
                         # Нашли блок с информацией о заседании
                         text_content = block.text.strip()
-                        logging.info(
-                            f"Найден блок заседания для {case_number}: "
-                            f"{text_content}"
+                        logger.info(
+                            "Найден блок заседания для %s: %s",
+                            case_number,
+                            text_content,
                         )
 
-                        # Ищем дату и время в формате DD.MM.YYYY, HH:MM
-                        date_time_match = re.search(
-                            r"(\d{2}\.\d{2}\.\d{4}),\s*(\d{2}:\d{2})",
-                            text_content
+                        hearing_date, hearing_time, hearing_room = (
+                            parse_hearing_text(text_content)
                         )
 
-                        if date_time_match:
-                            hearing_date = date_time_match.group(1)
-                            hearing_time = date_time_match.group(2)
-
-                            # Ищем номер кабинета/зала
-                            room_match = re.search(r"к\.(\d+)", text_content)
-                            if room_match:
-                                hearing_room = room_match.group(1)
-                            else:
-                                # Ищем другие варианты обозначения зала
-                                room_match = re.search(
-                                    r"Зал[^№]*№\s*(\d+)",
-                                    text_content
-                                )
-                                if room_match:
-                                    hearing_room = room_match.group(1)
-                                else:
-                                    hearing_room = ""
-
-                            logging.info(
+                        if hearing_date:
+                            logger.info(
                                 "Найдено следующее заседание: %s %s %s",
                                 hearing_date,
                                 hearing_time,
@@ -171,119 +242,121 @@ def get_case_events(
 
                 # Если не нашли по структуре, пробуем резервный поиск по тексту
                 if not hearing_date or not hearing_time:
-                    logging.info(
-                        f"Резервный поиск по тексту для дела {case_number}"
+                    logger.info(
+                        "Резервный поиск по тексту для дела %s", case_number
                     )
                     elems = driver.find_elements(
-                        By.XPATH,
-                        "//*[contains(text(),'Следующее заседание')]",
+                        By.XPATH, SELECTORS["hearing_text"]
                     )
                     if elems:
                         text_source = elems[0].text.strip()
-                        m = re.search(
-                            (
-                                r"Следующее заседание:\s*(\d{2}\.\d{2}\.\d{4}),"
-                                r"\s*(\d{2}:\d{2})(?:\s*,\s*к\.(\d+))?"
-                            ),
-                            text_source,
+                        hearing_date, hearing_time, hearing_room = (
+                            parse_hearing_text(text_source, fallback=True)
                         )
-                        if m:
-                            hearing_date = m.group(1)
-                            hearing_time = m.group(2)
-                            hearing_room = m.group(3) if m.group(3) else ""
-                            logging.info(
-                                "Найдено следующее заседание (резервный поиск): "
-                                "%s %s %s",
+                        if hearing_date:
+                            logger.info(
+                                "Найдено следующее заседание "
+                                "(резервный поиск): %s %s %s",
                                 hearing_date,
                                 hearing_time,
                                 hearing_room,
                             )
             except Exception as e:
-                logging.info(
+                logger.info(
                     "Не удалось извлечь 'Следующее заседание' для %s: %s",
                     case_number,
                     e,
                 )
+            laps.lap("hearing")
 
             # Переключение на вкладку "Судебные акты"
             try:
-                tabs = WebDriverWait(driver, 8).until(
+                tabs = WebDriverWait(driver, budget.timeout(8)).until(
                     EC.presence_of_all_elements_located(
-                        (By.CSS_SELECTOR, ".b-tab.js-tab")
+                        (By.CSS_SELECTOR, SELECTORS["tab"])
                     )
                 )
+                health.record("tab", True, case_number)
                 for tab in tabs:
                     if "Судебные акты" in tab.text:
                         driver.execute_script("arguments[0].click();", tab)
-                        time.sleep(random.uniform(1.0, 2.0))
-                        logging.info(
-                            f"Переключено на вкладку 'Судебные акты' для дела "
-                            f"{case_number}"
+                        time.sleep(human_pause(1.0, 2.0))
+                        logger.info(
+                            "Переключено на вкладку 'Судебные акты' для "
+                            "дела %s",
+                            case_number,
                         )
                         break
+            except TimeoutException:
+                health.record("tab", False, case_number)
             except Exception as e:
-                logging.info(
-                    f"Не удалось переключиться на вкладку 'Судебные акты' "
-                    f"для дела {case_number}: {e}"
+                logger.info(
+                    "Не удалось переключиться на вкладку 'Судебные акты' "
+                    "для дела %s: %s",
+                    case_number,
+                    e,
                 )
+            laps.lap("tab_switch")
 
             # Ожидание и клик по кнопке раскрытия хронологии
             try:
-                collapse_btn = WebDriverWait(driver, 10).until(
+                collapse_btn = WebDriverWait(
+                    driver, budget.timeout(10)
+                ).until(
                     EC.element_to_be_clickable(
-                        (By.CSS_SELECTOR, ".b-collapse.js-collapse")
+                        (By.CSS_SELECTOR, SELECTORS["collapse"])
                     )
                 )
+                health.record("collapse", True, case_number)
                 driver.execute_script(
                     "arguments[0].scrollIntoView(true);", collapse_btn
                 )
                 driver.execute_script("arguments[0].click();", collapse_btn)
-                time.sleep(random.uniform(1.0, 2.0))
-                logging.info(f"Раскрыта хронология для дела {case_number}")
+                time.sleep(human_pause(1.0, 2.0))
+                logger.info("Раскрыта хронология для дела %s", case_number)
             except TimeoutException:
-                logging.warning(
-                    f"Кнопка раскрытия хронологии (.b-collapse.js-collapse) "
-                    f"не найдена для дела {case_number} после 10 секунд"
+                logger.warning(
+                    "Кнопка раскрытия хронологии (%s) не найдена для дела %s "
+                    "после 10 секунд",
+                    SELECTORS["collapse"],
+                    case_number,
                 )
-                with open(
-                    f"error_{case_number.replace('/', '_')}.html",
-                    "w",
-                    encoding="utf-8",
-                ) as f:
-                    f.write(driver.page_source)
-                return None, 0
+                health.record("collapse", False, case_number)
+                save_error_page(case_number, driver.page_source)
+                raise CaseFailure(LAYOUT, "нет кнопки раскрытия хронологии")
+            except LayoutDriftError:
+                raise
             except Exception as e:
-                logging.warning(
-                    "Ошибка при клике на хронологию для дела "
-                    f"{case_number}: {e}"
+                logger.warning(
+                    "Ошибка при клике на хронологию для дела %s: %s",
+                    case_number,
+                    e,
+                )
+                save_error_page(case_number, driver.page_source)
+                raise CaseFailure(
+                    TRANSIENT, f"ошибка раскрытия хронологии: {e}"
                 )
-                with open(
-                    f"error_{case_number.replace('/', '_')}.html",
-                    "w",
-                    encoding="utf-8",
-                ) as f:
-                    f.write(driver.page_source)
-                return None, 0
+            laps.lap("expand")
 
             # Ожидание элементов хронологии
             try:
-                elements = WebDriverWait(driver, 20).until(
+                elements = WebDriverWait(driver, budget.timeout(20)).until(
                     EC.presence_of_all_elements_located(
-                        (By.CSS_SELECTOR, ".b-chrono-item.js-chrono-item")
+                        (By.CSS_SELECTOR, SELECTORS["chrono_item"])
                     )
                 )
+                health.record("chrono_item", True, case_number)
             except TimeoutException:
-                logging.warning(
-                    f"Элементы хронологии (.b-chrono-item.js-chrono-item) "
-                    f"не найдены для дела {case_number} после 20 секунд"
+                logger.warning(
+                    "Элементы хронологии (%s) не найдены для дела %s "
+                    "после 20 секунд",
+                    SELECTORS["chrono_item"],
+                    case_number,
                 )
-                with open(
-                    f"error_{case_number.replace('/', '_')}.html",
-                    "w",
-                    encoding="utf-8",
-                ) as f:
-                    f.write(driver.page_source)
-                return None, 0
+                health.record("chrono_item", False, case_number)
+                save_error_page(case_number, driver.page_source)
+                raise CaseFailure(LAYOUT, "нет элементов хронологии")
+            laps.lap("wait_items")
 
             events_count = len(elements)
             last_event = elements[0]
@@ -297,16 +370,20 @@ def get_case_events(
 
             doc_link = ""
             doc_links = last_event.find_elements(
-                By.CSS_SELECTOR, "a.js-case-result-text--doc_link"
+                By.CSS_SELECTOR, SELECTORS["doc_link"]
             )
             if doc_links:
                 doc_link = doc_links[0].get_attribute("href")
 
             event_data = {
-                "event_date": safe_sel(last_event, ".case-date"),
-                "event_title": safe_sel(last_event, ".case-type"),
-                "event_author": safe_sel(last_event, ".case-subject"),
-                "event_publish": safe_sel(last_event, ".b-case-publish_info")
+                "event_date": safe_sel(last_event, SELECTORS["event_date"]),
+                "event_title": safe_sel(last_event, SELECTORS["event_title"]),
+                "event_author": safe_sel(
+                    last_event, SELECTORS["event_author"]
+                ),
+                "event_publish": safe_sel(
+                    last_event, SELECTORS["event_publish"]
+                )
                 .replace("Дата публикации:", "")
                 .strip(),
                 "events_count": events_count,
@@ -315,339 +392,426 @@ def get_case_events(
                 "hearing_time": hearing_time,
                 "hearing_room": hearing_room,
             }
-            logging.info(
-                f"Спарсено событие для дела {case_number}: "
-                f"{event_data['event_title']} — {event_data['event_date']}"
+            # Пустые дата и название события при найденном элементе
+            # хронологии — признак изменения вложенной разметки
+            health.record(
+                "event_date", bool(event_data["event_date"]), case_number
+            )
+            health.record(
+                "event_title", bool(event_data["event_title"]), case_number
             )
+            logger.info(
+                "Спарсено событие для дела %s: %s — %s",
+                case_number,
+                event_data["event_title"],
+                event_data["event_date"],
+            )
+            laps.lap("extract")
             return event_data, events_count
 
+        except LayoutDriftError:
+            raise
         except Exception as e:
-            logging.error(
-                f"Ошибка при парсинге дела {case_number} (попытка {attempt + 1}): {e}"
+            failure = classify_exception(e)
+            logger.error(
+                "Ошибка при парсинге дела %s (попытка %s, %s): %s",
+                case_number,
+                budget.attempt,
+                failure.kind,
+                failure.reason,
             )
-            if attempt < 2:
-                time.sleep(random.uniform(2.0, 5.0))
-                continue
-            else:
-                logging.error(
-                    f"Не удалось спарсить дело {case_number} после 3 попыток"
-                )
-                return None, 0
 
-    return None, 0
+    failure = budget.give_up(failure)
+    logger.error("Не удалось спарсить дело %s: %s", case_number, failure)
+    raise failure
+
+
+def _record_hearing(
+    session, row: Dict[str, Any], chronology_id: int
+) -> None:
+    """Переносит заседание из события хронологии в таблицу hearings."""
+    try:
+        record_hearing(
+            session,
+            row["case_number"],
+            row["hearing_date"],
+            row["hearing_time"],
+            row["hearing_room"],
+            row["event_title"],
+            chronology_id,
+        )
+    except Exception as e:
+        session.rollback()
+        logger.error(
+            "Ошибка сохранения заседания по делу %s: %s",
+            row["case_number"],
+            e,
+        )
+
+
+def apply_case_events(
+    session,
+    case_number: str,
+    web_event: Dict[str, Any],
+    events_count: int,
+) -> str:
+    """
+    Сохраняет спарсенное событие дела в БД и отправляет уведомления.
+
+    Общий путь сохранения для синхронного парсера и асинхронного
+    многовкладочного движка.
+
+    Args:
+        session: Сессия базы данных
+        case_number: Номер дела
+        web_event: Данные последнего события с сайта
+        events_count: Количество событий в хронологии
+
+    Returns:
+        str: "added", "updated" или "unchanged"
+    """
+    bind_log_context(case_number=case_number, stage="persist")
+    laps = TIMINGS.laps(case_number)
+    db_event = (
+        session.query(Chronology)
+        .filter_by(case_number=case_number)
+        .order_by(Chronology.id.desc())
+        .first()
+    )
+    new_date = parse_date(web_event["event_date"])
+    row = {
+        "case_number": case_number,
+        "event_date": web_event["event_date"],
+        "event_title": web_event["event_title"],
+        "event_author": web_event["event_author"],
+        "event_publish": web_event["event_publish"],
+        "events_count": events_count,
+        "doc_link": web_event["doc_link"],
+        "hearing_date": web_event.get("hearing_date"),
+        "hearing_time": web_event.get("hearing_time"),
+        "hearing_room": web_event.get("hearing_room"),
+        "updated_at": datetime.now(),
+    }
+    if not db_event:
+        # Новое событие - добавляем в БД; при одновременной записи другим
+        # обработчиком INSERT ... ON CONFLICT обновит его запись
+        chronology_id = upsert_chronology(session, [row])[case_number]
+        session.commit()
+        _record_hearing(session, row, chronology_id)
+        laps.lap("db_write")
+
+        logger.info(
+            "Добавлено новое событие для дела %s: %s — %s",
+            case_number,
+            web_event["event_title"],
+            web_event["event_date"],
+        )
+
+        # Если назначено заседание, сообщаем о нём в CRM; событие в
+        # календаре создаст сверка календаря (calendar_reconcile)
+        if (web_event.get("hearing_date") and
+                web_event.get("hearing_time")):
+            notify_case_update(
+                session, case_number, web_event, chronology_id
+            )
+            laps.lap("crm_notify")
+        return "added"
+
+    old_date = parse_date(db_event.event_date)
+    hearing_changed = (
+        db_event.hearing_date != web_event.get("hearing_date") or
+        db_event.hearing_time != web_event.get("hearing_time") or
+        db_event.hearing_room != web_event.get("hearing_room")
+    )
+    has_newer_event = bool(new_date and (
+        not old_date or new_date > old_date))
+    if not has_newer_event and not hearing_changed:
+        logger.info("Без изменений для дела %s", case_number)
+        laps.lap("db_write")
+        return "unchanged"
+
+    # Обновляем основную информацию и информацию о заседании (держим БД в
+    # актуальном состоянии)
+    chronology_id = upsert_chronology(session, [row])[case_number]
+    session.commit()
+    _record_hearing(session, row, chronology_id)
+    laps.lap("db_write")
+
+    logger.info(
+        "Обновлено событие для дела %s: %s — %s",
+        case_number,
+        web_event["event_title"],
+        web_event["event_date"],
+    )
+
+    if hearing_changed:
+        logger.info(
+            "Обнаружены изменения в информации о заседании для дела %s",
+            case_number,
+        )
+
+    # Ставим уведомление в очередь; событие в календаре обновит сверка
+    notify_case_update(session, case_number, web_event, chronology_id)
+    laps.lap("crm_notify")
+    return "updated"
 
 
 def sync_chronology(
-    start_index: int = 0,
     batch_size: int = 10,
     pause_between_batches: int = 5,
-) -> None:
+    resume: bool = True,
+    worker_id: Optional[str] = None,
+) -> bool:
     """
     Синхронизирует хронологию дел с сайта kad.arbitr.ru.
 
+    Дела выдаются пакетами через таблицу case_leases: каждый пакет
+    захватывается с арендой, поэтому несколько процессов или машин могут
+    обходить один список дел, не обрабатывая дело дважды. Прогресс хранится
+    в БД: прерванный запуск при повторе пропускает дела, обработанные
+    менее CASE_RESCRAPE_INTERVAL секунд назад.
+
     Args:
-        start_index: Начальный индекс для обработки
         batch_size: Размер пакета для обработки
         pause_between_batches: Пауза между пакетами в секундах
+        resume: Если False, все дела считаются подлежащими обходу
+            независимо от времени последней обработки
+        worker_id: Идентификатор обработчика (по умолчанию host:pid)
+
+    Returns:
+        bool: False, если обход прерван ошибкой, блокировкой или
+        пользователем
+
+    Raises:
+        LayoutDriftError: Если разметка страниц дел изменилась
     """
+    setup_logging()
     session = Session()
-    driver = None
+    worker_id = worker_id or default_worker_id()
+    browser = BrowserSession(worker_id=worker_id)
+    load_stats = LoadStats()
+    run_started = datetime.now()
     processed_cases = 0
+    consecutive_blocks = 0
+    HEALTH.reset()
+    TIMINGS.reset()
+    job_started("parser")
 
     try:
-        # Загружаем прогресс
-        progress = load_progress("parser_progress.json")
-        if progress:
-            start_index = progress.get("index", start_index)
-            logging.info(f"Восстановлен прогресс с индекса {start_index}")
-
-        # Получаем список дел
-        cases = session.query(Cases).all()
-        if not cases:
-            logging.warning("Не найдено дел для обработки")
-            return
-
-        logging.info(f"Найдено {len(cases)} дел для обработки")
-        if start_index >= len(cases):
-            logging.info("Все дела уже обработаны")
-            return
-
-        # Инициализируем драйвер
-        driver = get_driver()
-        if not driver:
-            logging.error("Не удалось инициализировать Chrome драйвер")
-            return
-
-        with tqdm(total=len(cases), desc="Обработка дел", unit="дело") as pbar:
-            for i in range(0, len(cases), batch_size):
-                batch = cases[i: i + batch_size]
-                logging.info(
-                    f"Обработка пакета дел {i+1+start_index}-"
-                    f"{min(i+batch_size+start_index, len(cases)+start_index)} "
-                    f"из {len(cases)+start_index}"
+        ensure_leases(session)
+        reclaim_expired(session)
+        if not resume:
+            reset_due(session)
+
+        # Дела с постоянной ошибкой (например, ограничение подписки)
+        # пропускаются до сброса через reset_permanent_failures
+        total = count_due(session, run_started)
+        if not total:
+            logger.warning(
+                "Нет дел для обработки: все дела обработаны недавно или "
+                "заняты другими обработчиками"
+            )
+            return True
+        logger.info(
+            "Обработчик %s: найдено %s дел для обработки", worker_id, total
+        )
+
+        # Инициализируем драйвер (дальше сессия сама перезапускает его)
+        if not browser.driver:
+            logger.error("Не удалось инициализировать Chrome драйвер")
+            return False
+
+        with tqdm(total=total, desc="Обработка дел", unit="дело") as pbar:
+            while True:
+                batch = claim_cases(
+                    session, worker_id, batch_size, run_started
                 )
-                for index, case in enumerate(batch, start=i + start_index):
-                    case_number = case.case_number
+                if not batch:
+                    break
+                logger.info(
+                    "Обработчик %s взял пакет из %s дел", worker_id, len(batch)
+                )
+                for position, case_number in enumerate(batch):
+                    # Продлеваем аренду оставшихся дел пакета; дело, которое
+                    # уже забрал другой обработчик, пропускаем
+                    held = heartbeat(session, worker_id, batch[position:])
+                    if case_number not in held:
+                        pbar.update(1)
+                        continue
                     try:
-                        db_event = (
-                            session.query(Chronology)
-                            .filter_by(case_number=case_number)
-                            .order_by(Chronology.id.desc())
-                            .first()
-                        )
-                        web_event, events_count = get_case_events(
-                            driver, case_number
-                        )
-                        if not web_event:
-                            logging.warning(
-                                f"Не удалось получить события для дела "
-                                f"{case_number}"
+                        cpu_before = driver_cpu_seconds(browser.driver)
+                        try:
+                            web_event, events_count = get_case_events(
+                                browser.driver, case_number
                             )
-                            pbar.update(1)
-                            continue
-
-                        new_date = parse_date(web_event["event_date"])
-                        if not db_event:
-                            # Новое событие - добавляем в БД
-                            new_chronology = Chronology(
-                                case_number=case_number,
-                                event_date=web_event["event_date"],
-                                event_title=web_event["event_title"],
-                                event_author=web_event["event_author"],
-                                event_publish=web_event["event_publish"],
-                                events_count=events_count,
-                                doc_link=web_event["doc_link"],
-                                hearing_date=web_event.get("hearing_date"),
-                                hearing_time=web_event.get("hearing_time"),
-                                hearing_room=web_event.get("hearing_room"),
-                                hearing_created_at=None,
+                            consecutive_blocks = 0
+                        except CaseFailure as failure:
+                            web_event, events_count = None, 0
+                            METRICS.inc(
+                                "kadbot_case_failures_total",
+                                job="parser",
+                                kind=failure.kind,
                             )
-                            session.add(new_chronology)
-                            session.commit()
-
-                            # Получаем ID добавленной записи
-                            db_event = new_chronology
-
-                            logging.info(
-                                "Добавлено новое событие для дела "
-                                f"{case_number}: {web_event['event_title']} — "
-                                f"{web_event['event_date']}"
+                            record_case_failure(session, case_number, failure)
+                            if failure.kind == TRANSIENT:
+                                # Ошибки драйвера при мёртвой сессии не
+                                # пройдут без перезапуска браузера
+                                browser.recycle_if_dead()
+                            if failure.kind == BLOCKED:
+                                METRICS.inc(
+                                    "kadbot_blocks_total", job="parser"
+                                )
+                                consecutive_blocks += 1
+                            else:
+                                # Серию прерывает любой ответ, кроме
+                                # страницы блокировки
+                                consecutive_blocks = 0
+                            if consecutive_blocks >= MAX_CONSECUTIVE_BLOCKS:
+                                logger.error(
+                                    "Получено %s страниц блокировки подряд, "
+                                    "парсинг остановлен",
+                                    consecutive_blocks,
+                                )
+                                return False
+                        page_stats = collect_page_stats(browser.driver)
+                        cpu_after = driver_cpu_seconds(browser.driver)
+                        load_stats.add(
+                            page_stats,
+                            cpu_after - cpu_before
+                            if cpu_before is not None
+                            and cpu_after is not None
+                            else None,
+                        )
+                        if page_stats:
+                            logger.info(
+                                "Загрузка дела %s: %s байт, %s запросов, "
+                                "%s мс",
+                                case_number,
+                                page_stats.get("bytes", 0),
+                                page_stats.get("requests", 0),
+                                page_stats.get("load_ms"),
                             )
-
-                            # Если есть информация о заседании, создаём событие в календаре
-                            if (web_event.get("hearing_date") and
-                                    web_event.get("hearing_time")):
-                                notify_case_update(
-                                    case_number, web_event, db_event.id)
-                        else:
-                            old_date = parse_date(db_event.event_date)
-                            hearing_changed = (
-                                db_event.hearing_date != web_event.get("hearing_date") or
-                                db_event.hearing_time != web_event.get("hearing_time") or
-                                db_event.hearing_room != web_event.get(
-                                    "hearing_room")
+                        browser.page_done()
+                        METRICS.inc(
+                            "kadbot_cases_processed_total", job="parser"
+                        )
+                        METRICS.progress("parser")
+                        if web_event:
+                            outcome = apply_case_events(
+                                session, case_number, web_event, events_count
                             )
-                            has_newer_event = bool(new_date and (
-                                not old_date or new_date > old_date))
-                            if has_newer_event or hearing_changed:
-                                # Обновляем основную информацию (держим БД в актуальном состоянии)
-                                db_event.event_date = web_event["event_date"]
-                                db_event.event_title = web_event["event_title"]
-                                db_event.event_author = web_event["event_author"]
-                                db_event.event_publish = web_event["event_publish"]
-                                db_event.events_count = events_count
-                                db_event.doc_link = web_event["doc_link"]
-
-                                # Обновляем информацию о заседании
-                                db_event.hearing_date = web_event.get(
-                                    "hearing_date")
-                                db_event.hearing_time = web_event.get(
-                                    "hearing_time")
-                                db_event.hearing_room = web_event.get(
-                                    "hearing_room")
-
-                                # Если изменилась информация о заседании, сбрасываем флаг создания
-                                if hearing_changed:
-                                    db_event.hearing_created_at = None
-
-                                session.commit()
-
-                                logging.info(
-                                    "Обновлено событие для дела "
-                                    f"{case_number}: "
-                                    f"{web_event['event_title']} — "
-                                    f"{web_event['event_date']}"
+                            if outcome != "unchanged":
+                                METRICS.inc(
+                                    "kadbot_case_changes_total",
+                                    job="parser",
+                                    outcome=outcome,
                                 )
-
-                                if hearing_changed:
-                                    logging.info(
-                                        "Обнаружены изменения в информации о заседании "
-                                        f"для дела {case_number}"
-                                    )
-
-                                # Отправляем уведомление и создаём событие в календаре
-                                notify_case_update(
-                                    case_number, web_event, db_event.id)
-                            else:
-                                logging.info(
-                                    f"Без изменений для дела {case_number}")
-                        processed_cases += 1
-                        save_progress(
-                            case_number, index, "parser_progress.json"
+                            processed_cases += 1
+                        else:
+                            logger.warning(
+                                "Не удалось получить события для дела %s",
+                                case_number,
+                            )
+                    except LayoutDriftError:
+                        raise
+                    except WebDriverException as e:
+                        logger.error(
+                            "Ошибка драйвера при обработке дела %s: %s",
+                            case_number,
+                            e,
                         )
-                        pbar.update(1)
+                        browser.recycle_if_dead()
                     except Exception as e:
-                        logging.error(
-                            f"Ошибка обработки дела {case_number}: {e}"
+                        # Ошибка БД оставляет сессию в прерванной
+                        # транзакции: без отката падают следующие запросы
+                        session.rollback()
+                        logger.error(
+                            "Ошибка обработки дела %s: %s", case_number, e
                         )
-                        pbar.update(1)
-                        continue
-                if i + batch_size < len(cases):
-                    logging.info(
-                        f"Пауза {pause_between_batches} секунд перед "
-                        f"следующим пакетом"
-                    )
-                    time.sleep(pause_between_batches)
-        logging.info(
-            f"Завершена обработка {processed_cases} из {len(cases)} дел"
-        )
-        clear_progress("parser_progress.json")
+                    finally:
+                        try:
+                            release_case(session, worker_id, case_number)
+                        except Exception as e:
+                            session.rollback()
+                            logger.error(
+                                "Не удалось освободить аренду дела %s: %s",
+                                case_number,
+                                e,
+                            )
+                    pbar.update(1)
+                logger.info(
+                    "Пауза %s секунд перед следующим пакетом",
+                    pause_between_batches,
+                )
+                time.sleep(pause_between_batches)
+        logger.info("Завершена обработка %s из %s дел", processed_cases, total)
+        logger.info(load_stats.summary())
+        try:
+            write_hearings_ics(session)
+        except Exception as e:
+            logger.error("Не удалось записать календарь заседаний: %s", e)
+        reconcile_after_scrape(session)
+        flush_after_scrape(session)
+        return True
     except KeyboardInterrupt:
-        logging.info("Процесс прерван пользователем")
+        logger.info("Процесс прерван пользователем")
+        return False
+    except LayoutDriftError as e:
+        # Необработанные дела возвращаются в общий список: после обновления
+        # селекторов запуск продолжится с них
+        logger.critical("Парсинг остановлен: %s", e)
+        raise
     except Exception as e:
-        logging.error(f"Ошибка в sync_chronology: {e}")
+        logger.error("Ошибка в sync_chronology: %s", e)
+        return False
     finally:
-        if driver:
-            driver.quit()
-            logging.info("Chrome драйвер закрыт")
+        try:
+            release_unfinished(session, worker_id)
+        except Exception as e:
+            logger.error("Не удалось освободить аренду дел: %s", e)
+        TIMINGS.write_summary()
+        job_finished("parser")
+        browser.close()
         session.close()
-        logging.info("Сессия базы данных закрыта")
+        logger.info("Сессия базы данных закрыта")
 
 
 def notify_case_update(
+    session,
     case_number: str,
     event_data: Dict[str, Any],
     chronology_id: int
 ) -> None:
     """
-    Отправляет уведомление об обновлении дела в CRM и создаёт событие в календаре.
+    Ставит уведомление об обновлении дела в очередь CRM.
+
+    Уведомления проекта копятся NOTIFY_COALESCE_SECONDS и уходят одним
+    комментарием (notify_outbox). События календаря для заседаний создаёт,
+    переносит и удаляет сверка календаря (calendar_reconcile) по таблице
+    hearings.
 
     Args:
+        session: Сессия базы данных
         case_number: Номер дела
         event_data: Данные события для уведомления
         chronology_id: ID записи в таблице Chronology
     """
     project_id = get_project_id_for_case(case_number)
     if not project_id:
-        logging.warning(f"Не найден project_id для дела {case_number}")
+        logger.warning("Не найден project_id для дела %s", case_number)
         return
 
     try:
-        # Отправляем комментарий в CRM
-        send_case_update_comment(
-            project_id=project_id,
-            event_title=event_data.get("event_title", "Без названия"),
-            event_date=event_data.get("event_date", "Не указана"),
-            doc_link=event_data.get("doc_link"),
+        enqueue_notification(
+            session, project_id, case_number, event_data, chronology_id
         )
-        logging.info(
-            f"Комментарий успешно отправлен в CRM для дела {case_number}"
-        )
-
-        # Проверяем, нужно ли создать событие в календаре
-        hearing_date = event_data.get("hearing_date")
-        hearing_time = event_data.get("hearing_time")
-
-        if hearing_date and hearing_time:
-            # Проверяем, не было ли уже создано событие для этого заседания
-            session = Session()
-            try:
-                db_event = session.query(Chronology).get(chronology_id)
-                if db_event and db_event.hearing_created_at:
-                    logging.info(
-                        f"Событие в календаре уже создано для дела {case_number} "
-                        f"в {db_event.hearing_created_at}"
-                    )
-                    return
-            finally:
-                session.close()
-
-            try:
-                logging.info(
-                    "Найдена информация о заседании для дела %s: "
-                    "дата=%s, время=%s, кабинет=%s",
-                    case_number,
-                    hearing_date,
-                    hearing_time,
-                    event_data.get("hearing_room") or "не указан",
-                )
-
-                # Парсим дату и время
-                date_obj = datetime.strptime(hearing_date, "%d.%m.%Y")
-                time_obj = datetime.strptime(hearing_time, "%H:%M").time()
-                hearing_datetime = datetime.combine(date_obj.date(), time_obj)
-
-                logging.info(
-                    "Создаю событие календаря для дела %s на %s",
-                    case_number,
-                    hearing_datetime.strftime("%d.%m.%Y %H:%M"),
-                )
-
-                # Создаём событие в календаре CRM (жёстко в календарь ID 49)
-                calendar_result = create_project_calendar_event(
-                    project_id=project_id,
-                    case_number=case_number,
-                    start_dt=hearing_datetime,
-                    duration_minutes=60,
-                    room=event_data.get("hearing_room"),
-                    event_calendar_id=49,
-                )
-
-                if calendar_result:
-                    # Обновляем флаг создания события в БД
-                    session = Session()
-                    try:
-                        db_event = session.query(Chronology).get(chronology_id)
-                        if db_event:
-                            db_event.hearing_created_at = datetime.now().strftime(
-                                "%Y-%m-%d %H:%M:%S"
-                            )
-                            session.commit()
-                            logging.info(
-                                "Обновлён флаг создания события в календаре "
-                                f"для дела {case_number}"
-                            )
-                    finally:
-                        session.close()
-
-                    logging.info(
-                        "Событие календаря успешно создано для дела %s. "
-                        "Результат: %s",
-                        case_number,
-                        calendar_result,
-                    )
-                else:
-                    logging.warning(
-                        "Не удалось создать событие календаря для дела %s",
-                        case_number,
-                    )
-
-            except Exception as e:
-                logging.error(
-                    "Ошибка при создании события календаря для дела %s: %s",
-                    case_number,
-                    str(e),
-                    exc_info=True,
-                )
-        else:
-            logging.info(
-                "Информация о следующем заседании для дела %s не найдена",
-                case_number,
-            )
-
+        flush_notifications(session)
     except Exception as e:
-        logging.error(
-            f"Ошибка отправки комментария в CRM для дела {case_number}: {e}"
+        session.rollback()
+        logger.error(
+            "Ошибка постановки уведомления в очередь для дела %s: %s",
+            case_number,
+            e,
         )
 
 
@@ -0,0 +1,197 @@
+"""
+Модуль пакетной записи дел и хронологии.
+
+Записи сохраняются одним оператором INSERT ... ON CONFLICT DO UPDATE на
+пакет строк вместо выборки и изменения каждой строки через ORM. Оператор
+строится диалектом текущей БД (SQLite или PostgreSQL); для других БД
+используется построчная запись с тем же результатом.
+
+Функции не фиксируют транзакцию: вызывающий код выполняет commit, поэтому
+запись может входить в одну транзакцию с другими изменениями.
+
+Пример:
+    upsert_cases(session, [{"case_number": "А40-1/2024", "project_id": 7}])
+    session.commit()
+"""
+
+import logging
+from typing import Any, Dict, Iterable, List, Sequence
+
+from sqlalchemy import select, update  # type: ignore
+
+from models import Cases, Chronology
+
+logger = logging.getLogger(__name__)
+
+# Строк в одном операторе: SQLite ограничивает число параметров запроса
+UPSERT_CHUNK_SIZE = 500
+
+
+def dialect_insert(session):
+    """
+    Возвращает конструктор INSERT с поддержкой ON CONFLICT для диалекта
+    сессии или None, если диалект его не поддерживает.
+    """
+    dialect = session.get_bind().dialect.name
+    if dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert  # type: ignore
+
+        return insert
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert  # type: ignore
+
+        return insert
+    return None
+
+
+def _chunks(rows: Sequence[Dict[str, Any]], size: int):
+    """Делит строки на пакеты по size."""
+    for start in range(0, len(rows), size):
+        yield rows[start: start + size]
+
+
+def _group_by_columns(
+    rows: Iterable[Dict[str, Any]]
+) -> Dict[tuple, List[Dict[str, Any]]]:
+    """
+    Группирует строки по набору столбцов: в одном операторе все строки
+    должны обновлять одни и те же столбцы.
+    """
+    groups: Dict[tuple, List[Dict[str, Any]]] = {}
+    for row in rows:
+        groups.setdefault(tuple(sorted(row)), []).append(row)
+    return groups
+
+
+def _upsert(
+    session,
+    model,
+    rows: Sequence[Dict[str, Any]],
+    key: str,
+) -> Dict[str, int]:
+    """
+    Добавляет или обновляет строки по уникальному столбцу key.
+
+    Строки с одинаковым key объединяются до записи (более поздние значения
+    заменяют ранние): PostgreSQL не позволяет одному INSERT ... ON
+    CONFLICT DO UPDATE изменить строку дважды. Транзакция не фиксируется.
+
+    Args:
+        session: Сессия базы данных
+        model: Модель SQLAlchemy
+        rows: Строки в виде словарей столбец -> значение; столбцы, которых
+            нет в строке, у существующей записи не меняются
+        key: Уникальный столбец, по которому ищется существующая запись
+
+    Returns:
+        Dict[str, int]: Значение key -> id записи
+    """
+    merged: Dict[Any, Dict[str, Any]] = {}
+    for row in rows:
+        merged[row[key]] = {**merged.get(row[key], {}), **row}
+    rows = list(merged.values())
+
+    ids: Dict[str, int] = {}
+    insert = dialect_insert(session)
+    table = model.__table__
+    for columns, group in _group_by_columns(rows).items():
+        changed = [column for column in columns if column != key]
+        for chunk in _chunks(group, UPSERT_CHUNK_SIZE):
+            if insert is None:
+                ids.update(_upsert_rows(session, model, chunk, key))
+                continue
+            statement = insert(table).values(chunk)
+            if changed:
+                statement = statement.on_conflict_do_update(
+                    index_elements=[key],
+                    set_={
+                        column: statement.excluded[column]
+                        for column in changed
+                    },
+                )
+            else:
+                statement = statement.on_conflict_do_nothing(
+                    index_elements=[key]
+                )
+            result = session.execute(
+                statement.returning(table.c[key], table.c.id)
+            )
+            ids.update({value: row_id for value, row_id in result})
+    # Строки, не вернувшиеся из DO NOTHING, уже существовали
+    missing = [row[key] for row in rows if row[key] not in ids]
+    if missing:
+        ids.update(
+            session.execute(
+                select(table.c[key], table.c.id).where(
+                    table.c[key].in_(missing)
+                )
+            ).all()
+        )
+    return ids
+
+
+def _upsert_rows(
+    session, model, rows: Sequence[Dict[str, Any]], key: str
+) -> Dict[str, int]:
+    """Построчная запись для БД без INSERT ... ON CONFLICT."""
+    ids = {}
+    column = getattr(model, key)
+    for row in rows:
+        row_id = session.execute(
+            select(model.id).where(column == row[key])
+        ).scalar()
+        if row_id is None:
+            obj = model(**row)
+            session.add(obj)
+            session.flush()
+            row_id = obj.id
+        else:
+            values = {k: v for k, v in row.items() if k != key}
+            if values:
+                session.execute(
+                    update(model).where(model.id == row_id).values(**values)
+                )
+        ids[row[key]] = row_id
+    return ids
+
+
+def upsert_cases(
+    session, rows: Iterable[Dict[str, Any]]
+) -> Dict[str, int]:
+    """
+    Добавляет дела или обновляет существующие по номеру дела.
+
+    Args:
+        session: Сессия базы данных
+        rows: Строки с case_number и изменяемыми столбцами (project_id)
+
+    Returns:
+        Dict[str, int]: Номер дела -> id записи в cases
+    """
+    rows = list(rows)
+    if not rows:
+        return {}
+    ids = _upsert(session, Cases, rows, "case_number")
+    logger.debug("Записано дел: %s", len(ids))
+    return ids
+
+
+def upsert_chronology(
+    session, rows: Iterable[Dict[str, Any]]
+) -> Dict[str, int]:
+    """
+    Добавляет или обновляет последнее событие дел (одна запись на дело).
+
+    Args:
+        session: Сессия базы данных
+        rows: Строки с case_number и столбцами события
+
+    Returns:
+        Dict[str, int]: Номер дела -> id записи в chronology
+    """
+    rows = list(rows)
+    if not rows:
+        return {}
+    ids = _upsert(session, Chronology, rows, "case_number")
+    logger.debug("Записано событий хронологии: %s", len(ids))
+    return ids
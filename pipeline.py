@@ -0,0 +1,294 @@
+"""
+Модуль потокового конвейера из нескольких стадий.
+Стадии связаны ограниченными очередями: если следующая стадия не успевает,
+предыдущая блокируется на записи в очередь (backpressure), а не копит
+данные в памяти или на диске.
+"""
+
+import logging
+import queue
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+from logging_setup import bind_log_context
+from metrics import METRICS
+
+logger = logging.getLogger(__name__)
+
+# Маркер конца потока: рабочий поток, получивший его, возвращает маркер в
+# очередь для остальных потоков стадии
+_STOP = object()
+
+
+class Stage:
+    """
+    Стадия конвейера.
+
+    Обработчик вызывается как handler(item, context) и возвращает элемент
+    для следующей стадии или None, если элемент дальше не передаётся.
+    context — объект, созданный setup() для каждого рабочего потока
+    (например, собственный Chrome драйвер), или None.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        handler: Callable[[Any, Any], Any],
+        workers: int = 1,
+        queue_size: int = 10,
+        setup: Optional[Callable[[], Any]] = None,
+        teardown: Optional[Callable[[Any], None]] = None,
+    ) -> None:
+        self.name = name
+        self.handler = handler
+        self.workers = workers
+        self.queue: "queue.Queue[Any]" = queue.Queue(maxsize=queue_size)
+        self.setup = setup
+        self.teardown = teardown
+        self.processed = 0
+        self.dropped = 0
+        self.failed = 0
+        self.busy_seconds = 0.0
+        self.max_seconds = 0.0
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float, outcome: str) -> None:
+        """
+        Учитывает обработку одного элемента.
+
+        Args:
+            seconds: Длительность обработки
+            outcome: "processed", "dropped" или "failed"
+        """
+        with self._lock:
+            setattr(self, outcome, getattr(self, outcome) + 1)
+            self.busy_seconds += seconds
+            self.max_seconds = max(self.max_seconds, seconds)
+
+    def snapshot(self) -> Dict[str, Any]:
+        """
+        Возвращает метрики стадии.
+
+        Returns:
+            Dict[str, Any]: Глубина очереди, счётчики и задержки
+        """
+        with self._lock:
+            handled = self.processed + self.dropped + self.failed
+            return {
+                "stage": self.name,
+                "workers": self.workers,
+                "queue_depth": self.queue.qsize(),
+                "queue_size": self.queue.maxsize,
+                "processed": self.processed,
+                "dropped": self.dropped,
+                "failed": self.failed,
+                "avg_seconds": (
+                    round(self.busy_seconds / handled, 3) if handled else 0.0
+                ),
+                "max_seconds": round(self.max_seconds, 3),
+            }
+
+
+class Pipeline:
+    """
+    Конвейер из последовательных стадий с ограниченными очередями.
+    """
+
+    def __init__(
+        self,
+        stages: List[Stage],
+        on_finish: Optional[Callable[[Any, bool], None]] = None,
+        report_interval: float = 60.0,
+    ) -> None:
+        """
+        Args:
+            stages: Стадии в порядке обработки
+            on_finish: Вызывается, когда элемент покидает конвейер:
+                on_finish(item, True) после последней стадии,
+                on_finish(item, False), если элемент отброшен или упал
+            report_interval: Период записи метрик в лог в секундах
+        """
+        self.stages = stages
+        self.on_finish = on_finish
+        self.report_interval = report_interval
+        self._live_workers = [stage.workers for stage in stages]
+        self._lock = threading.Lock()
+        self._done = threading.Event()
+
+    def snapshot(self) -> List[Dict[str, Any]]:
+        """
+        Возвращает метрики всех стадий.
+
+        Returns:
+            List[Dict[str, Any]]: Метрики по стадиям
+        """
+        return [stage.snapshot() for stage in self.stages]
+
+    def log_metrics(self) -> None:
+        """Пишет в лог глубину очередей и задержки стадий."""
+        for metrics in self.snapshot():
+            logger.info(
+                "Конвейер, стадия %(stage)s: очередь %(queue_depth)s/"
+                "%(queue_size)s, обработано %(processed)s, отброшено "
+                "%(dropped)s, ошибок %(failed)s, среднее %(avg_seconds)s с, "
+                "максимум %(max_seconds)s с",
+                metrics,
+            )
+
+    def run(self, source: Iterable[Any]) -> List[Dict[str, Any]]:
+        """
+        Прогоняет элементы источника через все стадии и ждёт завершения.
+
+        Источник читается в вызывающем потоке; запись в очередь первой
+        стадии блокируется, если она заполнена.
+
+        Args:
+            source: Итерируемый источник элементов (стадия обнаружения)
+
+        Returns:
+            List[Dict[str, Any]]: Итоговые метрики по стадиям
+        """
+        threads = []
+        for index, stage in enumerate(self.stages):
+            for number in range(stage.workers):
+                thread = threading.Thread(
+                    target=self._worker,
+                    args=(index,),
+                    name=f"{stage.name}-{number + 1}",
+                    daemon=True,
+                )
+                thread.start()
+                threads.append(thread)
+
+        reporter = threading.Thread(
+            target=self._report_loop, name="pipeline-metrics", daemon=True
+        )
+        reporter.start()
+        METRICS.add_collector(self._export_queue_depth)
+
+        try:
+            for item in source:
+                self.stages[0].queue.put(item)
+        finally:
+            self.stages[0].queue.put(_STOP)
+            for thread in threads:
+                thread.join()
+            self._done.set()
+            reporter.join()
+            METRICS.remove_collector(self._export_queue_depth)
+            self._export_queue_depth()
+
+        self.log_metrics()
+        return self.snapshot()
+
+    def _report_loop(self) -> None:
+        """Периодически пишет метрики в лог, пока конвейер работает."""
+        while not self._done.wait(self.report_interval):
+            self.log_metrics()
+
+    def _export_queue_depth(self) -> None:
+        """Передаёт глубину очередей стадий в общий реестр метрик."""
+        for stage in self.stages:
+            METRICS.set(
+                "kadbot_queue_depth", stage.queue.qsize(), stage=stage.name
+            )
+
+    def _finish(self, item: Any, ok: bool) -> None:
+        """Сообщает о выходе элемента из конвейера."""
+        if self.on_finish:
+            try:
+                self.on_finish(item, ok)
+            except Exception as e:
+                logger.error("Ошибка в обработчике завершения: %s", e)
+
+    def _worker(self, index: int) -> None:
+        """Рабочий поток стадии с номером index."""
+        stage = self.stages[index]
+        next_stage = (
+            self.stages[index + 1] if index + 1 < len(self.stages) else None
+        )
+        context = None
+        failed = False
+        try:
+            if stage.setup:
+                context = stage.setup()
+            while True:
+                item = stage.queue.get()
+                if item is _STOP:
+                    break
+                bind_log_context(
+                    stage=stage.name,
+                    case_number=getattr(item, "case_number", None),
+                )
+                started = time.monotonic()
+                try:
+                    result = stage.handler(item, context)
+                except Exception as e:
+                    stage.record(time.monotonic() - started, "failed")
+                    logger.error("Ошибка на стадии %s: %s", stage.name, e)
+                    self._finish(item, False)
+                    continue
+                if result is None:
+                    stage.record(time.monotonic() - started, "dropped")
+                    self._finish(item, False)
+                    continue
+                stage.record(time.monotonic() - started, "processed")
+                if next_stage is not None:
+                    # Блокируется, пока следующая стадия не освободит место
+                    next_stage.queue.put(result)
+                else:
+                    self._finish(result, True)
+        except Exception as e:
+            logger.error("Рабочий поток стадии %s упал: %s", stage.name, e)
+            failed = True
+        finally:
+            if stage.teardown and context is not None:
+                try:
+                    stage.teardown(context)
+                except Exception as e:
+                    logger.error(
+                        "Ошибка завершения стадии %s: %s", stage.name, e
+                    )
+            self._stop_worker(index, failed)
+
+    def _drain(self, stage: Stage) -> None:
+        """
+        Разгружает очередь стадии, у которой не осталось рабочих потоков.
+
+        Элементы отбрасываются до маркера остановки, чтобы предыдущая
+        стадия не заблокировалась навсегда на заполненной очереди.
+        """
+        while True:
+            item = stage.queue.get()
+            if item is _STOP:
+                return
+            stage.record(0.0, "failed")
+            self._finish(item, False)
+
+    def _stop_worker(self, index: int, failed: bool) -> None:
+        """
+        Учитывает остановку рабочего потока.
+
+        Маркер остановки, полученный потоком, возвращается в очередь для
+        остальных потоков стадии. Упавший поток оставляет элементы очереди
+        работающим потокам стадии; если он был последним, очередь
+        разгружается. После остановки последнего потока стадии маркер
+        отправляется следующей стадии.
+
+        Args:
+            index: Номер стадии
+            failed: Поток упал, не дойдя до маркера остановки
+        """
+        stage = self.stages[index]
+        with self._lock:
+            self._live_workers[index] -= 1
+            last = self._live_workers[index] == 0
+        if not last:
+            if not failed:
+                stage.queue.put(_STOP)
+            return
+        if failed:
+            self._drain(stage)
+        if index + 1 < len(self.stages):
+            self.stages[index + 1].queue.put(_STOP)
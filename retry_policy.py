@@ -0,0 +1,284 @@
+"""
+Модуль политики повторов при парсинге карточек дел.
+
+Ошибки делятся на классы:
+    transient — таймауты и сетевые сбои: повторяются, пока не исчерпаны
+        попытки или время, отведённое на дело;
+    blocked — страница блокировки IP: не повторяется, после нескольких
+        блокировок подряд запуск останавливается;
+    permanent — дело недоступно (ограничение подписки, дело не найдено):
+        не повторяется и записывается в cases, следующий запуск его
+        пропускает;
+    layout — не найден обязательный элемент разметки: не повторяется,
+        учитывается монитором селекторов.
+"""
+
+import logging
+import os
+import random
+import time
+from datetime import datetime
+from typing import Optional
+
+from models import Cases
+
+try:
+    from selenium.common.exceptions import (  # type: ignore
+        TimeoutException,
+        WebDriverException,
+    )
+except ImportError:  # pragma: no cover - selenium нужен только парсеру
+    TimeoutException = WebDriverException = ()  # type: ignore
+
+logger = logging.getLogger(__name__)
+
+TRANSIENT = "transient"
+BLOCKED = "blocked"
+PERMANENT = "permanent"
+LAYOUT = "layout"
+
+CASE_MAX_ATTEMPTS = int(os.getenv("CASE_MAX_ATTEMPTS", "3"))
+# Общее время на одно дело, включая повторы и паузы между ними
+CASE_DEADLINE_SECONDS = float(os.getenv("CASE_DEADLINE_SECONDS", "120"))
+# Остановить запуск после стольких страниц блокировки подряд
+MAX_CONSECUTIVE_BLOCKS = int(os.getenv("MAX_CONSECUTIVE_BLOCKS", "3"))
+
+BLOCK_MARKERS = ["Доступ к сервису ограничен"]
+SUBSCRIPTION_MARKERS = ["Вы можете оформить подписку на 40 дел"]
+NOT_FOUND_MARKERS = ["Дело не найдено", "Карточка дела не найдена"]
+
+
+class CaseFailure(Exception):
+    """Неудачная попытка получить карточку дела с классом ошибки."""
+
+    def __init__(self, kind: str, reason: str) -> None:
+        super().__init__(f"{kind}: {reason}")
+        self.kind = kind
+        self.reason = reason
+
+
+def classify_page(page_source: str) -> Optional[CaseFailure]:
+    """
+    Определяет по тексту страницы, что дело получить нельзя.
+
+    Args:
+        page_source: HTML загруженной карточки
+
+    Returns:
+        CaseFailure: Класс и причина ошибки или None, если страница обычная
+    """
+    if any(marker in page_source for marker in BLOCK_MARKERS):
+        return CaseFailure(BLOCKED, "IP заблокирован")
+    if any(marker in page_source for marker in SUBSCRIPTION_MARKERS):
+        return CaseFailure(PERMANENT, "доступ ограничен подпиской")
+    if any(marker in page_source for marker in NOT_FOUND_MARKERS):
+        return CaseFailure(PERMANENT, "дело не найдено")
+    return None
+
+
+def classify_exception(exc: Exception) -> CaseFailure:
+    """
+    Приводит исключение при парсинге к CaseFailure.
+
+    Args:
+        exc: Исключение
+
+    Returns:
+        CaseFailure: Исходное исключение, если это CaseFailure, иначе
+            transient-ошибка
+    """
+    if isinstance(exc, CaseFailure):
+        return exc
+    if isinstance(exc, TimeoutException):
+        return CaseFailure(TRANSIENT, f"таймаут: {exc}")
+    if isinstance(exc, WebDriverException):
+        return CaseFailure(TRANSIENT, f"ошибка драйвера: {exc}")
+    return CaseFailure(TRANSIENT, f"{type(exc).__name__}: {exc}")
+
+
+class RetryPolicy:
+    """
+    Параметры повторов: число попыток, общий срок на дело и паузы.
+    """
+
+    def __init__(
+        self,
+        max_attempts: int = CASE_MAX_ATTEMPTS,
+        deadline: float = CASE_DEADLINE_SECONDS,
+        min_delay: float = 2.0,
+        max_delay: float = 5.0,
+    ) -> None:
+        """
+        Args:
+            max_attempts: Максимальное число попыток на дело
+            deadline: Общее время на дело в секундах
+            min_delay: Минимальная пауза перед повтором
+            max_delay: Максимальная пауза перед повтором
+        """
+        self.max_attempts = max_attempts
+        self.deadline = deadline
+        self.min_delay = min_delay
+        self.max_delay = max_delay
+
+    def start(self) -> "CaseBudget":
+        """Начинает отсчёт попыток и времени для нового дела."""
+        return CaseBudget(self)
+
+
+class CaseBudget:
+    """
+    Попытки и оставшееся время для одного дела.
+
+    Пример:
+        budget = policy.start()
+        failure = None
+        while budget.next_attempt(failure):
+            try:
+                return scrape()
+            except Exception as e:
+                failure = classify_exception(e)
+        raise budget.give_up(failure)
+    """
+
+    def __init__(self, policy: RetryPolicy) -> None:
+        self.policy = policy
+        self.started = time.monotonic()
+        self.attempt = 0
+
+    def elapsed(self) -> float:
+        """Время, прошедшее с начала обработки дела."""
+        return time.monotonic() - self.started
+
+    def remaining(self) -> float:
+        """Оставшееся время на дело в секундах."""
+        return self.policy.deadline - self.elapsed()
+
+    def timeout(self, seconds: float) -> float:
+        """
+        Ограничивает таймаут ожидания оставшимся временем на дело.
+
+        Args:
+            seconds: Обычный таймаут ожидания
+
+        Returns:
+            float: Таймаут не больше оставшегося времени (но не меньше 1 с)
+        """
+        return max(1.0, min(seconds, self.remaining()))
+
+    def delay_before_next(
+        self, failure: Optional[CaseFailure]
+    ) -> Optional[float]:
+        """
+        Решает, нужна ли следующая попытка, и возвращает паузу перед ней.
+
+        Args:
+            failure: Ошибка предыдущей попытки (None перед первой)
+
+        Returns:
+            float: Пауза в секундах или None, если повторять не нужно
+        """
+        if failure is None:
+            return 0.0 if self.attempt == 0 else None
+        if failure.kind != TRANSIENT:
+            return None
+        if self.attempt >= self.policy.max_attempts:
+            return None
+        delay = random.uniform(self.policy.min_delay, self.policy.max_delay)
+        if self.remaining() <= delay:
+            return None
+        return delay
+
+    def next_attempt(self, failure: Optional[CaseFailure] = None) -> bool:
+        """
+        Выдерживает паузу и разрешает следующую попытку.
+
+        Args:
+            failure: Ошибка предыдущей попытки (None перед первой)
+
+        Returns:
+            bool: True, если можно выполнить ещё одну попытку
+        """
+        delay = self.delay_before_next(failure)
+        if delay is None:
+            return False
+        if delay:
+            time.sleep(delay)
+        self.attempt += 1
+        return True
+
+    def give_up(self, failure: Optional[CaseFailure]) -> CaseFailure:
+        """
+        Возвращает итоговую ошибку по делу после последней попытки.
+
+        Args:
+            failure: Ошибка последней попытки
+
+        Returns:
+            CaseFailure: Ошибка для вызывающего кода
+        """
+        if failure is None:
+            return CaseFailure(TRANSIENT, "не выполнено ни одной попытки")
+        if failure.kind != TRANSIENT:
+            return failure
+        return CaseFailure(
+            TRANSIENT,
+            f"{failure.reason} (попыток {self.attempt}, "
+            f"{self.elapsed():.0f} с)",
+        )
+
+
+DEFAULT_POLICY = RetryPolicy()
+
+
+def record_case_failure(
+    session, case_number: str, failure: CaseFailure
+) -> None:
+    """
+    Записывает постоянную ошибку по делу, чтобы следующие запуски его
+    пропускали.
+
+    Args:
+        session: Сессия базы данных
+        case_number: Номер дела
+        failure: Ошибка по делу
+    """
+    if failure.kind != PERMANENT:
+        return
+    case = session.query(Cases).filter_by(case_number=case_number).first()
+    if not case:
+        return
+    case.scrape_status = PERMANENT
+    case.scrape_error = failure.reason
+    case.scrape_failed_at = datetime.now()
+    session.commit()
+    logger.warning(
+        "Дело %s отмечено как недоступное: %s", case_number, failure.reason
+    )
+
+
+def reset_permanent_failures(session) -> int:
+    """
+    Снимает отметки о постоянных ошибках (например, после продления
+    подписки).
+
+    Args:
+        session: Сессия базы данных
+
+    Returns:
+        int: Количество дел, возвращённых в обработку
+    """
+    count = (
+        session.query(Cases)
+        .filter(Cases.scrape_status == PERMANENT)
+        .update(
+            {
+                Cases.scrape_status: None,
+                Cases.scrape_error: None,
+                Cases.scrape_failed_at: None,
+            },
+            synchronize_session=False,
+        )
+    )
+    session.commit()
+    logger.info("Сброшены постоянные ошибки по %s делам", count)
+    return count
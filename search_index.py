@@ -0,0 +1,262 @@
+"""
+Модуль полнотекстового поиска по документам.
+
+Текст документов после OCR, название и автор события и номер дела
+индексируются в виртуальной таблице SQLite FTS5 document_search. Индекс
+пополняется стадией индексации конвейера скачивания документов (одна
+запись на документ, rowid совпадает с document_states.id), поэтому поиск
+по десяткам тысяч документов — один запрос к индексу вместо grep по папке.
+
+FTS5 есть только в SQLite: для серверной БД индекс не создаётся, а поиск
+возвращает пустой результат.
+
+Пример:
+    python search_index.py "ООО Ромашка неустойка" --limit 10
+    python search_index.py --rebuild
+"""
+
+import argparse
+import logging
+import os
+import re
+import time
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import text  # type: ignore
+
+from models import Chronology, DocumentState
+
+logger = logging.getLogger(__name__)
+
+SEARCH_TABLE = "document_search"
+# Слов контекста вокруг совпадения во фрагменте
+SEARCH_SNIPPET_WORDS = int(os.getenv("SEARCH_SNIPPET_WORDS", "12"))
+
+# Столбцы индекса; rowid — id записи в document_states
+_COLUMNS = ("case_number", "event_title", "event_author", "body")
+
+
+def is_supported(bind) -> bool:
+    """
+    Проверяет, поддерживает ли БД полнотекстовый индекс (SQLite).
+
+    Args:
+        bind: Engine, Connection или Session
+
+    Returns:
+        bool: True для SQLite
+    """
+    if hasattr(bind, "get_bind"):
+        bind = bind.get_bind()
+    return bind.dialect.name == "sqlite"
+
+
+def ensure_search_index(engine) -> bool:
+    """
+    Создаёт таблицу FTS5, если её ещё нет.
+
+    Args:
+        engine: Engine базы данных
+
+    Returns:
+        bool: False, если БД не поддерживает FTS5
+    """
+    if not is_supported(engine):
+        logger.warning(
+            "Полнотекстовый поиск доступен только для SQLite, индекс не "
+            "создан"
+        )
+        return False
+    with engine.connect() as conn:
+        conn.execute(
+            text(
+                f"CREATE VIRTUAL TABLE IF NOT EXISTS {SEARCH_TABLE} USING "
+                f"fts5({', '.join(_COLUMNS)}, file_path UNINDEXED, "
+                "tokenize = 'unicode61 remove_diacritics 2')"
+            )
+        )
+        conn.commit()
+    return True
+
+
+def _event_author(session, state: DocumentState) -> Optional[str]:
+    """Возвращает автора события, к которому относится документ."""
+    if not state.chronology_id:
+        return None
+    event = session.get(Chronology, state.chronology_id)
+    return event.event_author if event else None
+
+
+def index_document(session, state: DocumentState, body: str) -> None:
+    """
+    Добавляет документ в индекс или заменяет его прежнюю запись.
+
+    Args:
+        session: Сессия базы данных
+        state: Запись состояния документа
+        body: Текст документа после OCR
+    """
+    if not is_supported(session):
+        return
+    session.execute(
+        text(f"DELETE FROM {SEARCH_TABLE} WHERE rowid = :id"),
+        {"id": state.id},
+    )
+    session.execute(
+        text(
+            f"INSERT INTO {SEARCH_TABLE} (rowid, {', '.join(_COLUMNS)}, "
+            "file_path) VALUES (:id, :case_number, :event_title, "
+            ":event_author, :body, :file_path)"
+        ),
+        {
+            "id": state.id,
+            "case_number": state.case_number,
+            "event_title": state.event_title,
+            "event_author": _event_author(session, state),
+            "body": body,
+            "file_path": state.file_path,
+        },
+    )
+    session.commit()
+
+
+def rebuild_search_index(session) -> int:
+    """
+    Заново строит индекс по текстовым файлам распознанных документов.
+
+    Нужен один раз для документов, распознанных до появления индекса.
+
+    Args:
+        session: Сессия базы данных
+
+    Returns:
+        int: Количество проиндексированных документов
+    """
+    if not ensure_search_index(session.get_bind()):
+        return 0
+    session.execute(text(f"DELETE FROM {SEARCH_TABLE}"))
+    session.commit()
+    indexed = 0
+    states = (
+        session.query(DocumentState)
+        .filter(DocumentState.file_path.isnot(None))
+        .order_by(DocumentState.id)
+        .all()
+    )
+    for state in states:
+        text_path = f"{state.file_path}.txt"
+        if not os.path.exists(text_path):
+            continue
+        with open(text_path, encoding="utf-8") as f:
+            index_document(session, state, f.read())
+        indexed += 1
+    logger.info("Проиндексировано документов: %s", indexed)
+    return indexed
+
+
+def _match_expression(query: str) -> str:
+    """
+    Превращает пользовательский запрос в выражение MATCH: каждое слово
+    ищется как префикс, все слова обязательны. Спецсимволы FTS5 в словах
+    не интерпретируются.
+    """
+    words = re.findall(r"\w+", query)
+    return " ".join(f'"{word}"*' for word in words)
+
+
+def search(
+    session,
+    query: str,
+    limit: int = 20,
+    case_number: Optional[str] = None,
+) -> List[Dict[str, Any]]:
+    """
+    Ищет документы по тексту, названию и автору события и номеру дела.
+
+    Args:
+        session: Сессия базы данных
+        query: Слова для поиска (все обязательны, ищутся по началу слова)
+        limit: Максимальное количество результатов
+        case_number: Искать только в документах этого дела
+
+    Returns:
+        List[Dict[str, Any]]: Результаты по убыванию релевантности с
+            ключами case_number, document_id, file_path, event_title,
+            snippet и rank (меньше — релевантнее)
+    """
+    expression = _match_expression(query)
+    if not expression or not is_supported(session):
+        return []
+    sql = (
+        f"SELECT rowid, case_number, file_path, event_title, "
+        f"snippet({SEARCH_TABLE}, {_COLUMNS.index('body')}, '[', ']', "
+        f"'…', :words) AS snippet, bm25({SEARCH_TABLE}) AS rank "
+        f"FROM {SEARCH_TABLE} WHERE {SEARCH_TABLE} MATCH :expression"
+    )
+    params: Dict[str, Any] = {
+        "expression": expression,
+        "words": SEARCH_SNIPPET_WORDS,
+        "limit": limit,
+    }
+    if case_number:
+        sql += " AND case_number = :case_number"
+        params["case_number"] = case_number
+    sql += " ORDER BY rank LIMIT :limit"
+    return [
+        {
+            "case_number": row.case_number,
+            "document_id": row.rowid,
+            "file_path": row.file_path,
+            "event_title": row.event_title,
+            "snippet": row.snippet,
+            "rank": row.rank,
+        }
+        for row in session.execute(text(sql), params)
+    ]
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """
+    Командная строка поиска.
+
+    Args:
+        argv: Аргументы командной строки (по умолчанию sys.argv[1:])
+
+    Returns:
+        int: Код возврата процесса
+    """
+    from db import Session
+    from logging_setup import setup_logging
+
+    cli = argparse.ArgumentParser(description="Поиск по документам")
+    cli.add_argument("query", nargs="*", help="Слова для поиска")
+    cli.add_argument("--limit", type=int, default=20)
+    cli.add_argument("--case", default=None, help="Номер дела")
+    cli.add_argument(
+        "--rebuild",
+        action="store_true",
+        help="Заново построить индекс по текстовым файлам документов",
+    )
+    args = cli.parse_args(argv)
+    setup_logging()
+    session = Session()
+    try:
+        if args.rebuild:
+            indexed = rebuild_search_index(session)
+            print(f"Проиндексировано документов: {indexed}")
+        if not args.query:
+            return 0
+        started = time.perf_counter()
+        hits = search(session, " ".join(args.query), args.limit, args.case)
+        elapsed = (time.perf_counter() - started) * 1000
+        for hit in hits:
+            print(f"{hit['case_number']}  {hit['file_path']}")
+            print(f"    {hit['snippet']}")
+        print(f"Найдено: {len(hits)} за {elapsed:.1f} мс")
+        return 0
+    finally:
+        session.close()
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
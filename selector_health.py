@@ -0,0 +1,134 @@
+"""
+Модуль контроля селекторов разметки kad.arbitr.ru.
+
+Для каждого обязательного селектора хранится скользящее окно последних
+результатов поиска (найден/не найден). Если селектор не находится подряд
+на нескольких делах или доля промахов в окне превышает порог, значит
+разметка сайта изменилась: запуск останавливается с LayoutDriftError,
+вместо того чтобы часами ждать таймауты и писать дампы ошибок по каждому
+делу.
+"""
+
+import logging
+import os
+import threading
+from collections import deque
+from typing import Deque, Dict
+
+from kad_selectors import SELECTORS, SELECTORS_VERSION
+
+logger = logging.getLogger(__name__)
+
+SELECTOR_WINDOW = int(os.getenv("SELECTOR_WINDOW", "50"))
+SELECTOR_MAX_CONSECUTIVE_MISSES = int(
+    os.getenv("SELECTOR_MAX_CONSECUTIVE_MISSES", "5")
+)
+SELECTOR_MAX_MISS_RATE = float(os.getenv("SELECTOR_MAX_MISS_RATE", "0.8"))
+
+
+class LayoutDriftError(RuntimeError):
+    """Разметка сайта изменилась: обязательный селектор перестал находиться."""
+
+
+class SelectorHealth:
+    """
+    Скользящая статистика промахов по селекторам.
+
+    Потокобезопасен: один экземпляр может использоваться несколькими
+    вкладками или потоками.
+    """
+
+    def __init__(
+        self,
+        window: int = SELECTOR_WINDOW,
+        max_consecutive_misses: int = SELECTOR_MAX_CONSECUTIVE_MISSES,
+        max_miss_rate: float = SELECTOR_MAX_MISS_RATE,
+    ) -> None:
+        """
+        Args:
+            window: Размер скользящего окна по каждому селектору
+            max_consecutive_misses: Число промахов подряд до остановки
+            max_miss_rate: Доля промахов в заполненном окне до остановки
+        """
+        self.window = window
+        self.max_consecutive_misses = max_consecutive_misses
+        self.max_miss_rate = max_miss_rate
+        self._history: Dict[str, Deque[bool]] = {}
+        self._consecutive: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def reset(self) -> None:
+        """Очищает статистику (в начале нового запуска)."""
+        with self._lock:
+            self._history.clear()
+            self._consecutive.clear()
+
+    def record(self, name: str, found: bool, case_number: str = "") -> None:
+        """
+        Учитывает результат поиска селектора.
+
+        Args:
+            name: Имя селектора из kad_selectors.SELECTORS
+            found: Найден ли элемент
+            case_number: Номер дела для сообщения об ошибке
+
+        Raises:
+            LayoutDriftError: Если превышен порог промахов
+        """
+        with self._lock:
+            history = self._history.setdefault(
+                name, deque(maxlen=self.window)
+            )
+            history.append(found)
+            if found:
+                self._consecutive[name] = 0
+                return
+            consecutive = self._consecutive.get(name, 0) + 1
+            self._consecutive[name] = consecutive
+            misses = history.count(False)
+            miss_rate = misses / len(history)
+            window_full = len(history) == self.window
+
+        if consecutive >= self.max_consecutive_misses or (
+            window_full and miss_rate >= self.max_miss_rate
+        ):
+            message = (
+                f"Селектор '{name}' ({SELECTORS.get(name, '?')}) не найден "
+                f"{consecutive} раз подряд, промахов в окне {misses}/"
+                f"{len(history)}; последнее дело {case_number or '?'}. "
+                f"Вероятно, изменилась разметка kad.arbitr.ru — обновите "
+                f"kad_selectors.py (версия {SELECTORS_VERSION})"
+            )
+            logger.critical(message)
+            raise LayoutDriftError(message)
+        logger.info(
+            "Селектор '%s' не найден для дела %s (%s подряд)",
+            name,
+            case_number,
+            consecutive,
+        )
+
+    def snapshot(self) -> Dict[str, Dict[str, float]]:
+        """
+        Возвращает статистику по селекторам.
+
+        Returns:
+            Dict: Для каждого селектора — размер окна, доля промахов и
+                число промахов подряд
+        """
+        with self._lock:
+            return {
+                name: {
+                    "samples": len(history),
+                    "miss_rate": round(
+                        history.count(False) / len(history), 3
+                    ),
+                    "consecutive_misses": self._consecutive.get(name, 0),
+                }
+                for name, history in self._history.items()
+                if history
+            }
+
+
+# Общий монитор процесса
+HEALTH = SelectorHealth()
@@ -0,0 +1,35 @@
+"""
+Общие фикстуры тестов: временная база SQLite.
+
+Каждый вызов фабрики открывает отдельный engine на том же файле базы, так
+что две сессии ведут себя как два независимых обработчика (процесса).
+"""
+
+import pytest
+from sqlalchemy import create_engine  # type: ignore
+from sqlalchemy.orm import sessionmaker  # type: ignore
+
+from models import Base
+
+
+@pytest.fixture
+def make_session(tmp_path):
+    """Фабрика сессий пустой базы SQLite, по одному engine на сессию."""
+    url = f"sqlite:///{tmp_path / 'test.db'}"
+    engines = []
+    sessions = []
+
+    def factory():
+        engine = create_engine(url)
+        if not engines:
+            Base.metadata.create_all(engine)
+        engines.append(engine)
+        session = sessionmaker(bind=engine)()
+        sessions.append(session)
+        return session
+
+    yield factory
+    for session in sessions:
+        session.close()
+    for engine in engines:
+        engine.dispose()
@@ -0,0 +1,119 @@
+"""Тесты аренды дел для распределённого парсинга (case_leases.py)."""
+
+from datetime import datetime, timedelta
+
+from sqlalchemy import event, update  # type: ignore
+
+from case_leases import (
+    claim_cases,
+    count_due,
+    ensure_leases,
+    heartbeat,
+    release_case,
+    release_unfinished,
+)
+from models import CaseLease, Cases
+from retry_policy import PERMANENT
+
+
+def _add_cases(session, count, **extra):
+    """Добавляет дела и записи аренды для них."""
+    for number in range(count):
+        session.add(
+            Cases(case_number=f"А40-{number + 1}/2025", **extra)
+        )
+    session.commit()
+    ensure_leases(session)
+
+
+def test_two_workers_get_disjoint_batches(make_session):
+    first, second = make_session(), make_session()
+    _add_cases(first, 6)
+    run_started = datetime.now()
+
+    batch_a = claim_cases(first, "a", 3, run_started)
+    batch_b = claim_cases(second, "b", 10, run_started)
+
+    assert len(batch_a) == 3
+    assert len(batch_b) == 3
+    assert not set(batch_a) & set(batch_b)
+    assert count_due(first, run_started) == 0
+
+
+def test_claim_race_loses_rows_taken_after_select(make_session):
+    first, second = make_session(), make_session()
+    _add_cases(first, 4)
+    run_started = datetime.now()
+    stolen = []
+
+    # Второй обработчик захватывает дела между выборкой кандидатов первым
+    # обработчиком и его условным UPDATE
+    def steal(conn, cursor, statement, *args):
+        if statement.startswith("UPDATE case_leases") and not stolen:
+            stolen.extend(claim_cases(second, "b", 2, run_started))
+
+    event.listen(first.get_bind(), "before_cursor_execute", steal)
+    claimed = claim_cases(first, "a", 4, run_started)
+
+    assert len(stolen) == 2
+    assert len(claimed) == 2
+    assert not set(claimed) & set(stolen)
+    assert sorted(claimed + stolen) == sorted(
+        number for (number,) in first.query(CaseLease.case_number)
+    )
+    owners = dict(first.query(CaseLease.case_number, CaseLease.worker_id))
+    assert all(owners[number] == "b" for number in stolen)
+
+
+def test_expired_lease_is_taken_over(make_session):
+    first, second = make_session(), make_session()
+    _add_cases(first, 1)
+    run_started = datetime.now()
+    (case_number,) = claim_cases(first, "a", 1, run_started)
+
+    # Пока аренда действует, дело никому не выдаётся
+    assert claim_cases(second, "b", 1, run_started) == []
+
+    second.execute(
+        update(CaseLease).values(
+            lease_expires_at=datetime.now() - timedelta(seconds=1)
+        )
+    )
+    second.commit()
+
+    assert claim_cases(second, "b", 1, run_started) == [case_number]
+    # Прежний владелец видит потерю аренды и не может освободить дело
+    assert heartbeat(first, "a", [case_number]) == set()
+    assert release_case(first, "a", case_number) is False
+    assert release_case(second, "b", case_number) is True
+
+
+def test_released_case_is_not_claimed_again_in_same_run(make_session):
+    session = make_session()
+    _add_cases(session, 1)
+    run_started = datetime.now()
+    (case_number,) = claim_cases(session, "a", 1, run_started)
+
+    assert release_case(session, "a", case_number, rescrape_after=0)
+    assert claim_cases(session, "a", 1, run_started) == []
+    # Следующий запуск получает дело снова
+    assert claim_cases(session, "a", 1, datetime.now()) == [case_number]
+
+
+def test_release_unfinished_returns_cases_to_pool(make_session):
+    first, second = make_session(), make_session()
+    _add_cases(first, 3)
+    run_started = datetime.now()
+    claimed = claim_cases(first, "a", 3, run_started)
+
+    assert release_unfinished(first, "a") == 3
+    assert sorted(claim_cases(second, "b", 3, run_started)) == sorted(
+        claimed
+    )
+
+
+def test_permanent_failures_are_not_claimed(make_session):
+    session = make_session()
+    _add_cases(session, 2, scrape_status=PERMANENT)
+
+    assert claim_cases(session, "a", 2, datetime.now()) == []
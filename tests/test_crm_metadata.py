@@ -0,0 +1,59 @@
+"""Тесты кеша справочных данных CRM (crm_metadata.py)."""
+
+import logging
+
+from sqlalchemy.exc import IntegrityError  # type: ignore
+
+import crm_metadata
+from crm_metadata import cached_value, get_cached, put_cached
+from models import Cases
+
+
+def test_put_cached_leaves_commit_to_caller(make_session):
+    first, second = make_session(), make_session()
+    put_cached(first, "calendar:hearings", 7, ttl=60)
+    first.rollback()
+
+    assert get_cached(second, "calendar:hearings") is None
+
+    put_cached(first, "calendar:hearings", 7, ttl=60)
+    first.commit()
+
+    assert get_cached(second, "calendar:hearings") == 7
+
+
+def test_put_cached_updates_existing_value(make_session):
+    session = make_session()
+    put_cached(session, "calendar:hearings", 7, ttl=60)
+    session.commit()
+
+    assert cached_value(
+        session, "calendar:hearings", 60, lambda: 8, refresh=True
+    ) == 8
+    session.commit()
+    assert get_cached(make_session(), "calendar:hearings") == 8
+
+
+def test_failed_put_keeps_caller_changes_and_is_logged(
+    make_session, monkeypatch, caplog
+):
+    session = make_session()
+    session.add(Cases(case_number="А40-1/2025"))
+    session.flush()
+
+    def conflict():
+        raise IntegrityError("INSERT", {}, Exception("conflict"))
+
+    # БД без INSERT ... ON CONFLICT; оба сохранения конфликтуют с записью
+    # другого процесса
+    monkeypatch.setattr(crm_metadata, "dialect_insert", lambda _: None)
+    monkeypatch.setattr(session, "flush", conflict)
+    with caplog.at_level(logging.ERROR, logger="crm_metadata"):
+        put_cached(session, "calendar:hearings", 7, ttl=60)
+    monkeypatch.undo()
+    session.commit()
+
+    assert "calendar:hearings" in caplog.text
+    other = make_session()
+    assert other.query(Cases).count() == 1
+    assert get_cached(other, "calendar:hearings") is None
@@ -0,0 +1,62 @@
+"""Тесты журнала записей в CRM (crm_writes.py)."""
+
+from datetime import datetime, timedelta
+
+from sqlalchemy import update  # type: ignore
+
+from crm_writes import (
+    DONE,
+    abandon_write,
+    begin_write,
+    comment_key,
+    complete_write,
+    completed_writes,
+)
+from models import CrmWrite
+
+KEY = comment_key(1, "А40-1/2025", "01.02.2025", "Решение", None)
+
+
+def test_second_worker_does_not_repeat_pending_write(make_session):
+    first, second = make_session(), make_session()
+
+    assert begin_write(first, KEY, "comment", 1) is True
+    assert begin_write(second, KEY, "comment", 1) is False
+
+
+def test_completed_write_is_not_repeated(make_session):
+    first, second = make_session(), make_session()
+    begin_write(first, KEY, "comment", 1)
+    complete_write(first, KEY, remote_id=42)
+
+    done = completed_writes(second, [KEY, KEY])
+    assert list(done) == [KEY]
+    assert done[KEY].status == DONE
+    assert done[KEY].remote_id == 42
+    assert begin_write(second, KEY, "comment", 1) is False
+
+
+def test_abandoned_write_can_be_retried(make_session):
+    first, second = make_session(), make_session()
+    begin_write(first, KEY, "comment", 1)
+    abandon_write(first, KEY)
+
+    assert completed_writes(second, [KEY]) == {}
+    assert begin_write(second, KEY, "comment", 1) is True
+
+
+def test_stale_pending_write_is_taken_over_once(make_session):
+    first, second, third = make_session(), make_session(), make_session()
+    begin_write(first, KEY, "comment", 1)
+    # Обработчик упал, не завершив запись
+    first.execute(
+        update(CrmWrite).values(
+            started_at=datetime.now() - timedelta(hours=1)
+        )
+    )
+    first.commit()
+
+    assert begin_write(second, KEY, "comment", 1) is True
+    assert begin_write(third, KEY, "comment", 1) is False
+    (write,) = third.query(CrmWrite).all()
+    assert write.attempts == 2
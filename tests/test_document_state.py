@@ -0,0 +1,86 @@
+"""Тесты постановки документов в очередь по отметке (document_state.py)."""
+
+from datetime import datetime, timedelta
+
+from document_state import WATERMARK_OVERLAP, enqueue_documents
+from models import Chronology, DocumentState
+
+
+def _chronology(session, case_number, doc_link, updated_at):
+    """Добавляет запись хронологии."""
+    row = Chronology(
+        case_number=case_number,
+        event_title="Решение",
+        doc_link=doc_link,
+        updated_at=updated_at,
+    )
+    session.add(row)
+    session.commit()
+    return row
+
+
+def _queued(session):
+    """Ссылки документов в очереди."""
+    return sorted(
+        link for (link,) in session.query(DocumentState.doc_link)
+    )
+
+
+def test_new_documents_are_queued_once(make_session):
+    session = make_session()
+    now = datetime.now()
+    _chronology(session, "А40-1/2025", "https://kad.arbitr.ru/1.pdf", now)
+    _chronology(session, "А40-2/2025", "C:/docs/2.pdf", now)
+
+    assert enqueue_documents(session) == 1
+    assert enqueue_documents(session) == 0
+    assert _queued(session) == ["https://kad.arbitr.ru/1.pdf"]
+
+
+def test_updated_row_after_watermark_is_queued(make_session):
+    session = make_session()
+    row = _chronology(
+        session,
+        "А40-1/2025",
+        "https://kad.arbitr.ru/1.pdf",
+        datetime.now() - timedelta(hours=1),
+    )
+    enqueue_documents(session)
+
+    row.doc_link = "https://kad.arbitr.ru/2.pdf"
+    row.updated_at = datetime.now()
+    session.commit()
+
+    assert enqueue_documents(session) == 1
+    assert _queued(session) == [
+        "https://kad.arbitr.ru/1.pdf",
+        "https://kad.arbitr.ru/2.pdf",
+    ]
+
+
+def test_row_committed_late_within_lease_is_queued(make_session):
+    first, second = make_session(), make_session()
+    now = datetime.now()
+    _chronology(first, "А40-2/2025", "https://kad.arbitr.ru/2.pdf", now)
+    enqueue_documents(first)
+
+    # Транзакция другого обработчика взяла updated_at раньше отметки, но
+    # зафиксировалась после запуска постановки в очередь
+    late = now - WATERMARK_OVERLAP + timedelta(seconds=5)
+    _chronology(second, "А40-1/2025", "https://kad.arbitr.ru/1.pdf", late)
+
+    assert enqueue_documents(first) == 1
+    assert "https://kad.arbitr.ru/1.pdf" in _queued(first)
+
+
+def test_rows_without_updated_at_are_not_skipped(make_session):
+    session = make_session()
+    _chronology(
+        session, "А40-1/2025", "https://kad.arbitr.ru/1.pdf", datetime.now()
+    )
+    enqueue_documents(session)
+
+    _chronology(session, "А40-2/2025", "https://kad.arbitr.ru/2.pdf", None)
+
+    assert enqueue_documents(session) == 1
+    assert enqueue_documents(session) == 0
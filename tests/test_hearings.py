@@ -0,0 +1,86 @@
+"""Тесты расписания заседаний и календаря .ics (hearings.py)."""
+
+from datetime import datetime, timedelta
+
+import hearings
+from hearings import hearings_between, record_hearing, render_ics
+from models import Chronology, Hearing
+
+
+def _schedule(session, case_number, starts_at):
+    """Записывает следующее заседание дела в хронологию и hearings."""
+    hearing_date = starts_at.strftime("%d.%m.%Y")
+    hearing_time = starts_at.strftime("%H:%M")
+    event = (
+        session.query(Chronology).filter_by(case_number=case_number).first()
+    )
+    if event is None:
+        event = Chronology(case_number=case_number)
+        session.add(event)
+    event.hearing_date = hearing_date
+    event.hearing_time = hearing_time
+    session.commit()
+    record_hearing(session, case_number, hearing_date, hearing_time)
+
+
+def _window(session):
+    """Номера дел с заседаниями за месяц назад и вперёд."""
+    now = datetime.now()
+    return [
+        hearing.case_number
+        for hearing in hearings_between(
+            session, now - timedelta(days=30), now + timedelta(days=30)
+        )
+    ]
+
+
+def test_cancelled_future_hearing_is_dropped(make_session):
+    session = make_session()
+    starts_at = (datetime.now() + timedelta(days=3)).replace(
+        second=0, microsecond=0
+    )
+    _schedule(session, "А40-1/2025", starts_at)
+    _schedule(session, "А40-2/2025", starts_at)
+    assert _window(session) == ["А40-1/2025", "А40-2/2025"]
+
+    # Карточка дела больше не показывает заседание
+    event = session.query(Chronology).filter_by(case_number="А40-1/2025")
+    event.one().hearing_date = None
+    session.commit()
+
+    assert _window(session) == ["А40-2/2025"]
+
+
+def test_past_hearing_stays_and_orphan_is_dropped(make_session):
+    session = make_session()
+    past = (datetime.now() - timedelta(days=3)).replace(
+        second=0, microsecond=0
+    )
+    _schedule(session, "А40-1/2025", past)
+    _schedule(session, "А40-1/2025", past + timedelta(days=10))
+    session.add(Hearing(case_number="А40-9/2025", starts_at=past))
+    session.commit()
+
+    assert _window(session) == ["А40-1/2025", "А40-1/2025"]
+
+
+def test_ics_times_are_written_in_utc(monkeypatch):
+    monkeypatch.setattr(hearings, "HEARINGS_TZ", "Europe/Moscow")
+    hearing = Hearing(
+        case_number="А40-1/2025", starts_at=datetime(2025, 3, 4, 10, 30)
+    )
+
+    text = render_ics([hearing])
+
+    assert "DTSTART:20250304T073000Z" in text
+    assert "DTEND:20250304T083000Z" in text
+    assert "TZID" not in text
+
+
+def test_ics_times_are_floating_without_zone(monkeypatch):
+    monkeypatch.setattr(hearings, "HEARINGS_TZ", "")
+    hearing = Hearing(
+        case_number="А40-1/2025", starts_at=datetime(2025, 3, 4, 10, 30)
+    )
+
+    assert "DTSTART:20250304T103000\r\n" in render_ics([hearing])
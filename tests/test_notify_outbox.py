@@ -0,0 +1,124 @@
+"""Тесты очереди уведомлений CRM (notify_outbox.py)."""
+
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import update  # type: ignore
+
+import notify_outbox
+from crm_writes import comment_key, completed_writes
+from models import NotificationOutbox
+from notify_outbox import (
+    _claim_project,
+    enqueue_notification,
+    flush_notifications,
+    pending_count,
+)
+
+
+@pytest.fixture
+def sent(monkeypatch):
+    """Подменяет отправку комментария и запоминает отправленное."""
+    comments = []
+
+    def send(project_id, updates):
+        comments.append((project_id, updates))
+        return {"id": len(comments)}
+
+    monkeypatch.setattr(notify_outbox, "send_case_digest_comment", send)
+    return comments
+
+
+def _event(title, doc_link=None):
+    """Данные события для enqueue_notification."""
+    return {
+        "event_title": title,
+        "event_date": "01.02.2025",
+        "doc_link": doc_link,
+    }
+
+
+def _age(session, seconds):
+    """Сдвигает время добавления всех записей очереди в прошлое."""
+    session.execute(
+        update(NotificationOutbox).values(
+            created_at=datetime.now() - timedelta(seconds=seconds)
+        )
+    )
+    session.commit()
+
+
+def test_updates_wait_for_coalesce_window(make_session, sent):
+    session = make_session()
+    enqueue_notification(session, 1, "А40-1/2025", _event("Решение"))
+
+    assert flush_notifications(session) == 0
+    assert sent == []
+
+    _age(session, notify_outbox.NOTIFY_COALESCE_SECONDS + 1)
+    assert flush_notifications(session) == 1
+    assert pending_count(session) == 0
+
+
+def test_one_digest_per_project_with_duplicates_merged(make_session, sent):
+    session = make_session()
+    enqueue_notification(session, 1, "А40-1/2025", _event("Решение"))
+    enqueue_notification(session, 1, "А40-1/2025", _event("Решение"))
+    enqueue_notification(session, 1, "А40-2/2025", _event("Определение"))
+    enqueue_notification(session, 2, "А40-3/2025", _event("Решение"))
+
+    assert flush_notifications(session, force=True) == 2
+
+    digests = dict(sent)
+    assert [u["case_number"] for u in digests[1]] == [
+        "А40-1/2025",
+        "А40-2/2025",
+    ]
+    assert len(digests[2]) == 1
+    assert pending_count(session) == 0
+    key = comment_key(1, "А40-1/2025", "01.02.2025", "Решение", None)
+    assert list(completed_writes(session, [key])) == [key]
+
+
+def test_claimed_project_is_not_sent_by_second_worker(make_session, sent):
+    first, second = make_session(), make_session()
+    enqueue_notification(first, 1, "А40-1/2025", _event("Решение"))
+    now = datetime.now()
+
+    assert len(_claim_project(first, 1, now)) == 1
+    assert _claim_project(second, 1, now) == []
+    assert flush_notifications(second, force=True) == 0
+    assert sent == []
+
+
+def test_already_delivered_update_is_not_sent_again(make_session, sent):
+    first, second = make_session(), make_session()
+    enqueue_notification(first, 1, "А40-1/2025", _event("Решение"))
+    flush_notifications(first, force=True)
+    # То же событие снова попало в очередь (например, после сбоя до
+    # отметки sent_at)
+    enqueue_notification(second, 1, "А40-1/2025", _event("Решение"))
+
+    assert flush_notifications(second, force=True) == 0
+    assert len(sent) == 1
+    assert pending_count(second) == 0
+
+
+def test_failed_send_keeps_claim_and_counts_attempt(
+    make_session, monkeypatch
+):
+    session = make_session()
+    monkeypatch.setattr(
+        notify_outbox, "send_case_digest_comment", lambda *args: None
+    )
+    enqueue_notification(session, 1, "А40-1/2025", _event("Решение"))
+
+    assert flush_notifications(session, force=True) == 0
+    (item,) = session.query(NotificationOutbox).all()
+    assert item.attempts == 1
+    assert item.sent_at is None
+    assert item.claim_token is not None
+    # Повтор — только после истечения захвата
+    assert flush_notifications(session, force=True) == 0
+    session.refresh(item)
+    assert item.attempts == 1
@@ -0,0 +1,138 @@
+"""Тесты остановки и разгрузки потокового конвейера (pipeline.py)."""
+
+import threading
+
+import pytest
+
+from pipeline import Pipeline, Stage
+
+
+def _run(pipeline, source, timeout=10):
+    """Запускает конвейер в отдельном потоке и ждёт его без зависания."""
+    result = {}
+    thread = threading.Thread(
+        target=lambda: result.update(metrics=pipeline.run(source)),
+        daemon=True,
+    )
+    thread.start()
+    thread.join(timeout)
+    if thread.is_alive():
+        pytest.fail("Конвейер не завершился")
+    return result["metrics"]
+
+
+def _collector():
+    """Обработчик завершения, запоминающий исходы элементов."""
+    outcomes = []
+    lock = threading.Lock()
+
+    def on_finish(item, ok):
+        with lock:
+            outcomes.append((item, ok))
+
+    return outcomes, on_finish
+
+
+def test_all_items_pass_through_several_workers():
+    outcomes, on_finish = _collector()
+    pipeline = Pipeline(
+        [
+            Stage("double", lambda item, _: item * 2, workers=3, queue_size=2),
+            Stage("inc", lambda item, _: item + 1, workers=2, queue_size=1),
+        ],
+        on_finish=on_finish,
+    )
+
+    metrics = _run(pipeline, range(50))
+
+    assert sorted(item for item, _ in outcomes) == [
+        n * 2 + 1 for n in range(50)
+    ]
+    assert all(ok for _, ok in outcomes)
+    assert [stage["processed"] for stage in metrics] == [50, 50]
+    assert all(stage["queue_depth"] == 0 for stage in metrics)
+
+
+def test_healthy_workers_finish_when_one_setup_fails():
+    outcomes, on_finish = _collector()
+    calls = []
+    lock = threading.Lock()
+
+    def setup():
+        with lock:
+            calls.append(1)
+            if len(calls) == 1:
+                raise RuntimeError("драйвер не запустился")
+        return object()
+
+    pipeline = Pipeline(
+        [
+            Stage("noop", lambda item, _: item, workers=2, queue_size=1),
+            Stage(
+                "fetch",
+                lambda item, _: item,
+                workers=3,
+                queue_size=1,
+                setup=setup,
+            ),
+        ],
+        on_finish=on_finish,
+    )
+
+    metrics = _run(pipeline, range(30))
+
+    assert sorted(item for item, _ in outcomes) == list(range(30))
+    assert all(ok for _, ok in outcomes)
+    assert metrics[1]["processed"] == 30
+
+
+def test_queue_is_drained_when_all_workers_fail():
+    outcomes, on_finish = _collector()
+
+    def setup():
+        raise RuntimeError("драйвер не запустился")
+
+    pipeline = Pipeline(
+        [
+            Stage("noop", lambda item, _: item, workers=2, queue_size=1),
+            Stage(
+                "fetch",
+                lambda item, _: item,
+                workers=2,
+                queue_size=1,
+                setup=setup,
+            ),
+            Stage("store", lambda item, _: item, workers=1, queue_size=1),
+        ],
+        on_finish=on_finish,
+    )
+
+    # Без разгрузки первая стадия заблокировалась бы на заполненной очереди
+    metrics = _run(pipeline, range(20))
+
+    assert sorted(item for item, _ in outcomes) == list(range(20))
+    assert not any(ok for _, ok in outcomes)
+    assert metrics[1]["failed"] == 20
+    assert metrics[2]["processed"] == 0
+    assert all(stage["queue_depth"] == 0 for stage in metrics)
+
+
+def test_handler_errors_and_drops_are_reported():
+    outcomes, on_finish = _collector()
+
+    def handler(item, _):
+        if item % 3 == 0:
+            raise ValueError("битая страница")
+        return item if item % 3 == 1 else None
+
+    pipeline = Pipeline(
+        [Stage("parse", handler, workers=2, queue_size=1)],
+        on_finish=on_finish,
+    )
+
+    metrics = _run(pipeline, range(9))
+
+    assert sorted(item for item, ok in outcomes if ok) == [1, 4, 7]
+    assert metrics[0]["failed"] == 3
+    assert metrics[0]["dropped"] == 3
+    assert metrics[0]["processed"] == 3
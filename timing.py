@@ -0,0 +1,226 @@
+"""
+Модуль замеров времени по стадиям обработки дела.
+
+Длительности стадий (загрузка страницы, проверка блокировки, поиск
+заседания, переключение вкладки, раскрытие хронологии, ожидание
+элементов, извлечение полей, запись в БД, уведомление CRM) собираются в
+гистограмму в памяти процесса. По окончании запуска сводка — p50/p95/max
+по стадиям и самые медленные дела — пишется в лог и в JSON файл.
+
+Пример:
+    laps = TIMINGS.laps(case_number)
+    driver.get(url)
+    laps.lap("navigate")
+    ...
+    laps.lap("extract")
+"""
+
+import bisect
+import json
+import logging
+import os
+import threading
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+TIMINGS_FILE = os.getenv("TIMINGS_FILE", "scrape_timings.json")
+
+# Верхние границы корзин гистограммы в секундах
+HISTOGRAM_BUCKETS = [0.1, 0.25, 0.5, 1, 2, 5, 10, 20, 30, 60]
+BUCKET_LABELS = [f"le_{bound}" for bound in HISTOGRAM_BUCKETS] + ["le_inf"]
+
+# Сколько самых медленных дел включать в сводку
+SLOWEST_CASES = 10
+
+
+def percentile(values: List[float], fraction: float) -> float:
+    """
+    Возвращает перцентиль по отсортированному списку (ближайший ранг).
+
+    Args:
+        values: Отсортированные значения
+        fraction: Доля 0-1 (0.95 для p95)
+
+    Returns:
+        float: Значение перцентиля или 0.0 для пустого списка
+    """
+    if not values:
+        return 0.0
+    rank = int(round(fraction * len(values)))
+    return values[max(0, min(len(values) - 1, rank - 1))]
+
+
+class CaseLaps:
+    """
+    Секундомер одного дела: каждая отметка записывает время, прошедшее с
+    предыдущей отметки, как длительность названной стадии.
+    """
+
+    def __init__(self, timings: "Timings", case_number: str) -> None:
+        self.timings = timings
+        self.case_number = case_number
+        self._last = time.monotonic()
+
+    def lap(self, stage: str) -> float:
+        """
+        Записывает длительность стадии, завершившейся сейчас.
+
+        Args:
+            stage: Название стадии
+
+        Returns:
+            float: Длительность стадии в секундах
+        """
+        now = time.monotonic()
+        seconds = now - self._last
+        self._last = now
+        self.timings.record(stage, seconds, self.case_number)
+        return seconds
+
+    def skip(self) -> None:
+        """Сбрасывает отсчёт, не записывая время (например, после паузы)."""
+        self._last = time.monotonic()
+
+
+class Timings:
+    """
+    Гистограммы длительностей по стадиям и суммарное время по делам.
+
+    Потокобезопасен.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        """Очищает накопленные замеры (в начале нового запуска)."""
+        with self._lock:
+            self.started_at = datetime.now()
+            self._samples: Dict[str, List[float]] = {}
+            self._buckets: Dict[str, List[int]] = {}
+            self._cases: Dict[str, float] = {}
+
+    def laps(self, case_number: str) -> CaseLaps:
+        """
+        Создаёт секундомер для дела.
+
+        Args:
+            case_number: Номер дела
+
+        Returns:
+            CaseLaps: Секундомер, отсчёт начинается с момента создания
+        """
+        return CaseLaps(self, case_number)
+
+    def record(
+        self, stage: str, seconds: float, case_number: Optional[str] = None
+    ) -> None:
+        """
+        Записывает длительность стадии.
+
+        Args:
+            stage: Название стадии
+            seconds: Длительность в секундах
+            case_number: Номер дела (для рейтинга медленных дел)
+        """
+        with self._lock:
+            self._samples.setdefault(stage, []).append(seconds)
+            buckets = self._buckets.setdefault(
+                stage, [0] * (len(HISTOGRAM_BUCKETS) + 1)
+            )
+            buckets[bisect.bisect_left(HISTOGRAM_BUCKETS, seconds)] += 1
+            if case_number:
+                self._cases[case_number] = (
+                    self._cases.get(case_number, 0.0) + seconds
+                )
+
+    def samples(self) -> Dict[str, List[float]]:
+        """
+        Возвращает копию замеров по стадиям (для объединения замеров
+        нескольких процессов через record).
+
+        Returns:
+            Dict[str, List[float]]: Длительности стадий в секундах
+        """
+        with self._lock:
+            return {
+                stage: list(values) for stage, values in self._samples.items()
+            }
+
+    def summary(self) -> Dict[str, Any]:
+        """
+        Возвращает сводку замеров.
+
+        Returns:
+            Dict[str, Any]: По каждой стадии — count, total, p50, p95, max и
+                гистограмма; самые медленные дела по суммарному времени
+        """
+        with self._lock:
+            stages = {}
+            for stage, samples in self._samples.items():
+                ordered = sorted(samples)
+                stages[stage] = {
+                    "count": len(ordered),
+                    "total": round(sum(ordered), 3),
+                    "p50": round(percentile(ordered, 0.5), 3),
+                    "p95": round(percentile(ordered, 0.95), 3),
+                    "max": round(ordered[-1], 3),
+                    "histogram": dict(
+                        zip(BUCKET_LABELS, self._buckets[stage])
+                    ),
+                }
+            slowest = sorted(
+                self._cases.items(), key=lambda item: item[1], reverse=True
+            )[:SLOWEST_CASES]
+            return {
+                "started_at": self.started_at.isoformat(timespec="seconds"),
+                "finished_at": datetime.now().isoformat(timespec="seconds"),
+                "cases": len(self._cases),
+                "stages": stages,
+                "slowest_cases": [
+                    {"case_number": case, "seconds": round(seconds, 3)}
+                    for case, seconds in slowest
+                ],
+            }
+
+    def write_summary(self, path: Optional[str] = TIMINGS_FILE) -> None:
+        """
+        Пишет сводку в лог и (если задан путь) в JSON файл.
+
+        Args:
+            path: Путь к JSON файлу или None
+        """
+        summary = self.summary()
+        for stage, stats in summary["stages"].items():
+            logger.info(
+                "Стадия %s: %s раз, p50 %s с, p95 %s с, максимум %s с",
+                stage,
+                stats["count"],
+                stats["p50"],
+                stats["p95"],
+                stats["max"],
+            )
+        if summary["slowest_cases"]:
+            logger.info(
+                "Самые медленные дела: %s",
+                ", ".join(
+                    f"{item['case_number']} ({item['seconds']:.1f} с)"
+                    for item in summary["slowest_cases"]
+                ),
+            )
+        if not path:
+            return
+        try:
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump(summary, f, ensure_ascii=False, indent=2)
+            logger.info("Сводка замеров сохранена в %s", path)
+        except OSError as e:
+            logger.error("Не удалось сохранить сводку замеров: %s", e)
+
+
+# Общие замеры процесса
+TIMINGS = Timings()
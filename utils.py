@@ -21,6 +21,15 @@ try:
 except ImportError as e:
     raise ImportError(f"Required modules are missing: {e}")
 
+from kad_selectors import KAD_BASE_URL
+from lean_profile import (
+    BROWSER_LEAN,
+    apply_lean_options,
+    enable_request_blocking,
+)
+
+logger = logging.getLogger(__name__)
+
 # Список User-Agent для эмуляции разных браузеров
 USER_AGENTS = [
     "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 "
@@ -35,6 +44,27 @@ USER_AGENTS = [
     "(KHTML, like Gecko) Edge/126.0.0.0",
 ]
 
+# Файл кеша пути к ChromeDriver, найденного webdriver-manager
+DRIVER_PATH_CACHE = ".chromedriver_path.json"
+
+# Множитель пауз, имитирующих действия человека (0 — без пауз; только для
+# локального сервера mock_kad.py, на kad.arbitr.ru паузы обязательны)
+HUMAN_PAUSE_SCALE = float(os.getenv("HUMAN_PAUSE_SCALE", "1"))
+
+
+def human_pause(low: float, high: float) -> float:
+    """
+    Возвращает случайную паузу «как у человека» с учётом HUMAN_PAUSE_SCALE.
+
+    Args:
+        low: Минимальная пауза в секундах
+        high: Максимальная пауза в секундах
+
+    Returns:
+        float: Пауза в секундах
+    """
+    return random.uniform(low, high) * HUMAN_PAUSE_SCALE
+
 
 def save_progress(case_number: str, index: int, filename: str) -> None:
     """
@@ -48,8 +78,8 @@ def save_progress(case_number: str, index: int, filename: str) -> None:
     progress = {"last_case_number": case_number, "last_index": index}
     with open(filename, "w", encoding="utf-8") as f:
         json.dump(progress, f, ensure_ascii=False)
-    logging.info(
-        f"Прогресс сохранён в {filename}: {case_number}, " f"индекс {index}"
+    logger.info(
+        "Прогресс сохранён в %s: %s, индекс %s", filename, case_number, index
     )
 
 
@@ -70,9 +100,9 @@ def load_progress(filename: str) -> Optional[Dict[str, Any]]:
                 progress = json.load(f)
             if "last_case_number" in progress and "last_index" in progress:
                 return progress
-            logging.warning(f"Некорректный формат файла прогресса: {filename}")
+            logger.warning("Некорректный формат файла прогресса: %s", filename)
         except json.JSONDecodeError:
-            logging.error(f"Ошибка чтения файла прогресса: {filename}")
+            logger.error("Ошибка чтения файла прогресса: %s", filename)
     return None
 
 
@@ -85,16 +115,72 @@ def clear_progress(filename: str) -> None:
     """
     if os.path.exists(filename):
         os.remove(filename)
-        logging.info(f"Файл прогресса удалён: {filename}")
+        logger.info("Файл прогресса удалён: %s", filename)
+
+
+def resolve_driver_path(
+    cache_file: str = DRIVER_PATH_CACHE,
+    max_age_days: int = 7,
+    refresh: bool = False,
+) -> str:
+    """
+    Возвращает путь к ChromeDriver, не обращаясь к сети без необходимости.
+
+    ChromeDriverManager().install() выполняет сетевой запрос при каждом
+    вызове, поэтому найденный путь кешируется в файле и переиспользуется,
+    пока файл драйвера существует и кеш не старше max_age_days.
+
+    Args:
+        cache_file: Файл кеша пути к драйверу
+        max_age_days: Срок жизни кеша в днях
+        refresh: Удалить кеш и определить путь заново (например, если
+            драйвер по кешированному пути не запустился)
+
+    Returns:
+        str: Путь к исполняемому файлу ChromeDriver
+    """
+    if refresh and os.path.exists(cache_file):
+        os.remove(cache_file)
+        logger.info("Кеш пути драйвера %s удалён", cache_file)
+    if os.path.exists(cache_file):
+        try:
+            with open(cache_file, "r", encoding="utf-8") as f:
+                cached = json.load(f)
+            path = cached.get("path")
+            age = time.time() - float(cached.get("resolved_at", 0))
+            if path and os.path.exists(path) and age < max_age_days * 86400:
+                return path
+        except (json.JSONDecodeError, ValueError, OSError) as e:
+            logger.warning(
+                "Некорректный кеш пути драйвера %s: %s", cache_file, e
+            )
+
+    path = ChromeDriverManager().install()
+    with open(cache_file, "w", encoding="utf-8") as f:
+        json.dump({"path": path, "resolved_at": time.time()}, f)
+    logger.info("Путь к ChromeDriver сохранён в %s: %s", cache_file, path)
+    return path
 
 
-def get_driver(retries: int = 3, timeout: int = 30) -> Optional[uc.Chrome]:
+def get_driver(
+    retries: int = 3,
+    timeout: int = 30,
+    user_data_dir: Optional[str] = None,
+    warmup: bool = True,
+    lean: bool = BROWSER_LEAN,
+) -> Optional[uc.Chrome]:
     """
     Инициализирует и настраивает Chrome драйвер для парсинга.
 
     Args:
         retries: Количество попыток инициализации драйвера
         timeout: Таймаут для сетевых операций
+        user_data_dir: Папка профиля Chrome; если задана, кеш и cookies
+            сохраняются между запусками
+        warmup: Открыть главную страницу kad.arbitr.ru (KAD_BASE_URL)
+            после запуска
+        lean: Использовать облегчённый профиль (без изображений, шрифтов
+            и счётчиков аналитики)
 
     Returns:
         uc.Chrome: Настроенный Chrome драйвер или None при ошибке
@@ -103,12 +189,16 @@ def get_driver(retries: int = 3, timeout: int = 30) -> Optional[uc.Chrome]:
         Exception: Если не удалось инициализировать драйвер после всех попыток
     """
     socket.setdefaulttimeout(timeout)
+    driver_path = resolve_driver_path()
+    refreshed = False
 
     for attempt in range(retries):
+        driver = None
         try:
-            logging.info(
-                f"Попытка инициализации Chrome драйвера "
-                f"({attempt + 1}/{retries})"
+            logger.info(
+                "Попытка инициализации Chrome драйвера (%s/%s)",
+                attempt + 1,
+                retries,
             )
 
             # Создаем новый объект options для каждой
@@ -124,28 +214,44 @@ def get_driver(retries: int = 3, timeout: int = 30) -> Optional[uc.Chrome]:
             options.add_argument(f"--user-agent={random.choice(USER_AGENTS)}")
             options.add_argument("--disable-web-security")
             options.add_argument("--disable-site-isolation-trials")
+            if lean:
+                apply_lean_options(options)
 
-            # Используем webdriver-manager для автоматического
-            # управления ChromeDriver
-            driver_path = ChromeDriverManager().install()
             driver = uc.Chrome(
                 driver_executable_path=driver_path,
                 options=options,
-                use_subprocess=True
+                use_subprocess=True,
+                user_data_dir=user_data_dir,
             )
-            logging.info("Chrome драйвер успешно инициализирован")
-            driver.get("https://kad.arbitr.ru")
+            logger.info("Chrome драйвер успешно инициализирован")
+            if lean:
+                enable_request_blocking(driver)
+            if not warmup:
+                return driver
+            driver.get(KAD_BASE_URL)
             WebDriverWait(driver, timeout).until(
                 EC.presence_of_element_located((By.TAG_NAME, "body"))
             )
-            logging.info("Страница kad.arbitr.ru прогружена")
+            logger.info("Страница kad.arbitr.ru прогружена")
             return driver
         except Exception as e:
-            logging.error(f"Ошибка инициализации Chrome драйвера: {e}")
+            logger.error("Ошибка инициализации Chrome драйвера: %s", e)
+            if driver is None and not refreshed:
+                # Chrome не запустился: кешированный путь мог устареть,
+                # например после обновления браузера
+                refreshed = True
+                try:
+                    driver_path = resolve_driver_path(refresh=True)
+                except Exception as resolve_error:
+                    logger.error(
+                        "Не удалось заново определить путь к ChromeDriver: "
+                        "%s",
+                        resolve_error,
+                    )
             if attempt < retries - 1:
                 time.sleep(2)
             else:
-                logging.error("Не удалось инициализировать Chrome драйвер")
+                logger.error("Не удалось инициализировать Chrome драйвер")
                 raise Exception("Не удалось инициализировать Chrome драйвер")
     return None
 
@@ -171,6 +277,6 @@ def simulate_mouse_movement(driver: uc.Chrome) -> None:
             moveMouse(Math.random() * 1200, Math.random() * 800);
         """
         )
-        time.sleep(random.uniform(0.1, 0.3))
+        time.sleep(human_pause(0.1, 0.3))
     except Exception as e:
-        logging.info(f"Ошибка эмуляции движения мыши: {e}")
+        logger.info("Ошибка эмуляции движения мыши: %s", e)